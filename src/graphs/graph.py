@@ -3,6 +3,8 @@ from langgraph.graph import StateGraph, END
 from langchain_core.runnables import RunnableConfig
 from langgraph.runtime import Runtime
 from coze_coding_utils.runtime_ctx.context import Context
+from storage.memory.memory_saver import get_graph_checkpointer
+from utils.log.run_profile import current_run_profile
 
 from .state import (
     GlobalState,
@@ -26,6 +28,7 @@ from .state import (
     RouteDecisionInput
 )
 from .node import (
+    MEMORY_FIELDS,
     long_term_memory_node,
     homework_check_node,
     active_care_node,
@@ -40,15 +43,30 @@ from .node import (
 
 
 # ============== 包装函数：使用独立的Input/Output类型 ==============
+# 各路由分支读取的记忆字段：load_memory 先决定路由，只加载该分支需要的字段
+# （学习进度没有分支读取；保存记忆时需要的练习次数由 save_memory 按需加载）
+ROUTE_MEMORY_FIELDS = {
+    "快速回复": [],
+    "轻量级聊天": ["conversation_history"],
+    "主动关心": ["conversation_history"],
+    "作业提醒": [],
+    "口语练习": ["conversation_history"],
+    "实时对话": ["conversation_history"],
+}
+
+
 def wrap_load_memory(
     state: LoadMemoryWrapInput, 
     config: RunnableConfig, 
     runtime: Runtime[Context]
 ) -> LoadMemoryWrapOutput:
-    """加载长期记忆"""
+    """加载长期记忆（按路由分支只加载需要的字段）"""
+    route = decide_route(state.user_input_text, state.trigger_type)
+    fields = ROUTE_MEMORY_FIELDS.get(route, list(MEMORY_FIELDS))
     node_input = LongTermMemoryInput(
         child_id=state.child_id,
-        action_type="load"
+        action_type="load",
+        fields=fields
     )
     node_output: LongTermMemoryOutput = long_term_memory_node(node_input, config, runtime)
     
@@ -64,6 +82,8 @@ def wrap_load_memory(
         conversation_history=node_output.conversation_history,
         learning_progress=node_output.learning_progress,
         speaking_practice_count=node_output.speaking_practice_count,
+        memory_loaded=fields,
+        route=route,
         current_time=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     )
 
@@ -125,7 +145,7 @@ def wrap_speaking_practice(
         child_age=state.child_age,
         child_interests=state.child_interests,
         conversation_history=state.conversation_history,
-        practice_stage=None,  # 从GlobalState中获取
+        practice_stage=state.practice_stage,  # 启用 checkpointer 时为上一轮保存的阶段
         is_first_turn=True if not state.user_input_text and not state.user_input_audio else False
     )
     node_output: SpeakingPracticeOutput = speaking_practice_node(node_input, config, runtime)
@@ -137,7 +157,8 @@ def wrap_speaking_practice(
         crisis_detected=False,
         scenario_type="practice",
         execution_path=["speaking_practice"],
-        performance_metrics={}
+        performance_metrics={},
+        practice_stage=node_output.next_stage
     )
 
 
@@ -283,57 +304,40 @@ def wrap_save_memory(
         }
         memory_store.add_conversation(state.child_id, ai_record)
     
+    # 练习次数：口语练习分支会写入状态，其他分支未加载时从存储中读取
+    speaking_practice_count = state.speaking_practice_count
+    if "speaking_practice_count" not in state.memory_loaded and state.route != "口语练习":
+        speaking_practice_count = memory_store.get_speaking_practice_count(state.child_id)
+    
     # 更新学习进度
     if state.trigger_type == "practice":
         memory_store.update_learning_progress(state.child_id, {
-            "speaking_practice_count": state.speaking_practice_count,
+            "speaking_practice_count": speaking_practice_count,
             "last_practice_time": state.current_time
         })
     
-    # v2.0修复：从 GlobalState 收集执行路径和性能指标
-    # LangGraph 会将各个节点的输出合并到 GlobalState 中
-    # 我们在这里收集并聚合这些信息
-    
-    # 简化的执行路径推断（基于触发类型）
-    execution_path = ["load_memory", state.trigger_type]
-    if state.trigger_type == "conversation":
-        execution_path.append("realtime_conversation")
-    elif state.trigger_type == "practice":
-        execution_path.append("speaking_practice")
-    elif state.trigger_type == "care":
-        execution_path.append("active_care")
-    elif state.trigger_type == "remind":
-        execution_path.append("homework_check")
-    
-    execution_path.extend(["voice_synthesis", "save_memory"])
-    
-    # 简化的性能指标
-    performance_metrics = {
-        "total_nodes": len(execution_path),
-        "scenario_type": state.trigger_type
-    }
-    
-    # 存储到学习进度中，供后续查询
-    memory_store.update_learning_progress(state.child_id, {
-        "last_execution_path": execution_path,
-        "last_performance_metrics": performance_metrics
-    })
+    # 本次运行实际经过的节点和各阶段耗时（由 GraphService 记录），存储到学习进度中供后续查询
+    profile = current_run_profile()
+    if profile is not None and profile.execution_path:
+        memory_store.update_learning_progress(state.child_id, {
+            "last_execution_path": list(profile.execution_path),
+            "last_performance_metrics": profile.performance_metrics()
+        })
     
-    return SaveMemoryWrapOutput(saved=True)
+    return SaveMemoryWrapOutput(saved=True, speaking_practice_count=speaking_practice_count)
 
 
 # ============== 条件判断包装函数 ==============
-def wrap_route_decision(state: LoadMemoryWrapOutput) -> str:
-    """路由决策（支持场景短路优化）"""
+def decide_route(user_input_text: str, trigger_type: str) -> str:
+    """路由决策（支持场景短路优化），只依赖用户输入和触发类型，不需要加载记忆"""
     # v2.0优化：先检查场景类型，实现短路
     from graphs.state import DetectScenarioInput
     
     # 如果有用户输入，自动判定场景类型
-    if state.user_input_text:
+    if user_input_text:
         scenario_input = DetectScenarioInput(
-            user_input_text=state.user_input_text,
-            trigger_type=state.trigger_type,
-            conversation_history=state.conversation_history
+            user_input_text=user_input_text,
+            trigger_type=trigger_type
         )
         scenario_output = detect_scenario_type(scenario_input)
         
@@ -345,12 +349,17 @@ def wrap_route_decision(state: LoadMemoryWrapOutput) -> str:
     
     # 原有逻辑
     node_input = RouteDecisionInput(
-        trigger_type=state.trigger_type,
+        trigger_type=trigger_type,
         need_remind=False  # 这个参数在load阶段还不确定
     )
     return route_decision(node_input)
 
 
+def wrap_route_decision(state: LoadMemoryWrapOutput) -> str:
+    """路由决策：使用 load_memory 已决定的路由"""
+    return state.route or decide_route(state.user_input_text, state.trigger_type)
+
+
 # ============== 新增：快速回复包装节点（v2.0优化） ==============
 def wrap_quick_reply(
     state: QuickReplyWrapInput,
@@ -525,8 +534,8 @@ builder.add_edge("voice_synthesis", "save_memory")
 # 结束
 builder.add_edge("save_memory", END)
 
-# 编译图
-main_graph = builder.compile()
+# 编译图（GRAPH_CHECKPOINT_MODES 启用时带 checkpointer，口语练习阶段跨轮次恢复）
+main_graph = builder.compile(checkpointer=get_graph_checkpointer("full_companion"))
 
 # ============== 工作流模式切换 ==============
 # 支持三种模式，通过环境变量切换：
@@ -0,0 +1,339 @@
+"""
+MemoryStore 的紧凑记录类型
+
+作业、知识点和对话轮次在内存中以 __slots__ 对象保存，而不是字符串键的字典：
+- 时间戳为整数 epoch 秒，比较时不再需要 fromisoformat 解析
+- role / type 等取值有限的字段编码为小整数（CPython 缓存小整数，不占额外内存）
+- 其他未知字段放入 extra 字典，保证与原字典结构往返一致
+
+对外仍返回字典：to_dict() 生成与原先相同键的字典，from_dict() 从字典（WAL、快照、
+数据库、冷存储）构造记录。记录也支持 record["key"] 形式的读写，兼容直接操作内部数据的代码。
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class Codebook:
+    """字符串与小整数的双向编码表，按首次出现的顺序分配编码"""
+    __slots__ = ("_codes", "_values", "_lock")
+
+    def __init__(self, *values: str):
+        self._codes: Dict[str, int] = {}
+        self._values: List[str] = []
+        self._lock = threading.Lock()
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self._values)
+                    self._values.append(value)
+                    self._codes[value] = code
+        return code
+
+    def decode(self, code: int) -> str:
+        return self._values[code]
+
+
+ROLES = Codebook("user", "assistant", "system")
+CONVERSATION_TYPES = Codebook("conversation", "practice", "care", "remind", "quick_reply", "quick_chat")
+KNOWLEDGE_TYPES = Codebook("word", "concept", "skill")
+
+
+def now_epoch() -> int:
+    """当前时间（epoch 秒）"""
+    return int(time.time())
+
+
+def to_epoch(value: Any) -> Optional[int]:
+    """把 ISO 8601 字符串 / datetime / 数字转换为 epoch 秒，无法解析时返回None"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return int(value.timestamp())
+    except (ValueError, TypeError, AttributeError, OverflowError, OSError):
+        return None
+
+
+def from_epoch(value: int) -> str:
+    """epoch 秒转换为本地时间的 ISO 8601 字符串（与 datetime.now().isoformat() 同一时区）"""
+    return datetime.fromtimestamp(value).isoformat()
+
+
+# 字段类型
+_RAW = 0
+_TIME = 1
+_CODE = 2
+
+
+class _Record:
+    """
+    记录基类
+
+    子类通过 _FIELDS 声明 (键名, 字段类型, 编码表)，槽位名与键名相同；
+    槽位为 None 表示该键不存在。
+    """
+    __slots__ = ("extra",)
+    _FIELDS: Tuple[Tuple[str, int, Optional[Codebook]], ...] = ()
+    _SPEC: Dict[str, Tuple[int, Optional[Codebook]]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._SPEC = {key: (kind, book) for key, kind, book in cls._FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_Record":
+        record = cls.__new__(cls)
+        record.extra = None
+        for key, _, _ in cls._FIELDS:
+            setattr(record, key, None)
+        for key, value in data.items():
+            record[key] = value
+        return record
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {}
+        for key, kind, book in self._FIELDS:
+            value = getattr(self, key)
+            if value is None:
+                continue
+            if kind == _TIME:
+                value = from_epoch(value)
+            elif kind == _CODE:
+                value = book.decode(value)
+            data[key] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def copy(self, **fields: Any) -> "_Record":
+        """复制记录，fields 按槽位的内部值覆盖（如整数时间戳），用于批量生成同结构的记录"""
+        record = self.__new__(type(self))
+        for key, _, _ in self._FIELDS:
+            setattr(record, key, getattr(self, key))
+        record.extra = dict(self.extra) if self.extra else None
+        for key, value in fields.items():
+            setattr(record, key, value)
+        return record
+
+    # ============== 字典式访问（兼容旧代码） ==============
+
+    def __getitem__(self, key: str) -> Any:
+        spec = self._SPEC.get(key)
+        if spec is None:
+            if self.extra and key in self.extra:
+                return self.extra[key]
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None:
+            if self.extra and key in self.extra:
+                return self.extra[key]
+            raise KeyError(key)
+        kind, book = spec
+        if kind == _TIME:
+            return from_epoch(value)
+        if kind == _CODE:
+            return book.decode(value)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        spec = self._SPEC.get(key)
+        if spec is not None:
+            kind, book = spec
+            if value is None:
+                encoded = None
+            elif kind == _TIME:
+                encoded = to_epoch(value)
+            elif kind == _CODE:
+                encoded = book.encode(value) if isinstance(value, str) else None
+            else:
+                encoded = value
+            if encoded is not None or value is None:
+                setattr(self, key, encoded)
+                if self.extra:
+                    self.extra.pop(key, None)
+                return
+            # 无法编码（如时间戳格式错误），原样保存在 extra 中
+            setattr(self, key, None)
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def keys(self) -> Iterator[str]:
+        return iter(self.to_dict())
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, _Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+_MISSING = object()
+
+
+class ConversationTurn(_Record):
+    """对话轮次"""
+    __slots__ = ("role", "content", "type", "timestamp")
+    _FIELDS = (
+        ("role", _CODE, ROLES),
+        ("content", _RAW, None),
+        ("type", _CODE, CONVERSATION_TYPES),
+        ("timestamp", _TIME, None),
+    )
+
+
+class Homework(_Record):
+    """作业"""
+    __slots__ = ("id", "subject", "description", "completed", "created_at", "deadline", "deadline_days", "completed_at")
+    _FIELDS = (
+        ("id", _RAW, None),
+        ("subject", _RAW, None),
+        ("description", _RAW, None),
+        ("completed", _RAW, None),
+        ("created_at", _TIME, None),
+        ("deadline", _TIME, None),
+        ("deadline_days", _RAW, None),
+        ("completed_at", _TIME, None),
+    )
+
+
+class KnowledgePoint(_Record):
+    """知识点（间隔重复）"""
+    __slots__ = (
+        "id", "type", "content", "context", "mastery_level", "learned_at",
+        "next_review_time", "review_count", "correct_count", "is_due",
+        "repetitions", "ease_factor", "interval"
+    )
+    _FIELDS = (
+        ("id", _RAW, None),
+        ("type", _CODE, KNOWLEDGE_TYPES),
+        ("content", _RAW, None),
+        ("context", _RAW, None),
+        ("mastery_level", _RAW, None),
+        ("learned_at", _TIME, None),
+        ("next_review_time", _TIME, None),
+        ("review_count", _RAW, None),
+        ("correct_count", _RAW, None),
+        ("is_due", _RAW, None),
+        # 复习调度状态（见 review_scheduler），旧数据中不存在
+        ("repetitions", _RAW, None),
+        ("ease_factor", _RAW, None),
+        ("interval", _RAW, None),
+    )
+
+
+class KnowledgeIndex:
+    """
+    单个孩子的知识点统计计数和到期索引
+
+    由 MemoryStore 在增删改知识点时增量维护（不持久化，丢失后可由知识点列表重建）：
+    - total / mastered（掌握程度≥4）/ learning（掌握程度2-3）计数
+    - 按下次复习时间排序的 (时间, ID) 列表，到期数量只需一次二分查找
+    """
+    __slots__ = ("points", "by_id", "total", "mastered", "learning", "_due")
+
+    def __init__(self, points: List[KnowledgePoint]):
+        # 建立索引时的知识点列表（用于判断孩子数据是否已被整体替换）
+        self.points = points
+        self.by_id: Dict[str, KnowledgePoint] = {}
+        self.total = 0
+        self.mastered = 0
+        self.learning = 0
+        self._due: List[Tuple[int, str]] = []
+        for kp in points:
+            self.add(kp)
+
+    def _count(self, kp: KnowledgePoint, delta: int) -> None:
+        level = kp.mastery_level or 0
+        if level >= 4:
+            self.mastered += delta
+        elif level >= 2:
+            self.learning += delta
+
+    def add(self, kp: KnowledgePoint) -> None:
+        """加入知识点（修改知识点前先 remove，修改后再 add）"""
+        self.total += 1
+        self._count(kp, 1)
+        if kp.id is not None:
+            self.by_id[kp.id] = kp
+        if kp.next_review_time is not None:
+            insort(self._due, (kp.next_review_time, kp.id or ""))
+
+    def remove(self, kp: KnowledgePoint) -> None:
+        self.total -= 1
+        self._count(kp, -1)
+        if kp.id is not None:
+            self.by_id.pop(kp.id, None)
+        if kp.next_review_time is not None:
+            entry = (kp.next_review_time, kp.id or "")
+            i = bisect_left(self._due, entry)
+            if i < len(self._due) and self._due[i] == entry:
+                del self._due[i]
+
+    def due_count(self, now: int) -> int:
+        """下次复习时间不晚于 now 的知识点数量"""
+        return bisect_right(self._due, now, key=lambda entry: entry[0])
+
+    def due_points(self, now: int, limit: int) -> List[KnowledgePoint]:
+        """按到期时间排序的前 limit 个到期知识点"""
+        count = min(limit, self.due_count(now))
+        return [self.by_id[kp_id] for _, kp_id in self._due[:count] if kp_id in self.by_id]
+
+    def stats(self, now: int) -> Dict[str, int]:
+        return {
+            "total": self.total,
+            "mastered": self.mastered,
+            "learning": self.learning,
+            "need_review": self.due_count(now),
+        }
+
+
+def child_to_dict(child_data: Dict[str, Any]) -> Dict[str, Any]:
+    """把孩子数据复制为普通字典（记录对象转换为字典），用于导出"""
+    data = dict(child_data)
+    data["learning_progress"] = dict(child_data.get("learning_progress") or {})
+    for key in ("conversation_history", "homework_list", "knowledge_points"):
+        data[key] = [item.to_dict() for item in child_data.get(key) or []]
+    return data
+
+
+def child_from_dict(child_data: Dict[str, Any]) -> Dict[str, Any]:
+    """把孩子数据中的列表元素转换为记录对象（原地修改并返回）"""
+    for key, record_type in (
+        ("conversation_history", ConversationTurn),
+        ("homework_list", Homework),
+        ("knowledge_points", KnowledgePoint),
+    ):
+        items = child_data.get(key)
+        if items is None:
+            child_data[key] = []
+        else:
+            child_data[key] = [
+                item if isinstance(item, record_type) else record_type.from_dict(item) for item in items
+            ]
+    return child_data
@@ -1,25 +1,110 @@
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
-import random
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator, Sequence, Set, Tuple, TypeVar
+from collections import OrderedDict
+from datetime import datetime
+import atexit
+import os
+import secrets
+import threading
+
+import ormsgpack
+
+from storage.memory.memory_archive import SQLiteArchiveStore, MEMORY_ARCHIVE_PATH, is_durable_archive_path
+from storage.memory.memory_cold_store import SQLiteColdStore, MEMORY_COLD_STORE_PATH
+from storage.memory.memory_persistence import (
+    MemoryPersistence,
+    MEMORY_PERSIST_DIR,
+    MEMORY_SNAPSHOT_INTERVAL,
+    msgpack_default,
+    stable_shard_index,
+)
+from .memory_records import (
+    ConversationTurn,
+    Homework,
+    KnowledgeIndex,
+    KnowledgePoint,
+    child_from_dict,
+    child_to_dict,
+    from_epoch,
+    now_epoch,
+)
+from .memory_sweeper import MemorySweeper, MEMORY_SWEEP_INTERVAL
+from .response_cache import ResponseCache, RESPONSE_CACHE_SWEEP_INTERVAL
+from .review_scheduler import KnowledgeArrays, ReviewScheduler, SchedulerParams
+
+# 分片数量：按 child_id 哈希分片，每个分片一把锁（锁条带化）
+MEMORY_STORE_SHARDS = int(os.getenv("MEMORY_STORE_SHARDS", "64"))
+# 存储后端：memory（纯内存）/ postgres（Postgres 读穿透 + 批量回写）
+MEMORY_STORE_BACKEND = os.getenv("MEMORY_STORE_BACKEND", "memory").lower()
+# 内存预算：常驻内存的孩子数上限，超出后最久未访问的孩子溢出到冷存储；0 表示不限制
+MEMORY_STORE_MAX_RESIDENT_CHILDREN = int(os.getenv("MEMORY_STORE_MAX_RESIDENT_CHILDREN", "0"))
+# 加载到工作流状态中的对话窗口大小（提示词只使用最近3条）
+MEMORY_CONVERSATION_WINDOW = int(os.getenv("MEMORY_CONVERSATION_WINDOW", "3"))
+
+T = TypeVar("T")
 
 
 class MemoryStore:
-    """内存存储类，用于管理孩子的对话历史、作业和学习进度（支持时间感知）"""
+    """
+    内存存储类，用于管理孩子的对话历史、作业和学习进度（支持时间感知）
+    
+    线程安全：同步节点运行在 LangGraph 的线程池中，数据按 child_id 哈希分片，
+    每个分片持有一把可重入锁。同一孩子的读改写互斥，不同分片的孩子可并行访问。
+    
+    内存预算：设置常驻孩子数上限后，每个分片按 LRU 顺序把不活跃的孩子溢出到
+    本地 SQLite 冷存储，再次访问时加载回内存。
+    
+    作业、知识点和对话在内部保存为紧凑记录（见 memory_records），对外接口仍返回字典。
+    """
     
     _instance = None
-    _data: Dict[str, Dict[str, Any]] = {}
+    _instance_lock = threading.Lock()
     
     def __new__(cls) -> 'MemoryStore':
         if cls._instance is None:
-            cls._instance = super(MemoryStore, cls).__new__(cls)
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = super(MemoryStore, cls).__new__(cls)
         return cls._instance
     
     def __init__(self):
         """初始化（由于单例模式，实际只会在第一次创建时调用）"""
         if not hasattr(self, 'initialized'):
-            self._data: Dict[str, Dict[str, Any]] = {}
-            self._short_cache: Dict[str, Dict[str, Any]] = {}  # 短期缓存（1-2分钟）
+            self._num_shards = max(1, MEMORY_STORE_SHARDS)
+            # 每个分片按访问顺序排列（LRU），最久未访问的在最前
+            self._shards: List["OrderedDict[str, Dict[str, Any]]"] = [OrderedDict() for _ in range(self._num_shards)]
+            self._locks: List[threading.RLock] = [threading.RLock() for _ in range(self._num_shards)]
+            # 知识点统计计数和到期索引（按分片存放，随知识点增量维护，不持久化）
+            self._knowledge_indexes: List[Dict[str, KnowledgeIndex]] = [{} for _ in range(self._num_shards)]
+            self._scheduler = ReviewScheduler()  # 知识点复习调度
+            # 作业和知识点ID：进程随机标识 + 递增序号，同一秒内、跨孩子、跨进程重启、记录被归档移除后都不重复
+            self._record_id_token = secrets.token_hex(3)
+            self._record_id_seq = 0
+            self._record_id_lock = threading.Lock()
+            self._short_cache = ResponseCache()  # 短期缓存（TTL + LRU，1-3分钟）
+            self._short_cache.start_sweeper(RESPONSE_CACHE_SWEEP_INTERVAL)
+            self._persistence: Optional[MemoryPersistence] = None
+            self._backend = None  # PostgresMemoryBackend
+            self._cold_store: Optional[SQLiteColdStore] = None
+            self._max_resident_per_shard = 0
+            self._archive: Optional[SQLiteArchiveStore] = None  # 归档存储（首次归档时打开）
+            self._sweeper: Optional[MemorySweeper] = None
+            # 正在从后端加载的孩子（每个孩子同时只有一个线程查询），以及各分片的清除次数
+            self._loading: Dict[str, threading.Event] = {}
+            self._loading_lock = threading.Lock()
+            self._shard_clears: List[int] = [0] * self._num_shards
             self.initialized = True
+            # 冷存储需先于持久化恢复启用，恢复过程中即可按预算溢出
+            if MEMORY_STORE_MAX_RESIDENT_CHILDREN > 0:
+                self.enable_cold_tier(MEMORY_STORE_MAX_RESIDENT_CHILDREN)
+            if MEMORY_PERSIST_DIR:
+                self.enable_persistence(MEMORY_PERSIST_DIR)
+            if MEMORY_STORE_BACKEND == "postgres":
+                self.enable_postgres_backend()
+            if MEMORY_SWEEP_INTERVAL > 0:
+                if is_durable_archive_path(MEMORY_ARCHIVE_PATH):
+                    self.enable_sweeper(MEMORY_SWEEP_INTERVAL)
+                else:
+                    print("⚠️ 未配置持久的归档路径（MEMORY_ARCHIVE_PATH 或 MEMORY_PERSIST_DIR），不启动过期清理")
     
     @classmethod
     def get_instance(cls) -> 'MemoryStore':
@@ -28,21 +113,147 @@ class MemoryStore:
             cls._instance = cls()
         return cls._instance
     
+    def _shard_index(self, child_id: str) -> int:
+        """计算孩子所在的分片（跨进程稳定，快照恢复依赖该映射）"""
+        return stable_shard_index(child_id, self._num_shards)
+    
+    def get_shard_index(self, child_id: str) -> int:
+        """孩子所在的分片（批量导入按分片攒批）"""
+        return self._shard_index(child_id)
+    
+    @property
+    def num_shards(self) -> int:
+        return self._num_shards
+    
+    def _lock_for(self, child_id: str, load: bool = True) -> threading.RLock:
+        """
+        获取孩子所在分片的锁
+        
+        启用 Postgres 后端时，先在分片锁外加载不在内存中的孩子（load=False 跳过），
+        数据库查询不阻塞同一分片的其他孩子。
+        """
+        if load and self._backend is not None:
+            self._preload_child(child_id)
+        return self._locks[self._shard_index(child_id)]
+    
+    def _preload_child(self, child_id: str) -> None:
+        """在分片锁外从后端加载孩子，同一孩子的并发请求只查询一次，其余等待结果"""
+        shard_index = self._shard_index(child_id)
+        shard = self._shards[shard_index]
+        if child_id in shard:
+            return
+        with self._loading_lock:
+            loading = self._loading.get(child_id)
+            leader = loading is None
+            if leader:
+                loading = self._loading[child_id] = threading.Event()
+        if not leader:
+            loading.wait()
+            return
+        
+        try:
+            with self._locks[shard_index]:
+                if child_id in shard or (self._cold_store is not None and child_id in self._cold_store):
+                    return
+                clears = self._shard_clears[shard_index]
+            child_data = self._backend.load_child(child_id)
+            with self._locks[shard_index]:
+                # 加载期间其他线程已写入该孩子（读穿透）或清除了分片中的孩子时，放弃本次结果
+                if child_id in shard or self._shard_clears[shard_index] != clears:
+                    return
+                if self._cold_store is not None and child_id in self._cold_store:
+                    return
+                self._install_child(shard_index, child_id, child_data)
+        finally:
+            with self._loading_lock:
+                self._loading.pop(child_id, None)
+            loading.set()
+    
     def _get_child_data(self, child_id: str) -> Dict[str, Any]:
-        """获取孩子的数据"""
-        if child_id not in self._data:
-            self._data[child_id] = {
-                "conversation_history": [],
-                "learning_progress": {},
-                "speaking_practice_count": 0,
-                "homework_list": [],  # 作业列表，包含时间信息
-                "knowledge_points": []  # 知识点列表（长期记忆）
-            }
-        return self._data[child_id]
+        """
+        获取孩子数据的可变引用（供脚本直接读改，需要原子读改写时请使用 update_child_data）
+        
+        调用方可能直接修改知识点，交出引用时丢弃该孩子的知识点索引，下次访问时按当前数据重建。
+        """
+        with self._lock_for(child_id):
+            child_data = self._child_data(child_id)
+            self._drop_knowledge_index(child_id)
+            return child_data
+    
+    def _child_data(self, child_id: str) -> Dict[str, Any]:
+        """获取孩子的数据（内部使用；需要原子读改写时请在 _lock_for(child_id) 内调用）"""
+        shard_index = self._shard_index(child_id)
+        shard = self._shards[shard_index]
+        child_data = shard.get(child_id)
+        if child_data is not None and self._cold_store is None:
+            return child_data
+        
+        with self._locks[shard_index]:
+            child_data = shard.get(child_id)
+            if child_data is not None:
+                # LRU：标记为最近访问
+                shard.move_to_end(child_id)
+                return child_data
+            
+            if self._cold_store is not None:
+                child_data = self._cold_store.pop(child_id)
+            if child_data is None and self._backend is not None:
+                # 读穿透：通常已由 _lock_for 在锁外加载，这里只处理锁内才首次访问的孩子
+                child_data = self._backend.load_child(child_id)
+            return self._install_child(shard_index, child_id, child_data)
+    
+    def _install_child(self, shard_index: int, child_id: str, child_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """把加载到的孩子数据放入分片（None 时创建空数据），调用方需持有分片锁"""
+        if child_data is not None:
+            child_from_dict(child_data)
+        child_data = child_data or {
+            "conversation_history": [],
+            "learning_progress": {},
+            "speaking_practice_count": 0,
+            "homework_list": [],  # 作业列表，包含时间信息
+            "knowledge_points": []  # 知识点列表（长期记忆）
+        }
+        self._shards[shard_index][child_id] = child_data
+        self._evict_cold_children(shard_index)
+        return child_data
+    
+    def update_child_data(self, child_id: str, updater: Callable[[Dict[str, Any]], T]) -> T:
+        """
+        在孩子的分片锁内执行读改写操作
+        
+        Args:
+            child_id: 孩子ID
+            updater: 接收孩子数据字典的函数，其返回值将原样返回
+                （列表中的元素是 memory_records 中的记录对象，支持 record["key"] 读写）
+        
+        Returns:
+            updater 的返回值
+        """
+        with self._lock_for(child_id):
+            child_data = self._child_data(child_id)
+            result = updater(child_data)
+            # updater 可能直接修改知识点，索引下次访问时重建
+            self._drop_knowledge_index(child_id)
+            lsn = self._journal("child", child_id, child_data)
+        self._wait_durable(lsn)
+        return result
     
     def get_conversation_history(self, child_id: str) -> List[dict]:
         """获取对话历史"""
-        return self._get_child_data(child_id)["conversation_history"]
+        with self._lock_for(child_id):
+            return [turn.to_dict() for turn in self._child_data(child_id)["conversation_history"]]
+    
+    def get_recent_conversation(self, child_id: str, limit: int = MEMORY_CONVERSATION_WINDOW) -> Tuple[dict, ...]:
+        """
+        获取最近 limit 条对话的只读快照
+
+        只物化窗口内的记录，返回元组，工作流状态可直接按引用持有，无需再复制整段历史。
+        """
+        if limit <= 0:
+            return ()
+        with self._lock_for(child_id):
+            window = self._child_data(child_id)["conversation_history"][-limit:]
+        return tuple(turn.to_dict() for turn in window)
     
     def get_conversation_history_by_time_range(
         self, 
@@ -50,36 +261,35 @@ class MemoryStore:
         days: int = 7
     ) -> List[dict]:
         """获取指定天数范围内的对话历史"""
-        now = datetime.now()
-        cutoff_time = now - timedelta(days=days)
+        cutoff_time = now_epoch() - days * 86400
         
-        history = self._get_child_data(child_id)["conversation_history"]
+        with self._lock_for(child_id):
+            history = list(self._child_data(child_id)["conversation_history"])
         filtered = []
         
-        for conv in history:
-            timestamp_str = conv.get("timestamp", "")
-            if timestamp_str:
-                try:
-                    timestamp = datetime.fromisoformat(timestamp_str)
-                    if timestamp >= cutoff_time:
-                        filtered.append(conv)
-                except (ValueError, TypeError):
-                    # 时间戳解析失败，仍然保留（向后兼容）
-                    filtered.append(conv)
+        for turn in history:
+            if turn.timestamp is not None:
+                if turn.timestamp >= cutoff_time:
+                    filtered.append(turn.to_dict())
+            elif turn.extra and turn.extra.get("timestamp"):
+                # 时间戳解析失败，仍然保留（向后兼容）
+                filtered.append(turn.to_dict())
         
         return filtered
     
     def add_conversation(self, child_id: str, conversation: dict) -> None:
         """添加对话记录（自动添加时间戳）"""
-        child_data = self._get_child_data(child_id)
-        child_data["conversation_history"].append({
-            **conversation,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # 只保留最近100条对话（增加容量以支持更长的历史）
-        if len(child_data["conversation_history"]) > 100:
-            child_data["conversation_history"] = child_data["conversation_history"][-100:]
+        turn = ConversationTurn.from_dict(conversation)
+        turn["timestamp"] = now_epoch()
+        with self._lock_for(child_id):
+            history = self._child_data(child_id)["conversation_history"]
+            history.append(turn)
+            lsn = self._journal("conv", child_id, turn.to_dict())
+            
+            # 只保留最近100条对话（增加容量以支持更长的历史）
+            if len(history) > 100:
+                del history[:-100]
+        self._wait_durable(lsn)
     
     def add_homework(
         self, 
@@ -100,89 +310,208 @@ class MemoryStore:
         Returns:
             作业ID
         """
-        child_data = self._get_child_data(child_id)
-        
-        # 生成作业ID
-        homework_id = f"hw_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{len(child_data['homework_list'])}"
-        
         # 计算截止时间
-        deadline = datetime.now() + timedelta(days=deadline_days)
-        
-        homework = {
-            "id": homework_id,
-            "subject": subject,
-            "description": description,
-            "completed": False,
-            "created_at": datetime.now().isoformat(),
-            "deadline": deadline.isoformat(),
-            "deadline_days": deadline_days
-        }
+        created_at = now_epoch()
+        deadline = created_at + deadline_days * 86400
         
-        child_data["homework_list"].append(homework)
+        with self._lock_for(child_id):
+            child_data = self._child_data(child_id)
+            
+            # 生成作业ID
+            homework_id = self._new_record_ids("hw", created_at, 1)[0]
+            
+            homework = Homework.from_dict({
+                "id": homework_id,
+                "subject": subject,
+                "description": description,
+                "completed": False,
+                "created_at": created_at,
+                "deadline": deadline,
+                "deadline_days": deadline_days
+            })
+            
+            child_data["homework_list"].append(homework)
+            lsn = self._journal("hw_add", child_id, homework.to_dict())
+        self._wait_durable(lsn)
         return homework_id
     
+    def add_homework_bulk(
+        self,
+        child_ids: Iterable[str],
+        assignments: Sequence[Dict[str, Any]]
+    ) -> Dict[str, List[str]]:
+        """
+        批量布置作业（全班 × 多个学科）
+        
+        截止时间和作业记录模板按作业只计算一次，ID 一次性分配；孩子按分片分组，
+        每个分片只加锁一次，依次追加到各孩子的作业列表（启用后端时先在锁外加载孩子）。
+        
+        Args:
+            child_ids: 孩子ID列表（班级名单，重复的ID只布置一次）
+            assignments: 作业列表，每项包含 subject、description，可选 deadline_days（默认1天）
+        
+        Returns:
+            {child_id: [作业ID, ...]}，作业ID顺序与 assignments 一致
+        """
+        child_ids = list(dict.fromkeys(child_ids))
+        if not child_ids or not assignments:
+            return {child_id: [] for child_id in child_ids}
+        
+        created_at = now_epoch()
+        templates = []
+        for assignment in assignments:
+            deadline_days = assignment.get("deadline_days", 1)
+            homework = Homework.from_dict({
+                "id": None,
+                "subject": assignment["subject"],
+                "description": assignment["description"],
+                "completed": False,
+                "created_at": created_at,
+                "deadline": created_at + deadline_days * 86400,
+                "deadline_days": deadline_days
+            })
+            # WAL / 后端记录的字典也只生成一次，按孩子替换ID
+            templates.append((homework, homework.to_dict()))
+        
+        homework_ids = self._new_record_ids("hw", created_at, len(child_ids) * len(templates))
+        by_shard: Dict[int, List[int]] = {}
+        for position, child_id in enumerate(child_ids):
+            by_shard.setdefault(self._shard_index(child_id), []).append(position)
+        
+        result: Dict[str, List[str]] = {}
+        lsn = 0
+        for shard_index, positions in by_shard.items():
+            if self._backend is not None:
+                # 不在内存中的孩子先在分片锁外从后端加载
+                for position in positions:
+                    self._preload_child(child_ids[position])
+            with self._locks[shard_index]:
+                for position in positions:
+                    child_id = child_ids[position]
+                    child_data = self._child_data(child_id)
+                    ids = homework_ids[position * len(templates):(position + 1) * len(templates)]
+                    homework_list = child_data["homework_list"]
+                    for homework_id, (template, template_dict) in zip(ids, templates):
+                        homework_list.append(template.copy(id=homework_id))
+                        lsn = self._journal("hw_add", child_id, {**template_dict, "id": homework_id}, child_data)
+                    result[child_id] = ids
+        self._wait_durable(lsn)
+        return {child_id: result[child_id] for child_id in child_ids}
+    
+    def _new_record_ids(self, kind: str, created_at: int, count: int) -> List[str]:
+        """分配 count 个不重复的记录ID（kind_时间_进程标识_序号，kind 为 hw / kp）"""
+        with self._record_id_lock:
+            start = self._record_id_seq
+            self._record_id_seq += count
+        prefix = f"{kind}_{datetime.fromtimestamp(created_at).strftime('%Y%m%d_%H%M%S')}_{self._record_id_token}_"
+        return [f"{prefix}{seq}" for seq in range(start, start + count)]
+    
     def get_homework_list(self, child_id: str) -> List[dict]:
         """获取作业列表"""
-        return self._get_child_data(child_id)["homework_list"]
+        with self._lock_for(child_id):
+            return [hw.to_dict() for hw in self._child_data(child_id)["homework_list"]]
     
     def get_valid_homework(self, child_id: str) -> List[dict]:
         """
         获取有效的作业（未过期且未完成）
         过期作业不会被返回
         """
-        now = datetime.now()
-        homework_list = self._get_child_data(child_id)["homework_list"]
+        now = now_epoch()
+        with self._lock_for(child_id):
+            homework_list = list(self._child_data(child_id)["homework_list"])
         valid_homework = []
         
         for hw in homework_list:
             # 跳过已完成的作业
-            if hw.get("completed", False):
+            if hw.completed:
                 continue
             
-            # 检查是否过期
-            deadline_str = hw.get("deadline", "")
-            if deadline_str:
-                try:
-                    deadline = datetime.fromisoformat(deadline_str)
-                    if deadline < now:
-                        # 作业已过期，跳过
-                        continue
-                except (ValueError, TypeError):
-                    # 时间戳解析失败，视为有效（向后兼容）
-                    pass
+            # 检查是否过期（时间戳解析失败时 deadline 为None，视为有效）
+            if hw.deadline is not None and hw.deadline < now:
+                continue
             
-            valid_homework.append(hw)
+            valid_homework.append(hw.to_dict())
         
         return valid_homework
     
     def complete_homework(self, child_id: str, homework_id: str) -> bool:
         """标记作业为已完成"""
-        child_data = self._get_child_data(child_id)
-        
-        for hw in child_data["homework_list"]:
-            if hw.get("id") == homework_id:
-                hw["completed"] = True
-                hw["completed_at"] = datetime.now().isoformat()
-                return True
-        
-        return False
+        with self._lock_for(child_id):
+            child_data = self._child_data(child_id)
+            
+            for hw in child_data["homework_list"]:
+                if hw.id == homework_id:
+                    hw.completed = True
+                    hw.completed_at = now_epoch()
+                    lsn = self._journal("hw_done", child_id, {"id": homework_id, "completed_at": from_epoch(hw.completed_at)})
+                    break
+            else:
+                return False
+        self._wait_durable(lsn)
+        return True
     
     def get_learning_progress(self, child_id: str) -> Dict[str, Any]:
         """获取学习进度"""
-        return self._get_child_data(child_id)["learning_progress"]
+        with self._lock_for(child_id):
+            return dict(self._child_data(child_id)["learning_progress"])
     
     def update_learning_progress(self, child_id: str, progress: Dict[str, Any]) -> None:
         """更新学习进度"""
-        child_data = self._get_child_data(child_id)
-        child_data["learning_progress"].update(progress)
+        with self._lock_for(child_id):
+            self._child_data(child_id)["learning_progress"].update(progress)
+            lsn = self._journal("lp", child_id, progress)
+        self._wait_durable(lsn)
+    
+    def increment_learning_counter(
+        self,
+        child_id: str,
+        key: str,
+        delta: int = 1,
+        extra: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """
+        原子地累加学习进度中的计数器（如 speaking_practice_count）
+        
+        Args:
+            child_id: 孩子ID
+            key: 计数器字段名
+            delta: 增量
+            extra: 同一次更新中一并写入的其他字段
+        
+        Returns:
+            累加后的值
+        """
+        with self._lock_for(child_id):
+            learning_progress = self._child_data(child_id)["learning_progress"]
+            value = learning_progress.get(key, 0) + delta
+            learning_progress[key] = value
+            if extra:
+                learning_progress.update(extra)
+            lsn = self._journal("lp", child_id, {key: value, **(extra or {})})
+        self._wait_durable(lsn)
+        return value
     
     def get_speaking_practice_count(self, child_id: str) -> int:
         """获取口语练习次数"""
-        return self._get_child_data(child_id)["speaking_practice_count"]
+        with self._lock_for(child_id):
+            return self._child_data(child_id)["speaking_practice_count"]
     
     def update_speaking_practice_count(self, child_id: str, count: int) -> None:
         """更新口语练习次数"""
-        self._get_child_data(child_id)["speaking_practice_count"] = count
+        with self._lock_for(child_id):
+            self._child_data(child_id)["speaking_practice_count"] = count
+            lsn = self._journal("spc", child_id, count)
+        self._wait_durable(lsn)
+    
+    def increment_speaking_practice_count(self, child_id: str, delta: int = 1) -> int:
+        """原子地累加口语练习次数，返回累加后的值"""
+        with self._lock_for(child_id):
+            child_data = self._child_data(child_id)
+            child_data["speaking_practice_count"] += delta
+            count = child_data["speaking_practice_count"]
+            lsn = self._journal("spc", child_id, count)
+        self._wait_durable(lsn)
+        return count
     
     # ============== 知识追踪和间隔重复系统 ==============
     
@@ -205,33 +534,37 @@ class MemoryStore:
         Returns:
             知识点ID
         """
-        child_data = self._get_child_data(child_id)
-        
-        # 检查是否已存在相同知识点
-        for kp in child_data["knowledge_points"]:
-            if kp.get("content", "").lower() == content.lower():
-                return kp["id"]
-        
-        # 生成知识点ID
-        kp_id = f"kp_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{len(child_data['knowledge_points'])}"
-        
-        # 计算首次复习时间（10分钟后）
-        first_review_time = datetime.now() + timedelta(minutes=10)
-        
-        knowledge_point = {
-            "id": kp_id,
-            "type": point_type,
-            "content": content,
-            "context": context,
-            "mastery_level": 0,  # 掌握程度 0-5
-            "learned_at": datetime.now().isoformat(),
-            "next_review_time": first_review_time.isoformat(),
-            "review_count": 0,
-            "correct_count": 0,
-            "is_due": False
-        }
-        
-        child_data["knowledge_points"].append(knowledge_point)
+        with self._lock_for(child_id):
+            child_data = self._child_data(child_id)
+            
+            # 检查是否已存在相同知识点
+            content_lower = content.lower()
+            for kp in child_data["knowledge_points"]:
+                if (kp.content or "").lower() == content_lower:
+                    return kp.id
+            
+            # 生成知识点ID（不用列表长度做序号：知识点被归档移除后会与已有ID重复）
+            learned_at = now_epoch()
+            kp_id = self._new_record_ids("kp", learned_at, 1)[0]
+            
+            knowledge_point = KnowledgePoint.from_dict({
+                "id": kp_id,
+                "type": point_type,
+                "content": content,
+                "context": context,
+                "mastery_level": 0,  # 掌握程度 0-5
+                "learned_at": learned_at,
+                "next_review_time": learned_at + self._scheduler.params.level_intervals[0],  # 首次复习时间（10分钟后）
+                "review_count": 0,
+                "correct_count": 0,
+                "is_due": False
+            })
+            
+            index = self._knowledge_index(child_id, child_data)
+            child_data["knowledge_points"].append(knowledge_point)
+            index.add(knowledge_point)
+            lsn = self._journal("kp_add", child_id, knowledge_point.to_dict())
+        self._wait_durable(lsn)
         return kp_id
     
     def update_knowledge_mastery(
@@ -241,7 +574,7 @@ class MemoryStore:
         is_correct: bool
     ) -> Optional[Dict[str, Any]]:
         """
-        更新知识点掌握程度（基于简化版SM-2算法）
+        更新知识点掌握程度（复习间隔由 review_scheduler 计算）
         
         Args:
             child_id: 孩子ID
@@ -251,67 +584,74 @@ class MemoryStore:
         Returns:
             更新后的知识点，如果不存在则返回None
         """
-        child_data = self._get_child_data(child_id)
-        
-        for kp in child_data["knowledge_points"]:
-            if kp["id"] == knowledge_id:
-                kp["review_count"] += 1
-                
-                if is_correct:
-                    kp["correct_count"] += 1
-                    # 正确，提高掌握程度
-                    if kp["mastery_level"] < 5:
-                        kp["mastery_level"] += 1
-                else:
-                    # 错误，降低掌握程度（但不低于1）
-                    if kp["mastery_level"] > 1:
-                        kp["mastery_level"] -= 1
-                
-                # 计算下次复习时间（基于掌握程度）
-                kp["next_review_time"] = self._calculate_next_review(
-                    kp["mastery_level"],
-                    kp["review_count"]
-                ).isoformat()
-                
-                return kp
-        
-        return None
+        with self._lock_for(child_id):
+            child_data = self._child_data(child_id)
+            index = self._knowledge_index(child_id, child_data)
+            kp = index.by_id.get(knowledge_id)
+            if kp is None:
+                return None
+            
+            index.remove(kp)
+            # 更新掌握程度（答对+1，答错-1但不低于1）并计算下次复习时间
+            self._scheduler.review_point(kp, is_correct, now_epoch())
+            index.add(kp)
+            kp_dict = kp.to_dict()
+            lsn = self._journal("kp_set", child_id, kp_dict)
+        self._wait_durable(lsn)
+        return kp_dict
     
-    def _calculate_next_review(
-        self, 
-        mastery_level: int, 
-        review_count: int
-    ) -> datetime:
+    def set_review_scheduler(self, params: SchedulerParams, reschedule: bool = True, seed: Optional[int] = None) -> int:
         """
-        计算下次复习时间（简化版间隔重复算法）
+        更换复习调度参数
         
         Args:
-            mastery_level: 掌握程度 0-5
-            review_count: 复习次数
+            params: 新的调度参数
+            reschedule: 是否按新参数批量重排已有知识点
+            seed: 随机波动的种子（测试用）
         
         Returns:
-            下次复习时间
-        """
-        # 间隔时间表（根据掌握程度）
-        intervals = {
-            0: timedelta(minutes=10),    # 刚学习：10分钟后
-            1: timedelta(hours=1),      # 初步掌握：1小时后
-            2: timedelta(days=1),       # 熟悉：1天后
-            3: timedelta(days=3),       # 掌握：3天后
-            4: timedelta(days=7),       # 熟练：7天后
-            5: timedelta(days=14)       # 精通：14天后
-        }
-        
-        # 获取基础间隔
-        base_interval = intervals.get(mastery_level, timedelta(days=1))
+            重排的知识点数量
+        """
+        self._scheduler = ReviewScheduler(params, seed=seed)
+        return self.reschedule_knowledge_points() if reschedule else 0
+    
+    def reschedule_knowledge_points(self) -> int:
+        """
+        按当前调度参数批量重排所有孩子（含冷存储）的知识点复习时间
         
-        # 添加随机波动（±20%），避免所有知识点在同一时间复习
-        random_factor = random.uniform(0.8, 1.2)
-        actual_interval = timedelta(
-            seconds=int(base_interval.total_seconds() * random_factor)
-        )
+        每个分片的知识点合并为一批向量化计算，变更按孩子记录到 WAL / 后端。
         
-        return datetime.now() + actual_interval
+        Returns:
+            重排的知识点数量
+        """
+        total = 0
+        lsn = 0
+        for shard_index in range(self._num_shards):
+            with self._locks[shard_index]:
+                children = list(self._shards[shard_index].items())
+                cold_children = []
+                if self._cold_store is not None:
+                    cold_children = [
+                        (child_id, child_from_dict(child_data))
+                        for child_id, child_data in self._cold_store.load_shard(shard_index).items()
+                    ]
+                children = [(child_id, data) for child_id, data in children + cold_children if data["knowledge_points"]]
+                if not children:
+                    continue
+                
+                points = [kp for _, child_data in children for kp in child_data["knowledge_points"]]
+                state = KnowledgeArrays.from_points(points, self._scheduler.params)
+                total += self._scheduler.reschedule(state)
+                state.write_back(points)
+                
+                indexes = self._knowledge_indexes[shard_index]
+                for child_id, child_data in children:
+                    indexes.pop(child_id, None)
+                    lsn = self._journal("child", child_id, child_data, child_data)
+                if cold_children:
+                    self._cold_store.put_many(shard_index, cold_children)
+        self._wait_durable(lsn)
+        return total
     
     def get_due_for_review(
         self, 
@@ -328,32 +668,12 @@ class MemoryStore:
         Returns:
             需要复习的知识点列表
         """
-        now = datetime.now()
-        child_data = self._get_child_data(child_id)
-        due_points = []
-        
-        for kp in child_data.get("knowledge_points", []):
-            # 检查是否到期
-            next_review_str = kp.get("next_review_time", "")
-            if not next_review_str:
-                continue
-            
-            try:
-                next_review = datetime.fromisoformat(next_review_str)
-                if next_review <= now:
-                    # 到期，添加到列表
-                    due_points.append({
-                        **kp,
-                        "is_due": True
-                    })
-            except (ValueError, TypeError):
-                continue
-        
-        # 按到期时间排序
-        due_points.sort(key=lambda x: x.get("next_review_time", ""))
-        
-        # 限制返回数量
-        return due_points[:limit]
+        now = now_epoch()
+        with self._lock_for(child_id):
+            child_data = self._child_data(child_id)
+            # 到期索引按复习时间排序（无复习时间或解析失败的知识点不在索引中）
+            due_points = self._knowledge_index(child_id, child_data).due_points(now, limit)
+            return [{**kp.to_dict(), "is_due": True} for kp in due_points]
     
     def get_knowledge_point_by_content(
         self, 
@@ -370,34 +690,46 @@ class MemoryStore:
         Returns:
             知识点字典，如果不存在则返回None
         """
-        child_data = self._get_child_data(child_id)
-        
-        for kp in child_data.get("knowledge_points", []):
-            if kp.get("content", "").lower() == content.lower():
-                return kp
+        with self._lock_for(child_id):
+            child_data = self._child_data(child_id)
+            
+            content_lower = content.lower()
+            for kp in child_data["knowledge_points"]:
+                if (kp.content or "").lower() == content_lower:
+                    return kp.to_dict()
         
         return None
     
     def get_all_knowledge_points(self, child_id: str) -> List[Dict[str, Any]]:
         """获取所有知识点"""
-        return self._get_child_data(child_id).get("knowledge_points", [])
+        with self._lock_for(child_id):
+            return [kp.to_dict() for kp in self._child_data(child_id)["knowledge_points"]]
     
     def get_knowledge_statistics(self, child_id: str) -> Dict[str, Any]:
-        """获取知识点统计信息"""
-        knowledge_points = self.get_all_knowledge_points(child_id)
-        
-        total = len(knowledge_points)
-        if total == 0:
-            return {
-                "total": 0,
-                "mastered": 0,
-                "learning": 0,
-                "need_review": 0
-            }
-        
-        mastered = sum(1 for kp in knowledge_points if kp.get("mastery_level", 0) >= 4)
-        learning = sum(1 for kp in knowledge_points if 2 <= kp.get("mastery_level", 0) < 4)
-        need_review = len(self.get_due_for_review(child_id, limit=100))
+        """
+        获取知识点统计信息（增量维护的计数，不遍历知识点）
+        
+        Returns:
+            {"total": 总数, "mastered": 已精通（掌握程度≥4）, "learning": 学习中（掌握程度2-3）,
+             "need_review": 需要复习}
+        """
+        now = now_epoch()
+        with self._lock_for(child_id):
+            child_data = self._child_data(child_id)
+            return self._knowledge_index(child_id, child_data).stats(now)
+    
+    def _knowledge_index(self, child_id: str, child_data: Dict[str, Any]) -> KnowledgeIndex:
+        """获取孩子的知识点索引（调用方需持有分片锁），不存在或知识点列表已被替换时重建"""
+        indexes = self._knowledge_indexes[self._shard_index(child_id)]
+        index = indexes.get(child_id)
+        if index is None or index.points is not child_data["knowledge_points"]:
+            index = KnowledgeIndex(child_data["knowledge_points"])
+            indexes[child_id] = index
+        return index
+    
+    def _drop_knowledge_index(self, child_id: str) -> None:
+        """丢弃孩子的知识点索引（调用方需持有分片锁）"""
+        self._knowledge_indexes[self._shard_index(child_id)].pop(child_id, None)
 
     # ============== 短期缓存系统（v2.0优化） ==============
     
@@ -425,29 +757,7 @@ class MemoryStore:
             缓存的响应，如果过期或不存在则返回None
         """
         cache_key = self._get_cache_key(scenario, query)
-        cached_item = self._short_cache.get(cache_key)
-        
-        if not cached_item:
-            return None
-        
-        # 检查缓存是否过期
-        cached_time_str = cached_item.get("timestamp", "")
-        if not cached_time_str:
-            return None
-        
-        try:
-            cached_time = datetime.fromisoformat(cached_time_str)
-            now = datetime.now()
-            
-            if (now - cached_time).total_seconds() > cache_duration:
-                # 缓存过期，删除
-                del self._short_cache[cache_key]
-                return None
-            
-            # 返回缓存的响应
-            return cached_item.get("response")
-        except (ValueError, TypeError):
-            return None
+        return self._short_cache.get(cache_key, max_age=cache_duration)
     
     def cache_response(
         self, 
@@ -464,25 +774,7 @@ class MemoryStore:
             response: 响应内容
         """
         cache_key = self._get_cache_key(scenario, query)
-        
-        self._short_cache[cache_key] = {
-            "response": response,
-            "timestamp": datetime.now().isoformat(),
-            "scenario": scenario,
-            "query": query
-        }
-        
-        # 限制缓存大小（最多1000条）
-        if len(self._short_cache) > 1000:
-            # 删除最旧的缓存（按时间排序）
-            sorted_items = sorted(
-                self._short_cache.items(),
-                key=lambda x: x[1].get("timestamp", "")
-            )
-            # 删除最旧的10%
-            remove_count = len(sorted_items) // 10
-            for key, _ in sorted_items[:remove_count]:
-                del self._short_cache[key]
+        self._short_cache.put(cache_key, response, scenario=scenario, query=query)
     
     def clear_expired_cache(self, max_age_seconds: int = 180) -> int:
         """
@@ -494,38 +786,24 @@ class MemoryStore:
         Returns:
             删除的缓存数量
         """
-        now = datetime.now()
-        remove_count = 0
-        expired_keys = []
-        
-        for cache_key, cache_item in self._short_cache.items():
-            timestamp_str = cache_item.get("timestamp", "")
-            if not timestamp_str:
-                continue
-            
-            try:
-                cached_time = datetime.fromisoformat(timestamp_str)
-                if (now - cached_time).total_seconds() > max_age_seconds:
-                    expired_keys.append(cache_key)
-            except (ValueError, TypeError):
-                continue
-        
-        # 删除过期缓存
-        for key in expired_keys:
-            del self._short_cache[key]
-            remove_count += 1
-        
-        return remove_count
+        return self._short_cache.sweep(max_age=max_age_seconds)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取短期缓存统计信息（命中/未命中/淘汰次数等）"""
+        return self._short_cache.stats()
     
     def record_homework_check(self, child_id: str) -> None:
         """记录作业检查时间（用于降频机制）"""
-        child_data = self._get_child_data(child_id)
-        child_data["last_homework_check"] = datetime.now().isoformat()
+        with self._lock_for(child_id):
+            checked_at = datetime.now().isoformat()
+            self._child_data(child_id)["last_homework_check"] = checked_at
+            lsn = self._journal("hw_check", child_id, checked_at)
+        self._wait_durable(lsn)
     
     def get_last_homework_check(self, child_id: str) -> Optional[datetime]:
         """获取最后检查作业的时间"""
-        child_data = self._get_child_data(child_id)
-        last_check_str = child_data.get("last_homework_check", "")
+        with self._lock_for(child_id):
+            last_check_str = self._child_data(child_id).get("last_homework_check", "")
         
         if not last_check_str:
             return None
@@ -534,15 +812,537 @@ class MemoryStore:
             return datetime.fromisoformat(last_check_str)
         except (ValueError, TypeError):
             return None
-        
-        return {
-            "total": total,
-            "mastered": mastered,
-            "learning": learning,
-            "need_review": need_review
-        }
     
     def clear_child_data(self, child_id: str) -> None:
         """清除孩子所有数据"""
-        if child_id in self._data:
-            del self._data[child_id]
+        with self._lock_for(child_id, load=False):
+            shard_index = self._shard_index(child_id)
+            self._shards[shard_index].pop(child_id, None)
+            self._shard_clears[shard_index] += 1
+            self._drop_knowledge_index(child_id)
+            if self._cold_store is not None:
+                self._cold_store.delete(child_id)
+            if self._archive is not None:
+                self._archive.delete_child(child_id)
+            lsn = self._journal("clear", child_id, None)
+        self._wait_durable(lsn)
+    
+    # ============== 批量导出 / 导入 ==============
+    
+    def iter_children(self, child_ids: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        逐个导出孩子数据（普通字典，包括冷存储和 Postgres 后端中的孩子，不改变 LRU 顺序）
+        
+        每次只在分片锁内复制一个孩子；不在内存和冷存储中的孩子在锁外从后端读取，不放入内存。
+        导出全部时先导出内存和冷存储中的孩子，再按ID分页遍历后端中其余的孩子。
+        
+        Args:
+            child_ids: 只导出这些孩子，默认导出全部
+        """
+        if child_ids is not None:
+            for child_id in child_ids:
+                child_data = self._export_child(self._shard_index(child_id), child_id)
+                if child_data is not None:
+                    yield child_id, child_data
+            return
+        
+        # 已导出的孩子（只在启用后端时记录，用于跳过后端中的同一孩子）
+        exported: Optional[Set[str]] = set() if self._backend is not None else None
+        for shard_index in range(self._num_shards):
+            with self._locks[shard_index]:
+                ids = list(self._shards[shard_index])
+                if self._cold_store is not None:
+                    ids.extend(self._cold_store.child_ids(shard_index))
+            for child_id in ids:
+                child_data = self._export_child(shard_index, child_id)
+                if child_data is not None:
+                    if exported is not None:
+                        exported.add(child_id)
+                    yield child_id, child_data
+        
+        if exported is None:
+            return
+        for child_id in self._backend.iter_child_ids():
+            if child_id in exported:
+                continue
+            child_data = self._export_child(self._shard_index(child_id), child_id)
+            if child_data is not None:
+                yield child_id, child_data
+    
+    def _export_child(self, shard_index: int, child_id: str) -> Optional[Dict[str, Any]]:
+        with self._locks[shard_index]:
+            child_data = self._shards[shard_index].get(child_id)
+            if child_data is not None:
+                return child_to_dict(child_data)
+            if self._cold_store is not None:
+                # 冷存储中的数据本身就是普通字典
+                child_data = self._cold_store.get(child_id)
+                if child_data is not None:
+                    return child_data
+        if self._backend is not None:
+            # 读穿透但不放入内存：导出不应把全部孩子加载进分片
+            return self._backend.load_child(child_id)
+        return None
+    
+    @staticmethod
+    def _turn_key(turn: ConversationTurn) -> Tuple[Any, ...]:
+        """对话去重的键：时间戳、角色、内容和其他字段"""
+        extra = ormsgpack.packb(turn.extra, option=ormsgpack.OPT_SORT_KEYS, default=msgpack_default) if turn.extra else b""
+        return turn.timestamp, turn.role, turn.content, turn.type, extra
+    
+    def import_records(self, shard_index: int, records: List[Dict[str, Any]]) -> int:
+        """
+        在一次分片锁内写入一批导入记录（记录格式见 storage.memory.memory_transfer）
+        
+        作业和知识点按 ID 覆盖；对话按 (时间戳, 角色, 内容) 去重后与已有历史按时间戳合并，
+        保留最近100条（重复导入同一份导出不产生重复对话）。
+        每个孩子写完后作为一次整体变更记录到 WAL / 后端；启用后端时先在锁外加载批次中的孩子。
+        
+        Args:
+            shard_index: 分片索引（批次中的孩子必须都属于该分片）
+            records: 导入记录
+        
+        Returns:
+            写入的记录数
+        """
+        list_types = {
+            "homework": ("homework_list", Homework),
+            "knowledge": ("knowledge_points", KnowledgePoint),
+        }
+        current_id: Optional[str] = None
+        child_data: Dict[str, Any] = {}
+        positions: Dict[str, Dict[str, int]] = {}
+        turns: List[ConversationTurn] = []
+        lsn = 0
+        
+        def finish_child() -> None:
+            nonlocal lsn
+            history = child_data["conversation_history"]
+            added = []
+            if turns:
+                seen = {self._turn_key(turn) for turn in history}
+                for turn in turns:
+                    key = self._turn_key(turn)
+                    if key not in seen:
+                        seen.add(key)
+                        added.append(turn)
+                turns.clear()
+            if added:
+                history.extend(added)
+                history.sort(key=lambda turn: turn.timestamp or 0)
+            if len(history) > 100:
+                del history[:-100]
+            if added:
+                # 整体变更不包含对话历史（Postgres 后端单独写入对话），逐条记录保留下来的新对话
+                kept = {id(turn) for turn in history}
+                for turn in added:
+                    if id(turn) in kept:
+                        self._journal("conv", current_id, turn.to_dict(), child_data)
+            self._drop_knowledge_index(current_id)
+            lsn = self._journal("child", current_id, child_data, child_data)
+        
+        if self._backend is not None:
+            # 批次中不在内存中的孩子先在分片锁外从后端加载
+            for child_id in dict.fromkeys(record["child_id"] for record in records):
+                self._preload_child(child_id)
+        with self._locks[shard_index]:
+            for record in records:
+                child_id = record["child_id"]
+                if child_id != current_id:
+                    # 切换孩子前先记录上一个孩子，之后的 _child_data 可能把它溢出到冷存储
+                    if current_id is not None:
+                        finish_child()
+                    current_id = child_id
+                    child_data = self._child_data(child_id)
+                    positions = {}
+                
+                record_type = record["type"]
+                data = record["data"]
+                if record_type == "child":
+                    child_data["learning_progress"].update(data.get("learning_progress") or {})
+                    if "speaking_practice_count" in data:
+                        child_data["speaking_practice_count"] = data["speaking_practice_count"]
+                    if data.get("last_homework_check"):
+                        child_data["last_homework_check"] = data["last_homework_check"]
+                elif record_type == "conversation":
+                    turns.append(ConversationTurn.from_dict(data))
+                elif record_type in list_types:
+                    key, item_type = list_types[record_type]
+                    items = child_data[key]
+                    item = item_type.from_dict(data)
+                    index = positions.get(key)
+                    if index is None:
+                        index = positions[key] = {existing.id: i for i, existing in enumerate(items)}
+                    i = index.get(item.id)
+                    if i is None:
+                        index[item.id] = len(items)
+                        items.append(item)
+                    else:
+                        items[i] = item
+                else:
+                    raise ValueError(f"Unknown memory record type: {record_type}")
+            
+            if current_id is not None:
+                finish_child()
+        self._wait_durable(lsn)
+        return len(records)
+    
+    # ============== 持久化（WAL + 快照） ==============
+    
+    def enable_persistence(self, directory: str, **wal_options) -> Dict[str, Any]:
+        """
+        启用持久化：从快照和 WAL 恢复数据，之后的每次变更都追加写入 WAL
+        
+        Args:
+            directory: 持久化目录
+            wal_options: 传给 MemoryPersistence 的 WAL 参数（sync_mode 等）
+        
+        Returns:
+            恢复统计信息
+        """
+        persistence = MemoryPersistence(directory, **wal_options)
+        stats = persistence.restore(self._load_child, self._apply_wal_record)
+        self._persistence = persistence
+        persistence.start_snapshot_thread(self.create_snapshot, MEMORY_SNAPSHOT_INTERVAL)
+        atexit.register(self.close_persistence)
+        return stats
+    
+    def create_snapshot(self) -> Optional[Dict[str, Any]]:
+        """写出快照并清理已覆盖的 WAL 段，未启用持久化时返回None"""
+        if self._persistence is None:
+            return None
+        
+        def dump_shard(shard_index: int):
+            # 在分片锁内读取 LSN 并编码，保证快照内容与 LSN 一致
+            with self._locks[shard_index]:
+                shard = self._shards[shard_index]
+                if self._cold_store is not None:
+                    # 溢出到冷存储的孩子同样需要写入快照
+                    shard = {**self._cold_store.load_shard(shard_index), **shard}
+                return self._persistence.wal.last_lsn, MemoryPersistence.pack_shard(shard)
+        
+        return self._persistence.write_snapshot(self._num_shards, dump_shard)
+    
+    def close_persistence(self) -> None:
+        """落盘剩余 WAL 并停止后台线程"""
+        if self._persistence is not None:
+            self._persistence.close()
+            self._persistence = None
+    
+    def _journal(self, op: str, child_id: str, data: Any, child_data: Optional[Dict[str, Any]] = None) -> int:
+        """
+        记录一条变更（调用方需持有孩子的分片锁；child_data 默认取常驻内存的孩子数据）
+        
+        Returns:
+            WAL LSN，未启用持久化时为0；调用方释放分片锁后用 _wait_durable 等待落盘
+        """
+        lsn = 0
+        if self._persistence is not None:
+            lsn = self._persistence.append(op, child_id, data)
+        if self._backend is not None:
+            if child_data is None:
+                child_data = self._shards[self._shard_index(child_id)].get(child_id)
+            self._backend.record(op, child_id, data, child_data)
+        return lsn
+    
+    def _wait_durable(self, lsn: int) -> None:
+        """sync_mode=always 时等待 LSN 落盘（不能持有分片锁，否则同分片的写入方都要等 fsync）"""
+        persistence = self._persistence
+        if lsn and persistence is not None:
+            persistence.wait_durable(lsn)
+    
+    def _load_child(self, child_id: str, child_data: Dict[str, Any]) -> None:
+        """加载快照中的孩子数据"""
+        shard_index = self._shard_index(child_id)
+        self._shards[shard_index][child_id] = child_from_dict(child_data)
+        self._evict_cold_children(shard_index)
+    
+    def _apply_wal_record(self, op: str, child_id: str, data: Any) -> None:
+        """重放一条 WAL 记录（不再写入 WAL）"""
+        if op == "clear":
+            self._shards[self._shard_index(child_id)].pop(child_id, None)
+            self._drop_knowledge_index(child_id)
+            if self._cold_store is not None:
+                self._cold_store.delete(child_id)
+            return
+        if op == "child":
+            self._load_child(child_id, data)
+            return
+        
+        child_data = self._child_data(child_id)
+        if op == "conv":
+            history = child_data["conversation_history"]
+            history.append(ConversationTurn.from_dict(data))
+            if len(history) > 100:
+                del history[:-100]
+        elif op == "hw_add":
+            child_data["homework_list"].append(Homework.from_dict(data))
+        elif op == "hw_done":
+            for hw in child_data["homework_list"]:
+                if hw.id == data["id"]:
+                    hw.completed = True
+                    hw["completed_at"] = data["completed_at"]
+                    break
+        elif op == "lp":
+            child_data["learning_progress"].update(data)
+        elif op == "spc":
+            child_data["speaking_practice_count"] = data
+        elif op == "kp_add":
+            child_data["knowledge_points"].append(KnowledgePoint.from_dict(data))
+            self._drop_knowledge_index(child_id)
+        elif op == "kp_set":
+            for i, kp in enumerate(child_data["knowledge_points"]):
+                if kp.id == data["id"]:
+                    child_data["knowledge_points"][i] = KnowledgePoint.from_dict(data)
+                    break
+            self._drop_knowledge_index(child_id)
+        elif op == "hw_check":
+            child_data["last_homework_check"] = data
+        elif op == "archive":
+            self._remove_archived(child_id, child_data, data)
+    
+    # ============== 过期清理与归档 ==============
+    
+    def enable_sweeper(self, interval: float = MEMORY_SWEEP_INTERVAL, archive_path: str = MEMORY_ARCHIVE_PATH, **sweeper_options) -> MemorySweeper:
+        """
+        启用后台过期清理：过期作业和长期掌握的知识点归档后从内存中移除
+        
+        Args:
+            interval: 两轮清理之间的间隔（秒），0 表示只创建清理器、不启动线程（可手动 run_pass）
+            archive_path: 归档 SQLite 文件路径，必须持久（非空、不在临时目录下）
+            sweeper_options: 传给 MemorySweeper 的参数（homework_after、mastered_after、slice_ms、pause_ms）
+        
+        Raises:
+            ValueError: 归档路径不持久（归档后的记录只保存在归档文件中，文件丢失即数据丢失）
+        """
+        if not is_durable_archive_path(archive_path):
+            raise ValueError(f"Archive path must be durable (non-empty and outside the temp dir): {archive_path!r}")
+        if self._sweeper is not None:
+            self._sweeper.stop()
+        self._archive_path = archive_path
+        self._sweeper = MemorySweeper(self, **sweeper_options)
+        self._sweeper.start(interval)
+        return self._sweeper
+    
+    def _get_archive(self) -> SQLiteArchiveStore:
+        if self._archive is None:
+            with self._instance_lock:
+                if self._archive is None:
+                    self._archive = SQLiteArchiveStore(self._archive_path)
+                    atexit.register(self._archive.close)
+        return self._archive
+    
+    def shard_child_ids(self, shard_index: int) -> List[str]:
+        """分片中常驻内存的孩子ID（冷存储中的孩子不活跃，加载回内存后再清理）"""
+        with self._locks[shard_index]:
+            return list(self._shards[shard_index])
+    
+    def archive_expired(
+        self,
+        child_id: str,
+        homework_before: int,
+        mastered_before: int,
+        now: Optional[int] = None
+    ) -> Optional[Tuple[int, int, Tuple[int, int, int, int]]]:
+        """
+        归档孩子的过期作业和长期掌握的知识点（不改变 LRU 顺序）
+        
+        先写入归档存储，再从内存列表中移除并记录 "archive" 变更
+        （Postgres 后端只把对应的行标记为已归档，不删除）。
+        
+        Args:
+            homework_before: 截止时间早于该时间的作业被归档
+            mastered_before: 掌握程度5、上次复习早于该时间的知识点被归档
+        
+        Returns:
+            (归档作业数, 归档知识点数, (作业数, 知识点数, 对话数, 估算字节数))，孩子不在内存中时返回None
+        """
+        lsn = 0
+        with self._lock_for(child_id, load=False):
+            child_data = self._shards[self._shard_index(child_id)].get(child_id)
+            if child_data is None:
+                return None
+            homework = [
+                hw for hw in child_data["homework_list"]
+                if hw.deadline is not None and hw.deadline < homework_before
+            ]
+            knowledge = [kp for kp in child_data["knowledge_points"] if self._long_mastered(kp, mastered_before)]
+            if homework or knowledge:
+                archive = self._get_archive()
+                archive.archive(child_id, "homework", [hw.to_dict() for hw in homework], now)
+                archive.archive(child_id, "knowledge", [kp.to_dict() for kp in knowledge], now)
+                data = {"homework": [hw.id for hw in homework], "knowledge": [kp.id for kp in knowledge]}
+                self._remove_archived(child_id, child_data, data)
+                lsn = self._journal("archive", child_id, data, child_data)
+            size = (
+                len(child_data["homework_list"]),
+                len(child_data["knowledge_points"]),
+                len(child_data["conversation_history"]),
+                len(ormsgpack.packb(child_data, default=msgpack_default)),
+            )
+        self._wait_durable(lsn)
+        return len(homework), len(knowledge), size
+    
+    @staticmethod
+    def _long_mastered(kp: KnowledgePoint, before: int) -> bool:
+        if (kp.mastery_level or 0) < 5:
+            return False
+        # 上次复习时间 = 下次复习时间 - 间隔；旧数据没有间隔时用学习时间
+        if kp.next_review_time is not None and kp.interval is not None:
+            last_review = kp.next_review_time - kp.interval
+        else:
+            last_review = kp.learned_at
+        return last_review is not None and last_review < before
+    
+    def _remove_archived(self, child_id: str, child_data: Dict[str, Any], data: Dict[str, List[str]]) -> None:
+        """按ID从列表中移除已归档的记录（原地修改列表）"""
+        homework_ids = set(data.get("homework") or ())
+        if homework_ids:
+            child_data["homework_list"][:] = [hw for hw in child_data["homework_list"] if hw.id not in homework_ids]
+        knowledge_ids = set(data.get("knowledge") or ())
+        if knowledge_ids:
+            child_data["knowledge_points"][:] = [kp for kp in child_data["knowledge_points"] if kp.id not in knowledge_ids]
+            self._drop_knowledge_index(child_id)
+    
+    def record_child_sizes(self, samples: List[Tuple[str, int, int, int, int, int]]) -> int:
+        """写入一轮清理采样的孩子数据规模"""
+        if not samples:
+            return 0
+        return self._get_archive().record_sizes(samples)
+    
+    def prune_child_sizes(self, before: int) -> int:
+        """删除 before（epoch 秒）之前的数据规模采样"""
+        return self._get_archive().prune_sizes(before)
+    
+    def get_archived(self, child_id: str, kind: str) -> List[Dict[str, Any]]:
+        """读取孩子已归档的作业（homework）或知识点（knowledge）"""
+        if self._sweeper is None:
+            return []
+        return self._get_archive().get_archived(child_id, kind)
+    
+    def get_child_size_history(self, child_id: str, since: Optional[int] = None) -> List[Dict[str, int]]:
+        """孩子的数据规模随时间的变化（每轮清理采样一次）"""
+        if self._sweeper is None:
+            return []
+        return self._get_archive().size_history(child_id, since)
+    
+    def get_child_size_report(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """数据规模最大的孩子（最近一次采样）"""
+        if self._sweeper is None:
+            return []
+        return self._get_archive().size_report(limit)
+    
+    def get_sweeper_stats(self) -> Optional[Dict[str, Any]]:
+        """获取过期清理和归档的统计信息，未启用时返回None"""
+        if self._sweeper is None:
+            return None
+        stats = self._sweeper.stats()
+        if self._archive is not None:
+            stats.update(self._archive.stats())
+        return stats
+    
+    # ============== 冷数据层（内存预算） ==============
+    
+    def enable_cold_tier(self, max_resident_children: int, path: str = MEMORY_COLD_STORE_PATH) -> None:
+        """
+        启用冷数据层：常驻内存的孩子数超过预算时，把最久未访问的孩子溢出到 SQLite
+        
+        Args:
+            max_resident_children: 常驻内存的孩子数上限（按分片均分）
+            path: SQLite 文件路径（打开时清空）
+        """
+        if self._cold_store is None:
+            self._cold_store = SQLiteColdStore(path)
+            atexit.register(self._cold_store.close)
+        self._max_resident_per_shard = max(1, -(-max_resident_children // self._num_shards))
+        for shard_index in range(self._num_shards):
+            with self._locks[shard_index]:
+                self._evict_cold_children(shard_index)
+    
+    def _evict_cold_children(self, shard_index: int) -> int:
+        """把分片中超出预算的孩子溢出到冷存储（调用方需持有分片锁），返回溢出数量"""
+        if self._cold_store is None:
+            return 0
+        shard = self._shards[shard_index]
+        excess = len(shard) - self._max_resident_per_shard
+        if excess <= 0:
+            return 0
+        victims = [shard.popitem(last=False) for _ in range(excess)]
+        indexes = self._knowledge_indexes[shard_index]
+        for child_id, _ in victims:
+            indexes.pop(child_id, None)
+        return self._cold_store.put_many(shard_index, victims)
+    
+    def get_memory_stats(self) -> Dict[str, Any]:
+        """获取常驻/冷存储的孩子数量统计"""
+        resident = sum(len(shard) for shard in self._shards)
+        stats = {"resident_children": resident, "cold_children": 0}
+        if self._cold_store is not None:
+            stats.update({
+                "cold_children": len(self._cold_store),
+                "max_resident_children": self._max_resident_per_shard * self._num_shards,
+                "spilled": self._cold_store.spilled,
+                "loaded": self._cold_store.loaded,
+            })
+        return stats
+    
+    # ============== Postgres 后端 ==============
+    
+    def enable_postgres_backend(self, engine=None, **backend_options) -> bool:
+        """
+        启用 Postgres 后端：孩子数据首次访问时从数据库加载，变更批量回写
+        
+        Args:
+            engine: SQLAlchemy Engine，默认使用 storage.database.db.get_engine()
+            backend_options: 传给 PostgresMemoryBackend 的参数（flush_interval_ms、batch_size）
+        
+        Returns:
+            是否启用成功（数据库不可用时继续使用纯内存存储）
+        """
+        from storage.memory.memory_postgres import PostgresMemoryBackend
+        
+        if engine is None:
+            from storage.database.db import get_engine
+            engine = get_engine()
+        if engine is None:
+            print("⚠️ 数据库不可用，MemoryStore 继续使用纯内存存储")
+            return False
+        
+        backend = PostgresMemoryBackend(engine, **backend_options)
+        backend.create_tables()
+        self._backend = backend
+        atexit.register(self.close_backend)
+        return True
+    
+    def flush_backend(self) -> int:
+        """立即写入后端所有待写变更，返回写入的行数"""
+        if self._backend is None:
+            return 0
+        return self._backend.flush()
+    
+    def get_backend_stats(self) -> Optional[Dict[str, Any]]:
+        """获取后端统计信息，未启用时返回None"""
+        if self._backend is None:
+            return None
+        return self._backend.stats()
+    
+    def close_backend(self) -> None:
+        """写出剩余变更并停止后端线程"""
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+    
+    def close(self) -> None:
+        """停止后台线程（过期清理、缓存清理、快照、WAL、后端写入）并关闭冷存储和归档"""
+        if self._sweeper is not None:
+            self._sweeper.stop()
+            self._sweeper = None
+        self._short_cache.stop_sweeper()
+        self.close_persistence()
+        self.close_backend()
+        if self._cold_store is not None:
+            self._cold_store.close()
+            self._cold_store = None
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
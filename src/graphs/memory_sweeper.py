@@ -0,0 +1,170 @@
+"""
+MemoryStore 后台过期清理
+
+过期作业和长期掌握（掌握程度5）的知识点会一直留在孩子的列表中，每次读取都要重新跳过。
+清理线程按分片逐个孩子检查，把这些记录归档到压缩存储（见 storage/memory/memory_archive.py）
+后从内存列表中移除，同时采样每个孩子的数据规模。
+
+清理按时间片增量进行：每个时间片最多运行 MEMORY_SWEEP_SLICE_MS 毫秒，之后让出
+MEMORY_SWEEP_PAUSE_MS 毫秒；每次只持有一个孩子所在分片的锁，不会长时间阻塞请求。
+一轮扫完所有分片后，等待 MEMORY_SWEEP_INTERVAL 秒再开始下一轮。
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .memory_records import now_epoch
+
+# 两轮清理之间的间隔（秒），0 表示不启动后台清理
+MEMORY_SWEEP_INTERVAL = float(os.getenv("MEMORY_SWEEP_INTERVAL", "3600"))
+# 每个时间片的最长运行时间和时间片之间的停顿（毫秒）
+MEMORY_SWEEP_SLICE_MS = float(os.getenv("MEMORY_SWEEP_SLICE_MS", "5"))
+MEMORY_SWEEP_PAUSE_MS = float(os.getenv("MEMORY_SWEEP_PAUSE_MS", "20"))
+# 作业截止后多久归档（秒），默认1天（过期作业当天仍可被提醒和查询）
+MEMORY_ARCHIVE_HOMEWORK_AFTER = int(os.getenv("MEMORY_ARCHIVE_HOMEWORK_AFTER", str(86400)))
+# 掌握程度5的知识点距上次复习多久后归档（秒），默认30天
+MEMORY_ARCHIVE_MASTERED_AFTER = int(os.getenv("MEMORY_ARCHIVE_MASTERED_AFTER", str(30 * 86400)))
+# 数据规模采样的保留天数，每轮清理结束时删除更早的采样；0 表示一直保留
+MEMORY_SIZE_HISTORY_DAYS = int(os.getenv("MEMORY_SIZE_HISTORY_DAYS", "90"))
+
+
+class MemorySweeper:
+    """增量过期清理（游标记录当前分片和分片内位置，跨时间片继续）"""
+
+    def __init__(
+        self,
+        store,
+        homework_after: int = MEMORY_ARCHIVE_HOMEWORK_AFTER,
+        mastered_after: int = MEMORY_ARCHIVE_MASTERED_AFTER,
+        slice_ms: float = MEMORY_SWEEP_SLICE_MS,
+        pause_ms: float = MEMORY_SWEEP_PAUSE_MS,
+        size_history_days: int = MEMORY_SIZE_HISTORY_DAYS
+    ):
+        self.store = store  # MemoryStore
+        self.homework_after = homework_after
+        self.mastered_after = mastered_after
+        self.slice_seconds = slice_ms / 1000.0
+        self.pause_seconds = pause_ms / 1000.0
+        self.size_history_days = size_history_days
+
+        # 游标：当前分片、分片内待检查的孩子、本轮开始时间
+        self._shard_index = 0
+        self._pending: List[str] = []
+        self._pass_started: Optional[int] = None
+        self._samples: List[Tuple[str, int, int, int, int, int]] = []
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        # 统计信息
+        self.passes = 0
+        self.children_scanned = 0
+        self.homework_archived = 0
+        self.knowledge_archived = 0
+        self.size_samples_pruned = 0
+        self.last_pass_seconds = 0.0
+        self.slices = 0
+
+    def run_slice(self, now: Optional[int] = None) -> bool:
+        """
+        运行一个时间片
+
+        Args:
+            now: 当前时间（epoch 秒），默认取系统时间；一轮内使用本轮开始时的时间
+
+        Returns:
+            本轮是否已扫完所有分片
+        """
+        deadline = time.perf_counter() + self.slice_seconds
+        if self._pass_started is None:
+            self._pass_started = now if now is not None else now_epoch()
+            self._shard_index = 0
+            self._pending = self.store.shard_child_ids(0)
+        started = self._pass_started
+        self.slices += 1
+
+        scanned = 0
+        while True:
+            while not self._pending:
+                self._shard_index += 1
+                if self._shard_index >= self.store.num_shards:
+                    self._finish_pass(now if now is not None else now_epoch())
+                    return True
+                self._pending = self.store.shard_child_ids(self._shard_index)
+            # 每个时间片至少检查一个孩子
+            if scanned and time.perf_counter() >= deadline:
+                return False
+
+            scanned += 1
+            child_id = self._pending.pop()
+            result = self.store.archive_expired(
+                child_id,
+                homework_before=started - self.homework_after,
+                mastered_before=started - self.mastered_after,
+                now=started
+            )
+            if result is not None:
+                homework, knowledge, size = result
+                self.children_scanned += 1
+                self.homework_archived += homework
+                self.knowledge_archived += knowledge
+                self._samples.append((child_id, started) + size)
+
+    def _finish_pass(self, now: int) -> None:
+        self.store.record_child_sizes(self._samples)
+        self._samples = []
+        if self.size_history_days > 0:
+            self.size_samples_pruned += self.store.prune_child_sizes(now - self.size_history_days * 86400)
+        self.last_pass_seconds = now - self._pass_started
+        self._pass_started = None
+        self.passes += 1
+
+    def run_pass(self, now: Optional[int] = None) -> Dict[str, Any]:
+        """同步运行完整的一轮（不停顿），返回统计信息"""
+        while not self.run_slice(now):
+            pass
+        return self.stats()
+
+    def start(self, interval: float = MEMORY_SWEEP_INTERVAL) -> bool:
+        """启动后台清理线程（首轮在 interval 秒后开始），返回是否启动成功"""
+        if interval <= 0:
+            return False
+        if self._thread is not None and self._thread.is_alive():
+            return True
+
+        self._stop.clear()
+
+        def _run():
+            while not self._stop.wait(interval):
+                try:
+                    while not self.run_slice():
+                        if self._stop.wait(self.pause_seconds):
+                            return
+                except Exception as e:
+                    print(f"⚠️ 记忆过期清理失败: {e}")
+                    self._pass_started = None
+                    self._samples = []
+
+        self._thread = threading.Thread(target=_run, name="memory-sweeper", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止后台清理线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "passes": self.passes,
+            "slices": self.slices,
+            "children_scanned": self.children_scanned,
+            "homework_archived": self.homework_archived,
+            "knowledge_archived": self.knowledge_archived,
+            "size_samples_pruned": self.size_samples_pruned,
+            "last_pass_seconds": self.last_pass_seconds,
+            "in_progress": self._pass_started is not None,
+        }
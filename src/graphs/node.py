@@ -25,6 +25,10 @@ from graphs.state import (
 
 
 # ============== 节点1：长期记忆节点（内存方式） ==============
+# 长期记忆节点可加载的字段
+MEMORY_FIELDS = ("conversation_history", "learning_progress", "speaking_practice_count")
+
+
 def long_term_memory_node(
     state: LongTermMemoryInput,
     config: RunnableConfig,
@@ -42,10 +46,17 @@ def long_term_memory_node(
     memory_store = MemoryStore.get_instance()
     
     if state.action_type == "load":
-        # 加载数据
-        conversation_history = memory_store.get_conversation_history(state.child_id)
-        learning_progress = memory_store.get_learning_progress(state.child_id)
-        speaking_practice_count = memory_store.get_speaking_practice_count(state.child_id)
+        # 加载数据（只加载请求的字段，对话只取提示词需要的最近窗口）
+        fields = state.fields if state.fields is not None else MEMORY_FIELDS
+        conversation_history = (
+            memory_store.get_recent_conversation(state.child_id) if "conversation_history" in fields else ()
+        )
+        learning_progress = (
+            memory_store.get_learning_progress(state.child_id) if "learning_progress" in fields else {}
+        )
+        speaking_practice_count = (
+            memory_store.get_speaking_practice_count(state.child_id) if "speaking_practice_count" in fields else 0
+        )
         
         return LongTermMemoryOutput(
             conversation_history=conversation_history,
@@ -639,13 +650,15 @@ def speaking_practice_node(
         
         feedback = str(response.content).strip()
     
-    # 更新练习次数
-    new_practice_count = practice_count + 1
-    memory_store.update_learning_progress(state.child_name, {
-        "speaking_practice_count": new_practice_count,
-        "last_practice_time": datetime.now().isoformat(),
-        "last_scenario": current_scenario
-    })
+    # 更新练习次数（原子累加，避免并发轮次丢失更新）
+    new_practice_count = memory_store.increment_learning_counter(
+        state.child_name,
+        "speaking_practice_count",
+        extra={
+            "last_practice_time": datetime.now().isoformat(),
+            "last_scenario": current_scenario
+        }
+    )
     
     return SpeakingPracticeOutput(
         recognized_text=recognized_text,
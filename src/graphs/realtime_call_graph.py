@@ -11,7 +11,9 @@ from langgraph.graph import StateGraph, END
 from langchain_core.runnables import RunnableConfig
 from langgraph.runtime import Runtime
 from coze_coding_utils.runtime_ctx.context import Context
+from storage.memory.memory_saver import get_graph_checkpointer
 from utils.file.file import File
+from graphs.state import ConversationHistory
 
 
 # ============== 全局状态定义 ==============
@@ -26,7 +28,7 @@ class RealtimeCallState(BaseModel):
     child_age: int = Field(default=8, description="孩子年龄")
 
     # 上下文（可选，用于连续对话）
-    conversation_history: List[dict] = Field(default=[], description="对话历史（最近3条）")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史（最近3条）")
     child_id: str = Field(default="default_child", description="孩子ID")
 
     # 处理结果
@@ -45,7 +47,7 @@ class RealtimeCallInput(BaseModel):
     user_input_text: str = Field(default="", description="用户输入文本")
     child_name: str = Field(default="小朋友", description="孩子姓名")
     child_age: int = Field(default=8, description="孩子年龄")
-    conversation_history: List[dict] = Field(default=[], description="对话历史（可选）")
+    conversation_history: List[dict] = Field(default=[], description="对话历史（可选）")  # 外部输入，保留校验
     child_id: str = Field(default="default_child", description="孩子ID")
 
 
@@ -63,7 +65,7 @@ class ASRNodeInput(BaseModel):
     user_input_text: str = Field(default="", description="用户输入文本")
     child_name: str = Field(default="小朋友", description="孩子姓名")
     child_age: int = Field(default=8, description="孩子年龄")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     child_id: str = Field(default="default_child", description="孩子ID")
 
 
@@ -72,7 +74,7 @@ class ASRNodeOutput(BaseModel):
     recognized_text: str = Field(default="", description="识别出的文本")
     child_name: str = Field(default="小朋友", description="孩子姓名")
     child_age: int = Field(default=8, description="孩子年龄")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     child_id: str = Field(default="default_child", description="孩子ID")
     current_time: str = Field(default="", description="当前时间")
 
@@ -140,7 +142,7 @@ class LLMNodeInput(BaseModel):
     recognized_text: str = Field(default="", description="识别出的文本")
     child_name: str = Field(default="小朋友", description="孩子姓名")
     child_age: int = Field(default=8, description="孩子年龄")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     child_id: str = Field(default="default_child", description="孩子ID")
     current_time: str = Field(default="", description="当前时间")
 
@@ -151,7 +153,7 @@ class LLMNodeOutput(BaseModel):
     ai_response: str = Field(default="", description="AI响应文本")
     child_name: str = Field(default="小朋友", description="孩子姓名")
     child_age: int = Field(default=8, description="孩子年龄")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     child_id: str = Field(default="default_child", description="孩子ID")
     current_time: str = Field(default="", description="当前时间")
 
@@ -234,7 +236,7 @@ class TTSNodeInput(BaseModel):
     ai_response: str = Field(default="", description="AI响应文本")
     child_name: str = Field(default="小朋友", description="孩子姓名")
     child_age: int = Field(default=8, description="孩子年龄")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     child_id: str = Field(default="default_child", description="孩子ID")
     current_time: str = Field(default="", description="当前时间")
 
@@ -246,7 +248,7 @@ class TTSNodeOutput(BaseModel):
     ai_response_audio: str = Field(default="", description="AI响应音频URL")
     child_name: str = Field(default="小朋友", description="孩子姓名")
     child_age: int = Field(default=8, description="孩子年龄")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     child_id: str = Field(default="default_child", description="孩子ID")
     current_time: str = Field(default="", description="当前时间")
 
@@ -331,4 +333,4 @@ builder.add_edge("llm", "tts")
 builder.add_edge("tts", END)
 
 # 编译图
-realtime_call_graph = builder.compile()
+realtime_call_graph = builder.compile(checkpointer=get_graph_checkpointer("realtime_call"))
@@ -0,0 +1,202 @@
+"""
+短期响应缓存（TTL + LRU）
+
+- 基于 OrderedDict 的 LRU，get/put/淘汰均摊 O(1)
+- 使用单调时钟计算过期时间，不受系统时间调整影响
+- 同时限制条目数和字节数
+- 可选的后台清理线程，定期移除过期条目
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+# 缓存配置（可通过环境变量覆盖）
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))  # 16MB
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "180"))  # 3分钟
+RESPONSE_CACHE_SWEEP_INTERVAL = float(os.getenv("RESPONSE_CACHE_SWEEP_INTERVAL", "60"))  # 0 表示不启动后台清理
+
+
+class _CacheEntry:
+    """缓存条目"""
+    __slots__ = ("response", "scenario", "query", "stored_at", "size")
+
+    def __init__(self, response: str, scenario: str, query: str, stored_at: float, size: int):
+        self.response = response
+        self.scenario = scenario
+        self.query = query
+        self.stored_at = stored_at
+        self.size = size
+
+
+class ResponseCache:
+    """线程安全的 TTL + LRU 缓存"""
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        clock=time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        # 访问顺序（LRU）：最久未访问的在最前
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        # 写入顺序：最早写入的在最前，用于按时间清理过期条目
+        self._write_order: "OrderedDict[str, None]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_stop = threading.Event()
+
+    @staticmethod
+    def _estimate_size(key: str, response: str, query: str) -> int:
+        """估算条目占用的字节数（sys.getsizeof 对 str 是 O(1)）"""
+        return sys.getsizeof(key) + sys.getsizeof(response) + sys.getsizeof(query)
+
+    def _remove(self, key: str) -> _CacheEntry:
+        """移除条目（调用方需持有锁）"""
+        entry = self._entries.pop(key)
+        self._write_order.pop(key, None)
+        self._bytes -= entry.size
+        return entry
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """
+        获取缓存
+
+        Args:
+            key: 缓存键
+            max_age: 最大缓存时长（秒），默认使用 ttl_seconds
+
+        Returns:
+            缓存的响应，如果过期或不存在则返回None
+        """
+        ttl = self.ttl_seconds if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            if self._clock() - entry.stored_at > ttl:
+                # 缓存过期，删除
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.response
+
+    def put(self, key: str, response: str, scenario: str = "", query: str = "") -> None:
+        """写入缓存，超出条目数或字节数限制时淘汰最久未访问的条目"""
+        size = self._estimate_size(key, response, query)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            if size > self.max_bytes:
+                # 单条超过字节上限，不缓存
+                return
+
+            self._entries[key] = _CacheEntry(response, scenario, query, self._clock(), size)
+            self._write_order[key] = None
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._evictions += 1
+
+    def sweep(self, max_age: Optional[float] = None) -> int:
+        """
+        清理过期条目
+
+        按写入顺序从最早的条目开始检查，遇到未过期条目即停止，
+        因此每个过期条目只被处理一次（均摊 O(1)）。
+
+        Returns:
+            删除的缓存数量
+        """
+        ttl = self.ttl_seconds if max_age is None else max_age
+        removed = 0
+        with self._lock:
+            now = self._clock()
+            while self._write_order:
+                key = next(iter(self._write_order))
+                if now - self._entries[key].stored_at <= ttl:
+                    break
+                self._remove(key)
+                removed += 1
+            self._expirations += removed
+        return removed
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._write_order.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ============== 后台清理线程 ==============
+
+    def start_sweeper(self, interval: float = RESPONSE_CACHE_SWEEP_INTERVAL) -> bool:
+        """启动后台清理线程，返回是否启动成功"""
+        if interval <= 0:
+            return False
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return True
+
+        self._sweeper_stop.clear()
+
+        def _run():
+            while not self._sweeper_stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"⚠️ 响应缓存清理失败: {e}")
+
+        self._sweeper = threading.Thread(target=_run, name="response-cache-sweeper", daemon=True)
+        self._sweeper.start()
+        return True
+
+    def stop_sweeper(self, timeout: Optional[float] = None) -> None:
+        """停止后台清理线程"""
+        self._sweeper_stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout)
+            self._sweeper = None
@@ -0,0 +1,207 @@
+"""
+知识点复习调度（向量化间隔重复）
+
+调度状态以列式 NumPy 数组保存（掌握程度、复习次数、难度系数、间隔、下次复习时间），
+一次计算整批知识点的复习间隔：
+- table：按掌握程度查固定间隔表（10分钟 / 1小时 / 1天 / 3天 / 7天 / 14天），原有行为
+- sm2：SM-2 算法，每个知识点维护难度系数（ease factor），连续答对时间隔按系数增长
+
+调度参数变化时可用 reschedule() 以上次复习时间为基准批量重排，不需要逐个知识点计算。
+"""
+import os
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .memory_records import KnowledgePoint
+
+# 调度算法：table（固定间隔表）/ sm2（SM-2 难度系数）
+REVIEW_SCHEDULER = os.getenv("REVIEW_SCHEDULER", "table").lower()
+# 间隔随机波动比例（±20%），避免所有知识点在同一时间复习
+REVIEW_INTERVAL_JITTER = float(os.getenv("REVIEW_INTERVAL_JITTER", "0.2"))
+
+# 掌握程度 0-5 对应的复习间隔（秒）
+DEFAULT_LEVEL_INTERVALS = (600, 3600, 86400, 3 * 86400, 7 * 86400, 14 * 86400)
+
+MAX_MASTERY_LEVEL = 5
+
+
+@dataclass(frozen=True)
+class SchedulerParams:
+    algorithm: str = REVIEW_SCHEDULER  # table / sm2
+    level_intervals: Tuple[int, ...] = DEFAULT_LEVEL_INTERVALS  # 掌握程度对应的间隔（秒），sm2 的重学间隔取第0项
+    jitter: float = REVIEW_INTERVAL_JITTER  # 间隔随机波动比例
+    initial_ease: float = 2.5  # SM-2 初始难度系数
+    min_ease: float = 1.3  # SM-2 难度系数下限
+    first_interval: int = 86400  # SM-2 第1次答对后的间隔：1天
+    second_interval: int = 6 * 86400  # SM-2 第2次答对后的间隔：6天
+    max_interval: int = 180 * 86400  # 间隔上限
+    correct_quality: int = 4  # 答对对应的 SM-2 回答质量（0-5）
+    incorrect_quality: int = 2  # 答错对应的 SM-2 回答质量（0-5）
+
+
+class KnowledgeArrays:
+    """
+    一批知识点的调度状态（列式数组）
+
+    next_review 为 -1 表示没有有效的复习时间（不参与重排）。
+    """
+    __slots__ = ("mastery", "review_count", "correct_count", "repetitions", "ease", "interval", "next_review")
+
+    def __init__(self, size: int, params: SchedulerParams):
+        self.mastery = np.zeros(size, dtype=np.int64)
+        self.review_count = np.zeros(size, dtype=np.int64)
+        self.correct_count = np.zeros(size, dtype=np.int64)
+        # 连续答对次数（SM-2 的重复次数 n，答错时归零）
+        self.repetitions = np.zeros(size, dtype=np.int64)
+        self.ease = np.full(size, params.initial_ease, dtype=np.float64)
+        self.interval = np.zeros(size, dtype=np.int64)
+        self.next_review = np.full(size, -1, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.mastery)
+
+    def take(self, mask: np.ndarray) -> "KnowledgeArrays":
+        """取出子集（复制）"""
+        subset = object.__new__(KnowledgeArrays)
+        for name in self.__slots__:
+            setattr(subset, name, getattr(self, name)[mask])
+        return subset
+
+    def put(self, mask: np.ndarray, subset: "KnowledgeArrays") -> None:
+        """把子集写回对应位置"""
+        for name in self.__slots__:
+            getattr(self, name)[mask] = getattr(subset, name)
+
+    @classmethod
+    def from_points(cls, points: Sequence[KnowledgePoint], params: SchedulerParams) -> "KnowledgeArrays":
+        """从知识点记录构造；缺少调度字段的旧知识点按掌握程度推断原间隔"""
+        arrays = cls(len(points), params)
+        level_intervals = params.level_intervals
+        for i, kp in enumerate(points):
+            mastery = min(max(kp.mastery_level or 0, 0), MAX_MASTERY_LEVEL)
+            arrays.mastery[i] = mastery
+            arrays.review_count[i] = kp.review_count or 0
+            arrays.correct_count[i] = kp.correct_count or 0
+            arrays.repetitions[i] = kp.repetitions if kp.repetitions is not None else 0
+            if kp.ease_factor is not None:
+                arrays.ease[i] = kp.ease_factor
+            arrays.interval[i] = (
+                kp.interval if kp.interval is not None
+                else level_intervals[min(mastery, len(level_intervals) - 1)]
+            )
+            if kp.next_review_time is not None:
+                arrays.next_review[i] = kp.next_review_time
+        return arrays
+
+    def write_back(self, points: Sequence[KnowledgePoint]) -> None:
+        """把调度状态写回知识点记录"""
+        columns = zip(
+            self.mastery.tolist(), self.review_count.tolist(), self.correct_count.tolist(),
+            self.repetitions.tolist(), self.ease.tolist(), self.interval.tolist(), self.next_review.tolist()
+        )
+        for kp, (mastery, review_count, correct_count, repetitions, ease, interval, next_review) in zip(points, columns):
+            kp.mastery_level = mastery
+            kp.review_count = review_count
+            kp.correct_count = correct_count
+            kp.repetitions = repetitions
+            kp.ease_factor = round(ease, 4)
+            kp.interval = interval
+            if next_review >= 0:
+                kp.next_review_time = next_review
+
+
+class ReviewScheduler:
+    """向量化复习调度器"""
+
+    def __init__(self, params: Optional[SchedulerParams] = None, seed: Optional[int] = None):
+        self.params = params or SchedulerParams()
+        if self.params.algorithm not in ("table", "sm2"):
+            raise ValueError(f"Unknown review scheduler algorithm: {self.params.algorithm}")
+        self._level_intervals = np.asarray(self.params.level_intervals, dtype=np.float64)
+        self._rng = np.random.default_rng(seed)
+
+    def base_intervals(self, state: KnowledgeArrays) -> np.ndarray:
+        """根据当前状态计算复习间隔（秒，未加随机波动）"""
+        params = self.params
+        if params.algorithm == "table":
+            levels = np.clip(state.mastery, 0, len(self._level_intervals) - 1)
+            intervals = self._level_intervals[levels]
+        else:
+            # SM-2：I(1)=1天，I(2)=6天，I(n)=I(2)*EF^(n-2)；答错后回到重学间隔
+            repetitions = state.repetitions
+            growth = np.power(state.ease, np.maximum(repetitions - 2, 0))
+            intervals = np.select(
+                [repetitions <= 0, repetitions == 1],
+                [self._level_intervals[0], params.first_interval],
+                params.second_interval * growth
+            )
+        return np.minimum(intervals, params.max_interval)
+
+    def _jittered(self, intervals: np.ndarray) -> np.ndarray:
+        jitter = self.params.jitter
+        if jitter > 0:
+            intervals = intervals * self._rng.uniform(1 - jitter, 1 + jitter, len(intervals))
+        return np.rint(intervals).astype(np.int64)
+
+    def review(
+        self,
+        state: KnowledgeArrays,
+        correct: np.ndarray,
+        now: Union[int, np.ndarray]
+    ) -> np.ndarray:
+        """
+        记录一批复习结果，原地更新状态
+
+        Args:
+            state: 调度状态
+            correct: 每个知识点是否答对（bool 数组）
+            now: 复习时间（epoch 秒，标量或与 state 等长的数组）
+
+        Returns:
+            新的下次复习时间
+        """
+        params = self.params
+        correct = np.asarray(correct, dtype=bool)
+        state.review_count += 1
+        state.correct_count += correct
+
+        # 答对掌握程度+1（最高5），答错-1（但不低于1）
+        mastery = state.mastery
+        state.mastery = np.where(
+            correct,
+            np.minimum(mastery + 1, MAX_MASTERY_LEVEL),
+            np.where(mastery > 1, mastery - 1, mastery)
+        )
+
+        # SM-2 难度系数：EF' = EF + (0.1 - (5-q) * (0.08 + (5-q) * 0.02))，不低于下限
+        miss = 5 - np.where(correct, params.correct_quality, params.incorrect_quality)
+        state.ease = np.maximum(params.min_ease, state.ease + (0.1 - miss * (0.08 + miss * 0.02)))
+        state.repetitions = np.where(correct, state.repetitions + 1, 0)
+
+        state.interval = self._jittered(self.base_intervals(state))
+        state.next_review = np.asarray(now, dtype=np.int64) + state.interval
+        return state.next_review
+
+    def reschedule(self, state: KnowledgeArrays) -> int:
+        """
+        调度参数变化后批量重排（原地更新）
+
+        以上次复习时间（下次复习时间 - 原间隔）为基准，按当前参数重新计算间隔。
+
+        Returns:
+            重排的知识点数量
+        """
+        scheduled = state.next_review >= 0
+        last_review = state.next_review - state.interval
+        interval = self._jittered(self.base_intervals(state))
+        state.interval = np.where(scheduled, interval, state.interval)
+        state.next_review = np.where(scheduled, last_review + interval, state.next_review)
+        return int(np.count_nonzero(scheduled))
+
+    def review_point(self, kp: KnowledgePoint, is_correct: bool, now: int) -> None:
+        """记录单个知识点的复习结果（原地更新记录）"""
+        state = KnowledgeArrays.from_points([kp], self.params)
+        self.review(state, np.array([is_correct]), now)
+        state.write_back([kp])
@@ -0,0 +1,149 @@
+"""
+复习调度离线模拟器
+
+- simulate()：用指数遗忘模型模拟一批知识点按某个调度方案复习，生成复习历史
+- replay()：把已有的复习历史（真实数据或模拟结果）回放给调度器，统计该调度方案
+  与实际复习时间的偏差（超期比例、按时/超期的答对率、平均间隔、后续复习负担）
+
+所有知识点按"第 k 次复习"分轮向量化处理，每轮调用一次 ReviewScheduler.review()。
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .review_scheduler import KnowledgeArrays, ReviewScheduler
+
+DAY = 86400
+
+
+@dataclass
+class ReviewHistory:
+    point: np.ndarray  # 知识点序号
+    timestamp: np.ndarray  # 复习时间（epoch 秒）
+    correct: np.ndarray  # 是否答对
+    learned_at: np.ndarray  # 每个知识点的学习时间（epoch 秒）
+
+    def __len__(self) -> int:
+        return len(self.point)
+
+
+def _initial_state(scheduler: ReviewScheduler, learned_at: np.ndarray) -> KnowledgeArrays:
+    """新学知识点的调度状态（与 MemoryStore.add_knowledge_point 一致）"""
+    state = KnowledgeArrays(len(learned_at), scheduler.params)
+    state.interval[:] = scheduler.params.level_intervals[0]
+    state.next_review = learned_at + state.interval
+    return state
+
+
+def simulate(
+    scheduler: ReviewScheduler,
+    points: int,
+    days: int,
+    seed: Optional[int] = None,
+    mean_delay: float = 2 * 3600,
+    initial_stability: float = DAY,
+    stability_growth: float = 3.0
+) -> ReviewHistory:
+    """
+    模拟孩子按调度方案复习
+
+    记忆模型：回忆概率 = exp(-距上次复习的时间 / 稳定性)；答对后稳定性乘以 stability_growth，
+    答错后减半。孩子在到期后平均延迟 mean_delay 秒才复习。
+
+    Args:
+        scheduler: 调度器
+        points: 知识点数量（学习时间均为 0）
+        days: 模拟天数
+        seed: 随机种子
+    """
+    rng = np.random.default_rng(seed)
+    learned_at = np.zeros(points, dtype=np.int64)
+    state = _initial_state(scheduler, learned_at)
+    stability = initial_stability * rng.lognormal(0.0, 0.5, points)
+    last_seen = learned_at.astype(np.float64)
+    pending = state.next_review + rng.exponential(mean_delay, points)
+    end = days * DAY
+
+    chunks = []
+    while True:
+        idx = np.flatnonzero(pending <= end)
+        if len(idx) == 0:
+            break
+        now = pending[idx].astype(np.int64)
+        recall = rng.random(len(idx)) < np.exp(-(now - last_seen[idx]) / stability[idx])
+        stability[idx] = np.where(recall, stability[idx] * stability_growth, np.maximum(stability[idx] * 0.5, 3600))
+        last_seen[idx] = now
+        chunks.append((idx, now, recall))
+
+        subset = state.take(idx)
+        scheduler.review(subset, recall, now)
+        state.put(idx, subset)
+        pending[idx] = subset.next_review + rng.exponential(mean_delay, len(idx))
+
+    if not chunks:
+        empty = np.zeros(0, dtype=np.int64)
+        return ReviewHistory(empty, empty, empty.astype(bool), learned_at)
+    return ReviewHistory(
+        point=np.concatenate([c[0] for c in chunks]),
+        timestamp=np.concatenate([c[1] for c in chunks]),
+        correct=np.concatenate([c[2] for c in chunks]),
+        learned_at=learned_at
+    )
+
+
+def replay(scheduler: ReviewScheduler, history: ReviewHistory, horizon_days: int = 7) -> Dict[str, Any]:
+    """
+    回放复习历史，统计调度方案与实际复习的对比
+
+    Returns:
+        reviews: 复习次数
+        recall_rate: 答对率
+        overdue_ratio: 实际复习晚于调度时间的比例
+        recall_on_time / recall_overdue: 按时 / 超期复习的答对率
+        mean_interval_days: 调度给出的平均间隔（天）
+        due_next_days: 历史结束后 horizon_days 天内到期的知识点数量（复习负担）
+    """
+    state = _initial_state(scheduler, history.learned_at.astype(np.int64))
+    if len(history) == 0:
+        return {"reviews": 0}
+
+    # 按 (知识点, 时间) 排序，计算每条记录是该知识点的第几次复习
+    order = np.lexsort((history.timestamp, history.point))
+    points = history.point[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(points)) + 1]
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(points)]))
+    rank = np.arange(len(points)) - group_start
+
+    overdue_total = on_time_correct = on_time_total = overdue_correct = 0
+    interval_sum = 0.0
+    for k in range(int(rank.max()) + 1):
+        sel = order[rank == k]
+        idx = history.point[sel]
+        now = history.timestamp[sel].astype(np.int64)
+        correct = history.correct[sel].astype(bool)
+
+        overdue = now > state.next_review[idx]
+        overdue_total += int(overdue.sum())
+        overdue_correct += int((correct & overdue).sum())
+        on_time_total += int((~overdue).sum())
+        on_time_correct += int((correct & ~overdue).sum())
+
+        subset = state.take(idx)
+        scheduler.review(subset, correct, now)
+        state.put(idx, subset)
+        interval_sum += float(subset.interval.sum())
+
+    reviews = len(history)
+    end = int(history.timestamp.max())
+    return {
+        "reviews": reviews,
+        "recall_rate": float(history.correct.mean()),
+        "overdue_ratio": overdue_total / reviews,
+        "recall_on_time": on_time_correct / on_time_total if on_time_total else None,
+        "recall_overdue": overdue_correct / overdue_total if overdue_total else None,
+        "mean_interval_days": interval_sum / reviews / DAY,
+        "due_next_days": int(np.count_nonzero(
+            (state.next_review > end) & (state.next_review <= end + horizon_days * DAY)
+        )),
+    }
@@ -1,8 +1,18 @@
-from typing import Literal, Optional, List
-from pydantic import BaseModel, Field
+from typing import Literal, Optional, List, Sequence
+from pydantic import BaseModel, Field, SkipValidation
 from utils.file.file import File
 
+# 对话历史：MemoryStore 返回的只读元组，节点之间按引用传递，不做校验和复制
+ConversationHistory = SkipValidation[Sequence[dict]]
+
 # ============== 全局状态定义 ==============
+# 口语练习阶段（GlobalState 和口语练习节点共用）
+class PracticeStage(BaseModel):
+    """口语练习阶段"""
+    stage: Literal["initiate", "question", "followup", "feedback"] = Field(..., description="练习阶段")
+    current_scenario: str = Field(default="", description="当前场景")
+    turn_count: int = Field(default=0, description="当前对话轮数")
+
 class GlobalState(BaseModel):
     """AI陪伴孩子工作流的全局状态（支持时间感知）"""
     # 孩子基本信息
@@ -17,9 +27,11 @@ class GlobalState(BaseModel):
     need_remind: bool = Field(default=False, description="是否需要提醒")
     
     # 长期记忆（支持时间维度的数据管理）
-    conversation_history: List[dict] = Field(default=[], description="对话历史记录（每条包含时间戳）")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史记录（每条包含时间戳）")
     learning_progress: dict = Field(default={}, description="学习进度记录")
     speaking_practice_count: int = Field(default=0, description="口语练习次数")
+    memory_loaded: List[str] = Field(default=[], description="load_memory 已加载的记忆字段（其余字段按需加载）")
+    route: str = Field(default="", description="load_memory 决定的路由分支")
     
     # 对话相关
     user_input_text: str = Field(default="", description="用户输入的文本")
@@ -43,6 +55,9 @@ class GlobalState(BaseModel):
     execution_path: List[str] = Field(default=[], description="执行路径（节点执行顺序）")
     performance_metrics: dict = Field(default={}, description="性能指标（延迟、耗时等）")
     crisis_detected: bool = Field(default=False, description="是否检测到危机情况")
+    
+    # 口语练习阶段（启用 checkpointer 时跨轮次恢复）
+    practice_stage: Optional[PracticeStage] = Field(default=None, description="当前口语练习阶段")
 
 # ============== 图的输入输出 ==============
 class GraphInput(BaseModel):
@@ -82,12 +97,13 @@ class LongTermMemoryInput(BaseModel):
     """长期记忆节点输入"""
     child_id: str = Field(..., description="孩子ID")
     action_type: Literal["load", "save"] = Field(..., description="操作类型：加载/保存")
+    fields: Optional[List[str]] = Field(default=None, description="加载的字段（为空时全部加载）")
     conversation_record: Optional[dict] = Field(default=None, description="要保存的对话记录")
     learning_progress: Optional[dict] = Field(default=None, description="学习进度数据")
 
 class LongTermMemoryOutput(BaseModel):
     """长期记忆节点输出"""
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     learning_progress: dict = Field(default={}, description="学习进度")
     speaking_practice_count: int = Field(default=0, description="口语练习次数")
     load_success: bool = Field(default=False, description="加载是否成功")
@@ -112,7 +128,7 @@ class ActiveCareInput(BaseModel):
     child_name: str = Field(..., description="孩子姓名")
     child_age: int = Field(..., description="孩子年龄")
     child_interests: List[str] = Field(default=[], description="孩子兴趣爱好")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     current_time: str = Field(..., description="当前时间")
 
 class ActiveCareOutput(BaseModel):
@@ -120,13 +136,6 @@ class ActiveCareOutput(BaseModel):
     care_message: str = Field(..., description="关心的消息内容")
 
 # ============== 节点4：口语练习节点（支持主动引导） ==============
-# 练习阶段定义
-class PracticeStage(BaseModel):
-    """口语练习阶段"""
-    stage: Literal["initiate", "question", "followup", "feedback"] = Field(..., description="练习阶段")
-    current_scenario: str = Field(default="", description="当前场景")
-    turn_count: int = Field(default=0, description="当前对话轮数")
-
 # 场景库定义
 PRACTICE_SCENARIOS = {
     "daily_life": {
@@ -154,7 +163,7 @@ class SpeakingPracticeInput(BaseModel):
     child_name: str = Field(..., description="孩子姓名")
     child_age: int = Field(..., description="孩子年龄")
     child_interests: List[str] = Field(default=[], description="孩子兴趣爱好")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     practice_stage: Optional[PracticeStage] = Field(default=None, description="当前练习阶段")
     is_first_turn: bool = Field(default=True, description="是否是第一轮对话")
 
@@ -173,7 +182,7 @@ class RealtimeConversationInput(BaseModel):
     user_input_text: str = Field(..., description="用户输入文本")
     child_name: str = Field(..., description="孩子姓名")
     child_age: int = Field(..., description="孩子年龄")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     context_info: str = Field(default="", description="上下文信息")
 
 class RealtimeConversationOutput(BaseModel):
@@ -220,9 +229,11 @@ class LoadMemoryWrapOutput(BaseModel):
     user_input_text: str = Field(default="", description="用户输入文本")
     user_input_audio: Optional[File] = Field(default=None, description="用户输入音频")
     homework_list: List[dict] = Field(default=[], description="作业列表")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     learning_progress: dict = Field(default={}, description="学习进度")
     speaking_practice_count: int = Field(default=0, description="口语练习次数")
+    memory_loaded: List[str] = Field(default=[], description="已加载的记忆字段")
+    route: str = Field(default="", description="路由分支")
     current_time: str = Field(default="", description="当前时间")
 
 class HomeworkCheckWrapInput(BaseModel):
@@ -243,7 +254,7 @@ class ActiveCareWrapInput(BaseModel):
     child_name: str = Field(..., description="孩子姓名")
     child_age: int = Field(..., description="孩子年龄")
     child_interests: List[str] = Field(default=[], description="孩子兴趣爱好")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     current_time: str = Field(..., description="当前时间")
 
 class ActiveCareWrapOutput(BaseModel):
@@ -261,7 +272,8 @@ class SpeakingPracticeWrapInput(BaseModel):
     child_name: str = Field(..., description="孩子姓名")
     child_age: int = Field(..., description="孩子年龄")
     child_interests: List[str] = Field(default=[], description="孩子兴趣爱好")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
+    practice_stage: Optional[PracticeStage] = Field(default=None, description="当前练习阶段")
 
 class SpeakingPracticeWrapOutput(BaseModel):
     """口语练习包装节点输出"""
@@ -272,6 +284,7 @@ class SpeakingPracticeWrapOutput(BaseModel):
     scenario_type: str = Field(default="practice", description="场景类型")
     execution_path: List[str] = Field(default=[], description="执行路径")
     performance_metrics: dict = Field(default={}, description="性能指标")
+    practice_stage: Optional[PracticeStage] = Field(default=None, description="下一轮的练习阶段（练习结束时为None）")
 
 class RealtimeConversationWrapInput(BaseModel):
     """实时对话包装节点输入"""
@@ -279,7 +292,7 @@ class RealtimeConversationWrapInput(BaseModel):
     user_input_text: str = Field(..., description="用户输入文本")
     child_name: str = Field(..., description="孩子姓名")
     child_age: int = Field(..., description="孩子年龄")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     homework_status: str = Field(default="", description="作业状态")
 
 class RealtimeConversationWrapOutput(BaseModel):
@@ -307,18 +320,21 @@ class SaveMemoryWrapInput(BaseModel):
     recognized_text: str = Field(default="", description="识别出的文本")
     ai_response: str = Field(default="", description="AI响应")
     speaking_practice_count: int = Field(default=0, description="练习次数")
+    memory_loaded: List[str] = Field(default=[], description="已加载的记忆字段")
+    route: str = Field(default="", description="路由分支")
     current_time: str = Field(default="", description="当前时间")
 
 class SaveMemoryWrapOutput(BaseModel):
     """保存记忆包装节点输出"""
     saved: bool = Field(default=True, description="是否保存成功")
+    speaking_practice_count: int = Field(default=0, description="练习次数")
 
 # ============== 新增：场景类型判定节点 ==============
 class DetectScenarioInput(BaseModel):
     """场景类型判定节点输入"""
     user_input_text: str = Field(..., description="用户输入文本")
     trigger_type: str = Field(..., description="触发类型")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
 
 class DetectScenarioOutput(BaseModel):
     """场景类型判定节点输出"""
@@ -347,7 +363,7 @@ class QuickChatInput(BaseModel):
     user_input_text: str = Field(..., description="用户输入文本")
     child_name: str = Field(..., description="孩子姓名")
     child_age: int = Field(..., description="孩子年龄")
-    conversation_history: List[dict] = Field(default=[], description="对话历史（最近3条）")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史（最近3条）")
 
 class QuickChatOutput(BaseModel):
     """轻量级聊天节点输出"""
@@ -379,7 +395,7 @@ class QuickChatWrapInput(BaseModel):
     child_name: str = Field(..., description="孩子姓名")
     child_age: int = Field(..., description="孩子年龄")
     user_input_text: str = Field(..., description="用户输入文本")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
 
 class QuickChatWrapOutput(BaseModel):
     """轻量级聊天包装节点输出"""
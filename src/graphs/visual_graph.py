@@ -14,6 +14,7 @@ from langgraph.graph import StateGraph, END
 from langchain_core.runnables import RunnableConfig
 from langgraph.runtime import Runtime
 from coze_coding_utils.runtime_ctx.context import Context
+from storage.memory.memory_saver import get_graph_checkpointer
 
 from .memory_store import MemoryStore
 
@@ -82,13 +83,12 @@ def create_visual_graph():
         )
         node_output: LongTermMemoryOutput = long_term_memory_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            conversation_history=node_output.conversation_history,
-            learning_progress=node_output.learning_progress,
-            speaking_practice_count=node_output.speaking_practice_count,
-            current_time=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        )
+        return state.model_copy(update={
+            "conversation_history": node_output.conversation_history,
+            "learning_progress": node_output.learning_progress,
+            "speaking_practice_count": node_output.speaking_practice_count,
+            "current_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        })
     
     # 作业检查包装
     def wrap_homework_check_visual(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -99,12 +99,11 @@ def create_visual_graph():
         )
         node_output: HomeworkCheckOutput = homework_check_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            homework_status=node_output.homework_status,
-            need_remind=node_output.need_remind,
-            ai_response=node_output.remind_message
-        )
+        return state.model_copy(update={
+            "homework_status": node_output.homework_status,
+            "need_remind": node_output.need_remind,
+            "ai_response": node_output.remind_message,
+        })
     
     # 主动关心包装
     def wrap_active_care_visual(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -117,10 +116,9 @@ def create_visual_graph():
         )
         node_output: ActiveCareOutput = active_care_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            ai_response=node_output.care_message
-        )
+        return state.model_copy(update={
+            "ai_response": node_output.care_message,
+        })
     
     # ============== 口语练习拆分节点包装 ==============
     
@@ -134,10 +132,9 @@ def create_visual_graph():
         )
         node_output = practice_asr_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            recognized_text=node_output.recognized_text
-        )
+        return state.model_copy(update={
+            "recognized_text": node_output.recognized_text,
+        })
     
     # 2. 复习检查
     def wrap_practice_review_check(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -148,12 +145,11 @@ def create_visual_graph():
         )
         node_output = practice_review_check_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            practice_has_review=node_output.has_review,
-            practice_review_knowledge=node_output.review_knowledge,
-            should_review=node_output.should_review
-        )
+        return state.model_copy(update={
+            "practice_has_review": node_output.has_review,
+            "practice_review_knowledge": node_output.review_knowledge,
+            "should_review": node_output.should_review,
+        })
     
     # 3. 场景选择
     def wrap_practice_scenario_select(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -167,13 +163,12 @@ def create_visual_graph():
         )
         node_output = practice_scenario_select_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            practice_scenario_key=node_output.scenario_key,
-            practice_scenario_name=node_output.scenario_name,
-            practice_topic=node_output.topic,
-            practice_is_review_mode=node_output.is_review_mode
-        )
+        return state.model_copy(update={
+            "practice_scenario_key": node_output.scenario_key,
+            "practice_scenario_name": node_output.scenario_name,
+            "practice_topic": node_output.topic,
+            "practice_is_review_mode": node_output.is_review_mode,
+        })
     
     # 4. 对话引擎
     def wrap_practice_dialogue(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -197,12 +192,11 @@ def create_visual_graph():
         )
         node_output = practice_dialogue_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            ai_response=node_output.ai_response,
-            practice_stage=node_output.next_stage,
-            practice_turn_count=node_output.turn_count
-        )
+        return state.model_copy(update={
+            "ai_response": node_output.ai_response,
+            "practice_stage": node_output.next_stage,
+            "practice_turn_count": node_output.turn_count,
+        })
     
     # 5. 知识点识别
     def wrap_practice_knowledge_extract(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -215,10 +209,9 @@ def create_visual_graph():
         )
         node_output = practice_knowledge_extract_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            practice_new_knowledge=node_output.new_knowledge
-        )
+        return state.model_copy(update={
+            "practice_new_knowledge": node_output.new_knowledge,
+        })
     
     # 6. 更新记忆
     def wrap_practice_update_memory(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -232,10 +225,9 @@ def create_visual_graph():
         )
         node_output = practice_update_memory_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            speaking_practice_count=node_output.practice_count
-        )
+        return state.model_copy(update={
+            "speaking_practice_count": node_output.practice_count,
+        })
     
     # 7. TTS
     def wrap_practice_tts(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -246,10 +238,9 @@ def create_visual_graph():
         )
         node_output = practice_tts_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            ai_response_audio=node_output.audio_url
-        )
+        return state.model_copy(update={
+            "ai_response_audio": node_output.audio_url,
+        })
     
     # ============== 实时对话拆分节点包装 ==============
     
@@ -262,11 +253,10 @@ def create_visual_graph():
         )
         node_output = realtime_search_judgment_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            realtime_need_search=node_output.need_search,
-            realtime_search_query=node_output.search_query
-        )
+        return state.model_copy(update={
+            "realtime_need_search": node_output.need_search,
+            "realtime_search_query": node_output.search_query,
+        })
     
     # 2. 联网搜索
     def wrap_realtime_web_search(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -276,10 +266,9 @@ def create_visual_graph():
         )
         node_output = realtime_web_search_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            realtime_search_results=node_output.search_results
-        )
+        return state.model_copy(update={
+            "realtime_search_results": node_output.search_results,
+        })
     
     # 3. 上下文构建
     def wrap_realtime_context_builder(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -299,10 +288,9 @@ def create_visual_graph():
         )
         node_output = realtime_context_builder_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            realtime_context_str=node_output.context_str
-        )
+        return state.model_copy(update={
+            "realtime_context_str": node_output.context_str,
+        })
     
     # 4. LLM生成
     def wrap_realtime_llm_generate(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -315,10 +303,9 @@ def create_visual_graph():
         )
         node_output = realtime_llm_generate_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            ai_response=node_output.ai_response
-        )
+        return state.model_copy(update={
+            "ai_response": node_output.ai_response,
+        })
     
     # 5. 作业意图识别
     def wrap_realtime_homework_check(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -337,10 +324,9 @@ def create_visual_graph():
         )
         node_output = realtime_homework_check_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            realtime_homework_completed=node_output.homework_completed
-        )
+        return state.model_copy(update={
+            "realtime_homework_completed": node_output.homework_completed,
+        })
     
     # TTS合成（所有分支共享）
     def wrap_tts_visual(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -351,10 +337,9 @@ def create_visual_graph():
         )
         node_output = voice_synthesis_node(node_input, config, runtime)
         
-        return VisualGlobalState(
-            **state.dict(),
-            ai_response_audio=node_output.audio_url
-        )
+        return state.model_copy(update={
+            "ai_response_audio": node_output.audio_url,
+        })
     
     # 保存记忆（所有分支共享）
     def wrap_save_memory_visual(state: VisualGlobalState, config: RunnableConfig, runtime: Runtime[Context]) -> VisualGlobalState:
@@ -386,9 +371,7 @@ def create_visual_graph():
                 "last_practice_time": state.current_time
             })
         
-        return VisualGlobalState(
-            **state.dict()
-        )
+        return state
     
     # 路由决策包装
     def wrap_route_decision_visual(state: VisualGlobalState) -> str:
@@ -514,7 +497,7 @@ def create_visual_graph():
     # 结束
     builder.add_edge("save_memory", END)
     
-    return builder.compile()
+    return builder.compile(checkpointer=get_graph_checkpointer("detailed"))
 
 
 # 创建可视化模式图
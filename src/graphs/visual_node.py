@@ -459,15 +459,16 @@ def practice_update_memory_node(
     
     memory_store = MemoryStore.get_instance()
     
-    # 更新练习次数
-    new_practice_count = state.practice_count + 1
-    
-    memory_store.update_learning_progress(state.child_name, {
-        "speaking_practice_count": new_practice_count,
-        "last_practice_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "practice_stage": state.stage,
-        "practice_turn_count": state.turn_count
-    })
+    # 更新练习次数（原子累加，避免并发轮次丢失更新）
+    new_practice_count = memory_store.increment_learning_counter(
+        state.child_name,
+        "speaking_practice_count",
+        extra={
+            "last_practice_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "practice_stage": state.stage,
+            "practice_turn_count": state.turn_count
+        }
+    )
     
     # 如果有新知识点，记录到学习进度
     if state.new_knowledge:
@@ -8,6 +8,7 @@
 from typing import Literal, Optional, List, Dict
 from pydantic import BaseModel, Field
 from utils.file.file import File
+from graphs.state import ConversationHistory
 
 
 # ============== 可视化模式：口语练习拆分节点 ==============
@@ -62,7 +63,7 @@ class PracticeDialogueInput(BaseModel):
     child_age: int = Field(..., description="孩子年龄")
     child_interests: List[str] = Field(default=[], description="孩子兴趣爱好")
     recognized_text: str = Field(default="", description="识别出的文本")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     
     # 场景信息
     scenario_key: str = Field(..., description="场景key")
@@ -153,7 +154,7 @@ class RealtimeWebSearchOutput(BaseModel):
 class RealtimeContextBuilderInput(BaseModel):
     """实时对话-上下文构建节点输入"""
     user_input_text: str = Field(..., description="用户输入文本")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     search_results: str = Field(default="", description="搜索结果")
     homework_status: str = Field(default="", description="作业状态")
     child_name: str = Field(..., description="孩子姓名")
@@ -214,7 +215,7 @@ class VisualGlobalState(BaseModel):
     homework_list: List[dict] = Field(default=[], description="作业列表")
     homework_status: str = Field(default="", description="作业状态")
     need_remind: bool = Field(default=False, description="是否需要提醒")
-    conversation_history: List[dict] = Field(default=[], description="对话历史")
+    conversation_history: ConversationHistory = Field(default=(), description="对话历史")
     learning_progress: dict = Field(default={}, description="学习进度")
     speaking_practice_count: int = Field(default=0, description="口语练习次数")
     user_input_text: str = Field(default="", description="用户输入文本")
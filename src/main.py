@@ -6,11 +6,11 @@ import logging
 from typing import Any, Dict, Iterable, AsyncIterable, AsyncGenerator, Optional
 import threading
 import contextvars
-import cozeloop
+from contextlib import asynccontextmanager, nullcontext
 import uvicorn
 import time
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
 from langgraph.graph.state import CompiledStateGraph
@@ -18,7 +18,7 @@ from langgraph.graph.state import CompiledStateGraph
 from coze_coding_utils.runtime_ctx.context import new_context, Context
 from utils.helper import graph_helper
 from utils.log.node_log import LOG_FILE
-from utils.log.write_log import setup_logging, request_context
+from utils.log.write_log import setup_logging, request_context, loggable_body
 from utils.log.config import LOG_LEVEL
 from utils.messages.server import (
     create_message_end_dict,
@@ -42,9 +42,36 @@ from utils.helper.agent_helper import (
     to_client_message,
     agent_iter_server_messages,
 )
-from utils.log.parser import LangGraphParser
+from utils.log.parser import get_graph_parser
 from utils.log.err_trace import extract_core_stack
 from utils.log.loop_trace import init_run_config, init_agent_config
+from utils.log.metrics import instrument_sdk_clients, render_metrics
+from utils.log.run_profile import start_run_profile
+from storage.memory.memory_transfer import (
+    FORMATS as MEMORY_TRANSFER_FORMATS,
+    MEMORY_TRANSFER_ENABLED,
+    MEMORY_TRANSFER_TOKEN,
+    MemoryImporter,
+    RecordDecoder,
+    export_stream,
+    transfer_authorized,
+)
+from storage.memory.memory_saver import (
+    GRAPH_CHECKPOINT_DURABILITY,
+    ThreadRunLocks,
+    checkpointing_enabled,
+    close_graph_checkpointers,
+    get_checkpoint_pool_stats,
+    get_memory_saver,
+    prewarm_memory_saver,
+)
+from storage.database.db import dispose_async_engine, get_pool_stats, init_database
+from storage.memory.checkpoint_retention import (
+    CHECKPOINT_PRUNE_MAX_ACTIVE_RUNS,
+    get_checkpoint_pruner,
+    start_checkpoint_pruner,
+    stop_checkpoint_pruner,
+)
 
 
 # 超时配置常量
@@ -57,6 +84,8 @@ class GraphService:
 
         # 用于跟踪正在运行的任务（使用asyncio.Task）
         self.running_tasks: Dict[str, asyncio.Task] = {}
+        # 启用 checkpointer 时，同一检查点线程（同一个孩子）的运行串行执行
+        self.thread_locks = ThreadRunLocks()
         # 错误分类器
         self.error_classifier = ErrorClassifier()
 
@@ -78,9 +107,13 @@ class GraphService:
         run_config["recursion_limit"] = 100
         run_config["configurable"] = {"thread_id": session_id}
         stream_input = to_stream_input(client_msg)
+        start_run_profile()
         t0 = time.time()
         try:
-            items = self._get_graph(ctx).stream(stream_input, stream_mode="messages", config=run_config, context=ctx)
+            items = self._get_graph(ctx).stream(
+                stream_input, stream_mode="messages", config=run_config, context=ctx,
+                durability=GRAPH_CHECKPOINT_DURABILITY
+            )
             server_msgs_iter = agent_iter_server_messages(
                 items,
                 session_id=client_msg.session_id,
@@ -127,16 +160,22 @@ class GraphService:
 
         run_id = ctx.run_id
         logger.info(f"Starting run with run_id: {run_id}")
+        # 记录实际经过的节点和各阶段耗时，运行结束后填入 execution_path / performance_metrics
+        profile = start_run_profile()
 
         try:
             graph = self._get_graph(ctx)
             # custom tracer
             run_config = init_run_config(graph, ctx)
-            run_config["configurable"] = {"thread_id": ctx.run_id}
+            # 同一个孩子的多次运行共用检查点（启用 checkpointer 时恢复口语练习阶段）
+            thread_id = str(payload.get("child_id") or ctx.run_id)
+            run_config["configurable"] = {"thread_id": thread_id}
 
             # 直接调用，LangGraph会在当前任务上下文中执行
-            # 如果当前任务被取消，LangGraph的执行也会被取消
-            return await graph.ainvoke(payload, config=run_config, context=ctx)
+            # 如果当前任务被取消，LangGraph的执行也会被取消（包括等待同一孩子的上一次运行时）
+            async with self.thread_locks.hold(thread_id) if checkpointing_enabled() else nullcontext():
+                result = await graph.ainvoke(payload, config=run_config, context=ctx, durability=GRAPH_CHECKPOINT_DURABILITY)
+            return profile.apply(result)
 
         except asyncio.CancelledError:
             logger.info(f"Run {run_id} was cancelled")
@@ -175,7 +214,6 @@ class GraphService:
         finally:
             # 清理任务记录
             self.running_tasks.pop(run_id, None)
-            cozeloop.flush()
 
     # 取消执行 - 使用asyncio的标准方式
     def cancel_run(self, run_id: str, ctx: Optional[Context] = None) -> Dict[str, Any]:
@@ -224,7 +262,7 @@ class GraphService:
         if node_func is None or input_cls is None:
             raise KeyError(f"node_id '{node_id}' not found")
         assert self.graph is not None, "Graph is not initialized"
-        parser = LangGraphParser(self.graph)
+        parser = get_graph_parser(self.graph)
         metadata = parser.get_node_metadata(node_id) or {}
 
         _g = StateGraph(input_cls, input_schema=input_cls, output_schema=output_cls)
@@ -254,11 +292,16 @@ class GraphService:
         # 使用后台线程拉取同步流，并通过事件循环安全地推送到异步队列
         loop = asyncio.get_running_loop()
         q: asyncio.Queue = asyncio.Queue()
+        # 耗时记录随上下文复制到后台线程，message_end 中带上本次运行的 token 消耗
+        start_run_profile()
         context = contextvars.copy_context()
         start_time = time.time()
         def producer():
             try:
-                items = graph.stream(stream_input, stream_mode="messages", config=run_config, context=ctx)
+                items = graph.stream(
+                    stream_input, stream_mode="messages", config=run_config, context=ctx,
+                    durability=GRAPH_CHECKPOINT_DURABILITY
+                )
                 server_msgs_iter = agent_iter_server_messages(
                     items,
                     session_id=client_msg.session_id,
@@ -316,8 +359,31 @@ class GraphService:
             raise
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from graphs.memory_store import MEMORY_STORE_BACKEND, MemoryStore
+
+    if MEMORY_STORE_BACKEND == "postgres" or checkpointing_enabled():
+        # 就绪前确认数据库可连接并预热连接池（异步等待，不阻塞事件循环）
+        await init_database()
+    if MEMORY_STORE_BACKEND == "postgres":
+        await asyncio.to_thread(MemoryStore.get_instance)
+    if checkpointing_enabled():
+        # AsyncPostgresSaver 绑定创建时的事件循环，需在服务的事件循环中创建
+        get_memory_saver()
+        await prewarm_memory_saver()
+        # 低峰时段且运行中的请求不多时清理旧检查点
+        start_checkpoint_pruner(lambda: len(service.running_tasks) > CHECKPOINT_PRUNE_MAX_ACTIVE_RUNS)
+    yield
+    await asyncio.to_thread(stop_checkpoint_pruner, 10)
+    await asyncio.to_thread(close_graph_checkpointers, 10)
+    await dispose_async_engine()
+
+
 service = GraphService()
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+# LLM / TTS / ASR / Search 调用耗时
+instrument_sdk_clients()
 
 
 @app.post("/run")
@@ -339,7 +405,7 @@ async def http_run(request: Request) -> Dict[str, Any]:
         f"Received request for /run: "
         f"run_id={run_id}, "
         f"query={dict(request.query_params)}, "
-        f"body={body_text}"
+        f"body={loggable_body('run', body_text)}"
     )
 
     try:
@@ -393,8 +459,6 @@ async def http_run(request: Request) -> Dict[str, Any]:
                 "stack_trace": extract_core_stack(),
             }
         )
-    finally:
-        cozeloop.flush()
 
 
 @app.post("/stream_run")
@@ -414,7 +478,7 @@ async def http_stream_run(request: Request):
         f"Received request for /stream_run: "
         f"run_id={run_id}, "
         f"query={dict(request.query_params)}, "
-        f"body={body_text}"
+        f"body={loggable_body('stream_run', body_text)}"
     )
 
     try:
@@ -502,7 +566,7 @@ async def http_node_run(node_id: str, request: Request):
     logger.info(
         f"Received request for /node_run/{node_id}: "
         f"query={dict(request.query_params)}, "
-        f"body={body_text}",
+        f"body={loggable_body('node_run', body_text)}",
     )
 
     try:
@@ -530,8 +594,6 @@ async def http_node_run(node_id: str, request: Request):
                 "stack_trace": extract_core_stack(),
             }
         )
-    finally:
-        cozeloop.flush()
 
 
 @app.get("/health")
@@ -550,6 +612,103 @@ async def health_check():
 async def http_graph_inout_parameter(request: Request):
     return service.graph_inout_schema()
 
+def _check_memory_transfer_auth(request: Request) -> None:
+    if not transfer_authorized(request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="Invalid memory transfer token")
+
+
+async def http_memory_export(request: Request, format: str = "ndjson"):
+    """流式导出孩子记忆（NDJSON / msgpack），可用 child_id 参数（可重复）只导出部分孩子"""
+    from graphs.memory_store import MemoryStore
+
+    _check_memory_transfer_auth(request)
+    if format not in MEMORY_TRANSFER_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    child_ids = request.query_params.getlist("child_id") or None
+    logger.info(f"Received request for /memory/export: format={format}, child_ids={child_ids}")
+    return StreamingResponse(
+        export_stream(MemoryStore.get_instance(), format, child_ids),
+        media_type=MEMORY_TRANSFER_FORMATS[format]
+    )
+
+
+async def http_memory_import(request: Request, format: str = "ndjson"):
+    """流式导入孩子记忆（NDJSON / msgpack），按分片批量并行写入，返回导入统计"""
+    from graphs.memory_store import MemoryStore
+
+    _check_memory_transfer_auth(request)
+    if format not in MEMORY_TRANSFER_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    logger.info(f"Received request for /memory/import: format={format}")
+
+    importer = MemoryImporter(MemoryStore.get_instance())
+    decoder = RecordDecoder(format)
+    try:
+        async for chunk in request.stream():
+            records = decoder.feed(chunk)
+            if records:
+                # 写入可能等待分片锁和在途批次，放到线程中执行，不阻塞事件循环
+                await asyncio.to_thread(importer.add_many, records)
+        await asyncio.to_thread(importer.add_many, decoder.close())
+        return await asyncio.to_thread(importer.finish)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        await asyncio.to_thread(importer.close)
+
+
+async def http_memory_sizes(request: Request, child_id: str = "", since: int = 0, limit: int = 20):
+    """孩子数据规模：指定 child_id 时返回随时间的变化，否则返回规模最大的孩子和清理统计"""
+    from graphs.memory_store import MemoryStore
+
+    _check_memory_transfer_auth(request)
+    memory_store = MemoryStore.get_instance()
+    if child_id:
+        return {"child_id": child_id, "history": await asyncio.to_thread(memory_store.get_child_size_history, child_id, since)}
+    return {
+        "children": await asyncio.to_thread(memory_store.get_child_size_report, limit),
+        "sweeper": memory_store.get_sweeper_stats(),
+    }
+
+
+# 导出 / 导入 / 规模查询涉及孩子的个人数据，只在 MEMORY_TRANSFER_ENABLED 时注册（见 storage.memory.memory_transfer）
+if MEMORY_TRANSFER_ENABLED:
+    if not MEMORY_TRANSFER_TOKEN:
+        logger.warning("MEMORY_TRANSFER_ENABLED is set without MEMORY_TRANSFER_TOKEN: /memory/export, /memory/import and /memory/sizes are unauthenticated")
+    app.add_api_route("/memory/export", http_memory_export, methods=["GET"])
+    app.add_api_route("/memory/import", http_memory_import, methods=["POST"])
+    app.add_api_route("/memory/sizes", http_memory_sizes, methods=["GET"])
+
+
+@app.get("/metrics")
+async def http_metrics():
+    """Prometheus 文本格式的指标：节点、工作流、外部调用耗时，缓存命中，队列和连接池等待"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/db/pools")
+async def http_db_pools():
+    """数据库连接池统计：借出连接数、等待中的请求数、获取连接耗时"""
+    stats = get_pool_stats()
+    checkpoint = get_checkpoint_pool_stats()
+    if checkpoint is not None:
+        stats["checkpoint"] = checkpoint
+    return stats
+
+
+@app.get("/checkpoints/retention")
+async def http_checkpoint_retention():
+    """检查点各表大小和清理统计（检查点未存放在 Postgres 时 enabled 为False）"""
+    pruner = get_checkpoint_pruner()
+    if pruner is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "tables": await asyncio.to_thread(pruner.table_sizes),
+        "pruner": pruner.stats(),
+    }
+
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Start FastAPI server")
     parser.add_argument("-m", type=str, default="http", help="Run mode, support http,flow,node")
@@ -1,12 +1,32 @@
 import os
+import asyncio
+import threading
 import time
 from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from typing import Any, Dict, Optional, Tuple
 import logging
+from utils.log.metrics import QUEUE_WAIT
+from utils.log.run_profile import record_queue_wait
 logger = logging.getLogger(__name__)
 
 MAX_RETRY_TIME = 20  # 连接最大重试时间（秒）
+# 本服务所有 worker 进程合计可使用的数据库连接数，按 worker 数均分后再分给进程内的各个连接池
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+# worker 进程数（默认取 WEB_CONCURRENCY，与 uvicorn/gunicorn 一致）
+DB_WORKERS = max(1, int(os.getenv("DB_WORKERS", os.getenv("WEB_CONCURRENCY", "1"))))
+# 启动时每个连接池预先建立的连接数
+DB_POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", "2"))
+# 获取连接的最长等待时间（秒）
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = 1800
+
+# 进程内各连接池占本进程连接数的比例：同步引擎（记忆后端、会话）、异步引擎、检查点连接池
+DB_POOL_SHARES = {"engine": 0.4, "async_engine": 0.3, "checkpoint": 0.3}
+
 # Load environment variables from .env if present
 try:
     from dotenv import load_dotenv
@@ -34,27 +54,141 @@ def get_db_url() -> str:
         if url is None or url == "":
             logger.info("PGDATABASE_URL is not set, database features will be disabled")
     return url
+
+
+def pool_limits(name: str) -> Tuple[int, int]:
+    """
+    连接池大小：(常驻连接数, 最大连接数)
+
+    每个进程可用 DB_MAX_CONNECTIONS / DB_WORKERS 个连接，按 DB_POOL_SHARES 分给各个连接池，
+    常驻连接占一半，其余按需创建（空闲后关闭）。
+    """
+    budget = max(1, int(DB_MAX_CONNECTIONS / DB_WORKERS * DB_POOL_SHARES[name]))
+    return max(1, budget // 2), budget
+
+
+class PoolStats:
+    """连接获取统计：等待中的请求数、获取耗时"""
+
+    def __init__(self, name: str = "db"):
+        self.name = name  # 连接池名称（指标标签）
+        self._lock = threading.Lock()
+        self.acquires = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.errors = 0
+        self.acquire_seconds = 0.0
+        self.max_acquire_seconds = 0.0
+
+    def begin(self) -> float:
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+        return time.perf_counter()
+
+    def end(self, start: float, ok: bool) -> None:
+        elapsed = time.perf_counter() - start
+        QUEUE_WAIT.observe(elapsed, f"db_pool_{self.name}")
+        record_queue_wait(f"db_pool_{self.name}", elapsed)
+        with self._lock:
+            self.waiting -= 1
+            if ok:
+                self.acquires += 1
+                self.acquire_seconds += elapsed
+                self.max_acquire_seconds = max(self.max_acquire_seconds, elapsed)
+            else:
+                self.errors += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "acquires": self.acquires,
+            "acquire_errors": self.errors,
+            "avg_acquire_ms": round(self.acquire_seconds / self.acquires * 1000, 3) if self.acquires else None,
+            "max_acquire_ms": round(self.max_acquire_seconds * 1000, 3),
+        }
+
+
+class _InstrumentedPoolMixin:
+    """记录每次从 SQLAlchemy 连接池获取连接的等待时间"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquire_stats = PoolStats()
+
+    def _do_get(self):
+        start = self.acquire_stats.begin()
+        ok = False
+        try:
+            conn = super()._do_get()
+            ok = True
+            return conn
+        finally:
+            self.acquire_stats.end(start, ok)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.acquire_stats = self.acquire_stats
+        return pool
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pool_size": self.size(),
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(0, self.overflow()),
+            **self.acquire_stats.as_dict(),
+        }
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncPool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def async_db_url(url: str) -> str:
+    """转换为 psycopg 3 异步驱动的 SQLAlchemy URL"""
+    scheme, sep, rest = url.partition("://")
+    if not sep:
+        return url
+    return f"postgresql+psycopg://{rest}"
+
+
 _engine = None
+_async_engine: Optional[AsyncEngine] = None
 _SessionLocal = None
+# init_database() 已确认数据库可连接时，同步引擎不再阻塞检查
+_db_ready = False
+
+
+def _new_engine(url: str):
+    pool_size, max_connections = pool_limits("engine")
+    engine = create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_connections - pool_size,
+        pool_pre_ping=True,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    engine.pool.acquire_stats.name = "engine"
+    return engine
+
 
 def _create_engine_with_retry():
     url = get_db_url()
     if url is None or url == "":
         logger.info("PGDATABASE_URL is not set, database engine will not be created")
         return None
-    size = 100
-    overflow = 100
-    recycle = 1800
-    timeout = 30
-    engine = create_engine(
-        url,
-        pool_size=size,
-        max_overflow=overflow,
-        pool_pre_ping=True,
-        pool_recycle=recycle,
-        pool_timeout=timeout,
-    )
-    # 验证连接，带重试
+    engine = _new_engine(url)
+    if _db_ready:
+        return engine
+    # 验证连接，带重试（服务启动时由 init_database() 异步完成，这里只用于命令行等同步入口）
     start_time = time.time()
     last_error = None
     while time.time() - start_time < MAX_RETRY_TIME:
@@ -76,6 +210,97 @@ def get_engine():
         _engine = _create_engine_with_retry()
     return _engine
 
+def get_async_engine() -> Optional[AsyncEngine]:
+    """异步引擎（psycopg 3），未配置数据库时返回None；创建时不连接数据库"""
+    global _async_engine
+    if _async_engine is None:
+        url = get_db_url()
+        if not url:
+            return None
+        pool_size, max_connections = pool_limits("async_engine")
+        _async_engine = create_async_engine(
+            async_db_url(url),
+            poolclass=InstrumentedAsyncPool,
+            pool_size=pool_size,
+            max_overflow=max_connections - pool_size,
+            pool_pre_ping=True,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+        _async_engine.pool.acquire_stats.name = "async_engine"
+    return _async_engine
+
+def prewarm_engine(engine, connections: int = DB_POOL_PREWARM) -> int:
+    """同时借出 connections 个连接再归还，让连接池常驻这些连接，返回成功建立的连接数"""
+    conns = []
+    try:
+        for _ in range(min(connections, engine.pool.size())):
+            conns.append(engine.connect())
+    except OperationalError as e:
+        logger.warning(f"Database pool prewarm stopped after {len(conns)} connections: {e}")
+    finally:
+        for conn in conns:
+            conn.close()
+    return len(conns)
+
+async def prewarm_async_engine(engine: AsyncEngine, connections: int = DB_POOL_PREWARM) -> int:
+    """异步引擎的预热，见 prewarm_engine()"""
+    results = await asyncio.gather(
+        *(engine.connect() for _ in range(min(connections, engine.pool.size()))), return_exceptions=True
+    )
+    opened = [conn for conn in results if not isinstance(conn, BaseException)]
+    for conn in opened:
+        await conn.close()
+    return len(opened)
+
+async def init_database(timeout: float = MAX_RETRY_TIME) -> bool:
+    """
+    服务启动时确认数据库可连接并预热连接池（在事件循环中等待，不阻塞其他协程）
+
+    Returns:
+        数据库是否可用（未配置或超时后返回False，各功能按原有方式退化）
+    """
+    global _db_ready, _engine
+    engine = get_async_engine()
+    if engine is None:
+        return False
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            break
+        except Exception as e:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.error(f"Database connection failed after {timeout}s: {e}")
+                return False
+            logger.warning(f"Database connection failed, retrying... ({e})")
+            await asyncio.sleep(min(1, remaining))
+
+    _db_ready = True
+    warmed = await prewarm_async_engine(engine)
+    if _engine is None:
+        _engine = await asyncio.to_thread(_create_engine_with_retry)
+    if _engine is not None:
+        warmed += await asyncio.to_thread(prewarm_engine, _engine)
+    logger.info(f"Database ready, prewarmed {warmed} connections (workers={DB_WORKERS}, max_connections={DB_MAX_CONNECTIONS})")
+    return True
+
+def get_pool_stats() -> Dict[str, Any]:
+    """已创建的 SQLAlchemy 连接池统计（借出、等待、获取耗时）"""
+    stats = {}
+    if _engine is not None:
+        stats["engine"] = _engine.pool.get_stats()
+    if _async_engine is not None:
+        stats["async_engine"] = _async_engine.pool.get_stats()
+    return stats
+
+async def dispose_async_engine() -> None:
+    """关闭异步引擎的连接池（服务退出时调用；同步引擎在退出时仍用于写出记忆后端的剩余变更）"""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
 def get_sessionmaker():
     global _SessionLocal
     if _SessionLocal is None:
@@ -88,6 +313,9 @@ def get_session():
 __all__ = [
     "get_db_url",
     "get_engine",
+    "get_async_engine",
+    "init_database",
+    "get_pool_stats",
     "get_sessionmaker",
     "get_session",
 ]
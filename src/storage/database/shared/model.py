@@ -5,4 +5,64 @@ import datetime
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 class Base(DeclarativeBase):
-    pass
\ No newline at end of file
+    pass
+
+# ============== MemoryStore 持久化表 ==============
+# 可索引字段单独成列，完整记录保存在 data 列中，保证与内存结构一致
+
+class ChildMemory(Base):
+    """孩子档案：学习进度、口语练习次数等标量数据"""
+    __tablename__ = "child_memory"
+
+    child_id: Mapped[str] = mapped_column(Text, primary_key=True)
+    learning_progress: Mapped[dict] = mapped_column(JSON, nullable=False, server_default=text("'{}'"))
+    speaking_practice_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    last_homework_check: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=text("now()"))
+
+
+class ChildHomework(Base):
+    """作业"""
+    __tablename__ = "child_homework"
+    __table_args__ = (
+        PrimaryKeyConstraint("child_id", "id"),
+        Index("ix_child_homework_child_deadline", "child_id", "deadline"),
+    )
+
+    child_id: Mapped[str] = mapped_column(Text)
+    id: Mapped[str] = mapped_column(Text)
+    deadline: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+    created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+    data: Mapped[dict] = mapped_column(JSON, nullable=False)
+    # 过期清理归档的时间（归档的行保留，读穿透时跳过）
+    archived_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+
+
+class ChildKnowledgePoint(Base):
+    """知识点（间隔重复）"""
+    __tablename__ = "child_knowledge_point"
+    __table_args__ = (
+        PrimaryKeyConstraint("child_id", "id"),
+        Index("ix_child_knowledge_point_child_review", "child_id", "next_review_time"),
+    )
+
+    child_id: Mapped[str] = mapped_column(Text)
+    id: Mapped[str] = mapped_column(Text)
+    next_review_time: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+    learned_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+    data: Mapped[dict] = mapped_column(JSON, nullable=False)
+    # 过期清理归档的时间（归档的行保留，读穿透时跳过）
+    archived_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+
+
+class ChildConversation(Base):
+    """对话历史"""
+    __tablename__ = "child_conversation"
+    __table_args__ = (
+        Index("ix_child_conversation_child_ts", "child_id", "ts"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    child_id: Mapped[str] = mapped_column(Text, nullable=False)
+    ts: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+    data: Mapped[dict] = mapped_column(JSON, nullable=False)
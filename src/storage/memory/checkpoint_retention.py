@@ -0,0 +1,335 @@
+"""
+LangGraph Postgres 检查点保留策略
+
+启用 checkpointer 后，AsyncPostgresSaver 每个会话每轮至少写入一个检查点，且从不删除，
+memory schema 下的 checkpoints / checkpoint_blobs / checkpoint_writes 会无限增长。
+CheckpointPruner 在后台按批清理：
+
+- 压缩：每个会话（每个 checkpoint_ns）只保留最近 CHECKPOINT_KEEP_LAST 个检查点，删除更早检查点
+  及其 pending writes，再删除不再被任何保留的检查点引用的 channel blobs
+- 过期：最后一个检查点早于 CHECKPOINT_TTL_DAYS 天的会话整个删除
+
+会话按 thread_id 游标分批处理，一批一个事务，批之间停顿 CHECKPOINT_PRUNE_PAUSE_MS 毫秒。
+后台线程只在低峰时段（CHECKPOINT_PRUNE_WINDOW）且服务不繁忙时运行，否则记住游标，下次检查时继续。
+
+saver 写入一个检查点时先写 blobs 再写检查点行（自动提交模式下分别提交），因此只压缩已空闲
+CHECKPOINT_PRUNE_IDLE_SECONDS 秒的会话，避免把刚写入、检查点行尚未提交的 blob 当成孤儿删除。
+"""
+import os
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psycopg
+
+logger = logging.getLogger(__name__)
+
+# 每个会话保留的检查点个数，0 表示不压缩
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "5"))
+# 会话空闲多少天后整个删除，0 表示不过期
+CHECKPOINT_TTL_DAYS = float(os.getenv("CHECKPOINT_TTL_DAYS", "30"))
+# 会话空闲多久（秒）后才压缩
+CHECKPOINT_PRUNE_IDLE_SECONDS = int(os.getenv("CHECKPOINT_PRUNE_IDLE_SECONDS", "300"))
+# 每批处理的会话数和批之间的停顿（毫秒）
+CHECKPOINT_PRUNE_BATCH_THREADS = int(os.getenv("CHECKPOINT_PRUNE_BATCH_THREADS", "200"))
+CHECKPOINT_PRUNE_PAUSE_MS = float(os.getenv("CHECKPOINT_PRUNE_PAUSE_MS", "100"))
+# 后台检查间隔（秒），0 表示不启动后台清理
+CHECKPOINT_PRUNE_INTERVAL = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL", "600"))
+# 低峰时段（本地时间 HH:MM-HH:MM，可跨午夜），为空表示任何时间都可运行
+CHECKPOINT_PRUNE_WINDOW = os.getenv("CHECKPOINT_PRUNE_WINDOW", "02:00-06:00")
+# 正在运行的请求数超过该值时暂停清理
+CHECKPOINT_PRUNE_MAX_ACTIVE_RUNS = int(os.getenv("CHECKPOINT_PRUNE_MAX_ACTIVE_RUNS", "2"))
+
+CHECKPOINT_TABLES = ("checkpoints", "checkpoint_blobs", "checkpoint_writes")
+
+_SELECT_THREADS = (
+    "SELECT thread_id, COUNT(*), MAX((checkpoint->>'ts')::timestamptz)"
+    " FROM checkpoints WHERE thread_id > %s"
+    " GROUP BY thread_id ORDER BY thread_id LIMIT %s"
+)
+
+# 删除每个 (thread_id, checkpoint_ns) 中排在 keep 之后的检查点及其 pending writes，返回两者的行数
+_COMPACT_CHECKPOINTS = """
+WITH ranked AS (
+    SELECT thread_id, checkpoint_ns, checkpoint_id,
+           row_number() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rn
+    FROM checkpoints WHERE thread_id = ANY(%(threads)s)
+), doomed AS (
+    DELETE FROM checkpoints c USING ranked r
+    WHERE r.rn > %(keep)s
+      AND c.thread_id = r.thread_id AND c.checkpoint_ns = r.checkpoint_ns AND c.checkpoint_id = r.checkpoint_id
+    RETURNING c.thread_id, c.checkpoint_ns, c.checkpoint_id
+), writes AS (
+    DELETE FROM checkpoint_writes w USING doomed d
+    WHERE w.thread_id = d.thread_id AND w.checkpoint_ns = d.checkpoint_ns AND w.checkpoint_id = d.checkpoint_id
+    RETURNING 1
+)
+SELECT (SELECT COUNT(*) FROM doomed), (SELECT COUNT(*) FROM writes)
+"""
+
+# 删除不再被同一会话任何检查点的 channel_versions 引用的 blobs
+_DELETE_ORPHAN_BLOBS = """
+DELETE FROM checkpoint_blobs b
+WHERE b.thread_id = ANY(%(threads)s)
+  AND NOT EXISTS (
+    SELECT 1 FROM checkpoints c
+    WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+      AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+  )
+"""
+
+_TABLE_SIZES = (
+    "SELECT c.relname, GREATEST(c.reltuples, 0)::bigint, pg_total_relation_size(c.oid)"
+    " FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace"
+    " WHERE n.nspname = current_schema() AND c.relname = ANY(%s)"
+)
+
+
+def parse_window(window: str) -> Optional[Tuple[int, int]]:
+    """解析 "HH:MM-HH:MM" 为一天中的 (开始分钟, 结束分钟)，为空时返回None"""
+    window = (window or "").strip()
+    if not window:
+        return None
+    try:
+        start, end = window.split("-")
+        minutes = []
+        for part in (start, end):
+            hour, minute = part.strip().split(":")
+            minutes.append(int(hour) * 60 + int(minute))
+    except ValueError:
+        raise ValueError(f"Invalid checkpoint prune window: {window!r}, expected HH:MM-HH:MM")
+    return minutes[0], minutes[1]
+
+
+def in_window(window: Optional[Tuple[int, int]], now: Optional[datetime] = None) -> bool:
+    """当前本地时间是否在时段内（结束早于开始时表示跨午夜）"""
+    if window is None:
+        return True
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    start, end = window
+    if start <= end:
+        return start <= minute < end
+    return minute >= start or minute < end
+
+
+class CheckpointPruner:
+    """检查点分批清理（游标记录已处理到的 thread_id，跨批次、跨时段继续）"""
+
+    def __init__(
+        self,
+        conninfo: str,
+        keep_last: int = CHECKPOINT_KEEP_LAST,
+        ttl_days: float = CHECKPOINT_TTL_DAYS,
+        idle_seconds: int = CHECKPOINT_PRUNE_IDLE_SECONDS,
+        batch_threads: int = CHECKPOINT_PRUNE_BATCH_THREADS,
+        pause_ms: float = CHECKPOINT_PRUNE_PAUSE_MS,
+        window: str = CHECKPOINT_PRUNE_WINDOW,
+        is_busy: Optional[Callable[[], bool]] = None
+    ):
+        self.conninfo = conninfo  # psycopg 连接串（需带 search_path）
+        self.keep_last = keep_last
+        self.ttl = timedelta(days=ttl_days) if ttl_days > 0 else None
+        self.idle = timedelta(seconds=idle_seconds)
+        self.batch_threads = batch_threads
+        self.pause_seconds = pause_ms / 1000.0
+        self.window = parse_window(window)
+        self.is_busy = is_busy
+
+        # 游标：上一批最后一个 thread_id，None 表示当前不在一轮清理中
+        self._cursor: Optional[str] = None
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        # 统计信息
+        self.passes = 0
+        self.batches = 0
+        self.deferred = 0
+        self.threads_scanned = 0
+        self.threads_expired = 0
+        self.threads_compacted = 0
+        self.checkpoints_deleted = 0
+        self.writes_deleted = 0
+        self.blobs_deleted = 0
+        self.prune_seconds = 0.0
+        self.last_pass_at: Optional[float] = None
+
+    def can_run(self) -> bool:
+        """是否处于低峰时段且服务不繁忙"""
+        if not in_window(self.window):
+            return False
+        return not (self.is_busy is not None and self.is_busy())
+
+    def _connect(self) -> psycopg.Connection:
+        return psycopg.connect(self.conninfo, connect_timeout=15)
+
+    def run_batch(self, conn: psycopg.Connection, now: Optional[datetime] = None) -> bool:
+        """
+        处理下一批会话（一个事务）
+
+        Returns:
+            本轮是否已处理完所有会话
+        """
+        now = now or datetime.now(timezone.utc)
+        start = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute(_SELECT_THREADS, (self._cursor or "", self.batch_threads))
+            rows = cur.fetchall()
+            if not rows:
+                conn.commit()
+                return True
+            self._cursor = rows[-1][0]
+
+            expired: List[str] = []
+            compact: List[str] = []
+            for thread_id, count, last_ts in rows:
+                if self.ttl is not None and last_ts is not None and last_ts < now - self.ttl:
+                    expired.append(thread_id)
+                elif self.keep_last > 0 and count > self.keep_last and (last_ts is None or last_ts < now - self.idle):
+                    compact.append(thread_id)
+
+            if expired:
+                for table in ("checkpoint_writes", "checkpoint_blobs", "checkpoints"):
+                    cur.execute(f"DELETE FROM {table} WHERE thread_id = ANY(%s)", (expired,))
+                    if table == "checkpoint_writes":
+                        self.writes_deleted += cur.rowcount
+                    elif table == "checkpoint_blobs":
+                        self.blobs_deleted += cur.rowcount
+                    else:
+                        self.checkpoints_deleted += cur.rowcount
+            if compact:
+                cur.execute(_COMPACT_CHECKPOINTS, {"threads": compact, "keep": self.keep_last})
+                checkpoints, writes = cur.fetchone()
+                cur.execute(_DELETE_ORPHAN_BLOBS, {"threads": compact})
+                self.checkpoints_deleted += checkpoints
+                self.writes_deleted += writes
+                self.blobs_deleted += cur.rowcount
+        conn.commit()
+
+        self.batches += 1
+        self.threads_scanned += len(rows)
+        self.threads_expired += len(expired)
+        self.threads_compacted += len(compact)
+        self.prune_seconds += time.perf_counter() - start
+        return len(rows) < self.batch_threads
+
+    def run_pass(self, now: Optional[datetime] = None, respect_schedule: bool = False) -> bool:
+        """
+        从游标处继续清理，直到处理完所有会话
+
+        Args:
+            now: 当前时间（带时区），默认取系统时间
+            respect_schedule: 为True时，离开低峰时段或服务繁忙时暂停（游标保留，下次继续）
+
+        Returns:
+            本轮是否已完成
+        """
+        conn = self._connect()
+        try:
+            while True:
+                if respect_schedule and not self.can_run():
+                    self.deferred += 1
+                    return False
+                try:
+                    done = self.run_batch(conn, now)
+                except Exception:
+                    conn.rollback()
+                    raise
+                if done:
+                    self._cursor = None
+                    self.passes += 1
+                    self.last_pass_at = time.time()
+                    return True
+                if self.pause_seconds and self._stop.wait(self.pause_seconds):
+                    return False
+        finally:
+            conn.close()
+
+    def table_sizes(self) -> Dict[str, Dict[str, int]]:
+        """检查点各表的估算行数和总大小（含索引和 TOAST）"""
+        with self._connect() as conn:
+            rows = conn.execute(_TABLE_SIZES, (list(CHECKPOINT_TABLES),)).fetchall()
+        return {name: {"rows_estimate": rows_estimate, "total_bytes": total_bytes} for name, rows_estimate, total_bytes in rows}
+
+    def start(self, interval: float = CHECKPOINT_PRUNE_INTERVAL) -> bool:
+        """启动后台清理线程（每 interval 秒检查一次是否可以运行），返回是否启动成功"""
+        if interval <= 0:
+            return False
+        if self._thread is not None and self._thread.is_alive():
+            return True
+
+        self._stop.clear()
+
+        def _run():
+            while not self._stop.wait(interval):
+                if not self.can_run():
+                    continue
+                try:
+                    self.run_pass(respect_schedule=True)
+                except Exception as e:
+                    logger.warning(f"Checkpoint prune failed: {e}")
+
+        self._thread = threading.Thread(target=_run, name="checkpoint-pruner", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止后台清理线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self.checkpoints_deleted + self.writes_deleted + self.blobs_deleted
+        return {
+            "passes": self.passes,
+            "batches": self.batches,
+            "deferred": self.deferred,
+            "in_progress": self._cursor is not None,
+            "threads_scanned": self.threads_scanned,
+            "threads_expired": self.threads_expired,
+            "threads_compacted": self.threads_compacted,
+            "checkpoints_deleted": self.checkpoints_deleted,
+            "writes_deleted": self.writes_deleted,
+            "blobs_deleted": self.blobs_deleted,
+            "prune_seconds": round(self.prune_seconds, 3),
+            "rows_per_second": round(rows / self.prune_seconds, 1) if self.prune_seconds else None,
+            "last_pass_at": self.last_pass_at,
+        }
+
+
+_pruner: Optional[CheckpointPruner] = None
+
+
+def start_checkpoint_pruner(is_busy: Optional[Callable[[], bool]] = None) -> Optional[CheckpointPruner]:
+    """检查点存放在 Postgres 时启动后台清理（在 get_memory_saver() 之后调用），否则返回None"""
+    global _pruner
+    if _pruner is not None:
+        return _pruner
+    from storage.memory.memory_saver import get_checkpoint_db_url
+
+    conninfo = get_checkpoint_db_url()
+    if not conninfo or CHECKPOINT_PRUNE_INTERVAL <= 0:
+        return None
+    _pruner = CheckpointPruner(conninfo, is_busy=is_busy)
+    _pruner.start()
+    logger.info(
+        f"Checkpoint pruner started: keep_last={CHECKPOINT_KEEP_LAST}, ttl_days={CHECKPOINT_TTL_DAYS}, "
+        f"window={CHECKPOINT_PRUNE_WINDOW or 'any'}"
+    )
+    return _pruner
+
+
+def get_checkpoint_pruner() -> Optional[CheckpointPruner]:
+    return _pruner
+
+
+def stop_checkpoint_pruner(timeout: Optional[float] = None) -> None:
+    global _pruner
+    if _pruner is not None:
+        _pruner.stop(timeout)
+        _pruner = None
@@ -0,0 +1,216 @@
+"""
+检查点序列化：msgpack + 可选 zstd 压缩，以及按通道的增量写入
+
+GlobalState / VisualGlobalState 每轮都会把 conversation_history、homework_list、learning_progress 等
+整段写回状态，即使内容与上一轮相同，saver 也会为每个被写入的通道保存一份新的 blob。
+
+- CheckpointSerializer：在 LangGraph 默认的 msgpack 编码之上，超过 CHECKPOINT_ZSTD_MIN_BYTES
+  的值用 zstd 压缩（类型记为 msgpack+zstd），读取时兼容已有的未压缩数据
+- ChannelDeltaTracker：记录每个会话上一次写入的各通道版本和编码摘要，写入新检查点时，
+  内容未变的通道不再保存新 blob，检查点中该通道的版本仍指向上一次的 blob
+
+增量只在同一进程内连续写入同一会话时生效（新检查点的父检查点就是上一次写入的检查点），
+因此被引用的旧 blob 一定还被父检查点引用着，不会被保留策略当成孤儿删除。
+
+沿用旧 blob 时检查点中的通道版本会退回上一次的版本，而节点是否触发取决于
+channel_versions 是否大于 versions_seen。因此触发节点的通道都不做增量：结构通道
+（__start__、branch:to:*、join:* 等），以及出现在任一节点 versions_seen 中的通道
+（直接订阅状态通道的 Pregel 节点），否则从检查点恢复时下游节点不会再被触发。
+中断检查记录的版本（versions_seen["__interrupt__"]）不计入，见 prepare()。
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import zstandard
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# zstd 压缩级别，0 表示不压缩
+CHECKPOINT_ZSTD_LEVEL = int(os.getenv("CHECKPOINT_ZSTD_LEVEL", "3"))
+# 编码后超过该字节数才压缩（小值压缩收益低于开销）
+CHECKPOINT_ZSTD_MIN_BYTES = int(os.getenv("CHECKPOINT_ZSTD_MIN_BYTES", "512"))
+# 是否只为内容变化的通道写入新 blob
+CHECKPOINT_DELTA = os.getenv("CHECKPOINT_DELTA", "1") != "0"
+# 增量跟踪最多记录的会话数（LRU）
+CHECKPOINT_DELTA_MAX_THREADS = int(os.getenv("CHECKPOINT_DELTA_MAX_THREADS", "10000"))
+
+ZSTD_TYPE = "msgpack+zstd"
+# LangGraph 记录中断检查所见版本用的 versions_seen 键
+INTERRUPT_SEEN_KEY = "__interrupt__"
+
+
+class CheckpointSerializer(SerializerProtocol):
+    """msgpack 编码 + 可选 zstd 压缩（编码交给 JsonPlusSerializer，支持 pydantic 模型等扩展类型）"""
+
+    def __init__(
+        self,
+        level: int = CHECKPOINT_ZSTD_LEVEL,
+        min_bytes: int = CHECKPOINT_ZSTD_MIN_BYTES,
+        base: Optional[SerializerProtocol] = None
+    ):
+        self.base = base or JsonPlusSerializer()
+        self.level = level
+        self.min_bytes = min_bytes
+        # ZstdCompressor / ZstdDecompressor 不能跨线程共享
+        self._local = threading.local()
+        # 已编码结果：id(obj) -> (obj, typed)，增量跟踪算摘要时编码过的值，saver 写入时直接复用
+        self._encoded: Dict[int, Tuple[Any, Tuple[str, bytes]]] = {}
+
+    def _compressor(self) -> zstandard.ZstdCompressor:
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+        return compressor
+
+    def _decompressor(self) -> zstandard.ZstdDecompressor:
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor
+
+    def encode(self, obj: Any) -> Tuple[str, bytes]:
+        """编码并暂存结果，紧接着的 dumps_typed(obj) 直接返回（需配合 forget 清理）"""
+        typed = self._dumps(obj)
+        self._encoded[id(obj)] = (obj, typed)
+        return typed
+
+    def forget(self, obj: Any) -> None:
+        self._encoded.pop(id(obj), None)
+
+    def _dumps(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.base.dumps_typed(obj)
+        if self.level > 0 and type_ == "msgpack" and len(data) >= self.min_bytes:
+            return ZSTD_TYPE, self._compressor().compress(data)
+        return type_, data
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        encoded = self._encoded.get(id(obj))
+        if encoded is not None and encoded[0] is obj:
+            return encoded[1]
+        return self._dumps(obj)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_ == ZSTD_TYPE:
+            return self.base.loads_typed(("msgpack", self._decompressor().decompress(payload)))
+        return self.base.loads_typed(data)
+
+
+def is_structural_channel(channel: str) -> bool:
+    """触发节点用的通道（__start__、branch:to:*、join:* 等），不做增量"""
+    return channel.startswith("__") or ":" in channel
+
+
+class ChannelDeltaTracker:
+    """记录每个会话上一次写入的检查点 ID 和各通道 (版本, 编码摘要)"""
+
+    def __init__(self, max_threads: int = CHECKPOINT_DELTA_MAX_THREADS):
+        self.max_threads = max_threads
+        self._threads: "OrderedDict[Tuple[str, str], Tuple[str, Dict[str, Tuple[Any, bytes]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.channels_written = 0
+        self.channels_skipped = 0
+
+    @staticmethod
+    def _digest(typed: Tuple[str, Any]) -> bytes:
+        type_, data = typed
+        return hashlib.blake2b(data or b"", digest_size=16, person=type_.encode()[:16]).digest()
+
+    def prepare(
+        self,
+        serde: SerializerProtocol,
+        config: Dict[str, Any],
+        checkpoint: Dict[str, Any],
+        new_versions: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Tuple[Any, bytes]]]:
+        """
+        计算增量：内容与上一次写入相同的通道从 new_versions 中去掉，检查点中的版本改回上一次的版本
+        （触发节点的通道除外，见模块说明）
+
+        Returns:
+            (检查点, new_versions, 写入成功后交给 commit() 的通道记录)
+        """
+        configurable = config["configurable"]
+        key = (str(configurable["thread_id"]), configurable.get("checkpoint_ns", ""))
+        with self._lock:
+            previous = self._threads.get(key)
+        # 只在父检查点就是上一次写入的检查点时做增量
+        known = previous[1] if previous is not None and previous[0] == configurable.get("checkpoint_id") else {}
+
+        values = checkpoint["channel_values"]
+        # 节点订阅的通道；__interrupt__ 记录全部通道，但中断检查只看是否有任一通道更新，
+        # 结构通道每步都会更新，不受增量影响
+        triggers = {
+            channel
+            for node, seen in checkpoint.get("versions_seen", {}).items() if node != INTERRUPT_SEEN_KEY
+            for channel in seen
+        }
+        channels = dict(known)
+        versions = dict(new_versions)
+        restored: Dict[str, Any] = {}
+        for channel, version in new_versions.items():
+            if is_structural_channel(channel) or channel in triggers or channel not in values:
+                channels.pop(channel, None)
+                continue
+            value = values[channel]
+            typed = serde.encode(value) if isinstance(serde, CheckpointSerializer) else serde.dumps_typed(value)
+            digest = self._digest(typed)
+            last = known.get(channel)
+            if last is not None and last[1] == digest:
+                del versions[channel]
+                restored[channel] = last[0]
+                self.channels_skipped += 1
+            else:
+                channels[channel] = (version, digest)
+                self.channels_written += 1
+
+        if restored:
+            checkpoint = {**checkpoint, "channel_versions": {**checkpoint["channel_versions"], **restored}}
+        return checkpoint, versions, channels
+
+    def commit(self, config: Dict[str, Any], checkpoint_id: str, channels: Dict[str, Tuple[Any, bytes]]) -> None:
+        """检查点写入成功后记录，作为该会话下一次写入的基准"""
+        configurable = config["configurable"]
+        key = (str(configurable["thread_id"]), configurable.get("checkpoint_ns", ""))
+        with self._lock:
+            self._threads[key] = (checkpoint_id, channels)
+            self._threads.move_to_end(key)
+            while len(self._threads) > self.max_threads:
+                self._threads.popitem(last=False)
+
+    def discard(self, config: Dict[str, Any]) -> None:
+        """写入失败或会话被删除时丢弃基准（下一次写入全部通道）"""
+        configurable = config["configurable"]
+        key = (str(configurable["thread_id"]), configurable.get("checkpoint_ns", ""))
+        with self._lock:
+            self._threads.pop(key, None)
+
+    def discard_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._threads if k[0] == str(thread_id)]:
+                del self._threads[key]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.channels_written + self.channels_skipped
+        return {
+            "threads": len(self._threads),
+            "channels_written": self.channels_written,
+            "channels_skipped": self.channels_skipped,
+            "skip_ratio": round(self.channels_skipped / total, 3) if total else None,
+        }
+
+
+_serializer: Optional[CheckpointSerializer] = None
+
+
+def get_checkpoint_serializer() -> CheckpointSerializer:
+    """saver 共用的序列化器"""
+    global _serializer
+    if _serializer is None:
+        _serializer = CheckpointSerializer()
+    return _serializer
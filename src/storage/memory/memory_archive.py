@@ -0,0 +1,191 @@
+"""
+MemoryStore 归档存储：过期作业和长期掌握的知识点从内存列表移出后保存在这里
+
+- 归档记录按 (孩子, 类型) 成批写入，一批为一行，msgpack 编码后用 zstd 压缩
+- 同时记录每个孩子每轮清理时的数据规模（条数和估算字节数），用于观察增长趋势；
+  超过保留期（MEMORY_SIZE_HISTORY_DAYS，见 graphs/memory_sweeper.py）的采样在每轮清理结束时删除
+
+与冷数据层不同，归档是持久数据，重启后保留：文件默认放在持久化目录下，未启用持久化时需通过
+MEMORY_ARCHIVE_PATH 指定，且不能位于临时目录（见 is_durable_archive_path），否则不启动过期清理。
+启用 Postgres 后端时，共享表中的记录只标记 archived_at、不删除，本地归档文件丢失也不会丢数据。
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import ormsgpack
+import zstandard
+
+from storage.memory.memory_persistence import MEMORY_PERSIST_DIR, msgpack_default
+
+logger = logging.getLogger(__name__)
+
+# 归档文件路径：默认放在持久化目录下，未启用持久化时为空（不启动过期清理）
+MEMORY_ARCHIVE_PATH = os.getenv(
+    "MEMORY_ARCHIVE_PATH",
+    os.path.join(MEMORY_PERSIST_DIR, "memory_archive.sqlite3") if MEMORY_PERSIST_DIR else ""
+)
+# zstd 压缩级别
+MEMORY_ARCHIVE_ZSTD_LEVEL = int(os.getenv("MEMORY_ARCHIVE_ZSTD_LEVEL", "3"))
+
+ARCHIVE_KINDS = ("homework", "knowledge")
+
+
+def is_durable_archive_path(path: str) -> bool:
+    """归档路径是否持久：非空，且不在临时目录下（临时目录可能在重启或清理时被删除）"""
+    if not path:
+        return False
+    real_path = os.path.realpath(path)
+    temp_dir = os.path.realpath(tempfile.gettempdir())
+    return os.path.commonpath([real_path, temp_dir]) != temp_dir
+
+
+class SQLiteArchiveStore:
+    """基于 SQLite 的压缩归档"""
+
+    def __init__(self, path: str = MEMORY_ARCHIVE_PATH, level: int = MEMORY_ARCHIVE_ZSTD_LEVEL):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+        # 连接在多个线程间共享，由 _lock 串行化
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS archived_batches ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " child_id TEXT NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " archived_at INTEGER NOT NULL,"
+                " count INTEGER NOT NULL,"
+                " raw_bytes INTEGER NOT NULL,"
+                " data BLOB NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_archived_batches_child ON archived_batches (child_id, kind)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS child_sizes ("
+                " child_id TEXT NOT NULL,"
+                " sampled_at INTEGER NOT NULL,"
+                " homework INTEGER NOT NULL,"
+                " knowledge INTEGER NOT NULL,"
+                " conversations INTEGER NOT NULL,"
+                " bytes INTEGER NOT NULL,"
+                " PRIMARY KEY (child_id, sampled_at))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_child_sizes_sampled_at ON child_sizes (sampled_at)"
+            )
+
+        # 统计信息
+        self.items_archived = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+    def archive(self, child_id: str, kind: str, items: List[Dict[str, Any]], archived_at: Optional[int] = None) -> int:
+        """归档一批记录（字典），写入完成后返回，调用方随后才从内存中删除"""
+        if kind not in ARCHIVE_KINDS:
+            raise ValueError(f"Unknown archive kind: {kind}")
+        if not items:
+            return 0
+        raw = ormsgpack.packb(items, default=msgpack_default)
+        data = self._compressor.compress(raw)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO archived_batches (child_id, kind, archived_at, count, raw_bytes, data)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (child_id, kind, archived_at or int(time.time()), len(items), len(raw), data)
+            )
+            self.items_archived += len(items)
+            self.raw_bytes += len(raw)
+            self.compressed_bytes += len(data)
+        return len(items)
+
+    def get_archived(self, child_id: str, kind: str) -> List[Dict[str, Any]]:
+        """读取孩子的归档记录（按归档顺序；同一ID被重复归档时保留最后一次）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM archived_batches WHERE child_id = ? AND kind = ? ORDER BY id",
+                (child_id, kind)
+            ).fetchall()
+        items: Dict[Any, Dict[str, Any]] = {}
+        for (data,) in rows:
+            for item in ormsgpack.unpackb(self._decompressor.decompress(data)):
+                items.pop(item.get("id"), None)
+                items[item.get("id")] = item
+        return list(items.values())
+
+    def delete_child(self, child_id: str) -> None:
+        """删除孩子的归档和规模记录（清空孩子数据时调用）"""
+        with self._lock:
+            self._conn.execute("DELETE FROM archived_batches WHERE child_id = ?", (child_id,))
+            self._conn.execute("DELETE FROM child_sizes WHERE child_id = ?", (child_id,))
+
+    # ============== 数据规模 ==============
+
+    def record_sizes(self, samples: Iterable[Tuple[str, int, int, int, int, int]]) -> int:
+        """写入一批规模采样 (child_id, sampled_at, homework, knowledge, conversations, bytes)"""
+        samples = list(samples)
+        if not samples:
+            return 0
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO child_sizes VALUES (?, ?, ?, ?, ?, ?)", samples)
+        return len(samples)
+
+    def prune_sizes(self, before: int) -> int:
+        """删除 before（epoch 秒）之前的规模采样，返回删除的条数"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM child_sizes WHERE sampled_at < ?", (before,))
+        return cursor.rowcount
+
+    def size_history(self, child_id: str, since: Optional[int] = None) -> List[Dict[str, int]]:
+        """孩子的数据规模随时间的变化"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT sampled_at, homework, knowledge, conversations, bytes FROM child_sizes"
+                " WHERE child_id = ? AND sampled_at >= ? ORDER BY sampled_at",
+                (child_id, since or 0)
+            ).fetchall()
+        return [
+            {"sampled_at": row[0], "homework": row[1], "knowledge": row[2], "conversations": row[3], "bytes": row[4]}
+            for row in rows
+        ]
+
+    def size_report(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """每个孩子最近一次采样的数据规模，按字节数从大到小排列"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT s.child_id, s.sampled_at, s.homework, s.knowledge, s.conversations, s.bytes"
+                " FROM child_sizes s JOIN ("
+                "  SELECT child_id, MAX(sampled_at) AS sampled_at FROM child_sizes GROUP BY child_id"
+                " ) latest ON s.child_id = latest.child_id AND s.sampled_at = latest.sampled_at"
+                " ORDER BY s.bytes DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {"child_id": row[0], "sampled_at": row[1], "homework": row[2], "knowledge": row[3],
+             "conversations": row[4], "bytes": row[5]}
+            for row in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items_archived": self.items_archived,
+            "raw_bytes": self.raw_bytes,
+            "compressed_bytes": self.compressed_bytes,
+            "compression_ratio": round(self.raw_bytes / self.compressed_bytes, 2) if self.compressed_bytes else None,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
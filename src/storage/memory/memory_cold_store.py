@@ -0,0 +1,157 @@
+"""
+MemoryStore 冷数据层：把长期不活跃的孩子溢出到本地 SQLite，访问时再加载回内存
+
+冷存储只是本进程的溢出层，不承担持久化职责（持久化由 WAL/快照或 Postgres 后端负责），
+因此每次打开时都会清空。打开前对 "<path>.lock" 加排他 flock，同一路径已被其他进程
+（例如多个 uvicorn worker 共用一个 MEMORY_COLD_STORE_PATH）使用时直接报错，不会清空对方的数据。
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import ormsgpack
+
+try:
+    import fcntl
+except ImportError:  # Windows：不加文件锁
+    fcntl = None
+
+from storage.memory.memory_persistence import msgpack_default
+
+logger = logging.getLogger(__name__)
+
+# 冷存储文件路径，默认放在临时目录下（按进程区分）；指定路径时每个进程需使用不同的文件
+MEMORY_COLD_STORE_PATH = os.getenv(
+    "MEMORY_COLD_STORE_PATH",
+    os.path.join(tempfile.gettempdir(), f"memory_cold_{os.getpid()}.sqlite3")
+)
+
+
+class SQLiteColdStore:
+    """基于 SQLite 的冷数据存储，孩子数据以 msgpack 编码保存"""
+
+    def __init__(self, path: str = MEMORY_COLD_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock_file = self._acquire_file_lock(path)
+        self._closed = False
+        # 连接在多个线程间共享，由 _lock 串行化
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # 冷数据可随时重建，不需要 fsync
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute("DROP TABLE IF EXISTS cold_children")
+            self._conn.execute(
+                "CREATE TABLE cold_children ("
+                " child_id TEXT PRIMARY KEY,"
+                " shard INTEGER NOT NULL,"
+                " data BLOB NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX ix_cold_children_shard ON cold_children (shard)")
+
+        # 统计信息
+        self.spilled = 0
+        self.loaded = 0
+
+    @staticmethod
+    def _acquire_file_lock(path: str):
+        """对 <path>.lock 加排他锁，已被其他进程持有时抛出 RuntimeError"""
+        if fcntl is None:
+            return None
+        lock_file = open(path + ".lock", "a")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(
+                f"Cold store {path} is in use by another process; "
+                f"give each worker its own MEMORY_COLD_STORE_PATH"
+            )
+        return lock_file
+
+    def put_many(self, shard_index: int, children: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """写入一批孩子数据，返回写入数量"""
+        rows = [
+            (child_id, shard_index, ormsgpack.packb(child_data, default=msgpack_default))
+            for child_id, child_data in children
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cold_children (child_id, shard, data) VALUES (?, ?, ?)", rows
+            )
+            self.spilled += len(rows)
+        return len(rows)
+
+    def pop(self, child_id: str) -> Optional[Dict[str, Any]]:
+        """取出孩子数据（从冷存储中删除），不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "DELETE FROM cold_children WHERE child_id = ? RETURNING data", (child_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.loaded += 1
+        return ormsgpack.unpackb(row[0])
+
+    def get(self, child_id: str) -> Optional[Dict[str, Any]]:
+        """读取孩子数据（不删除），不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM cold_children WHERE child_id = ?", (child_id,)
+            ).fetchone()
+        return ormsgpack.unpackb(row[0]) if row is not None else None
+
+    def __contains__(self, child_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM cold_children WHERE child_id = ?", (child_id,)
+            ).fetchone() is not None
+
+    def child_ids(self, shard_index: int) -> List[str]:
+        """某个分片中的孩子ID"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT child_id FROM cold_children WHERE shard = ?", (shard_index,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, child_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cold_children WHERE child_id = ?", (child_id,))
+
+    def load_shard(self, shard_index: int) -> Dict[str, Dict[str, Any]]:
+        """读取某个分片的全部冷数据（不删除），用于生成快照"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT child_id, data FROM cold_children WHERE shard = ?", (shard_index,)
+            ).fetchall()
+        return {child_id: ormsgpack.unpackb(data) for child_id, data in rows}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cold_children").fetchone()[0]
+
+    def close(self, remove_file: bool = True) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._conn.close()
+        # 先删除文件再释放文件锁，之后打开同一路径的进程不会被误删
+        if remove_file:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(self.path + suffix)
+                except OSError:
+                    pass
+        if self._lock_file is not None:
+            self._lock_file.close()
@@ -0,0 +1,488 @@
+"""
+MemoryStore 持久化：预写日志（WAL）+ 周期快照
+
+- WAL：追加写入的 msgpack 变更记录，按批次合并 fsync（group commit）
+- 快照：按分片写出的全量数据，写完后删除已被覆盖的旧 WAL 段
+- 恢复：加载最新快照，再重放快照之后的 WAL 尾部
+
+文件布局（均位于持久化目录下）：
+    wal-<起始LSN>.log        WAL 段文件
+    snapshot-<LSN>.msgpack   快照文件
+
+记录帧格式：<长度:u32><crc32:u32><lsn:u64><msgpack 负载>
+"""
+import os
+import struct
+import threading
+import time
+import zlib
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import ormsgpack
+
+logger = logging.getLogger(__name__)
+
+# 持久化目录，为空时不启用持久化
+MEMORY_PERSIST_DIR = os.getenv("MEMORY_PERSIST_DIR", "")
+# fsync 策略：always（写入方等待落盘）/ batch（后台批量落盘）/ off（不调用 fsync）
+MEMORY_WAL_SYNC_MODE = os.getenv("MEMORY_WAL_SYNC_MODE", "batch").lower()
+# 批量落盘间隔（毫秒）和缓冲区阈值（字节），任一满足即触发写盘
+MEMORY_WAL_FLUSH_INTERVAL_MS = int(os.getenv("MEMORY_WAL_FLUSH_INTERVAL_MS", "20"))
+MEMORY_WAL_FLUSH_BYTES = int(os.getenv("MEMORY_WAL_FLUSH_BYTES", str(256 * 1024)))
+# 快照间隔（秒），0 表示不自动快照
+MEMORY_SNAPSHOT_INTERVAL = float(os.getenv("MEMORY_SNAPSHOT_INTERVAL", "300"))
+
+SYNC_MODES = ("always", "batch", "off")
+
+_FRAME_HEADER = struct.Struct("<IIQ")
+_SNAPSHOT_MAGIC = b"MSNP1\n"
+_WAL_PREFIX = "wal-"
+_WAL_SUFFIX = ".log"
+_SNAPSHOT_PREFIX = "snapshot-"
+_SNAPSHOT_SUFFIX = ".msgpack"
+
+
+def stable_shard_index(child_id: str, num_shards: int) -> int:
+    """跨进程稳定的分片索引（内置 hash() 每个进程随机化，不能用于持久化）"""
+    return zlib.crc32(child_id.encode("utf-8")) % num_shards
+
+
+def msgpack_default(obj: Any) -> Any:
+    """msgpack 编码回退：带 to_dict() 的记录对象转为字典，其他类型转为字符串"""
+    to_dict = getattr(obj, "to_dict", None)
+    if to_dict is not None:
+        return to_dict()
+    return str(obj)
+
+
+def _encode_frame(lsn: int, payload: bytes) -> bytes:
+    return _FRAME_HEADER.pack(len(payload), zlib.crc32(payload), lsn) + payload
+
+
+def _read_frames(path: str) -> Iterator[Tuple[int, bytes]]:
+    """逐帧读取文件，遇到截断或校验失败的帧即停止（崩溃时的残缺尾部）"""
+    with open(path, "rb") as f:
+        if path.endswith(_SNAPSHOT_SUFFIX):
+            if f.read(len(_SNAPSHOT_MAGIC)) != _SNAPSHOT_MAGIC:
+                raise ValueError(f"Invalid snapshot file: {path}")
+        while True:
+            header = f.read(_FRAME_HEADER.size)
+            if len(header) < _FRAME_HEADER.size:
+                return
+            length, crc, lsn = _FRAME_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                logger.warning(f"Truncated or corrupt frame in {path} after lsn {lsn - 1}, ignoring tail")
+                return
+            yield lsn, payload
+
+
+def _fsync_dir(directory: str) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """
+    追加写入的 WAL，支持 group commit
+
+    写入方只在内存中编码并入队，由后台线程按时间间隔或缓冲区大小批量写盘、
+    合并 fsync。sync_mode=always 时写入方在释放自己的锁之后调用 wait_durable 等待记录落盘，
+    append 本身不等待（调用方通常持有分片锁）。
+
+    写盘或 fsync 失败（ENOSPC、EIO 等）时，段文件截断回写入前的长度，批次放回缓冲区头部，
+    由后台线程重试；只有写入并 fsync 成功后才推进已落盘的 LSN。失败期间 wait_durable
+    对尚未落盘的 LSN 抛出异常，而不是一直等待或返回成功。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        start_lsn: int = 0,
+        sync_mode: str = MEMORY_WAL_SYNC_MODE,
+        flush_interval_ms: int = MEMORY_WAL_FLUSH_INTERVAL_MS,
+        flush_bytes: int = MEMORY_WAL_FLUSH_BYTES
+    ):
+        if sync_mode not in SYNC_MODES:
+            raise ValueError(f"Unknown WAL sync mode: {sync_mode}, expected one of {SYNC_MODES}")
+        self.directory = directory
+        self.sync_mode = sync_mode
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_bytes = flush_bytes
+
+        self._lsn = start_lsn
+        self._durable_lsn = start_lsn
+        self._buffer: List[bytes] = []
+        self._buffered_bytes = 0
+        self._closed = False
+        # 最近一次写盘失败的异常及该批次的最大 LSN，写盘成功后清除
+        self._error: Optional[BaseException] = None
+        self._failed_lsn = 0
+
+        # _lock 保护 LSN 分配和缓冲区；_file_lock 保证批次按入队顺序写入当前段
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._durable = threading.Condition(threading.Lock())
+        self._file_lock = threading.Lock()
+
+        # 统计信息
+        self.records_written = 0
+        self.bytes_written = 0
+        self.fsync_count = 0
+        self.write_errors = 0
+
+        self._file = self._open_segment(start_lsn + 1)
+        self._flusher = threading.Thread(target=self._flush_loop, name="memory-wal-flusher", daemon=True)
+        self._flusher.start()
+
+    def _open_segment(self, first_lsn: int):
+        path = os.path.join(self.directory, f"{_WAL_PREFIX}{first_lsn:020d}{_WAL_SUFFIX}")
+        # 不使用用户态缓冲：写入失败时缓冲区中不残留半个批次
+        f = open(path, "ab", buffering=0)
+        _fsync_dir(self.directory)
+        return f
+
+    @property
+    def last_lsn(self) -> int:
+        """最后分配的 LSN"""
+        return self._lsn
+
+    def append(self, op: str, child_id: str, data: Any) -> int:
+        """追加一条变更记录（不等待落盘），返回其 LSN"""
+        payload = ormsgpack.packb((op, child_id, data), default=msgpack_default)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("WAL is closed")
+            self._lsn += 1
+            lsn = self._lsn
+            frame = _encode_frame(lsn, payload)
+            self._buffer.append(frame)
+            self._buffered_bytes += len(frame)
+            if self._buffered_bytes >= self.flush_bytes or self.sync_mode == "always":
+                self._wakeup.notify()
+        return lsn
+
+    def wait_durable(self, lsn: int, timeout: Optional[float] = None) -> bool:
+        """
+        等待指定 LSN 落盘
+
+        Returns:
+            是否已落盘（超时返回False）
+
+        Raises:
+            OSError: 写盘失败，该 LSN 尚未落盘（后台线程会继续重试）
+        """
+        with self._durable:
+            def failed() -> bool:
+                # 只有包含该 LSN 的批次写盘失败才报错，之后追加的记录等待下一次重试
+                return self._error is not None and self._failed_lsn >= lsn
+
+            self._durable.wait_for(lambda: self._durable_lsn >= lsn or failed(), timeout=timeout)
+            if self._durable_lsn >= lsn:
+                return True
+            if failed():
+                raise OSError(f"Memory WAL write failed, lsn {lsn} is not durable: {self._error}") from self._error
+            return False
+
+    def _write_pending(self, rotate: bool = False) -> int:
+        """
+        写出缓冲区中的记录（调用方需持有 _file_lock）
+
+        Returns:
+            已写出的最大 LSN；rotate=True 时返回新段的起始 LSN
+        """
+        with self._lock:
+            batch = self._buffer
+            high_lsn = self._lsn
+            self._buffer = []
+            self._buffered_bytes = 0
+
+        if batch:
+            data = b"".join(batch)
+            offset = self._file.tell()
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[self._file.write(view):]
+                if self.sync_mode != "off":
+                    os.fsync(self._file.fileno())
+                    self.fsync_count += 1
+            except BaseException as e:
+                self._write_failed(batch, len(data), offset, high_lsn, e)
+                raise
+            self.records_written += len(batch)
+            self.bytes_written += len(data)
+
+        with self._durable:
+            self._durable_lsn = high_lsn
+            self._error = None
+            self._durable.notify_all()
+
+        if rotate:
+            self._file.close()
+            self._file = self._open_segment(high_lsn + 1)
+            return high_lsn + 1
+        return high_lsn
+
+    def _write_failed(self, batch: List[bytes], size: int, offset: int, high_lsn: int, error: BaseException) -> None:
+        """写盘失败：截断已写出的部分，批次放回缓冲区头部等待重试，并通知等待落盘的写入方"""
+        self.write_errors += 1
+        try:
+            os.ftruncate(self._file.fileno(), offset)
+            self._file.seek(offset)
+        except OSError as e:
+            logger.error(f"Failed to truncate memory WAL after a failed write: {e}")
+        with self._lock:
+            self._buffer[:0] = batch
+            self._buffered_bytes += size
+        with self._durable:
+            self._error = error
+            self._failed_lsn = high_lsn
+            self._durable.notify_all()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._lock:
+                urgent = self._buffered_bytes >= self.flush_bytes or (self.sync_mode == "always" and self._buffer)
+                if not self._closed and not urgent:
+                    self._wakeup.wait(self.flush_interval)
+                if self._closed:
+                    # 最后一批由 close() 写出
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush memory WAL: {e}")
+                time.sleep(self.flush_interval)
+
+    def flush(self) -> None:
+        """立即写出并落盘所有已追加的记录"""
+        with self._file_lock:
+            if not self._file.closed:
+                self._write_pending()
+
+    def rotate(self) -> int:
+        """
+        切换到新的 WAL 段
+
+        Returns:
+            新段的起始 LSN（此前的记录都位于旧段中）
+        """
+        with self._file_lock:
+            return self._write_pending(rotate=True)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+        self._flusher.join()
+        with self._file_lock:
+            if not self._file.closed:
+                try:
+                    self._write_pending()
+                finally:
+                    self._file.close()
+
+
+class MemoryPersistence:
+    """WAL + 快照的组合：负责恢复、记录变更和生成快照"""
+
+    def __init__(
+        self,
+        directory: str,
+        sync_mode: str = MEMORY_WAL_SYNC_MODE,
+        flush_interval_ms: int = MEMORY_WAL_FLUSH_INTERVAL_MS,
+        flush_bytes: int = MEMORY_WAL_FLUSH_BYTES
+    ):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._wal_kwargs = dict(sync_mode=sync_mode, flush_interval_ms=flush_interval_ms, flush_bytes=flush_bytes)
+        self.wal: Optional[WriteAheadLog] = None
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._snapshot_stop = threading.Event()
+
+    # ============== 文件枚举 ==============
+
+    def _list(self, prefix: str, suffix: str) -> List[Tuple[int, str]]:
+        files = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(suffix):
+                try:
+                    lsn = int(name[len(prefix):-len(suffix)])
+                except ValueError:
+                    continue
+                files.append((lsn, os.path.join(self.directory, name)))
+        files.sort()
+        return files
+
+    def _wal_segments(self) -> List[Tuple[int, str]]:
+        return self._list(_WAL_PREFIX, _WAL_SUFFIX)
+
+    def _snapshots(self) -> List[Tuple[int, str]]:
+        return self._list(_SNAPSHOT_PREFIX, _SNAPSHOT_SUFFIX)
+
+    # ============== 恢复 ==============
+
+    def restore(
+        self,
+        load_child: Callable[[str, Dict[str, Any]], None],
+        apply_record: Callable[[str, str, Any], None]
+    ) -> Dict[str, Any]:
+        """
+        从快照和 WAL 恢复数据，完成后打开新的 WAL 段用于写入
+
+        Args:
+            load_child: 加载快照中单个孩子数据的回调 (child_id, child_data)
+            apply_record: 重放单条 WAL 记录的回调 (op, child_id, data)
+
+        Returns:
+            恢复统计信息
+        """
+        start = time.perf_counter()
+        stats = {"children": 0, "replayed": 0, "skipped": 0, "snapshot_lsn": 0}
+        shard_lsns: List[int] = []
+        snapshot_shards = 0
+        max_lsn = 0
+
+        snapshots = self._snapshots()
+        if snapshots:
+            snapshot_lsn, path = snapshots[-1]
+            try:
+                frames = _read_frames(path)
+                _, header = next(frames)
+                meta = ormsgpack.unpackb(header)
+                snapshot_shards = meta["num_shards"]
+                shard_lsns = [0] * snapshot_shards
+                for _, payload in frames:
+                    shard_index, shard_lsn, shard_blob = ormsgpack.unpackb(payload)
+                    shard_lsns[shard_index] = shard_lsn
+                    for child_id, child_data in ormsgpack.unpackb(shard_blob).items():
+                        load_child(child_id, child_data)
+                        stats["children"] += 1
+                stats["snapshot_lsn"] = snapshot_lsn
+                max_lsn = max(shard_lsns) if shard_lsns else snapshot_lsn
+            except Exception as e:
+                logger.error(f"Failed to load memory snapshot {path}: {e}")
+                shard_lsns = []
+                snapshot_shards = 0
+
+        for _, path in self._wal_segments():
+            for lsn, payload in _read_frames(path):
+                max_lsn = max(max_lsn, lsn)
+                op, child_id, data = ormsgpack.unpackb(payload)
+                if snapshot_shards and lsn <= shard_lsns[stable_shard_index(child_id, snapshot_shards)]:
+                    stats["skipped"] += 1
+                    continue
+                apply_record(op, child_id, data)
+                stats["replayed"] += 1
+
+        self.wal = WriteAheadLog(self.directory, start_lsn=max_lsn, **self._wal_kwargs)
+        stats["last_lsn"] = max_lsn
+        stats["seconds"] = time.perf_counter() - start
+        logger.info(f"MemoryStore restored from {self.directory}: {stats}")
+        return stats
+
+    # ============== 写入 ==============
+
+    @staticmethod
+    def pack_shard(shard: Dict[str, Any]) -> bytes:
+        """编码单个分片（需在分片锁内调用，编码结果即该时刻的一致副本）"""
+        return ormsgpack.packb(shard, default=msgpack_default)
+
+    def append(self, op: str, child_id: str, data: Any) -> int:
+        return self.wal.append(op, child_id, data)
+
+    def wait_durable(self, lsn: int) -> None:
+        """sync_mode=always 时等待 append 返回的 LSN 落盘，其他模式直接返回；写盘失败时抛出 OSError"""
+        wal = self.wal
+        if wal is not None and wal.sync_mode == "always":
+            wal.wait_durable(lsn)
+
+    def write_snapshot(
+        self,
+        num_shards: int,
+        dump_shard: Callable[[int], Tuple[int, bytes]]
+    ) -> Dict[str, Any]:
+        """
+        写出快照并清理已被覆盖的 WAL 段和旧快照
+
+        Args:
+            num_shards: 分片数量
+            dump_shard: 在分片锁内返回 (当前 WAL LSN, pack_shard 编码结果) 的回调；
+                分片需以 stable_shard_index 划分
+
+        Returns:
+            快照统计信息
+        """
+        with self._snapshot_lock:
+            start = time.perf_counter()
+            # 先切换 WAL 段：旧段中的记录 LSN 都小于任何分片的快照 LSN
+            new_segment_lsn = self.wal.rotate()
+            snapshot_lsn = self.wal.last_lsn
+
+            final_path = os.path.join(self.directory, f"{_SNAPSHOT_PREFIX}{snapshot_lsn:020d}{_SNAPSHOT_SUFFIX}")
+            tmp_path = final_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(_SNAPSHOT_MAGIC)
+                header = ormsgpack.packb({"num_shards": num_shards, "created_at": time.time()})
+                f.write(_encode_frame(snapshot_lsn, header))
+                for shard_index in range(num_shards):
+                    shard_lsn, shard_blob = dump_shard(shard_index)
+                    f.write(_encode_frame(shard_lsn, ormsgpack.packb((shard_index, shard_lsn, shard_blob))))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, final_path)
+            _fsync_dir(self.directory)
+
+            # 删除旧快照和已被快照覆盖的 WAL 段
+            for lsn, path in self._snapshots():
+                if path != final_path:
+                    os.remove(path)
+            for lsn, path in self._wal_segments():
+                if lsn < new_segment_lsn:
+                    os.remove(path)
+
+            stats = {
+                "snapshot_lsn": snapshot_lsn,
+                "bytes": os.path.getsize(final_path),
+                "seconds": time.perf_counter() - start,
+            }
+            logger.info(f"MemoryStore snapshot written: {stats}")
+            return stats
+
+    def start_snapshot_thread(self, take_snapshot: Callable[[], Any], interval: float = MEMORY_SNAPSHOT_INTERVAL) -> bool:
+        """启动周期快照线程"""
+        if interval <= 0:
+            return False
+        self._snapshot_stop.clear()
+
+        def _run():
+            while not self._snapshot_stop.wait(interval):
+                try:
+                    take_snapshot()
+                except Exception as e:
+                    logger.error(f"Failed to write memory snapshot: {e}")
+
+        self._snapshot_thread = threading.Thread(target=_run, name="memory-snapshot", daemon=True)
+        self._snapshot_thread.start()
+        return True
+
+    def close(self) -> None:
+        self._snapshot_stop.set()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+            self._snapshot_thread = None
+        if self.wal is not None:
+            self.wal.close()
@@ -0,0 +1,486 @@
+"""
+MemoryStore 的 Postgres 后端：读穿透 + 批量回写（write-behind）
+
+- 读：MemoryStore 的分片字典即每个孩子的缓存，首次访问某个孩子时从 Postgres 加载
+- 写：MemoryStore 每次变更都通过 record() 入队，按实体合并后由后台线程批量写入
+  （作业/知识点/档案按主键 upsert，对话历史批量插入后按孩子裁剪）
+- 归档：过期清理归档的作业/知识点只设置 archived_at，行保留在共享表中（本地归档文件之外的持久副本），
+  读穿透时跳过；再次 upsert 同一主键时清除标记
+- 失败：写入失败的批次放回队列并退避重试，重试超过 MEMORY_PG_MAX_RETRIES 次、
+  或放回后待写条目超过 MEMORY_PG_MAX_PENDING 时丢弃该批次并计入 dropped_rows
+- 表结构见 storage/database/shared/model.py
+"""
+import os
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import orjson
+from sqlalchemy import delete, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Engine
+
+from storage.database.shared.model import (
+    Base,
+    ChildConversation,
+    ChildHomework,
+    ChildKnowledgePoint,
+    ChildMemory,
+)
+
+logger = logging.getLogger(__name__)
+
+# 批量回写间隔（毫秒）和批次阈值（待写条目数），任一满足即触发写入
+MEMORY_PG_FLUSH_INTERVAL_MS = int(os.getenv("MEMORY_PG_FLUSH_INTERVAL_MS", "200"))
+MEMORY_PG_BATCH_SIZE = int(os.getenv("MEMORY_PG_BATCH_SIZE", "500"))
+# 待写条目上限和单个批次的最大重试次数（数据库长时间不可用时限制内存占用）
+MEMORY_PG_MAX_PENDING = int(os.getenv("MEMORY_PG_MAX_PENDING", "100000"))
+MEMORY_PG_MAX_RETRIES = int(os.getenv("MEMORY_PG_MAX_RETRIES", "10"))
+# 连续失败时的最大退避间隔（秒）
+MEMORY_PG_MAX_BACKOFF = 30.0
+# 每个孩子保留的对话条数（与 MemoryStore 内存中的上限一致）
+MEMORY_PG_HISTORY_LIMIT = 100
+
+_TABLES = [ChildMemory.__table__, ChildHomework.__table__, ChildKnowledgePoint.__table__, ChildConversation.__table__]
+# 单条 INSERT 语句的最大行数
+_CHUNK_ROWS = 1000
+
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _as_dict(item: Any) -> Dict[str, Any]:
+    """复制一条作业/知识点（MemoryStore 内部为记录对象，提供 to_dict()）"""
+    to_dict = getattr(item, "to_dict", None)
+    return to_dict() if to_dict is not None else dict(item)
+
+
+def _jsonable(value: Any) -> Any:
+    """转换为可 JSON 序列化的结构（非常规类型转为字符串）"""
+    return orjson.loads(orjson.dumps(value, default=str))
+
+
+class _PendingBatch:
+    """一批待写入的变更，同一实体的多次变更只保留最新值"""
+    __slots__ = (
+        "deletes", "profiles", "homework", "knowledge", "history", "homework_archives", "knowledge_archives", "attempts"
+    )
+
+    def __init__(self):
+        self.deletes: Set[str] = set()
+        self.profiles: Dict[str, Dict[str, Any]] = {}
+        self.homework: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.knowledge: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.history: List[Tuple[str, Dict[str, Any]]] = []
+        # 已归档（从内存移除）的作业和知识点，写入时只标记 archived_at
+        self.homework_archives: Set[Tuple[str, str]] = set()
+        self.knowledge_archives: Set[Tuple[str, str]] = set()
+        # 已失败的写入次数
+        self.attempts = 0
+
+    def __len__(self) -> int:
+        return (
+            len(self.deletes) + len(self.profiles) + len(self.homework) + len(self.knowledge) + len(self.history)
+            + len(self.homework_archives) + len(self.knowledge_archives)
+        )
+
+    def discard_child(self, child_id: str) -> None:
+        """丢弃某个孩子所有待写入的变更"""
+        self.profiles.pop(child_id, None)
+        self.homework = {k: v for k, v in self.homework.items() if k[0] != child_id}
+        self.knowledge = {k: v for k, v in self.knowledge.items() if k[0] != child_id}
+        self.history = [h for h in self.history if h[0] != child_id]
+        self.homework_archives = {k for k in self.homework_archives if k[0] != child_id}
+        self.knowledge_archives = {k for k in self.knowledge_archives if k[0] != child_id}
+
+
+class PostgresMemoryBackend:
+    """MemoryStore 的 Postgres 读穿透 / 批量回写后端"""
+
+    def __init__(
+        self,
+        engine: Engine,
+        flush_interval_ms: int = MEMORY_PG_FLUSH_INTERVAL_MS,
+        batch_size: int = MEMORY_PG_BATCH_SIZE,
+        max_pending: int = MEMORY_PG_MAX_PENDING,
+        max_retries: int = MEMORY_PG_MAX_RETRIES
+    ):
+        self.engine = engine
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+
+        self._pending = _PendingBatch()
+        # _lock 保护待写队列和批次序号；_flush_lock 保证批次按顺序提交
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        # 批次序号：_batch_seq 为最后取出的批次，_done_seq 为最后结束（提交或放回队列）的批次，
+        # 读穿透只等待开始读取时正在写入的批次
+        self._batch_seq = 0
+        self._done_seq = 0
+        self._batch_done = threading.Condition(self._lock)
+        self._closed = False
+
+        # 统计信息
+        self.batches_written = 0
+        self.rows_written = 0
+        self.children_loaded = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.dropped_batches = 0
+        self.dropped_rows = 0
+        self.backpressure = 0
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="memory-pg-flusher", daemon=True)
+        self._flusher.start()
+
+    def create_tables(self) -> None:
+        """创建表和索引（已存在时跳过，并补上旧表缺少的 archived_at 列）"""
+        Base.metadata.create_all(self.engine, tables=_TABLES)
+        with self.engine.begin() as conn:
+            for model in (ChildHomework, ChildKnowledgePoint):
+                conn.execute(text(f"ALTER TABLE {model.__tablename__} ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP"))
+
+    # ============== 读穿透 ==============
+
+    def load_child(self, child_id: str) -> Optional[Dict[str, Any]]:
+        """
+        从 Postgres 加载孩子的数据
+
+        Returns:
+            与 MemoryStore 内存结构一致的字典；数据库中没有该孩子时返回None
+        """
+        # 只等待开始读取时正在写入的批次（提交或失败放回队列），避免读到清除前的旧数据
+        with self._lock:
+            seq = self._batch_seq
+            self._batch_done.wait_for(lambda: self._done_seq >= seq)
+            if child_id in self._pending.deletes:
+                return None
+
+        # 四个查询在同一个快照中读取，不受并发提交的批次影响
+        with self.engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn:
+            with conn.begin():
+                profile = conn.execute(
+                    select(ChildMemory).where(ChildMemory.child_id == child_id)
+                ).first()
+                homework = conn.execute(
+                    select(ChildHomework.data)
+                    .where(ChildHomework.child_id == child_id, ChildHomework.archived_at.is_(None))
+                    .order_by(ChildHomework.created_at, ChildHomework.id)
+                ).scalars().all()
+                knowledge = conn.execute(
+                    select(ChildKnowledgePoint.data)
+                    .where(ChildKnowledgePoint.child_id == child_id, ChildKnowledgePoint.archived_at.is_(None))
+                    .order_by(ChildKnowledgePoint.learned_at, ChildKnowledgePoint.id)
+                ).scalars().all()
+                history = conn.execute(
+                    select(ChildConversation.data)
+                    .where(ChildConversation.child_id == child_id)
+                    .order_by(ChildConversation.ts.desc(), ChildConversation.id.desc())
+                    .limit(MEMORY_PG_HISTORY_LIMIT)
+                ).scalars().all()
+
+        if profile is None and not homework and not knowledge and not history:
+            return None
+
+        with self._lock:
+            self.children_loaded += 1
+        child_data = {
+            "conversation_history": list(reversed(history)),
+            "learning_progress": {},
+            "speaking_practice_count": 0,
+            "homework_list": list(homework),
+            "knowledge_points": list(knowledge),
+        }
+        if profile is not None:
+            child_data["learning_progress"] = dict(profile.learning_progress or {})
+            child_data["speaking_practice_count"] = profile.speaking_practice_count
+            if profile.last_homework_check is not None:
+                child_data["last_homework_check"] = profile.last_homework_check.isoformat()
+        return child_data
+
+    def iter_child_ids(self, page_size: int = 1000) -> Iterator[str]:
+        """
+        数据库中所有孩子的ID（按ID分页读取，不长时间占用连接；导出用）
+
+        包括只有作业、知识点或对话、没有档案行的孩子。
+        """
+        query = text(
+            "SELECT child_id FROM ("
+            " SELECT child_id FROM child_memory WHERE child_id > :after"
+            " UNION SELECT child_id FROM child_homework WHERE child_id > :after"
+            " UNION SELECT child_id FROM child_knowledge_point WHERE child_id > :after"
+            " UNION SELECT child_id FROM child_conversation WHERE child_id > :after"
+            ") ids ORDER BY child_id LIMIT :limit"
+        )
+        after = ""
+        while True:
+            with self.engine.connect() as conn:
+                page = conn.execute(query, {"after": after, "limit": page_size}).scalars().all()
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1]
+
+    # ============== 批量回写 ==============
+
+    @staticmethod
+    def _profile_row(child_id: str, child_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "child_id": child_id,
+            "learning_progress": dict(child_data["learning_progress"]),
+            "speaking_practice_count": child_data["speaking_practice_count"],
+            "last_homework_check": child_data.get("last_homework_check"),
+        }
+
+    def record(self, op: str, child_id: str, data: Any, child_data: Optional[Dict[str, Any]]) -> None:
+        """
+        记录一条变更（调用方需持有孩子的分片锁，child_data 为变更后的内存数据）
+
+        与 WAL 使用相同的操作类型，入队时复制需要写入的实体，之后的内存修改不影响本次写入。
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Postgres memory backend is closed")
+            pending = self._pending
+            if op == "clear":
+                pending.discard_child(child_id)
+                pending.deletes.add(child_id)
+            elif op == "conv":
+                pending.history.append((child_id, data))
+            elif op in ("hw_add", "kp_add", "kp_set"):
+                target, archives = (
+                    (pending.homework, pending.homework_archives) if op == "hw_add"
+                    else (pending.knowledge, pending.knowledge_archives)
+                )
+                target[(child_id, data["id"])] = dict(data)
+                archives.discard((child_id, data["id"]))
+            elif op == "archive":
+                # 同一批次中尚未写入的 upsert 保留（先写入行再标记），共享表中始终有一份副本
+                for hw_id in data.get("homework") or ():
+                    pending.homework_archives.add((child_id, hw_id))
+                for kp_id in data.get("knowledge") or ():
+                    pending.knowledge_archives.add((child_id, kp_id))
+            elif op == "hw_done":
+                for hw in child_data["homework_list"]:
+                    if hw["id"] == data["id"]:
+                        pending.homework[(child_id, hw["id"])] = _as_dict(hw)
+                        break
+            elif op in ("lp", "spc", "hw_check"):
+                pending.profiles[child_id] = self._profile_row(child_id, child_data)
+            elif op == "child":
+                # 任意读改写：同步档案、作业和知识点（对话历史只通过 add_conversation 追加）
+                pending.profiles[child_id] = self._profile_row(child_id, child_data)
+                for hw in child_data["homework_list"]:
+                    pending.homework[(child_id, hw["id"])] = _as_dict(hw)
+                    pending.homework_archives.discard((child_id, hw["id"]))
+                for kp in child_data["knowledge_points"]:
+                    pending.knowledge[(child_id, kp["id"])] = _as_dict(kp)
+                    pending.knowledge_archives.discard((child_id, kp["id"]))
+            else:
+                raise ValueError(f"Unknown memory op: {op}")
+
+            if len(pending) >= self.batch_size:
+                if len(pending) >= self.max_pending:
+                    self.backpressure += 1
+                self._wakeup.notify()
+
+    def _take_batch(self) -> Tuple[int, _PendingBatch]:
+        with self._lock:
+            batch = self._pending
+            self._pending = _PendingBatch()
+            self._batch_seq += 1
+            return self._batch_seq, batch
+
+    def _finish_batch(self, seq: int) -> None:
+        with self._lock:
+            self._done_seq = seq
+            self._batch_done.notify_all()
+
+    def _requeue(self, batch: _PendingBatch) -> None:
+        """
+        写入失败时把批次放回队列，之后入队的新变更优先
+
+        批次失败次数超过 max_retries，或放回后待写条目超过 max_pending 时丢弃该批次。
+        """
+        with self._lock:
+            pending = self._pending
+            batch.attempts += 1
+            if batch.attempts > self.max_retries or len(pending) + len(batch) > self.max_pending:
+                self.dropped_batches += 1
+                self.dropped_rows += len(batch)
+                logger.error(
+                    f"Dropped {len(batch)} memory changes after {batch.attempts} failed Postgres writes "
+                    f"({len(pending)} newer changes pending)"
+                )
+                return
+            pending.attempts = max(pending.attempts, batch.attempts)
+            cleared_later = set(pending.deletes)
+            pending.deletes |= batch.deletes
+            for child_id, row in batch.profiles.items():
+                if child_id not in cleared_later:
+                    pending.profiles.setdefault(child_id, row)
+            for key, row in batch.homework.items():
+                if key[0] not in cleared_later:
+                    pending.homework.setdefault(key, row)
+            for key, row in batch.knowledge.items():
+                if key[0] not in cleared_later:
+                    pending.knowledge.setdefault(key, row)
+            for key in batch.homework_archives:
+                if key[0] not in cleared_later and key not in pending.homework:
+                    pending.homework_archives.add(key)
+            for key in batch.knowledge_archives:
+                if key[0] not in cleared_later and key not in pending.knowledge:
+                    pending.knowledge_archives.add(key)
+            pending.history[:0] = [h for h in batch.history if h[0] not in cleared_later]
+
+    def _write_batch(self, batch: _PendingBatch) -> int:
+        """在一个事务内写入批次，返回写入的行数"""
+        rows = 0
+        with self.engine.begin() as conn:
+            if batch.deletes:
+                child_ids = list(batch.deletes)
+                for model in (ChildMemory, ChildHomework, ChildKnowledgePoint, ChildConversation):
+                    conn.execute(delete(model).where(model.child_id.in_(child_ids)))
+                rows += len(child_ids)
+
+            if batch.profiles:
+                values = [
+                    {**row, "learning_progress": _jsonable(row["learning_progress"]),
+                     "last_homework_check": _parse_time(row["last_homework_check"])}
+                    for row in batch.profiles.values()
+                ]
+                rows += self._upsert(conn, ChildMemory, values, ["child_id"], extra={"updated_at": text("now()")})
+
+            if batch.homework:
+                values = [
+                    {"child_id": child_id, "id": hw_id, "deadline": _parse_time(hw.get("deadline")),
+                     "created_at": _parse_time(hw.get("created_at")), "data": _jsonable(hw), "archived_at": None}
+                    for (child_id, hw_id), hw in batch.homework.items()
+                ]
+                rows += self._upsert(conn, ChildHomework, values, ["child_id", "id"])
+
+            if batch.knowledge:
+                values = [
+                    {"child_id": child_id, "id": kp_id, "next_review_time": _parse_time(kp.get("next_review_time")),
+                     "learned_at": _parse_time(kp.get("learned_at")), "data": _jsonable(kp), "archived_at": None}
+                    for (child_id, kp_id), kp in batch.knowledge.items()
+                ]
+                rows += self._upsert(conn, ChildKnowledgePoint, values, ["child_id", "id"])
+
+            # upsert 之后再标记，同一批次中新增后即归档的行也会写入
+            for model, keys in ((ChildHomework, batch.homework_archives), (ChildKnowledgePoint, batch.knowledge_archives)):
+                keys = list(keys)
+                for i in range(0, len(keys), _CHUNK_ROWS):
+                    conn.execute(
+                        update(model)
+                        .where(tuple_(model.child_id, model.id).in_(keys[i:i + _CHUNK_ROWS]))
+                        .values(archived_at=text("now()"))
+                    )
+                rows += len(keys)
+
+            if batch.history:
+                values = [
+                    {"child_id": child_id, "ts": _parse_time(record.get("timestamp")), "data": _jsonable(record)}
+                    for child_id, record in batch.history
+                ]
+                for i in range(0, len(values), _CHUNK_ROWS):
+                    conn.execute(insert(ChildConversation), values[i:i + _CHUNK_ROWS])
+                rows += len(values)
+                # 只保留每个孩子最近的对话
+                conn.execute(
+                    text(
+                        "DELETE FROM child_conversation c USING ("
+                        " SELECT id, row_number() OVER (PARTITION BY child_id ORDER BY ts DESC, id DESC) AS rn"
+                        " FROM child_conversation WHERE child_id = ANY(:child_ids)"
+                        ") old WHERE c.id = old.id AND old.rn > :keep"
+                    ),
+                    {"child_ids": list({child_id for child_id, _ in batch.history}), "keep": MEMORY_PG_HISTORY_LIMIT}
+                )
+        return rows
+
+    @staticmethod
+    def _upsert(conn, model, values: List[Dict[str, Any]], key_columns: List[str], extra: Optional[Dict[str, Any]] = None) -> int:
+        """按主键批量 upsert（多行 VALUES，每 _CHUNK_ROWS 行一条语句）"""
+        for i in range(0, len(values), _CHUNK_ROWS):
+            stmt = insert(model).values(values[i:i + _CHUNK_ROWS])
+            update_columns = {
+                column: stmt.excluded[column] for column in values[0] if column not in key_columns
+            }
+            update_columns.update(extra or {})
+            conn.execute(stmt.on_conflict_do_update(index_elements=key_columns, set_=update_columns))
+        return len(values)
+
+    def flush(self) -> int:
+        """立即写入所有待写变更，返回写入的行数；失败时变更放回队列（或按上限丢弃）并抛出异常"""
+        with self._flush_lock:
+            seq, batch = self._take_batch()
+            try:
+                if not len(batch):
+                    return 0
+                try:
+                    rows = self._write_batch(batch)
+                except Exception:
+                    self.errors += 1
+                    self.consecutive_errors += 1
+                    self._requeue(batch)
+                    raise
+                self.consecutive_errors = 0
+                self.batches_written += 1
+                self.rows_written += rows
+                return rows
+            finally:
+                self._finish_batch(seq)
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._lock:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                if self._closed:
+                    # 最后一批由 close() 写出
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush memory changes to Postgres: {e}")
+                # 连续失败时指数退避
+                time.sleep(min(self.flush_interval * 2 ** min(self.consecutive_errors, 16), MEMORY_PG_MAX_BACKOFF))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "batches_written": self.batches_written,
+            "rows_written": self.rows_written,
+            "children_loaded": self.children_loaded,
+            "errors": self.errors,
+            "consecutive_errors": self.consecutive_errors,
+            "dropped_batches": self.dropped_batches,
+            "dropped_rows": self.dropped_rows,
+            "backpressure": self.backpressure,
+        }
+
+    def close(self) -> None:
+        """停止后台线程并写出剩余变更"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+        self._flusher.join()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush memory changes to Postgres on close: {e}")
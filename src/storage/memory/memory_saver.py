@@ -3,17 +3,46 @@ from psycopg_pool import AsyncConnectionPool
 from langgraph.checkpoint.postgres import PostgresSaver
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from langgraph.checkpoint.memory import MemorySaver
-from langgraph.checkpoint.base import BaseCheckpointSaver
-from typing import Optional, Union
+from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple
+from langchain_core.runnables import RunnableConfig
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Sequence, Tuple, Union
+from contextlib import asynccontextmanager
+import asyncio
 import logging
+import os
+import queue
+import threading
 import time
 
+from utils.log.metrics import QUEUE_WAIT
+from utils.log.run_profile import record_queue_wait
+from storage.memory.checkpoint_serde import CHECKPOINT_DELTA, ChannelDeltaTracker, get_checkpoint_serializer
+
 logger = logging.getLogger(__name__)
 
 # 数据库连接超时时间（秒），每次尝试 15 秒，共尝试 2 次
 DB_CONNECTION_TIMEOUT = 15
 DB_MAX_RETRIES = 2
 
+# 启用 checkpointer 的工作流模式（逗号分隔：full_companion / detailed / realtime_call / all），为空时不启用
+GRAPH_CHECKPOINT_MODES = {m.strip().lower() for m in os.getenv("GRAPH_CHECKPOINT_MODES", "").split(",") if m.strip()}
+# 检查点写入时机（LangGraph durability）：exit（每轮只在结束时写一次）/ async / sync
+GRAPH_CHECKPOINT_DURABILITY = os.getenv("GRAPH_CHECKPOINT_DURABILITY", "exit").lower()
+# 是否后台异步写入检查点（写入不计入本轮耗时）
+GRAPH_CHECKPOINT_ASYNC_WRITES = os.getenv("GRAPH_CHECKPOINT_ASYNC_WRITES", "1") != "0"
+# 后台写入队列上限，超出后写入方等待（过载时的背压）
+GRAPH_CHECKPOINT_MAX_PENDING = int(os.getenv("GRAPH_CHECKPOINT_MAX_PENDING", "1000"))
+
+# 各模式下跨轮次恢复的状态字段，其余字段每轮从输入重新开始（与不启用 checkpointer 时一致）
+GRAPH_RESUME_CHANNELS: Dict[str, Tuple[str, ...]] = {
+    "full_companion": ("practice_stage",),
+    "detailed": (
+        "practice_stage", "practice_turn_count", "practice_scenario_key", "practice_scenario_name",
+        "practice_topic", "practice_is_review_mode", "practice_review_knowledge",
+    ),
+    "realtime_call": (),
+}
+
 
 class MemoryManager:
     """Memory Manager 单例类"""
@@ -21,6 +50,7 @@ class MemoryManager:
     _instance: Optional['MemoryManager'] = None
     _checkpointer: Optional[Union[AsyncPostgresSaver, MemorySaver]] = None
     _pool: Optional[AsyncConnectionPool] = None
+    _db_url: Optional[str] = None
     _setup_done: bool = False
 
     def __new__(cls):
@@ -83,7 +113,7 @@ class MemoryManager:
 
     def _create_fallback_checkpointer(self) -> MemorySaver:
         """创建内存兜底 checkpointer"""
-        self._checkpointer = MemorySaver()
+        self._checkpointer = MemorySaver(serde=get_checkpoint_serializer())
         logger.warning("Using MemorySaver as fallback checkpointer (data will not persist across restarts)")
         return self._checkpointer
 
@@ -107,15 +137,19 @@ class MemoryManager:
         else:
             db_url = f"{db_url}?options=-csearch_path%3Dmemory"
 
-        # 4. 尝试创建连接池和 checkpointer
+        # 4. 尝试创建连接池和 checkpointer（大小按 worker 数分配，见 storage.database.db.pool_limits）
         try:
+            from storage.database.db import DB_POOL_PREWARM, pool_limits
+            _, max_size = pool_limits("checkpoint")
             self._pool = AsyncConnectionPool(
                 conninfo=db_url,
                 timeout=DB_CONNECTION_TIMEOUT,
-                min_size=1,
+                min_size=max(1, min(DB_POOL_PREWARM, max_size)),
+                max_size=max_size,
                 max_idle=300,
             )
-            self._checkpointer = AsyncPostgresSaver(self._pool)
+            self._checkpointer = AsyncPostgresSaver(self._pool, serde=get_checkpoint_serializer())
+            self._db_url = db_url
             logger.info("AsyncPostgresSaver initialized successfully")
         except Exception as e:
             logger.warning(f"Failed to create AsyncPostgresSaver: {e}, will fallback to MemorySaver")
@@ -123,6 +157,34 @@ class MemoryManager:
 
         return self._checkpointer
 
+    async def prewarm(self, timeout: float = DB_CONNECTION_TIMEOUT) -> bool:
+        """等待检查点连接池建立 min_size 个连接（服务就绪前调用），返回是否在超时前完成"""
+        if self._pool is None:
+            return False
+        try:
+            await self._pool.wait(timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"Checkpoint pool prewarm failed: {e}")
+            return False
+
+    def get_pool_stats(self) -> Optional[Dict[str, Any]]:
+        """检查点连接池统计，未使用 Postgres 时返回None"""
+        if self._pool is None:
+            return None
+        stats = self._pool.get_stats()
+        requests = stats.get("requests_num", 0)
+        return {
+            "pool_size": stats.get("pool_size", 0),
+            "checked_out": stats.get("pool_size", 0) - stats.get("pool_available", 0),
+            "idle": stats.get("pool_available", 0),
+            "max_size": stats.get("pool_max", 0),
+            "waiting": stats.get("requests_waiting", 0),
+            "acquires": requests,
+            "acquire_errors": stats.get("requests_errors", 0),
+            "avg_acquire_ms": round(stats.get("requests_wait_ms", 0) / requests, 3) if requests else None,
+        }
+
 _memory_manager: Optional[MemoryManager] = None
 
 
@@ -131,4 +193,312 @@ def get_memory_saver() -> BaseCheckpointSaver:
     global _memory_manager
     if _memory_manager is None:
         _memory_manager = MemoryManager()
-    return _memory_manager.get_checkpointer()
\ No newline at end of file
+    return _memory_manager.get_checkpointer()
+
+
+def get_checkpoint_db_url() -> Optional[str]:
+    """检查点存放在 Postgres 时返回其连接串（带 search_path），使用 MemorySaver 或尚未创建时返回None"""
+    if _memory_manager is None:
+        return None
+    return _memory_manager._db_url
+
+
+async def prewarm_memory_saver(timeout: float = DB_CONNECTION_TIMEOUT) -> bool:
+    """预热检查点连接池（在 get_memory_saver() 之后调用）"""
+    if _memory_manager is None:
+        return False
+    return await _memory_manager.prewarm(timeout)
+
+
+def get_checkpoint_pool_stats() -> Optional[Dict[str, Any]]:
+    if _memory_manager is None:
+        return None
+    return _memory_manager.get_pool_stats()
+
+
+class BackgroundCheckpointSaver(BaseCheckpointSaver):
+    """
+    后台写入的 checkpointer 包装
+
+    async_writes 为True时，put / put_writes 入队后立即返回（返回值与被包装的 saver 一致），由后台线程按顺序写入，
+    检查点 I/O 不计入本轮耗时。读取某个会话前先等待该会话已入队的写入完成，保证读到最新检查点。
+
+    resume_channels 不为None时，读取的检查点只保留这些状态字段：其余字段每轮从输入重新开始，
+    避免上一轮的回复、作业状态等残留到下一轮。
+
+    delta 为True时，内容与该会话上一次写入相同的通道不再保存新 blob（见 checkpoint_serde.py）。
+    """
+
+    def __init__(
+        self,
+        saver: Union[BaseCheckpointSaver, Callable[[], BaseCheckpointSaver]],
+        resume_channels: Optional[Sequence[str]] = None,
+        async_writes: bool = GRAPH_CHECKPOINT_ASYNC_WRITES,
+        max_pending: int = GRAPH_CHECKPOINT_MAX_PENDING,
+        delta: bool = CHECKPOINT_DELTA
+    ):
+        super().__init__()
+        # 传入工厂函数时在首次使用时创建（AsyncPostgresSaver 需在服务的事件循环中创建）
+        self._saver = saver if isinstance(saver, BaseCheckpointSaver) else None
+        self._factory = None if self._saver is not None else saver
+        self._factory_lock = threading.Lock()
+        self.resume_channels = None if resume_channels is None else frozenset(resume_channels)
+        self.async_writes = async_writes
+        self._delta = ChannelDeltaTracker() if delta else None
+
+        self._queue: "queue.Queue[Optional[Tuple[str, str, tuple, float]]]" = queue.Queue(maxsize=max_pending)
+        # 每个会话已入队、未写完的操作数
+        self._pending: Dict[str, int] = {}
+        self._idle = threading.Condition()
+        self._writer = threading.Thread(target=self._write_loop, name="checkpoint-writer", daemon=True)
+        self._writer.start()
+
+        # 统计信息
+        self.writes = 0
+        self.errors = 0
+        self.write_seconds = 0.0
+
+    @property
+    def saver(self) -> BaseCheckpointSaver:
+        if self._saver is None:
+            with self._factory_lock:
+                if self._saver is None:
+                    self._saver = self._factory()
+        return self._saver
+
+    @property
+    def config_specs(self) -> list:
+        return self.saver.config_specs
+
+    def get_next_version(self, current: Any, channel: None) -> Any:
+        return self.saver.get_next_version(current, channel)
+
+    # ============== 写入 ==============
+
+    def _enqueue(self, op: str, config: RunnableConfig, args: tuple) -> None:
+        thread_id = str(config["configurable"]["thread_id"])
+        with self._idle:
+            self._pending[thread_id] = self._pending.get(thread_id, 0) + 1
+        enqueued = time.perf_counter()
+        self._queue.put((op, thread_id, args, enqueued))
+        # 队列已满时本次运行会在这里等待，计入运行的排队耗时
+        record_queue_wait("checkpoint_enqueue", time.perf_counter() - enqueued)
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            op, thread_id, args, enqueued = item
+            start = time.perf_counter()
+            QUEUE_WAIT.observe(start - enqueued, "checkpoint_writer")
+            try:
+                if op == "put":
+                    self._put(*args)
+                else:
+                    self.saver.put_writes(*args)
+                self.writes += 1
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Background checkpoint {op} failed for thread {thread_id}: {e}")
+            finally:
+                self.write_seconds += time.perf_counter() - start
+                with self._idle:
+                    remaining = self._pending[thread_id] - 1
+                    if remaining:
+                        self._pending[thread_id] = remaining
+                    else:
+                        del self._pending[thread_id]
+                    self._idle.notify_all()
+
+    def _release(self, checkpoint: Any, new_versions: Any) -> None:
+        serde = self.saver.serde
+        if hasattr(serde, "forget"):
+            for channel in new_versions:
+                if channel in checkpoint["channel_values"]:
+                    serde.forget(checkpoint["channel_values"][channel])
+
+    def _put(self, config: RunnableConfig, checkpoint: Any, metadata: Any, new_versions: Any) -> RunnableConfig:
+        """按增量写入检查点（内容未变的通道沿用上一次的 blob）"""
+        if self._delta is None:
+            return self.saver.put(config, checkpoint, metadata, new_versions)
+        stored, versions, channels = self._delta.prepare(self.saver.serde, config, checkpoint, new_versions)
+        try:
+            result = self.saver.put(config, stored, metadata, versions)
+        except Exception:
+            self._delta.discard(config)
+            raise
+        finally:
+            self._release(checkpoint, new_versions)
+        self._delta.commit(config, checkpoint["id"], channels)
+        return result
+
+    async def _aput(self, config: RunnableConfig, checkpoint: Any, metadata: Any, new_versions: Any) -> RunnableConfig:
+        if self._delta is None:
+            return await self.saver.aput(config, checkpoint, metadata, new_versions)
+        stored, versions, channels = self._delta.prepare(self.saver.serde, config, checkpoint, new_versions)
+        try:
+            result = await self.saver.aput(config, stored, metadata, versions)
+        except Exception:
+            self._delta.discard(config)
+            raise
+        finally:
+            self._release(checkpoint, new_versions)
+        self._delta.commit(config, checkpoint["id"], channels)
+        return result
+
+    def put(self, config: RunnableConfig, checkpoint: Any, metadata: Any, new_versions: Any) -> RunnableConfig:
+        if not self.async_writes:
+            return self._put(config, checkpoint, metadata, new_versions)
+        self._enqueue("put", config, (config, checkpoint, metadata, new_versions))
+        return {
+            "configurable": {
+                "thread_id": config["configurable"]["thread_id"],
+                "checkpoint_ns": config["configurable"].get("checkpoint_ns", ""),
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        if not self.async_writes:
+            return self.saver.put_writes(config, writes, task_id, task_path)
+        self._enqueue("put_writes", config, (config, list(writes), task_id, task_path))
+
+    async def aput(self, config: RunnableConfig, checkpoint: Any, metadata: Any, new_versions: Any) -> RunnableConfig:
+        if not self.async_writes:
+            return await self._aput(config, checkpoint, metadata, new_versions)
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        if not self.async_writes:
+            return await self.saver.aput_writes(config, writes, task_id, task_path)
+        self.put_writes(config, writes, task_id, task_path)
+
+    def flush(self, thread_id: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """等待（某个会话或全部）已入队的写入完成，返回是否在超时前完成"""
+        with self._idle:
+            return self._idle.wait_for(
+                lambda: not self._pending if thread_id is None else thread_id not in self._pending, timeout
+            )
+
+    # ============== 读取 ==============
+
+    def _restore(self, checkpoint_tuple: Optional[CheckpointTuple]) -> Optional[CheckpointTuple]:
+        if checkpoint_tuple is None or self.resume_channels is None:
+            return checkpoint_tuple
+        checkpoint = dict(checkpoint_tuple.checkpoint)
+        checkpoint["channel_values"] = {
+            k: v for k, v in checkpoint["channel_values"].items() if k in self.resume_channels
+        }
+        return checkpoint_tuple._replace(checkpoint=checkpoint)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        self.flush(str(config["configurable"]["thread_id"]))
+        return self._restore(self.saver.get_tuple(config))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        if thread_id in self._pending:
+            await asyncio.to_thread(self.flush, thread_id)
+        return self._restore(await self.saver.aget_tuple(config))
+
+    def list(self, config: Optional[RunnableConfig], **kwargs) -> Iterator[CheckpointTuple]:
+        self.flush()
+        return self.saver.list(config, **kwargs)
+
+    async def alist(self, config: Optional[RunnableConfig], **kwargs):
+        await asyncio.to_thread(self.flush)
+        async for item in self.saver.alist(config, **kwargs):
+            yield item
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.flush(str(thread_id))
+        if self._delta is not None:
+            self._delta.discard_thread(thread_id)
+        self.saver.delete_thread(thread_id)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.flush, str(thread_id))
+        if self._delta is not None:
+            self._delta.discard_thread(thread_id)
+        await self.saver.adelete_thread(thread_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "writes": self.writes,
+            "errors": self.errors,
+            "pending": self._queue.qsize(),
+            "avg_write_ms": round(self.write_seconds / self.writes * 1000, 3) if self.writes else None,
+            "delta": self._delta.stats() if self._delta is not None else None,
+        }
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """写完已入队的检查点后停止后台线程"""
+        self.flush(timeout=timeout)
+        self._queue.put(None)
+        self._writer.join(timeout)
+
+
+_graph_checkpointers: Dict[str, BaseCheckpointSaver] = {}
+
+
+def get_graph_checkpointer(mode: str) -> Optional[BaseCheckpointSaver]:
+    """
+    获取工作流模式对应的 checkpointer（编译图时使用），未在 GRAPH_CHECKPOINT_MODES 中启用时返回None
+
+    底层 saver 在首次读写时通过 get_memory_saver() 创建。
+    """
+    mode = mode.lower()
+    if mode not in GRAPH_CHECKPOINT_MODES and "all" not in GRAPH_CHECKPOINT_MODES:
+        return None
+    if mode not in _graph_checkpointers:
+        resume_channels = GRAPH_RESUME_CHANNELS.get(mode)
+        _graph_checkpointers[mode] = BackgroundCheckpointSaver(get_memory_saver, resume_channels)
+        logger.info(
+            f"Checkpointer enabled for graph mode {mode}: durability={GRAPH_CHECKPOINT_DURABILITY}, "
+            f"async_writes={GRAPH_CHECKPOINT_ASYNC_WRITES}, resume_channels={resume_channels}"
+        )
+    return _graph_checkpointers[mode]
+
+
+def checkpointing_enabled() -> bool:
+    """是否有工作流模式启用了 checkpointer"""
+    return bool(GRAPH_CHECKPOINT_MODES)
+
+
+class ThreadRunLocks:
+    """
+    按检查点 thread_id 串行执行运行（同一事件循环内使用）
+
+    同一线程的两次运行并发时会读到同一个检查点、各自写回，后写入的覆盖先写入的恢复字段；
+    串行后每次运行都从上一次运行写入的检查点开始。没有运行使用的锁随即移除。
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, thread_id: str) -> AsyncIterator[None]:
+        lock = self._locks.get(thread_id)
+        if lock is None:
+            lock = self._locks[thread_id] = asyncio.Lock()
+        self._users[thread_id] = self._users.get(thread_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[thread_id] -= 1
+            if not self._users[thread_id]:
+                del self._users[thread_id]
+                del self._locks[thread_id]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+def close_graph_checkpointers(timeout: Optional[float] = None) -> None:
+    """写完所有后台检查点（服务退出时调用）"""
+    for checkpointer in _graph_checkpointers.values():
+        if isinstance(checkpointer, BackgroundCheckpointSaver):
+            checkpointer.close(timeout)
@@ -0,0 +1,384 @@
+"""
+MemoryStore 批量导出 / 导入（流式）
+
+记录格式（每条记录一个对象）：
+    {"type": "child", "child_id": ..., "data": {"learning_progress": ..., "speaking_practice_count": ..., ...}}
+    {"type": "homework" | "knowledge" | "conversation", "child_id": ..., "data": {作业/知识点/对话字典}}
+
+编码：
+- ndjson：每行一个 JSON 对象
+- msgpack：<长度:u32><msgpack 负载> 帧序列
+
+导出逐个孩子生成记录；导入按分片攒批，不同分片的批次由线程池并行写入，同一分片同时只有
+一个批次在执行（保证同一孩子的记录按顺序写入）。两者的内存占用都与数据总量无关。
+
+命令行（在 src 目录下运行）：
+    python -m storage.memory.memory_transfer export -o memory.ndjson
+    python -m storage.memory.memory_transfer import -i memory.ndjson
+    python -m storage.memory.memory_transfer export --url http://127.0.0.1:5000 --format msgpack -o memory.bin
+    python -m storage.memory.memory_transfer import --url http://127.0.0.1:5000 --format msgpack -i memory.bin
+
+--url 模式调用服务的 /memory/export、/memory/import 接口。接口读写的是孩子的个人数据，
+服务端只有设置 MEMORY_TRANSFER_ENABLED=1 时才注册这两个接口（以及按孩子查询数据规模的
+/memory/sizes）；设置了 MEMORY_TRANSFER_TOKEN 时
+请求需携带 "Authorization: Bearer <token>"（命令行通过 --token 或同名环境变量传入）。
+"""
+import argparse
+import contextlib
+import hmac
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+import ormsgpack
+
+from storage.memory.memory_persistence import MEMORY_PERSIST_DIR, msgpack_default
+
+logger = logging.getLogger(__name__)
+
+# 导入时每个分片攒够多少条记录写入一次
+MEMORY_IMPORT_BATCH_SIZE = int(os.getenv("MEMORY_IMPORT_BATCH_SIZE", "500"))
+# 导入并行写入的线程数
+MEMORY_IMPORT_WORKERS = int(os.getenv("MEMORY_IMPORT_WORKERS", "4"))
+
+# 是否在服务中注册 /memory/export、/memory/import、/memory/sizes 接口（默认不注册），以及接口要求的令牌
+MEMORY_TRANSFER_ENABLED = os.getenv("MEMORY_TRANSFER_ENABLED", "").lower() in ("1", "true", "yes")
+MEMORY_TRANSFER_TOKEN = os.getenv("MEMORY_TRANSFER_TOKEN", "")
+
+# 编码格式及对应的 Content-Type
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "msgpack": "application/x-msgpack",
+}
+RECORD_TYPES = ("child", "homework", "knowledge", "conversation")
+
+_FRAME_LENGTH = struct.Struct("<I")
+# 编码输出的块大小，避免每条记录一次写入
+_CHUNK_BYTES = 64 * 1024
+
+
+def transfer_authorized(authorization: Optional[str], token: str = MEMORY_TRANSFER_TOKEN) -> bool:
+    """检查导出 / 导入接口的 Authorization 头（未设置令牌时不检查）"""
+    if not token:
+        return True
+    scheme, _, value = (authorization or "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(value.strip().encode(), token.encode())
+
+
+def _auth_headers(token: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def export_records(store, child_ids: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+    """逐个孩子生成导出记录（store 为 MemoryStore）"""
+    for child_id, child_data in store.iter_children(child_ids):
+        profile = {
+            key: value for key, value in child_data.items()
+            if key not in ("conversation_history", "homework_list", "knowledge_points")
+        }
+        yield {"type": "child", "child_id": child_id, "data": profile}
+        for record_type, key in (
+            ("homework", "homework_list"),
+            ("knowledge", "knowledge_points"),
+            ("conversation", "conversation_history"),
+        ):
+            for item in child_data.get(key) or []:
+                yield {"type": record_type, "child_id": child_id, "data": item}
+
+
+def encode_records(records: Iterable[Dict[str, Any]], fmt: str) -> Iterator[bytes]:
+    """把记录编码为字节块"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    buffer = bytearray()
+    for record in records:
+        if fmt == "ndjson":
+            buffer += json.dumps(record, ensure_ascii=False, default=str).encode("utf-8")
+            buffer += b"\n"
+        else:
+            payload = ormsgpack.packb(record, default=msgpack_default)
+            buffer += _FRAME_LENGTH.pack(len(payload))
+            buffer += payload
+        if len(buffer) >= _CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def export_stream(store, fmt: str, child_ids: Optional[Iterable[str]] = None) -> Iterator[bytes]:
+    """导出并编码，结束时记录导出速率"""
+    stats = {"records": 0}
+
+    def counted() -> Iterator[Dict[str, Any]]:
+        for record in export_records(store, child_ids):
+            stats["records"] += 1
+            yield record
+
+    start = time.perf_counter()
+    yield from encode_records(counted(), fmt)
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Memory export finished: {stats['records']} records in {elapsed:.2f}s "
+        f"({stats['records'] / elapsed if elapsed > 0 else 0:.0f} records/s)"
+    )
+
+
+class RecordDecoder:
+    """增量解码器：喂入任意切分的字节块，返回其中完整的记录"""
+
+    def __init__(self, fmt: str):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        self.fmt = fmt
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        self._buffer += chunk
+        records = []
+        if self.fmt == "ndjson":
+            end = self._buffer.rfind(b"\n")
+            if end < 0:
+                return records
+            for line in bytes(self._buffer[:end]).splitlines():
+                if line.strip():
+                    records.append(self._parse_json(line))
+            del self._buffer[:end + 1]
+        else:
+            offset = 0
+            while len(self._buffer) - offset >= _FRAME_LENGTH.size:
+                (length,) = _FRAME_LENGTH.unpack_from(self._buffer, offset)
+                start = offset + _FRAME_LENGTH.size
+                if len(self._buffer) - start < length:
+                    break
+                records.append(ormsgpack.unpackb(bytes(self._buffer[start:start + length])))
+                offset = start + length
+            del self._buffer[:offset]
+        return records
+
+    def close(self) -> List[Dict[str, Any]]:
+        """输入结束：返回最后一条没有换行结尾的记录，残留不完整的数据时抛出 ValueError"""
+        records = []
+        if self.fmt == "ndjson" and self._buffer.strip():
+            records.append(self._parse_json(bytes(self._buffer)))
+        elif self.fmt == "msgpack" and self._buffer:
+            raise ValueError(f"Truncated msgpack stream: {len(self._buffer)} trailing bytes")
+        self._buffer.clear()
+        return records
+
+    @staticmethod
+    def _parse_json(line: bytes) -> Dict[str, Any]:
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid NDJSON record: {e}") from e
+
+
+def decode_stream(chunks: Iterable[bytes], fmt: str) -> Iterator[Dict[str, Any]]:
+    """把字节块流解码为记录流"""
+    decoder = RecordDecoder(fmt)
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.close()
+
+
+class MemoryImporter:
+    """
+    并行批量导入
+
+    记录按孩子所在分片攒批，攒够 batch_size 条后提交线程池写入。
+    同一分片提交新批次前等待上一批完成，在途批次数不超过 workers * 2。
+    """
+
+    def __init__(self, store, batch_size: int = MEMORY_IMPORT_BATCH_SIZE, workers: int = MEMORY_IMPORT_WORKERS):
+        self._store = store
+        self._batch_size = max(1, batch_size)
+        self._buffers: Dict[int, List[Dict[str, Any]]] = {}
+        self._inflight: Dict[int, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="memory-import")
+        self._slots = threading.BoundedSemaphore(max(1, workers) * 2)
+        self._closed = False
+        self._start = time.perf_counter()
+        self.counts = {record_type: 0 for record_type in RECORD_TYPES}
+
+    def add(self, record: Dict[str, Any]) -> None:
+        record_type = record.get("type") if isinstance(record, dict) else None
+        if record_type not in RECORD_TYPES or not record.get("child_id") or not isinstance(record.get("data"), dict):
+            raise ValueError(f"Invalid memory record: {str(record)[:200]}")
+        shard_index = self._store.get_shard_index(record["child_id"])
+        buffer = self._buffers.setdefault(shard_index, [])
+        buffer.append(record)
+        self.counts[record_type] += 1
+        if len(buffer) >= self._batch_size:
+            self._submit(shard_index)
+
+    def add_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            self.add(record)
+
+    def _submit(self, shard_index: int) -> None:
+        batch = self._buffers.pop(shard_index)
+        previous = self._inflight.get(shard_index)
+        if previous is not None:
+            # 同一分片按顺序写入，同时暴露上一批的错误
+            previous.result()
+        self._slots.acquire()
+        try:
+            self._inflight[shard_index] = self._executor.submit(self._apply, shard_index, batch)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _apply(self, shard_index: int, batch: List[Dict[str, Any]]) -> int:
+        try:
+            return self._store.import_records(shard_index, batch)
+        finally:
+            self._slots.release()
+
+    def finish(self) -> Dict[str, Any]:
+        """写入剩余记录并等待完成，返回导入统计"""
+        try:
+            for shard_index in list(self._buffers):
+                self._submit(shard_index)
+            for future in self._inflight.values():
+                future.result()
+        finally:
+            self.close()
+        elapsed = time.perf_counter() - self._start
+        records = sum(self.counts.values())
+        stats = {
+            "records": records,
+            "by_type": dict(self.counts),
+            "seconds": round(elapsed, 3),
+            "records_per_sec": round(records / elapsed) if elapsed > 0 else 0,
+        }
+        logger.info(f"Memory import finished: {stats}")
+        return stats
+
+    def close(self) -> None:
+        """停止线程池（等待在途批次）"""
+        if not self._closed:
+            self._closed = True
+            self._executor.shutdown(wait=True)
+
+
+# ============== 命令行 ==============
+
+def _read_chunks(stream: BinaryIO) -> Iterator[bytes]:
+    while True:
+        chunk = stream.read(_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _open_output(path: str):
+    return contextlib.nullcontext(sys.stdout.buffer) if path == "-" else open(path, "wb")
+
+
+def _open_input(path: str):
+    return contextlib.nullcontext(sys.stdin.buffer) if path == "-" else open(path, "rb")
+
+
+def _local_store(persist_dir: str):
+    from graphs.memory_store import MemoryStore
+
+    store = MemoryStore.get_instance()
+    # MEMORY_PERSIST_DIR 已在 MemoryStore 初始化时恢复
+    if persist_dir and persist_dir != MEMORY_PERSIST_DIR:
+        store.enable_persistence(persist_dir)
+    return store
+
+
+def _cli_export(args) -> None:
+    start = time.perf_counter()
+    records = 0
+    with _open_output(args.output) as output:
+        if args.url:
+            import requests
+
+            params = {"format": args.format}
+            if args.child_id:
+                params["child_id"] = args.child_id
+            with requests.get(
+                f"{args.url.rstrip('/')}/memory/export", params=params, headers=_auth_headers(args.token), stream=True
+            ) as response:
+                response.raise_for_status()
+                decoder = RecordDecoder(args.format)
+                for chunk in response.iter_content(_CHUNK_BYTES):
+                    output.write(chunk)
+                    records += len(decoder.feed(chunk))
+                records += len(decoder.close())
+        else:
+            def counted() -> Iterator[Dict[str, Any]]:
+                nonlocal records
+                for record in export_records(_local_store(args.persist_dir), args.child_id or None):
+                    records += 1
+                    yield record
+
+            for chunk in encode_records(counted(), args.format):
+                output.write(chunk)
+    elapsed = time.perf_counter() - start
+    print(f"📤 导出 {records} 条记录, {elapsed:.2f}s, {records / elapsed if elapsed > 0 else 0:.0f} 条/秒", file=sys.stderr)
+
+
+def _cli_import(args) -> None:
+    start = time.perf_counter()
+    with _open_input(args.input) as stream:
+        if args.url:
+            import requests
+
+            response = requests.post(
+                f"{args.url.rstrip('/')}/memory/import",
+                params={"format": args.format},
+                data=_read_chunks(stream),
+                headers={"Content-Type": FORMATS[args.format], **_auth_headers(args.token)},
+            )
+            response.raise_for_status()
+            stats = response.json()
+        else:
+            store = _local_store(args.persist_dir)
+            importer = MemoryImporter(store, batch_size=args.batch_size, workers=args.workers)
+            try:
+                importer.add_many(decode_stream(_read_chunks(stream), args.format))
+            finally:
+                stats = importer.finish()
+            # 本地导入后写出快照 / 落盘后端，保证导入的数据持久化
+            store.create_snapshot()
+            store.close_persistence()
+            store.flush_backend()
+    elapsed = time.perf_counter() - start
+    print(f"📥 导入 {stats['records']} 条记录 {stats['by_type']}, {elapsed:.2f}s, "
+          f"{stats['records'] / elapsed if elapsed > 0 else 0:.0f} 条/秒", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="MemoryStore 批量导出 / 导入")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name in ("export", "import"):
+        sub = subparsers.add_parser(name)
+        sub.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+        sub.add_argument("--url", default="", help="服务地址，为空时直接读写本进程的 MemoryStore")
+        sub.add_argument("--token", default=MEMORY_TRANSFER_TOKEN, help="--url 模式的接口令牌（默认使用 MEMORY_TRANSFER_TOKEN）")
+        sub.add_argument("--persist-dir", default="", help="本地模式的持久化目录（默认使用 MEMORY_PERSIST_DIR）")
+    subparsers.choices["export"].add_argument("-o", "--output", default="-")
+    subparsers.choices["export"].add_argument("--child-id", action="append", default=[])
+    subparsers.choices["import"].add_argument("-i", "--input", default="-")
+    subparsers.choices["import"].add_argument("--batch-size", type=int, default=MEMORY_IMPORT_BATCH_SIZE)
+    subparsers.choices["import"].add_argument("--workers", type=int, default=MEMORY_IMPORT_WORKERS)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        _cli_export(args)
+    else:
+        _cli_import(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+应用日志基准测试
+
+对比请求线程中一次 logger.info()（带请求上下文、与 /run 相同的请求日志）的耗时：
+- 同步写入：LOG_ASYNC=0，各 handler 在调用方线程用 JsonFormatter 格式化并写文件
+- 队列写入：LOG_ASYNC=1，调用方只过滤和入队，监听线程格式化并写入
+
+用法：
+    python src/tests/bench_app_logging.py
+    python src/tests/bench_app_logging.py --records 50000 --threads 8 --body-chars 20000
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from coze_coding_utils.runtime_ctx.context import new_context
+from utils.log import write_log
+from utils.log.write_log import flush_logging, loggable_body, request_context, setup_logging
+
+
+def run(name: str, path: str, records: int, threads: int, body: str, limit_body: bool) -> None:
+    logger = logging.getLogger("bench.app_logging")
+    per_thread = records // threads
+
+    def worker():
+        request_context.set(new_context(method="run"))
+        for _ in range(per_thread):
+            text = loggable_body("run", body) if limit_body else body
+            logger.info(f"Received request for /run: run_id=bench, query={{}}, body={text}")
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    submitted = time.perf_counter() - start
+    flush_logging()
+    total = time.perf_counter() - start
+    size = os.path.getsize(path) / 1024 / 1024
+    dropped = write_log._queue_handler.dropped if write_log._queue_handler is not None else 0
+    print(f"  {name:<28} 调用方 {submitted / (per_thread * threads) * 1_000_000:7.1f} µs/条  "
+          f"写完 {total * 1000:8.1f} ms  文件 {size:7.1f} MB  丢弃 {dropped}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="应用日志基准测试")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--body-chars", type=int, default=8000)
+    args = parser.parse_args()
+
+    body = json.dumps({"child_id": "bench_child", "text": "今天在学校学了新的英语单词" * (args.body_chars // 13)}, ensure_ascii=False)
+    print(f"📜 {args.records} 条请求日志, {args.threads} 个线程, 请求体 {len(body)} 字符")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, async_mode, limit_body in (("同步写入", False, False), ("队列写入", True, False),
+                                             ("队列写入 + 请求体限流截断", True, True)):
+            write_log.LOG_ASYNC = async_mode
+            path = os.path.join(tmp, f"{name}.log")
+            setup_logging(log_file=path, console_output=False)
+            run(name, path, args.records, args.threads, body, limit_body)
+    write_log._stop_listener()
+
+
+if __name__ == "__main__":
+    main()
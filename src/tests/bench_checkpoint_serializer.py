@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+检查点序列化基准测试
+
+用与 full_companion 相同的状态结构（GlobalState，4 个节点，见 bench_checkpoint_write.py），
+加载记忆节点每轮返回最近 20 条对话（每轮新增一问一答）、完整作业列表和学习进度，
+durability=exit（每轮写一个检查点），对比每轮写入的字节数和序列化耗时：
+- msgpack：LangGraph 默认编码
+- msgpack + zstd
+- 增量 msgpack：内容未变的通道不写新 blob
+- 增量 msgpack + zstd
+
+字节数统计 MemorySaver 中新增的 blob 和检查点记录；设置 MEMORY_PG_TEST_URL 时同时统计
+PostgresSaver 三张检查点表的大小增长。
+
+用法：
+    python src/tests/bench_checkpoint_serializer.py
+    MEMORY_PG_TEST_URL=postgresql://postgres@127.0.0.1:5432/postgres python src/tests/bench_checkpoint_serializer.py --turns 500
+"""
+import argparse
+import os
+import sys
+import uuid
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.graph import StateGraph, END
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_checkpoint_write import make_input, save_memory, speaking_practice, voice_synthesis
+from graphs.state import GlobalState, GraphInput, GraphOutput
+from storage.memory.checkpoint_serde import CheckpointSerializer
+from storage.memory.memory_saver import BackgroundCheckpointSaver
+
+PG_TEST_URL = os.getenv("MEMORY_PG_TEST_URL", "")
+
+HOMEWORK = [
+    {"id": f"hw_20261018_100000_{n}", "subject": ["数学", "语文", "英语"][n % 3],
+     "description": f"完成练习册第{n + 1}页，口算20题并订正错题", "deadline": "2026-10-20 18:00:00",
+     "completed": n < 3, "created_at": "2026-10-15 19:00:00", "remind_count": n % 2}
+    for n in range(8)
+]
+
+
+def load_memory(state: GlobalState) -> dict:
+    turn = int(state.user_input_text.rsplit(" ", 1)[-1])
+    history = tuple(
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"今天在学校学了新的英语单词，第{i}句",
+         "timestamp": f"2026-10-18T10:{i // 60 % 60:02d}:{i % 60:02d}"}
+        for i in range(max(0, 2 * turn - 20), 2 * turn)
+    )
+    return {
+        "conversation_history": history,
+        "homework_list": HOMEWORK,
+        "learning_progress": {"total_practice": 42, "speaking_practice_count": 17, "words": 120,
+                              "subjects": {"数学": 12, "语文": 9, "英语": 21}},
+        "speaking_practice_count": 17,
+        "memory_loaded": ["conversation_history", "homework_list", "learning_progress", "speaking_practice_count"],
+        "route": "口语练习",
+        "current_time": "2026-10-18 10:00:00",
+    }
+
+
+def build_graph(checkpointer):
+    builder = StateGraph(GlobalState, input_schema=GraphInput, output_schema=GraphOutput)
+    for name, func in (("load_memory", load_memory), ("speaking_practice", speaking_practice),
+                       ("voice_synthesis", voice_synthesis), ("save_memory", save_memory)):
+        builder.add_node(name, func)
+    builder.set_entry_point("load_memory")
+    builder.add_edge("load_memory", "speaking_practice")
+    builder.add_edge("speaking_practice", "voice_synthesis")
+    builder.add_edge("voice_synthesis", "save_memory")
+    builder.add_edge("save_memory", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def saved_bytes(saver: MemorySaver) -> int:
+    blobs = sum(len(data or b"") for _, data in saver.blobs.values())
+    records = sum(
+        len(checkpoint[1]) + len(metadata[1])
+        for namespaces in saver.storage.values()
+        for checkpoints in namespaces.values()
+        for checkpoint, metadata, _ in checkpoints.values()
+    )
+    return blobs + records
+
+
+def table_bytes(conn) -> int:
+    return conn.execute(
+        "SELECT SUM(pg_total_relation_size(c.oid)) FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace"
+        " WHERE n.nspname = current_schema() AND c.relname IN ('checkpoints', 'checkpoint_blobs', 'checkpoint_writes')"
+    ).fetchone()[0]
+
+
+def run(name: str, saver, delta: bool, turns: int, threads: int, measure) -> None:
+    checkpointer = BackgroundCheckpointSaver(saver, None, async_writes=True, delta=delta)
+    graph = build_graph(checkpointer)
+    before = measure()
+    for i in range(turns):
+        config = {"configurable": {"thread_id": f"bench_{i % threads}"}}
+        graph.invoke(make_input(i // threads + 1), config, durability="exit")
+    checkpointer.flush()
+    stats = checkpointer.stats()
+    checkpointer.close()
+    written = measure() - before
+    write_ms = stats["avg_write_ms"] * stats["writes"] / turns
+    skipped = f"  未变通道 {stats['delta']['skip_ratio']:.0%}" if stats["delta"] else ""
+    print(f"  {name:<22} 每轮 {written / turns:8.0f} 字节  序列化+写入 {write_ms:6.3f} ms{skipped}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查点序列化基准测试")
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=20)
+    args = parser.parse_args()
+
+    variants = (
+        ("msgpack", JsonPlusSerializer, False),
+        ("msgpack + zstd", lambda: CheckpointSerializer(level=3), False),
+        ("增量 msgpack", lambda: CheckpointSerializer(level=0), True),
+        ("增量 msgpack + zstd", lambda: CheckpointSerializer(level=3), True),
+    )
+
+    print(f"💾 MemorySaver（{args.turns} 轮, {args.threads} 个会话）")
+    for name, make_serde, delta in variants:
+        saver = MemorySaver(serde=make_serde())
+        run(name, saver, delta, args.turns, args.threads, lambda: saved_bytes(saver))
+
+    if PG_TEST_URL:
+        import psycopg
+        from langgraph.checkpoint.postgres import PostgresSaver
+        from psycopg_pool import ConnectionPool
+
+        base = PG_TEST_URL.replace("+psycopg", "")
+        print(f"💾 PostgresSaver（{args.turns} 轮, {args.threads} 个会话，三张检查点表的大小增长）")
+        for name, make_serde, delta in variants:
+            schema = f"bench_serde_{uuid.uuid4().hex[:8]}"
+            with psycopg.connect(base, autocommit=True) as conn:
+                conn.execute(f"CREATE SCHEMA {schema}")
+            sep = "&" if "?" in base else "?"
+            conninfo = f"{base}{sep}options=-csearch_path%3D{schema}"
+            pool = ConnectionPool(conninfo, min_size=2, max_size=4,
+                                  kwargs={"autocommit": True, "prepare_threshold": 0}, open=True)
+            PostgresSaver(pool).setup()
+            conn = psycopg.connect(conninfo, autocommit=True)
+            try:
+                run(name, PostgresSaver(pool, serde=make_serde()), delta, args.turns, args.threads,
+                    lambda: table_bytes(conn))
+            finally:
+                conn.close()
+                pool.close()
+                with psycopg.connect(base, autocommit=True) as admin:
+                    admin.execute(f"DROP SCHEMA {schema} CASCADE")
+
+
+if __name__ == "__main__":
+    main()
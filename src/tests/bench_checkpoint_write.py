@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+检查点写入基准测试
+
+用与 full_companion 相同的状态结构（GlobalState：对话历史、作业列表、学习进度、口语练习阶段）
+构造一个 4 个节点的工作流（加载记忆 → 口语练习 → 语音合成 → 保存记忆），节点本身不做 I/O，
+对比每轮耗时：
+- 不启用 checkpointer
+- durability=sync / exit：每个超步 / 每轮结束时同步写入
+- exit + 后台写入（BackgroundCheckpointSaver）：写入不计入本轮耗时
+
+saver 默认为 MemorySaver；设置 MEMORY_PG_TEST_URL 时同时测试 PostgresSaver。
+
+用法：
+    python src/tests/bench_checkpoint_write.py
+    MEMORY_PG_TEST_URL=postgresql://postgres@127.0.0.1:5432/postgres python src/tests/bench_checkpoint_write.py --turns 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, END
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.state import GlobalState, GraphInput, GraphOutput, PracticeStage
+from storage.memory.memory_saver import BackgroundCheckpointSaver, GRAPH_RESUME_CHANNELS
+
+PG_TEST_URL = os.getenv("MEMORY_PG_TEST_URL", "")
+
+
+def load_memory(state: GlobalState) -> dict:
+    history = tuple(
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"今天在学校学了新的英语单词，第{i}句",
+         "timestamp": "2026-10-18T10:00:00"}
+        for i in range(3)
+    )
+    return {
+        "conversation_history": history,
+        "learning_progress": {"total_practice": 42, "speaking_practice_count": 17, "words": 120},
+        "speaking_practice_count": 17,
+        "memory_loaded": ["conversation_history", "learning_progress", "speaking_practice_count"],
+        "route": "口语练习",
+        "current_time": "2026-10-18 10:00:00",
+    }
+
+
+def speaking_practice(state: GlobalState) -> dict:
+    turn = state.practice_stage.turn_count + 1 if state.practice_stage else 1
+    return {
+        "recognized_text": state.user_input_text,
+        "ai_response": "说得真好！我们再试一个句子：I like playing football with my friends.",
+        "practice_stage": PracticeStage(stage="followup", current_scenario="daily_life", turn_count=turn),
+        "execution_path": ["load_memory", "speaking_practice"],
+    }
+
+
+def voice_synthesis(state: GlobalState) -> dict:
+    return {"ai_response_audio": f"https://example.com/tts/{uuid.uuid4().hex}.mp3"}
+
+
+def save_memory(state: GlobalState) -> dict:
+    return {"performance_metrics": {"total_ms": 850, "llm_ms": 600, "tts_ms": 200}}
+
+
+def build_graph(checkpointer):
+    builder = StateGraph(GlobalState, input_schema=GraphInput, output_schema=GraphOutput)
+    for name, func in (("load_memory", load_memory), ("speaking_practice", speaking_practice),
+                       ("voice_synthesis", voice_synthesis), ("save_memory", save_memory)):
+        builder.add_node(name, func)
+    builder.set_entry_point("load_memory")
+    builder.add_edge("load_memory", "speaking_practice")
+    builder.add_edge("speaking_practice", "voice_synthesis")
+    builder.add_edge("voice_synthesis", "save_memory")
+    builder.add_edge("save_memory", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def make_input(i: int) -> dict:
+    return {
+        "child_id": "bench_child",
+        "child_name": "小明",
+        "child_age": 8,
+        "child_interests": ["足球", "画画"],
+        "trigger_type": "practice",
+        "user_input_text": f"I like playing football {i}",
+        "homework_list": [{"id": f"hw_{n}", "subject": "数学", "description": "口算20题", "completed": False}
+                          for n in range(5)],
+    }
+
+
+def run(name: str, checkpointer, durability: str, turns: int, threads: int) -> None:
+    graph = build_graph(checkpointer)
+    latencies = []
+    for i in range(turns):
+        config = {"configurable": {"thread_id": f"bench_{i % threads}"}}
+        start = time.perf_counter()
+        graph.invoke(make_input(i), config, durability=durability)
+        latencies.append((time.perf_counter() - start) * 1000)
+    extra = ""
+    if isinstance(checkpointer, BackgroundCheckpointSaver):
+        checkpointer.flush()
+        stats = checkpointer.stats()
+        extra = f"  后台写入 {stats['writes']} 次, 平均 {stats['avg_write_ms']} ms/次"
+        checkpointer.close()
+    latencies.sort()
+    print(f"  {name:<28} 每轮 {statistics.mean(latencies):7.3f} ms  "
+          f"p95 {latencies[int(len(latencies) * 0.95)]:7.3f} ms{extra}")
+
+
+def bench(label: str, make_saver, turns: int, threads: int) -> None:
+    resume = GRAPH_RESUME_CHANNELS["full_companion"]
+    print(f"💾 {label}（{turns} 轮, {threads} 个会话）")
+    run("不启用", None, "exit", turns, threads)
+    run("durability=sync", make_saver(), "sync", turns, threads)
+    run("durability=exit", make_saver(), "exit", turns, threads)
+    run("exit + 后台写入", BackgroundCheckpointSaver(make_saver(), resume), "exit", turns, threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查点写入基准测试")
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=20)
+    args = parser.parse_args()
+
+    bench("MemorySaver", MemorySaver, args.turns, args.threads)
+
+    if PG_TEST_URL:
+        from langgraph.checkpoint.postgres import PostgresSaver
+        from psycopg_pool import ConnectionPool
+
+        pool = ConnectionPool(PG_TEST_URL.replace("+psycopg", ""), min_size=2, max_size=4,
+                              kwargs={"autocommit": True, "prepare_threshold": 0}, open=True)
+        PostgresSaver(pool).setup()
+        bench("PostgresSaver", lambda: PostgresSaver(pool), args.turns, args.threads)
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
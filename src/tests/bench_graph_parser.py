@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+每次请求的 tracer 初始化基准测试
+
+GraphService 每次运行都通过 init_run_config() 创建 Logger；对比 full_companion 主图上：
+- 每次请求重新解析图（原来的 LangGraphParser(graph)）
+- 使用按图缓存的解析结果（get_graph_parser）
+- 完整的 init_run_config()（Logger + cozeloop 回调）
+- 一次运行中 LoopTracer 每个回调都会取的 get_node_tags()
+
+用法：
+    python src/tests/bench_graph_parser.py
+    python src/tests/bench_graph_parser.py --requests 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from coze_coding_utils.runtime_ctx.context import new_context
+from graphs.graph import main_graph
+from utils.log.loop_trace import init_run_config
+from utils.log.node_log import Logger
+from utils.log.parser import LangGraphParser, get_graph_parser
+
+
+def timed(name: str, func, requests: int, baseline: float = None) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(requests):
+        func()
+    per_request = (time.perf_counter() - start) / requests * 1_000_000
+    extra = f"  ({baseline / per_request:.0f}x)" if baseline else ""
+    print(f"  {name:<32} {per_request:9.1f} µs/次{extra}")
+    return per_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description="每次请求的 tracer 初始化基准测试")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    ctx = new_context(method="run")
+    node_names = list(get_graph_parser(main_graph).nodes)
+    print(f"🧭 full_companion 主图（{len(node_names)} 个节点, {args.requests} 次请求）")
+
+    uncached = timed("LangGraphParser(graph) 每次解析", lambda: LangGraphParser(main_graph), args.requests)
+    timed("get_graph_parser(graph) 缓存", lambda: get_graph_parser(main_graph), args.requests, uncached)
+
+    # 原来的 Logger 初始化 = 缓存后的初始化 + 一次完整解析
+    before = timed("Logger（重新解析）", lambda: (Logger(main_graph, ctx), LangGraphParser(main_graph)), args.requests)
+    timed("Logger（缓存）", lambda: Logger(main_graph, ctx), args.requests, before)
+    timed("init_run_config()", lambda: init_run_config(main_graph, ctx), args.requests)
+
+    logger = Logger(main_graph, ctx)
+    timed(f"get_node_tags × {len(node_names)} 节点", lambda: [logger.get_node_tags(n) for n in node_names], args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+批量布置作业基准测试
+
+对比逐个调用 add_homework（每条作业各自取时间、生成ID、加锁）与 add_homework_bulk
+（按作业预先计算截止时间和记录模板、一次分配ID、每个分片加锁一次）的吞吐，并检查作业ID是否重复。
+
+用法：
+    python src/tests/bench_homework_bulk.py
+    python src/tests/bench_homework_bulk.py --classes 200 --students 45 --subjects 5
+"""
+import argparse
+import os
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from conftest import new_memory_store
+
+SUBJECTS = ["数学", "语文", "英语", "科学", "美术", "音乐", "体育", "道德与法治"]
+
+
+def make_classes(classes: int, students: int):
+    return [[f"bench_class_{c}_student_{s}" for s in range(students)] for c in range(classes)]
+
+
+def make_assignments(subjects: int):
+    return [
+        {"subject": SUBJECTS[i % len(SUBJECTS)], "description": f"第{i}项作业", "deadline_days": 1 + i % 3}
+        for i in range(subjects)
+    ]
+
+
+def run_single(rosters, assignments) -> list:
+    store = new_memory_store()
+    ids = []
+    for roster in rosters:
+        for child_id in roster:
+            for assignment in assignments:
+                ids.append(store.add_homework(
+                    child_id, assignment["subject"], assignment["description"], assignment["deadline_days"]
+                ))
+    store.close()
+    return ids
+
+
+def run_bulk(rosters, assignments) -> list:
+    store = new_memory_store()
+    ids = []
+    for roster in rosters:
+        for hw_ids in store.add_homework_bulk(roster, assignments).values():
+            ids.extend(hw_ids)
+    store.close()
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量布置作业基准测试")
+    parser.add_argument("--classes", type=int, default=100)
+    parser.add_argument("--students", type=int, default=45)
+    parser.add_argument("--subjects", type=int, default=5)
+    args = parser.parse_args()
+
+    rosters = make_classes(args.classes, args.students)
+    assignments = make_assignments(args.subjects)
+    total = args.classes * args.students * args.subjects
+    print(f"📚 {args.classes} 个班 × {args.students} 名学生 × {args.subjects} 项作业 = {total} 条")
+
+    rates = {}
+    for name, run in (("逐个添加", run_single), ("批量布置", run_bulk)):
+        start = time.perf_counter()
+        ids = run(rosters, assignments)
+        elapsed = time.perf_counter() - start
+        rates[name] = total / elapsed
+        print(f"  {name}: {elapsed:6.3f}s  {rates[name] / 1e3:8.1f}k 条/s  "
+              f"ID重复 {len(ids) - len(set(ids))}")
+    print(f"  加速: {rates['批量布置'] / rates['逐个添加']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
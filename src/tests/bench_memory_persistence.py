@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+MemoryStore 持久化基准测试
+
+- 不同 fsync 策略（off / batch / always）下的写入吞吐量
+- 快照耗时与快照文件大小
+- 冷启动恢复耗时（快照 + WAL 尾部）
+
+用法：
+    python src/tests/bench_memory_persistence.py
+    python src/tests/bench_memory_persistence.py --children 1000000 --threads 16
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from conftest import new_memory_store
+from graphs.memory_store import MemoryStore
+
+
+def new_store(directory: str, **wal_options) -> MemoryStore:
+    """创建独立于单例的 MemoryStore 并启用持久化"""
+    store = new_memory_store()
+    store.enable_persistence(directory, **wal_options)
+    return store
+
+
+def write_load(store: MemoryStore, children: int, threads: int, ops_per_thread: int) -> float:
+    """多线程写入，返回 ops/s"""
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(tid: int):
+        barrier.wait()
+        for n in range(ops_per_thread):
+            child_id = f"child_{(tid * 7919 + n) % children}"
+            if n % 2 == 0:
+                store.add_conversation(child_id, {"user_input": "你好", "ai_response": "你好呀"})
+            else:
+                store.increment_learning_counter(child_id, "total_practice")
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in pool:
+        t.join()
+    return threads * ops_per_thread / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoryStore 持久化基准测试")
+    parser.add_argument("--children", type=int, default=20000, help="孩子数量（快照/恢复规模）")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=5000, help="每个线程的写入次数")
+    parser.add_argument("--dir", type=str, default="", help="持久化目录（默认使用临时目录）")
+    args = parser.parse_args()
+
+    base_dir = args.dir or tempfile.mkdtemp(prefix="memory_persist_bench_")
+    print(f"📁 目录: {base_dir}")
+    try:
+        print("\n== 写入吞吐量 ==")
+        for mode in ("off", "batch", "always"):
+            directory = os.path.join(base_dir, f"wal_{mode}")
+            store = new_store(directory, sync_mode=mode)
+            ops = args.ops if mode != "always" else max(1, args.ops // 10)
+            ops_per_sec = write_load(store, args.children, args.threads, ops)
+            wal = store._persistence.wal
+            store.close()
+            print(f"  {mode:>6}: {ops_per_sec:>12,.0f} ops/s  "
+                  f"records={wal.records_written} fsync={wal.fsync_count}")
+
+        print("\n== 快照与恢复 ==")
+        directory = os.path.join(base_dir, "snapshot")
+        store = new_store(directory, sync_mode="off")
+        start = time.perf_counter()
+        for i in range(args.children):
+            child_id = f"child_{i}"
+            store.add_homework(child_id, "数学", "口算20题")
+            store.add_knowledge_point(child_id, "word", f"word_{i}", "日常对话")
+        print(f"  填充 {args.children} 个孩子: {time.perf_counter() - start:.2f}s")
+
+        stats = store.create_snapshot()
+        print(f"  快照: {stats['seconds']:.2f}s, {stats['bytes'] / 1024 / 1024:.1f}MB")
+
+        # 快照之后再写一段 WAL 尾部
+        write_load(store, args.children, args.threads, args.ops)
+        store.close()
+
+        restored = new_memory_store()
+        stats = restored.enable_persistence(directory, sync_mode="off")
+        restored.close()
+        print(f"  恢复: {stats['seconds']:.2f}s, children={stats['children']}, "
+              f"replayed={stats['replayed']}, skipped={stats['skipped']}")
+    finally:
+        if not args.dir:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
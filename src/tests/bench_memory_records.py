@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+MemoryStore 记录内存占用基准测试
+
+使用 tracemalloc 对比字典（ISO 时间字符串）与紧凑记录（__slots__ + 整数时间戳 + 小整数枚举）
+每条作业、知识点、对话轮次的字节数。
+
+用法：
+    python src/tests/bench_memory_records.py
+    python src/tests/bench_memory_records.py --records 200000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.memory_records import ConversationTurn, Homework, KnowledgePoint
+
+
+def make_homework(i: int) -> dict:
+    now = datetime.now()
+    return {
+        "id": f"hw_{now.strftime('%Y%m%d_%H%M%S')}_{i}",
+        "subject": "数学",
+        "description": "口算练习第3页",
+        "completed": False,
+        "created_at": now.isoformat(),
+        "deadline": (now + timedelta(days=1)).isoformat(),
+        "deadline_days": 1,
+    }
+
+
+def make_knowledge_point(i: int) -> dict:
+    now = datetime.now()
+    return {
+        "id": f"kp_{now.strftime('%Y%m%d_%H%M%S')}_{i}",
+        "type": "word",
+        "content": f"word_{i}",
+        "context": "日常对话",
+        "mastery_level": 0,
+        "learned_at": now.isoformat(),
+        "next_review_time": (now + timedelta(minutes=10)).isoformat(),
+        "review_count": 0,
+        "correct_count": 0,
+        "is_due": False,
+    }
+
+
+def make_turn(i: int) -> dict:
+    return {
+        "role": "user" if i % 2 == 0 else "assistant",
+        "content": f"今天学校里发生了一件有趣的事情，第{i}句",
+        "type": "conversation",
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def copy_values(data: dict) -> dict:
+    """复制字典中的字符串，使其计入本次测量（str 切片不会产生新对象）"""
+    return {k: (v.encode("utf-8").decode("utf-8") if isinstance(v, str) else v) for k, v in data.items()}
+
+
+def measure(build, count: int) -> float:
+    """返回每条记录的平均字节数（只统计构建期间新分配且仍存活的内存）"""
+    gc.collect()
+    tracemalloc.start()
+    records = [build(i) for i in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return current / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoryStore 记录内存占用基准测试")
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    # 输入字典先生成好，只测量存储形态本身的开销
+    print(f"📦 每种记录 {args.records} 条")
+    for name, make, record_type in (
+        ("作业", make_homework, Homework),
+        ("知识点", make_knowledge_point, KnowledgePoint),
+        ("对话轮次", make_turn, ConversationTurn),
+    ):
+        sources = [make(i) for i in range(args.records)]
+        dict_bytes = measure(lambda i: copy_values(sources[i]), args.records)
+        record_bytes = measure(lambda i: record_type.from_dict(copy_values(sources[i])), args.records)
+        print(f"  {name:<6} 字典 {dict_bytes:7.0f} B/条   紧凑记录 {record_bytes:7.0f} B/条   "
+              f"节省 {(1 - record_bytes / dict_bytes) * 100:4.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+MemoryStore 锁竞争基准测试
+
+对比单分片（等价于全局锁）与多分片（锁条带化）在不同线程数下的吞吐量。
+每种配置在独立子进程中运行，通过 MEMORY_STORE_SHARDS 环境变量控制分片数。
+
+用法：
+    python src/tests/bench_memory_store_contention.py
+    python src/tests/bench_memory_store_contention.py --threads 1,4,16,64 --ops 20000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+
+def run_worker(threads: int, ops_per_thread: int, children: int) -> dict:
+    """在当前进程内运行一次压测，返回吞吐量"""
+    from graphs.memory_store import MemoryStore
+
+    memory_store = MemoryStore.get_instance()
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(tid: int):
+        barrier.wait()
+        for n in range(ops_per_thread):
+            child_id = f"bench_child_{(tid * 7919 + n) % children}"
+            op = n % 4
+            if op == 0:
+                memory_store.add_conversation(child_id, {"role": "user", "content": "你好"})
+            elif op == 1:
+                memory_store.increment_learning_counter(child_id, "speaking_practice_count")
+            elif op == 2:
+                memory_store.update_learning_progress(child_id, {"last_scenario": "daily_life"})
+            else:
+                memory_store.get_conversation_history(child_id)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    total_ops = threads * ops_per_thread
+    return {"ops": total_ops, "seconds": elapsed, "ops_per_sec": total_ops / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoryStore 锁竞争基准测试")
+    parser.add_argument("--threads", type=str, default="1,4,16,64")
+    parser.add_argument("--shards", type=str, default="1,64")
+    parser.add_argument("--ops", type=int, default=20000, help="每个线程的操作数")
+    parser.add_argument("--children", type=int, default=1000)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(int(args.threads), args.ops, args.children)))
+        return
+
+    print(f"{'shards':>8} {'threads':>8} {'ops/s':>14}")
+    for shards in args.shards.split(","):
+        for threads in args.threads.split(","):
+            env = {**os.environ, "MEMORY_STORE_SHARDS": shards, "RESPONSE_CACHE_SWEEP_INTERVAL": "0"}
+            out = subprocess.run(
+                [sys.executable, __file__, "--worker", "--threads", threads,
+                 "--ops", str(args.ops), "--children", str(args.children)],
+                env=env, capture_output=True, text=True, check=True
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{shards:>8} {threads:>8} {result['ops_per_sec']:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
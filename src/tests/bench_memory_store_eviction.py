@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+MemoryStore 内存预算基准测试
+
+对比不限制常驻孩子数与设置内存预算（冷数据溢出到 SQLite）时的 RSS。
+每种配置在独立子进程中运行，通过 MEMORY_STORE_MAX_RESIDENT_CHILDREN 环境变量控制预算。
+
+用法：
+    python src/tests/bench_memory_store_eviction.py
+    python src/tests/bench_memory_store_eviction.py --children 200000 --budgets 0,10000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+
+def run_worker(children: int) -> dict:
+    """在当前进程内填充数据，返回 RSS 和耗时"""
+    import gc
+    import psutil
+    from graphs.memory_store import MemoryStore
+
+    process = psutil.Process()
+    memory_store = MemoryStore.get_instance()
+    gc.collect()
+    rss_before = process.memory_info().rss
+
+    start = time.perf_counter()
+    for i in range(children):
+        child_id = f"bench_child_{i}"
+        for n in range(20):
+            memory_store.add_conversation(child_id, {
+                "role": "user" if n % 2 == 0 else "assistant",
+                "content": f"今天学校里发生了一件有趣的事情，第{n}句",
+                "type": "conversation"
+            })
+        for n in range(3):
+            memory_store.add_homework(child_id, "数学", f"口算练习第{n}页")
+        for n in range(10):
+            memory_store.add_knowledge_point(child_id, "word", f"word_{n}", "日常对话")
+    populate_seconds = time.perf_counter() - start
+
+    # 随机回访一部分孩子，测量冷数据加载开销
+    start = time.perf_counter()
+    revisits = min(children, 10000)
+    for i in range(0, children, max(1, children // revisits)):
+        memory_store.get_homework_list(f"bench_child_{i}")
+    revisit_seconds = time.perf_counter() - start
+
+    gc.collect()
+    rss_after = process.memory_info().rss
+    return {
+        "rss_before_mb": rss_before / 1024 / 1024,
+        "rss_after_mb": rss_after / 1024 / 1024,
+        "mb_per_10k_children": (rss_after - rss_before) / 1024 / 1024 / children * 10000,
+        "populate_seconds": populate_seconds,
+        "revisit_us": revisit_seconds / revisits * 1e6,
+        "stats": memory_store.get_memory_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoryStore 内存预算基准测试")
+    parser.add_argument("--children", type=int, default=50000)
+    parser.add_argument("--budgets", type=str, default="0,10000", help="常驻孩子数上限，0 表示不限制")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.children)))
+        return
+
+    print(f"👶 孩子数: {args.children}（每个孩子 20 条对话、3 项作业、10 个知识点）")
+    for budget in [int(b) for b in args.budgets.split(",")]:
+        env = {**os.environ, "MEMORY_STORE_MAX_RESIDENT_CHILDREN": str(budget), "RESPONSE_CACHE_SWEEP_INTERVAL": "0"}
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker", "--children", str(args.children)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        label = "不限制" if budget == 0 else f"预算 {budget}"
+        print(
+            f"  {label:>12}: RSS {result['rss_before_mb']:.0f}MB -> {result['rss_after_mb']:.0f}MB, "
+            f"{result['mb_per_10k_children']:.1f}MB/万孩子, 填充 {result['populate_seconds']:.1f}s, "
+            f"回访 {result['revisit_us']:.0f}us/次, "
+            f"常驻 {result['stats']['resident_children']}, 冷存储 {result['stats']['cold_children']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
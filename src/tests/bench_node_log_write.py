@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+节点日志写入基准测试
+
+用与 Logger 回调相同的日志结构（create_log_entry，输入输出为序列化后的节点状态），
+对比调用方（LangGraph 回调所在线程）每个事件的耗时：
+- 同步写入：原来的 write_log，每个事件 open + write + flush + fsync
+- 后台写入：NodeLogWriter.submit，分别使用 batch / interval / off 三种 fsync 策略
+
+同时用多个线程并发写入，模拟多个请求同时执行节点。
+
+用法：
+    python src/tests/bench_node_log_write.py
+    python src/tests/bench_node_log_write.py --events 20000 --threads 8 --dir /data/logs
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from utils.log.node_log import create_log_entry, _serialize_data
+from utils.log.node_log_writer import NodeLogWriter
+
+
+def make_entry(i: int) -> dict:
+    state = {
+        "child_id": "bench_child",
+        "user_input_text": f"I like playing football {i}",
+        "conversation_history": [{"role": "user", "content": f"今天在学校学了新的英语单词，第{n}句"} for n in range(3)],
+        "ai_response": "说得真好！我们再试一个句子：I like playing football with my friends.",
+    }
+    return create_log_entry(
+        message="Node 'speaking_practice' ended",
+        output_data=_serialize_data(state),
+        node_name="speaking_practice",
+        event_type="node_end",
+        execution_id=f"run_{i}",
+    )
+
+
+def sync_write(path: str, entry: dict) -> None:
+    """原来的写法：每个事件打开文件、写一行、flush 并 fsync"""
+    with open(path, 'a', encoding='utf-8', buffering=1) as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def run(name: str, write, events: int, threads: int, finish=None) -> None:
+    entries = [make_entry(i) for i in range(events)]
+    per_thread = events // threads
+    latencies = [[] for _ in range(threads)]
+
+    def worker(t: int):
+        out = latencies[t]
+        for entry in entries[t * per_thread:(t + 1) * per_thread]:
+            start = time.perf_counter()
+            write(entry)
+            out.append((time.perf_counter() - start) * 1_000_000)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    submitted = time.perf_counter() - start
+    extra = ""
+    if finish is not None:
+        extra = finish()
+    total = time.perf_counter() - start
+
+    flat = sorted(v for values in latencies for v in values)
+    print(f"  {name:<22} 每事件 {statistics.mean(flat):8.1f} µs  p99 {flat[int(len(flat) * 0.99)]:8.1f} µs  "
+          f"调用方合计 {submitted * 1000:7.1f} ms  写完 {total * 1000:7.1f} ms{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="节点日志写入基准测试")
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--dir", default=None, help="日志目录（默认临时目录；fsync 开销取决于所在磁盘）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        print(f"📝 节点日志写入（{args.events} 个事件, {args.threads} 个线程）")
+        path = os.path.join(tmp, "sync.log")
+        run("同步写入 + fsync", lambda entry: sync_write(path, entry), args.events, args.threads)
+
+        for fsync in ("batch", "interval", "off"):
+            writer = NodeLogWriter(os.path.join(tmp, f"{fsync}.log"), fsync=fsync)
+
+            def finish(writer=writer) -> str:
+                writer.flush()
+                stats = writer.stats()
+                writer.close()
+                return (f"  {stats['batches']} 批, 平均 {stats['avg_batch']} 条/批, "
+                        f"fsync {stats['fsyncs']} 次, 丢弃 {stats['dropped']}")
+
+            run(f"后台写入 fsync={fsync}", writer.submit, args.events, args.threads, finish)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+复习调度基准测试
+
+1. 吞吐：逐个知识点计算（原 _calculate_next_review 的 datetime + random.uniform 实现）
+   与 NumPy 批量计算 / 批量重排的对比
+2. MemoryStore 全量重排：更换调度参数后重排所有孩子的知识点
+3. 离线模拟：table 与 sm2 两种调度方案的复习次数和答对率，并把 table 方案的历史回放给 sm2
+
+用法：
+    python src/tests/bench_review_scheduler.py
+    python src/tests/bench_review_scheduler.py --points 5000000 --sim-points 50000 --days 90
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.memory_store import MemoryStore
+from graphs.review_scheduler import KnowledgeArrays, ReviewScheduler, SchedulerParams
+from graphs.review_simulator import replay, simulate
+
+
+def legacy_next_review(mastery_level: int) -> datetime:
+    """原逐个计算的实现"""
+    intervals = {
+        0: timedelta(minutes=10),
+        1: timedelta(hours=1),
+        2: timedelta(days=1),
+        3: timedelta(days=3),
+        4: timedelta(days=7),
+        5: timedelta(days=14)
+    }
+    base_interval = intervals.get(mastery_level, timedelta(days=1))
+    random_factor = random.uniform(0.8, 1.2)
+    return datetime.now() + timedelta(seconds=int(base_interval.total_seconds() * random_factor))
+
+
+def bench_throughput(points: int) -> None:
+    rng = np.random.default_rng(0)
+    mastery = rng.integers(0, 6, points)
+    correct = rng.random(points) < 0.7
+
+    sample = min(points, 200000)
+    levels = mastery[:sample].tolist()
+    start = time.perf_counter()
+    for level in levels:
+        legacy_next_review(level)
+    legacy_rate = sample / (time.perf_counter() - start)
+
+    params = SchedulerParams(algorithm="table")
+    state = KnowledgeArrays(points, params)
+    state.mastery[:] = mastery
+    scheduler = ReviewScheduler(params, seed=0)
+    start = time.perf_counter()
+    scheduler.review(state, correct, int(time.time()))
+    review_rate = points / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    ReviewScheduler(SchedulerParams(algorithm="sm2"), seed=0).reschedule(state)
+    reschedule_rate = points / (time.perf_counter() - start)
+
+    print(f"⚡ 吞吐（{points} 个知识点）")
+    print(f"  逐个计算:   {legacy_rate / 1e6:8.2f} M/s")
+    print(f"  批量复习:   {review_rate / 1e6:8.2f} M/s  （{review_rate / legacy_rate:.0f}x）")
+    print(f"  批量重排:   {reschedule_rate / 1e6:8.2f} M/s")
+
+
+def bench_store_reschedule(children: int, per_child: int) -> None:
+    memory_store = MemoryStore.get_instance()
+    for i in range(children):
+        child_id = f"bench_review_child_{i}"
+        for n in range(per_child):
+            memory_store.add_knowledge_point(child_id, "word", f"word_{n}")
+
+    start = time.perf_counter()
+    rescheduled = memory_store.set_review_scheduler(SchedulerParams(algorithm="sm2"))
+    elapsed = time.perf_counter() - start
+    print(f"🗂️ MemoryStore 全量重排: {rescheduled} 个知识点, {elapsed:.2f}s ({rescheduled / elapsed / 1e3:.0f}k/s)")
+
+
+def bench_simulation(points: int, days: int) -> None:
+    print(f"🧪 离线模拟（{points} 个知识点, {days} 天）")
+    histories = {}
+    for algorithm in ("table", "sm2"):
+        scheduler = ReviewScheduler(SchedulerParams(algorithm=algorithm), seed=1)
+        start = time.perf_counter()
+        history = simulate(scheduler, points, days, seed=1)
+        elapsed = time.perf_counter() - start
+        histories[algorithm] = history
+        print(f"  {algorithm:>5}: 每个知识点复习 {len(history) / points:5.1f} 次, "
+              f"答对率 {history.correct.mean() * 100:5.1f}%, 耗时 {elapsed:.2f}s")
+
+    stats = replay(ReviewScheduler(SchedulerParams(algorithm="sm2"), seed=1), histories["table"])
+    print(f"  table 历史回放给 sm2: 超期比例 {stats['overdue_ratio'] * 100:.1f}%, "
+          f"平均间隔 {stats['mean_interval_days']:.1f} 天, 7天内到期 {stats['due_next_days']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="复习调度基准测试")
+    parser.add_argument("--points", type=int, default=1000000)
+    parser.add_argument("--children", type=int, default=10000)
+    parser.add_argument("--per-child", type=int, default=20)
+    parser.add_argument("--sim-points", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=60)
+    args = parser.parse_args()
+
+    bench_throughput(args.points)
+    bench_store_reschedule(args.children, args.per_child)
+    bench_simulation(args.sim_points, args.days)
+
+
+if __name__ == "__main__":
+    main()
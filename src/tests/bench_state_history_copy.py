@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+工作流状态对话历史复制基准测试
+
+模拟一次对话轮次中对话历史的流转：MemoryStore 加载 → 长期记忆节点输出 → 全局状态 → 对话节点输入。
+对比旧方式（加载完整历史，List[dict] 字段在每个状态对象上重新校验复制）与
+新方式（只加载最近窗口的元组快照，各状态对象按引用持有），用 tracemalloc 统计每轮的内存分配。
+
+用法：
+    python src/tests/bench_state_history_copy.py
+    python src/tests/bench_state_history_copy.py --turns 2000 --history 100
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from typing import List
+
+from pydantic import BaseModel, Field
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.memory_store import MemoryStore
+from graphs.state import ConversationHistory
+
+
+# 旧方式：List[dict] 字段，构造时逐条校验并复制
+class LegacyMemoryOutput(BaseModel):
+    conversation_history: List[dict] = Field(default=[])
+    learning_progress: dict = Field(default={})
+
+
+class LegacyState(BaseModel):
+    child_id: str
+    conversation_history: List[dict] = Field(default=[])
+    learning_progress: dict = Field(default={})
+    ai_response: str = ""
+
+
+class LegacyNodeInput(BaseModel):
+    user_input_text: str = ""
+    conversation_history: List[dict] = Field(default=[])
+
+
+# 新方式：只读快照按引用持有
+class MemoryOutput(BaseModel):
+    conversation_history: ConversationHistory = Field(default=())
+    learning_progress: dict = Field(default={})
+
+
+class State(BaseModel):
+    child_id: str
+    conversation_history: ConversationHistory = Field(default=())
+    learning_progress: dict = Field(default={})
+    ai_response: str = ""
+
+
+class NodeInput(BaseModel):
+    user_input_text: str = ""
+    conversation_history: ConversationHistory = Field(default=())
+
+
+def run_turn(memory_store: MemoryStore, child_id: str, legacy: bool):
+    """执行一轮对话的状态流转，返回该轮的最终状态"""
+    if legacy:
+        history = memory_store.get_conversation_history(child_id)
+        output_type, state_type, input_type = LegacyMemoryOutput, LegacyState, LegacyNodeInput
+    else:
+        history = memory_store.get_recent_conversation(child_id)
+        output_type, state_type, input_type = MemoryOutput, State, NodeInput
+
+    output = output_type(conversation_history=history, learning_progress={})
+    state = state_type(child_id=child_id, conversation_history=output.conversation_history)
+    node_input = input_type(user_input_text="你好", conversation_history=state.conversation_history)
+    prompt_history = node_input.conversation_history[-3:]
+    return state.model_copy(update={"ai_response": f"收到{len(prompt_history)}条上下文"})
+
+
+def measure(memory_store: MemoryStore, child_id: str, turns: int, legacy: bool) -> dict:
+    """返回每轮的峰值分配、保留内存（状态被检查点持有）和耗时"""
+    run_turn(memory_store, child_id, legacy)
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    # 保留每轮的最终状态，模拟检查点持有状态对象
+    states = [run_turn(memory_store, child_id, legacy) for _ in range(turns)]
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del states
+
+    tracemalloc.start()
+    run_turn(memory_store, child_id, legacy)
+    _, single_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "retained": current / turns,
+        "peak": single_peak,
+        "us": elapsed / turns * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工作流状态对话历史复制基准测试")
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=100, help="孩子已有的对话条数（MemoryStore 最多保留100条）")
+    args = parser.parse_args()
+
+    memory_store = MemoryStore.get_instance()
+    child_id = "bench_state_child"
+    memory_store.clear_child_data(child_id)
+    for n in range(args.history):
+        memory_store.add_conversation(child_id, {
+            "role": "user" if n % 2 == 0 else "assistant",
+            "content": f"今天学校里发生了一件有趣的事情，第{n}句",
+            "type": "conversation"
+        })
+
+    print(f"💬 对话历史 {args.history} 条，{args.turns} 轮")
+    for label, legacy in (("复制完整历史", True), ("窗口快照引用", False)):
+        result = measure(memory_store, child_id, args.turns, legacy)
+        print(f"  {label}: 单轮峰值分配 {result['peak'] / 1024:8.1f} KB   "
+              f"每轮保留 {result['retained'] / 1024:8.1f} KB   耗时 {result['us']:7.1f} us/轮")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+cozeloop trace 开销基准测试
+
+在一个多节点的测试图上对比每次请求的耗时：
+- 只有 Logger（不挂 trace 回调，采样为 off 的运行）
+- trace 全部采样（span 交给上报队列）
+- 未被采样、等待运行结果的 trace（hold，成功后丢弃）
+
+上报队列换成只计数的 processor，不访问网络；同时输出 trace 回调自身记录的每请求开销。
+
+用法：
+    python src/tests/bench_trace_overhead.py
+    python src/tests/bench_trace_overhead.py --requests 2000 --nodes 8
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Optional
+
+os.environ.setdefault("COZE_PROJECT_ENV", "PROD")
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from langgraph.graph import StateGraph, END
+from pydantic import BaseModel
+
+from coze_coding_utils.runtime_ctx.context import new_context
+from utils.log import loop_trace
+from utils.log.loop_trace import SampledTraceHandler, init_run_config
+
+
+class BenchState(BaseModel):
+    text: str = ""
+    reply: Optional[str] = None
+
+
+class CountingProcessor:
+    def __init__(self):
+        self.spans = 0
+
+    def on_span_end(self, span):
+        self.spans += 1
+
+    def shutdown(self) -> bool:
+        return True
+
+
+def build_graph(nodes: int):
+    builder = StateGraph(BenchState)
+    names = [f"step_{i}" for i in range(nodes)]
+    for name in names:
+        builder.add_node(name, lambda state: {"reply": state.text})
+    builder.set_entry_point(names[0])
+    for current, following in zip(names, names[1:]):
+        builder.add_edge(current, following)
+    builder.add_edge(names[-1], END)
+    return builder.compile()
+
+
+def run(name: str, graph, requests: int, sample_rate: float, error_rate: float) -> float:
+    loop_trace.COZE_LOOP_SAMPLE_RATE = sample_rate
+    loop_trace.COZE_LOOP_ERROR_SAMPLE_RATE = error_rate
+    overhead = 0.0
+    start = time.perf_counter()
+    for _ in range(requests):
+        config = init_run_config(graph, new_context(method="run"))
+        graph.invoke({"text": "hi"}, config)
+        overhead += sum(h.overhead for h in config["callbacks"] if isinstance(h, SampledTraceHandler))
+    per_request = (time.perf_counter() - start) / requests * 1_000_000
+    print(f"  {name:<24} {per_request:9.1f} µs/次  trace 回调 {overhead / requests * 1_000_000:8.1f} µs/次")
+    return per_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cozeloop trace 开销基准测试")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--nodes", type=int, default=5)
+    args = parser.parse_args()
+
+    processor = CountingProcessor()
+    loop_trace.cozeloopTracer._trace_provider.span_processor = processor
+    graph = build_graph(args.nodes)
+    print(f"🔍 {args.nodes} 个节点的测试图, {args.requests} 次请求")
+
+    run("预热", graph, 20, 1.0, 1.0)
+    baseline = run("不挂 trace 回调", graph, args.requests, 0.0, 0.0)
+    sampled = run("全部采样", graph, args.requests, 1.0, 1.0)
+    held = run("hold（成功后丢弃）", graph, args.requests, 0.0, 1.0)
+    print(f"  trace 增加: 采样 {sampled - baseline:+.1f} µs/次, hold {held - baseline:+.1f} µs/次, "
+          f"交给上报队列的 span {processor.spans}")
+
+
+if __name__ == "__main__":
+    main()
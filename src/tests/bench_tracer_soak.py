@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Logger 回调状态的浸泡测试
+
+直接驱动 Logger 的 chain 回调（与 LangGraph 运行时的调用顺序相同），模拟大量请求，
+其中每 --abandon-every 个请求的节点收不到结束回调（客户端断开、超时、取消）。
+每隔一段请求输出 tracemalloc / RSS 和未结束 run 的数量，内存应保持平稳。
+
+- 默认每个请求创建新的 Logger（与 init_run_config 相同）
+- --reuse 时所有请求共用一个 Logger，检查根 run 结束时的释放
+
+节点日志在线上环境不写入，这里设置 COZE_PROJECT_ENV=PROD，只测回调本身的状态。
+
+用法：
+    python src/tests/bench_tracer_soak.py
+    python src/tests/bench_tracer_soak.py --requests 100000 --abandon-every 5 --reuse
+"""
+import argparse
+import gc
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import uuid
+
+os.environ.setdefault("COZE_PROJECT_ENV", "PROD")
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from coze_coding_utils.runtime_ctx.context import new_context
+from graphs.graph import main_graph
+from utils.log.node_log import Logger
+from utils.log.parser import get_graph_parser
+
+
+def rss_mb() -> float:
+    """当前 RSS（Linux 读 /proc，其他平台退回峰值 RSS）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def request(tracer: Logger, nodes: list, abandon: bool) -> None:
+    """一次运行：根 run + 依次执行的节点，abandon 时最后一个节点没有结束回调"""
+    root = uuid.uuid4()
+    tracer.on_chain_start_graph({}, {}, run_id=root, name="LangGraph")
+    for i, node in enumerate(nodes):
+        run_id = uuid.uuid4()
+        tracer.on_chain_start_graph({}, {}, run_id=run_id, parent_run_id=root, name=node)
+        if abandon and i == len(nodes) - 1:
+            break
+        tracer.on_chain_end_graph({}, run_id=run_id, parent_run_id=root)
+    tracer.on_chain_end_graph({}, run_id=root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logger 回调状态的浸泡测试")
+    parser.add_argument("--requests", type=int, default=1_000_000)
+    parser.add_argument("--abandon-every", type=int, default=10, help="每 N 个请求放弃一个（0 表示不放弃）")
+    parser.add_argument("--nodes", type=int, default=3, help="每个请求执行的节点数")
+    parser.add_argument("--reuse", action="store_true", help="所有请求共用一个 Logger")
+    parser.add_argument("--checkpoints", type=int, default=10)
+    args = parser.parse_args()
+
+    ctx = new_context(method="run")
+    nodes = list(get_graph_parser(main_graph).nodes)[:args.nodes]
+    shared = Logger(main_graph, ctx) if args.reuse else None
+    step = max(1, args.requests // args.checkpoints)
+    mode = "共用 Logger" if args.reuse else "每请求新建 Logger"
+    print(f"🧪 {args.requests} 次请求, 每请求 {len(nodes)} 个节点, 每 {args.abandon_every} 个放弃一个, {mode}")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    baseline = None
+    for i in range(1, args.requests + 1):
+        tracer = shared or Logger(main_graph, ctx)
+        request(tracer, nodes, args.abandon_every > 0 and i % args.abandon_every == 0)
+        if i % step == 0:
+            gc.collect()
+            traced, _ = tracemalloc.get_traced_memory()
+            baseline = traced if baseline is None else baseline
+            open_runs = len(tracer.run_id_map) + len(tracer._node_started)
+            print(f"  {i:>9} 次  traced {traced / 1024:8.1f} KB ({(traced - baseline) / 1024:+7.1f})  "
+                  f"RSS {rss_mb():7.1f} MB  未结束 run {open_runs}  "
+                  f"{(time.perf_counter() - start) / i * 1_000_000:6.1f} µs/次")
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""测试共享夹具：独立于单例的 MemoryStore"""
+import sys
+import os
+from typing import Callable, List
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.memory_store import MemoryStore
+
+
+def new_memory_store() -> MemoryStore:
+    """
+    创建独立于单例的 MemoryStore（测试和基准测试用）
+
+    用完需调用 close() 停止后台线程、关闭持久化 / 后端 / 冷存储 / 归档。
+    """
+    store = object.__new__(MemoryStore)
+    store.__init__()
+    return store
+
+
+@pytest.fixture
+def new_store() -> Callable[[], MemoryStore]:
+    """创建独立 MemoryStore 的工厂，测试结束时关闭本测试创建的所有实例"""
+    stores: List[MemoryStore] = []
+
+    def factory() -> MemoryStore:
+        store = new_memory_store()
+        stores.append(store)
+        return store
+
+    yield factory
+    for store in reversed(stores):
+        store.close()
+
+
+@pytest.fixture
+def memory_store(new_store) -> MemoryStore:
+    """单个独立的 MemoryStore，测试结束时关闭"""
+    return new_store()
@@ -0,0 +1,160 @@
+"""测试检查点保留策略（压缩、过期、低峰时段）
+
+需要真实数据库的用例通过 MEMORY_PG_TEST_URL 指定本地 Postgres，例如：
+    MEMORY_PG_TEST_URL=postgresql+psycopg://postgres@127.0.0.1:5432/postgres pytest src/tests/test_checkpoint_retention.py
+"""
+import sys
+import os
+import operator
+import uuid
+from datetime import datetime, timezone
+from typing import Annotated, List
+
+import pytest
+from pydantic import BaseModel
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from storage.memory.checkpoint_retention import CheckpointPruner, in_window, parse_window
+
+PG_TEST_URL = os.getenv("MEMORY_PG_TEST_URL", "")
+
+
+def test_prune_window():
+    """低峰时段支持跨午夜，为空时任何时间都可运行"""
+    assert parse_window("") is None
+    assert in_window(None)
+
+    night = parse_window("23:30-05:00")
+    assert in_window(night, datetime(2024, 1, 1, 23, 45))
+    assert in_window(night, datetime(2024, 1, 1, 4, 59))
+    assert not in_window(night, datetime(2024, 1, 1, 5, 0))
+    assert not in_window(night, datetime(2024, 1, 1, 12, 0))
+
+    afternoon = parse_window("13:00-15:00")
+    assert in_window(afternoon, datetime(2024, 1, 1, 14, 0))
+    assert not in_window(afternoon, datetime(2024, 1, 1, 15, 0))
+
+    with pytest.raises(ValueError):
+        parse_window("2-5")
+
+
+def test_busy_defers_pass():
+    """服务繁忙时不连接数据库，计入 deferred"""
+    pruner = CheckpointPruner("postgresql://localhost/unused", window="", is_busy=lambda: True)
+    pruner._connect = lambda: type("Conn", (), {"close": lambda self: None})()
+    assert not pruner.run_pass(respect_schedule=True)
+    assert pruner.stats()["deferred"] == 1
+
+
+class TurnState(BaseModel):
+    turns: Annotated[List[str], operator.add] = []
+    reply: str = ""
+
+
+def _build_graph(checkpointer):
+    from langgraph.graph import END, StateGraph
+
+    def respond(state: TurnState) -> dict:
+        return {"turns": [f"turn{len(state.turns)}"], "reply": "ok"}
+
+    builder = StateGraph(TurnState)
+    builder.add_node("respond", respond)
+    builder.set_entry_point("respond")
+    builder.add_edge("respond", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+@pytest.fixture
+def pg_conninfo():
+    if not PG_TEST_URL:
+        pytest.skip("MEMORY_PG_TEST_URL not set")
+    import psycopg
+
+    base = PG_TEST_URL.replace("postgresql+psycopg://", "postgresql://")
+    schema = f"ckpt_test_{uuid.uuid4().hex[:8]}"
+    with psycopg.connect(base, autocommit=True) as conn:
+        conn.execute(f"CREATE SCHEMA {schema}")
+    sep = "&" if "?" in base else "?"
+    yield f"{base}{sep}options=-csearch_path%3D{schema}"
+    with psycopg.connect(base, autocommit=True) as conn:
+        conn.execute(f"DROP SCHEMA {schema} CASCADE")
+
+
+def _count(conn, table: str, thread_id: str) -> int:
+    return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE thread_id = %s", (thread_id,)).fetchone()[0]
+
+
+def test_compact_and_expire(pg_conninfo):
+    """保留最近 K 个检查点且最新状态可恢复，过期会话整个删除"""
+    import psycopg
+    from langgraph.checkpoint.postgres import PostgresSaver
+
+    with PostgresSaver.from_conn_string(pg_conninfo) as saver:
+        saver.setup()
+        graph = _build_graph(saver)
+        for thread_id, turns in (("active", 6), ("old", 3), ("short", 1)):
+            config = {"configurable": {"thread_id": thread_id}}
+            for _ in range(turns):
+                graph.invoke({"reply": ""}, config)
+
+        with psycopg.connect(pg_conninfo, autocommit=True) as conn:
+            conn.execute(
+                "UPDATE checkpoints SET checkpoint = jsonb_set(checkpoint, '{ts}', to_jsonb('2020-01-01T00:00:00+00:00'::text))"
+                " WHERE thread_id = 'old'"
+            )
+            before = {t: _count(conn, "checkpoints", t) for t in ("active", "old", "short")}
+            assert before["active"] > 2
+
+        pruner = CheckpointPruner(pg_conninfo, keep_last=2, ttl_days=30, idle_seconds=0, batch_threads=2, pause_ms=0, window="")
+        assert pruner.run_pass(now=datetime.now(timezone.utc))
+
+        with psycopg.connect(pg_conninfo, autocommit=True) as conn:
+            assert _count(conn, "checkpoints", "active") == 2
+            assert _count(conn, "checkpoints", "short") == 2
+            for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes"):
+                assert _count(conn, table, "old") == 0
+            # 剩余 blobs 都被保留的检查点引用
+            orphans = conn.execute(
+                "SELECT COUNT(*) FROM checkpoint_blobs b WHERE NOT EXISTS ("
+                " SELECT 1 FROM checkpoints c WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns"
+                " AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version)"
+            ).fetchone()[0]
+            assert orphans == 0
+
+        stats = pruner.stats()
+        assert stats["batches"] == 2 and stats["passes"] == 1 and not stats["in_progress"]
+        assert stats["threads_expired"] == 1 and stats["threads_compacted"] == 2
+        assert stats["checkpoints_deleted"] == before["active"] - 2 + before["short"] - 2 + before["old"]
+        assert stats["rows_per_second"] > 0
+
+        # 压缩后最新状态完整，可以继续对话
+        config = {"configurable": {"thread_id": "active"}}
+        assert graph.get_state(config).values["turns"] == [f"turn{i}" for i in range(6)]
+        assert graph.invoke({"reply": ""}, config)["turns"][-1] == "turn6"
+
+        sizes = pruner.table_sizes()
+        assert set(sizes) == {"checkpoints", "checkpoint_blobs", "checkpoint_writes"}
+        assert all(s["total_bytes"] > 0 for s in sizes.values())
+
+
+def test_recent_threads_are_not_compacted(pg_conninfo):
+    """空闲时间未到的会话不压缩（避免删除刚写入的 blobs）"""
+    import psycopg
+    from langgraph.checkpoint.postgres import PostgresSaver
+
+    with PostgresSaver.from_conn_string(pg_conninfo) as saver:
+        saver.setup()
+        graph = _build_graph(saver)
+        config = {"configurable": {"thread_id": "busy"}}
+        for _ in range(4):
+            graph.invoke({"reply": ""}, config)
+
+    pruner = CheckpointPruner(pg_conninfo, keep_last=1, ttl_days=30, idle_seconds=3600, pause_ms=0, window="")
+    assert pruner.run_pass()
+    with psycopg.connect(pg_conninfo) as conn:
+        assert _count(conn, "checkpoints", "busy") > 1
+    assert pruner.stats()["checkpoints_deleted"] == 0
@@ -0,0 +1,190 @@
+"""测试检查点序列化：zstd 压缩和按通道增量写入"""
+import sys
+import os
+from typing import List
+
+import pytest
+from langgraph.channels import LastValue
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.graph import StateGraph, END
+from langgraph.pregel import NodeBuilder, Pregel
+from pydantic import BaseModel
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.state import PracticeStage
+from storage.memory.checkpoint_serde import ZSTD_TYPE, CheckpointSerializer
+from storage.memory.memory_saver import BackgroundCheckpointSaver
+
+
+def test_serializer_compresses_large_values():
+    """大值压缩为 msgpack+zstd，小值保持 msgpack，兼容默认序列化器写入的数据"""
+    serde = CheckpointSerializer(level=3, min_bytes=256)
+    history = [{"role": "user", "content": f"今天学了第{i}个单词"} for i in range(50)]
+
+    type_, data = serde.dumps_typed(history)
+    assert type_ == ZSTD_TYPE
+    assert len(data) < len(JsonPlusSerializer().dumps_typed(history)[1])
+    assert serde.loads_typed((type_, data)) == history
+
+    stage = PracticeStage(stage="followup", turn_count=3)
+    type_, data = serde.dumps_typed(stage)
+    assert type_ == "msgpack"
+    assert serde.loads_typed((type_, data)) == stage
+
+    assert serde.loads_typed(JsonPlusSerializer().dumps_typed(history)) == history
+    assert CheckpointSerializer(level=0, min_bytes=0).dumps_typed(history)[0] == "msgpack"
+
+
+class DeltaState(BaseModel):
+    turn: int = 0
+    homework_list: List[dict] = []
+    reply: str = ""
+
+
+HOMEWORK = [{"id": f"hw_{n}", "description": "口算20题" * 10, "completed": False} for n in range(5)]
+
+
+def _build_graph(checkpointer, **compile_options):
+    def load(state: DeltaState) -> dict:
+        return {"homework_list": [dict(h) for h in HOMEWORK], "turn": state.turn + 1}
+
+    def respond(state: DeltaState) -> dict:
+        return {"reply": f"第{state.turn}轮"}
+
+    builder = StateGraph(DeltaState)
+    builder.add_node("load", load)
+    builder.add_node("respond", respond)
+    builder.set_entry_point("load")
+    builder.add_edge("load", "respond")
+    builder.add_edge("respond", END)
+    return builder.compile(checkpointer=checkpointer, **compile_options)
+
+
+def _blob_count(saver: MemorySaver, channel: str) -> int:
+    return sum(1 for key in saver.blobs if key[2] == channel)
+
+
+def test_unchanged_channels_reuse_previous_blob():
+    """内容未变的通道只写一次 blob，读回的状态与完整写入一致"""
+    serde = CheckpointSerializer(level=3, min_bytes=256)
+    saver = MemorySaver(serde=serde)
+    checkpointer = BackgroundCheckpointSaver(saver, None, async_writes=False)
+    graph = _build_graph(checkpointer)
+    config = {"configurable": {"thread_id": "child_1"}}
+
+    for _ in range(4):
+        graph.invoke({"reply": ""}, config, durability="exit")
+
+    assert _blob_count(saver, "homework_list") == 1
+    assert _blob_count(saver, "turn") == 4
+    values = graph.get_state(config).values
+    assert values["homework_list"] == HOMEWORK
+    assert values["turn"] == 4 and values["reply"] == "第4轮"
+    assert checkpointer.stats()["delta"]["channels_skipped"] == 3
+    assert not serde._encoded
+
+    # 重启后（新的增量基准为空）第一轮写入全部通道，之后继续增量
+    restarted = BackgroundCheckpointSaver(saver, None, async_writes=False)
+    graph = _build_graph(restarted)
+    graph.invoke({"reply": ""}, config, durability="exit")
+    graph.invoke({"reply": ""}, config, durability="exit")
+    assert _blob_count(saver, "homework_list") == 2
+    assert graph.get_state(config).values["turn"] == 6
+
+    # 内容变化时写入新 blob
+    HOMEWORK[0]["completed"] = True
+    try:
+        graph.invoke({"reply": ""}, config, durability="exit")
+        assert _blob_count(saver, "homework_list") == 3
+        assert graph.get_state(config).values["homework_list"][0]["completed"] is True
+    finally:
+        HOMEWORK[0]["completed"] = False
+
+
+def test_background_writes_with_delta():
+    """后台写入时增量同样生效，不同会话互不影响"""
+    saver = MemorySaver(serde=CheckpointSerializer())
+    checkpointer = BackgroundCheckpointSaver(saver, None, async_writes=True)
+    graph = _build_graph(checkpointer)
+    try:
+        for _ in range(3):
+            for thread_id in ("a", "b"):
+                graph.invoke({"reply": ""}, {"configurable": {"thread_id": thread_id}}, durability="exit")
+        checkpointer.flush()
+        assert _blob_count(saver, "homework_list") == 2
+        for thread_id in ("a", "b"):
+            values = graph.get_state({"configurable": {"thread_id": thread_id}}).values
+            assert values["turn"] == 3 and values["homework_list"] == HOMEWORK
+    finally:
+        checkpointer.close()
+
+
+def test_downstream_nodes_run_on_resume():
+    """下游节点失败后从增量写入的检查点恢复，下游节点照常执行，未变的通道仍只写一次 blob"""
+    failed = set()
+
+    def load(state: DeltaState) -> dict:
+        return {"homework_list": [dict(h) for h in HOMEWORK], "turn": state.turn + 1}
+
+    def respond(state: DeltaState) -> dict:
+        if state.turn not in failed:
+            failed.add(state.turn)
+            raise ConnectionError("model timeout")
+        return {"reply": f"第{state.turn}轮"}
+
+    builder = StateGraph(DeltaState)
+    builder.add_node("load", load)
+    builder.add_node("respond", respond)
+    builder.set_entry_point("load")
+    builder.add_edge("load", "respond")
+    builder.add_edge("respond", END)
+    saver = MemorySaver(serde=CheckpointSerializer())
+    graph = builder.compile(checkpointer=BackgroundCheckpointSaver(saver, None, async_writes=False))
+    config = {"configurable": {"thread_id": "child_1"}}
+
+    for turn in (1, 2, 3):
+        with pytest.raises(ConnectionError):
+            graph.invoke({"reply": ""}, config, durability="sync")
+        assert graph.get_state(config).next == ("respond",)
+        assert graph.invoke(None, config, durability="sync")["reply"] == f"第{turn}轮"
+    assert _blob_count(saver, "homework_list") == 1
+
+
+def test_downstream_nodes_run_after_interrupt():
+    """中断后恢复：中断记录的通道版本不会因增量而退回，下游节点照常执行"""
+    saver = MemorySaver(serde=CheckpointSerializer())
+    graph = _build_graph(BackgroundCheckpointSaver(saver, None, async_writes=False), interrupt_before=["respond"])
+    config = {"configurable": {"thread_id": "child_1"}}
+
+    for turn in (1, 2, 3):
+        graph.invoke({"reply": ""}, config, durability="sync")
+        assert graph.get_state(config).next == ("respond",)
+        assert graph.invoke(None, config, durability="sync")["reply"] == f"第{turn}轮"
+    assert _blob_count(saver, "homework_list") == 1
+
+
+def test_channels_that_trigger_nodes_are_always_written():
+    """直接订阅状态通道的节点：内容未变的通道也写入新版本，恢复后节点仍被触发"""
+    runs = []
+    fetch = NodeBuilder().subscribe_only("question").do(lambda question: "同一份资料").write_to("material")
+    read = NodeBuilder().subscribe_only("material").do(lambda material: runs.append(material) or len(runs)).write_to("answer")
+    saver = MemorySaver(serde=CheckpointSerializer())
+    app = Pregel(
+        nodes={"fetch": fetch, "read": read},
+        channels={"question": LastValue(str), "material": LastValue(str), "answer": LastValue(int)},
+        input_channels=["question"],
+        output_channels=["answer"],
+        checkpointer=BackgroundCheckpointSaver(saver, None, async_writes=False),
+        interrupt_before_nodes=["read"],
+    )
+    config = {"configurable": {"thread_id": "child_1"}}
+
+    for turn in (1, 2, 3):
+        app.invoke({"question": f"第{turn}个问题"}, config, durability="sync")
+        assert app.invoke(None, config, durability="sync") == {"answer": turn}
+    assert _blob_count(saver, "material") == 3
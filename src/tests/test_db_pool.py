@@ -0,0 +1,135 @@
+"""测试数据库连接池：按 worker 数分配大小、预热、获取连接统计
+
+需要真实数据库的用例通过 MEMORY_PG_TEST_URL 指定本地 Postgres，例如：
+    MEMORY_PG_TEST_URL=postgresql+psycopg://postgres@127.0.0.1:5432/postgres pytest src/tests/test_db_pool.py
+"""
+import sys
+import os
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from storage.database import db
+
+PG_TEST_URL = os.getenv("MEMORY_PG_TEST_URL", "")
+
+
+def test_pool_limits_follow_worker_count(monkeypatch):
+    """每个进程的连接数 = 总连接数 / worker 数，再按比例分给各个连接池"""
+    monkeypatch.setattr(db, "DB_MAX_CONNECTIONS", 100)
+    monkeypatch.setattr(db, "DB_WORKERS", 1)
+    assert db.pool_limits("engine") == (20, 40)
+    assert db.pool_limits("checkpoint") == (15, 30)
+
+    monkeypatch.setattr(db, "DB_WORKERS", 4)
+    assert db.pool_limits("engine") == (5, 10)
+    total = sum(db.pool_limits(name)[1] for name in db.DB_POOL_SHARES) * 4
+    assert total <= 100
+
+    monkeypatch.setattr(db, "DB_WORKERS", 200)
+    assert db.pool_limits("async_engine") == (1, 1)
+
+
+def test_async_db_url():
+    assert db.async_db_url("postgresql://u:p@h:5432/d?sslmode=require") == "postgresql+psycopg://u:p@h:5432/d?sslmode=require"
+    assert db.async_db_url("postgres://h/d") == "postgresql+psycopg://h/d"
+    assert db.async_db_url("postgresql+psycopg2://h/d") == "postgresql+psycopg://h/d"
+
+
+def test_instrumented_pool_stats(tmp_path):
+    """统计借出连接数、等待中的请求数和获取超时"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=db.InstrumentedQueuePool, pool_size=2, max_overflow=0, pool_timeout=0.2
+    )
+    assert db.prewarm_engine(engine, 5) == 2
+    stats = engine.pool.get_stats()
+    assert stats["idle"] == 2 and stats["checked_out"] == 0 and stats["acquires"] == 2
+
+    held = [engine.connect(), engine.connect()]
+    assert engine.pool.get_stats()["checked_out"] == 2
+
+    # 连接池耗尽时请求进入等待，超时后计入 acquire_errors
+    waiting = threading.Event()
+    errors = []
+
+    def acquire():
+        waiting.set()
+        try:
+            engine.connect()
+        except PoolTimeoutError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    waiting.wait()
+    thread.join()
+    for conn in held:
+        conn.close()
+
+    stats = engine.pool.get_stats()
+    assert len(errors) == 1
+    assert stats["acquire_errors"] == 1 and stats["max_waiting"] >= 1 and stats["waiting"] == 0
+    assert stats["max_acquire_ms"] >= 0 and stats["avg_acquire_ms"] is not None
+    engine.dispose()
+
+
+def test_init_database_prewarms_pools(monkeypatch):
+    """启动时异步确认数据库可连接，并预热异步和同步连接池"""
+    if not PG_TEST_URL:
+        pytest.skip("MEMORY_PG_TEST_URL not set")
+    monkeypatch.setenv("PGDATABASE_URL", PG_TEST_URL.replace("+psycopg", ""))
+    monkeypatch.setattr(db, "_engine", None)
+    monkeypatch.setattr(db, "_async_engine", None)
+    monkeypatch.setattr(db, "_db_ready", False)
+    monkeypatch.setattr(db, "DB_POOL_PREWARM", 2)
+
+    async def run():
+        try:
+            assert await db.init_database(timeout=5)
+            stats = db.get_pool_stats()
+            assert stats["async_engine"]["idle"] == 2
+            assert stats["engine"]["idle"] == 2
+            assert stats["engine"]["acquire_errors"] == 0
+        finally:
+            await db.dispose_async_engine()
+            if db._engine is not None:
+                db._engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_init_database_gives_up_without_blocking(monkeypatch):
+    """数据库不可达时在超时后返回False，等待期间事件循环可以处理其他协程"""
+    monkeypatch.setenv("PGDATABASE_URL", "postgresql://postgres@127.0.0.1:1/none?connect_timeout=1")
+    monkeypatch.setattr(db, "_engine", None)
+    monkeypatch.setattr(db, "_async_engine", None)
+    monkeypatch.setattr(db, "_db_ready", False)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.05)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        try:
+            assert not await db.init_database(timeout=0.5)
+        finally:
+            task.cancel()
+            await db.dispose_async_engine()
+        assert ticks >= 5
+        assert db._engine is None
+
+    asyncio.run(run())
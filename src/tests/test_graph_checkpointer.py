@@ -0,0 +1,139 @@
+"""测试工作流 checkpointer：后台写入和跨轮次恢复的状态字段"""
+import sys
+import os
+import asyncio
+import time
+from typing import Optional
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, END
+from pydantic import BaseModel
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.state import GlobalState, PracticeStage, SpeakingPracticeWrapOutput
+from storage.memory.memory_saver import (
+    BackgroundCheckpointSaver, GRAPH_RESUME_CHANNELS, ThreadRunLocks, get_graph_checkpointer
+)
+
+
+class SlowSaver(MemorySaver):
+    """每次写入耗时 delay 秒的 MemorySaver（模拟数据库写入）"""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def put(self, *args, **kwargs):
+        time.sleep(self.delay)
+        return super().put(*args, **kwargs)
+
+
+class TurnState(BaseModel):
+    user_input_text: str = ""
+    ai_response: str = ""
+    practice_stage: Optional[PracticeStage] = None
+
+
+def practice(state: TurnState) -> dict:
+    turn = state.practice_stage.turn_count + 1 if state.practice_stage else 1
+    update = {"practice_stage": PracticeStage(stage="question", turn_count=turn)}
+    if not state.ai_response:
+        update["ai_response"] = f"第{turn}轮"
+    return update
+
+
+def _compile(checkpointer):
+    builder = StateGraph(TurnState)
+    builder.add_node("practice", practice)
+    builder.set_entry_point("practice")
+    builder.add_edge("practice", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def test_practice_stage_resumes_across_turns():
+    """口语练习阶段跨轮次恢复，其他字段每轮重新开始"""
+    checkpointer = BackgroundCheckpointSaver(MemorySaver(), GRAPH_RESUME_CHANNELS["full_companion"])
+    graph = _compile(checkpointer)
+    config = {"configurable": {"thread_id": "child_1"}}
+
+    results = [graph.invoke({"user_input_text": "hi"}, config, durability="exit") for _ in range(3)]
+    assert [r["practice_stage"].turn_count for r in results] == [1, 2, 3]
+    # ai_response 不恢复：每轮都由节点重新生成
+    assert [r["ai_response"] for r in results] == ["第1轮", "第2轮", "第3轮"]
+
+    other = graph.invoke({"user_input_text": "hi"}, {"configurable": {"thread_id": "child_2"}}, durability="exit")
+    assert other["practice_stage"].turn_count == 1
+    checkpointer.close()
+
+
+def test_concurrent_runs_of_a_thread_are_serialized():
+    """同一线程的并发运行依次执行，每次都从上一次写入的检查点开始；不同线程互不等待"""
+    async def slow_practice(state: TurnState) -> dict:
+        await asyncio.sleep(0.05)
+        return practice(state)
+
+    builder = StateGraph(TurnState)
+    builder.add_node("practice", slow_practice)
+    builder.set_entry_point("practice")
+    builder.add_edge("practice", END)
+    checkpointer = BackgroundCheckpointSaver(MemorySaver(), ("practice_stage",))
+    graph = builder.compile(checkpointer=checkpointer)
+    locks = ThreadRunLocks()
+
+    async def turn(thread_id: str) -> int:
+        async with locks.hold(thread_id):
+            config = {"configurable": {"thread_id": thread_id}}
+            result = await graph.ainvoke({"user_input_text": "hi"}, config, durability="exit")
+        return result["practice_stage"].turn_count
+
+    async def main():
+        return await asyncio.gather(*(turn("child_1") for _ in range(3)), turn("child_2"))
+
+    start = time.perf_counter()
+    *same_thread, other = asyncio.run(main())
+    assert sorted(same_thread) == [1, 2, 3]
+    assert other == 1
+    assert time.perf_counter() - start < 0.05 * 4
+    assert len(locks) == 0
+    checkpointer.close()
+
+
+def test_writes_do_not_block_turns():
+    """检查点写入在后台完成，不计入本轮耗时；下一轮读取前等待写入完成"""
+    delay = 0.2
+    checkpointer = BackgroundCheckpointSaver(SlowSaver(delay), ("practice_stage",))
+    graph = _compile(checkpointer)
+    config = {"configurable": {"thread_id": "child_1"}}
+
+    start = time.perf_counter()
+    graph.invoke({"user_input_text": "hi"}, config, durability="exit")
+    assert time.perf_counter() - start < delay
+
+    result = graph.invoke({"user_input_text": "hi"}, config, durability="exit")
+    assert result["practice_stage"].turn_count == 2
+    assert checkpointer.flush(timeout=5)
+    assert checkpointer.stats()["writes"] >= 2
+    checkpointer.close()
+
+
+def test_sync_writes_and_mode_selection():
+    """关闭后台写入时同步写入；未启用的模式不创建 checkpointer"""
+    saver = SlowSaver(0.05)
+    checkpointer = BackgroundCheckpointSaver(saver, ("practice_stage",), async_writes=False)
+    graph = _compile(checkpointer)
+    start = time.perf_counter()
+    graph.invoke({"user_input_text": "hi"}, {"configurable": {"thread_id": "c"}}, durability="exit")
+    assert time.perf_counter() - start >= 0.05
+    checkpointer.close()
+
+    assert get_graph_checkpointer("no_such_mode") is None
+
+
+def test_state_declares_resume_channels():
+    """恢复字段都是工作流状态中的字段，口语练习包装节点会写回阶段"""
+    assert set(GRAPH_RESUME_CHANNELS["full_companion"]) <= set(GlobalState.model_fields)
+    assert "practice_stage" in SpeakingPracticeWrapOutput.model_fields
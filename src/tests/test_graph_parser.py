@@ -0,0 +1,87 @@
+"""测试图解析结果的缓存：每个已编译图只解析一次，各请求的 Logger 共享"""
+import sys
+import os
+import gc
+import threading
+from typing import Optional
+
+from langgraph.graph import StateGraph, END
+from pydantic import BaseModel
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from coze_coding_utils.runtime_ctx.context import new_context
+from utils.log import parser as parser_module
+from utils.log.node_log import Logger
+from utils.log.parser import LangGraphParser, get_graph_parser
+
+
+class ParseState(BaseModel):
+    text: str = ""
+    reply: Optional[str] = None
+
+
+def _build_graph():
+    def parse_reply(state: ParseState) -> dict:
+        """
+        title: 回复
+        desc: 生成回复
+        """
+        return {"reply": state.text}
+
+    builder = StateGraph(ParseState)
+    builder.add_node("parse_reply", parse_reply, metadata={"type": "agent"})
+    builder.set_entry_point("parse_reply")
+    builder.add_edge("parse_reply", END)
+    return builder.compile()
+
+
+def test_parser_cached_per_graph(monkeypatch):
+    """同一个图的 Logger 共享解析结果，并发获取也只解析一次"""
+    built = []
+    original_init = LangGraphParser.__init__
+
+    def counting_init(self, app):
+        built.append(app)
+        original_init(self, app)
+
+    monkeypatch.setattr(LangGraphParser, "__init__", counting_init)
+    graph = _build_graph()
+
+    threads = [threading.Thread(target=lambda: Logger(graph, new_context(method="run"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    loggers = [Logger(graph, new_context(method="run")) for _ in range(3)]
+    assert len(built) == 1
+    assert all(logger.parser is loggers[0].parser for logger in loggers)
+
+    other = _build_graph()
+    assert get_graph_parser(other) is not loggers[0].parser
+    assert len(built) == 2
+
+
+def test_node_tags_from_cache():
+    """trace 标签来自预先计算的结果，调用方修改返回值不影响缓存"""
+    logger = Logger(_build_graph(), new_context(method="run"))
+    tags = logger.get_node_tags("parse_reply")
+    assert tags == {"node_id": "parse_reply", "node_type": "agent", "node_title": "回复", "node_name": "parse_reply"}
+    tags["node_title"] = "changed"
+    assert logger.get_node_tags("parse_reply")["node_title"] == "回复"
+    assert logger.get_node_tags("missing") == {}
+    assert logger.get_node_tags("") == {}
+
+
+def test_cache_released_with_graph():
+    """图不再被引用时缓存随之释放"""
+    graph = _build_graph()
+    get_graph_parser(graph)
+    assert graph in parser_module._parsers
+    count = len(parser_module._parsers)
+    del graph
+    gc.collect()
+    assert len(parser_module._parsers) == count - 1
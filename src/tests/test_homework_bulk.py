@@ -0,0 +1,61 @@
+"""测试 MemoryStore 批量布置作业"""
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+
+ASSIGNMENTS = [
+    {"subject": "数学", "description": "口算20题"},
+    {"subject": "语文", "description": "背诵古诗", "deadline_days": 3},
+]
+
+
+def test_bulk_matches_single_adds(new_store):
+    """批量布置的作业与逐个 add_homework 的结果结构一致"""
+    store = new_store()
+    roster = [f"student_{i}" for i in range(45)]
+    assigned = store.add_homework_bulk(roster + ["student_0"], ASSIGNMENTS)
+
+    assert list(assigned) == roster
+    store.add_homework("single", "数学", "口算20题")
+    store.add_homework("single", "语文", "背诵古诗", deadline_days=3)
+    expected = [{k: v for k, v in hw.items() if k != "id"} for hw in store.get_homework_list("single")]
+
+    for child_id in roster:
+        homework_list = store.get_homework_list(child_id)
+        assert [hw["id"] for hw in homework_list] == assigned[child_id]
+        assert [{k: v for k, v in hw.items() if k != "id"} for hw in homework_list] == expected
+        assert len(store.get_valid_homework(child_id)) == 2
+
+    # 模板复制出的记录互不影响
+    assert store.complete_homework("student_0", assigned["student_0"][0])
+    assert len(store.get_valid_homework("student_1")) == 2
+
+
+def test_homework_ids_unique(new_store):
+    """同一秒内的批量和单个作业ID都不重复，两个进程（存储实例）之间也不重复"""
+    store = new_store()
+    ids = [hw_id for hw_ids in store.add_homework_bulk(["a", "b"], ASSIGNMENTS * 50).values() for hw_id in hw_ids]
+    ids += [store.add_homework("a", "数学", f"作业{n}") for n in range(100)]
+    ids += [hw_id for hw_ids in new_store().add_homework_bulk(["a"], ASSIGNMENTS).values() for hw_id in hw_ids]
+    assert len(ids) == len(set(ids)) == 302
+
+
+def test_bulk_is_journaled(tmp_path, new_store):
+    """批量作业写入 WAL，重启后恢复"""
+    store = new_store()
+    store.enable_persistence(str(tmp_path))
+    assigned = store.add_homework_bulk(["c1", "c2"], ASSIGNMENTS)
+    store.close_persistence()
+
+    restored = new_store()
+    restored.enable_persistence(str(tmp_path))
+    try:
+        assert [hw["id"] for hw in restored.get_homework_list("c2")] == assigned["c2"]
+        assert restored.get_homework_list("c1") == store.get_homework_list("c1")
+    finally:
+        restored.close_persistence()
@@ -0,0 +1,79 @@
+"""测试 MemoryStore 知识点统计的增量维护"""
+import sys
+import os
+import random
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.memory_records import now_epoch
+from graphs.memory_store import MemoryStore
+
+
+def _scan_statistics(store: MemoryStore, child_id: str) -> dict:
+    """全量遍历计算的统计结果（对照）"""
+    now = now_epoch()
+    points = store.get_all_knowledge_points(child_id)
+    levels = [kp["mastery_level"] for kp in points]
+    due = [kp for kp in store.update_child_data(child_id, lambda data: list(data["knowledge_points"]))
+           if kp.next_review_time is not None and kp.next_review_time <= now]
+    return {
+        "total": len(points),
+        "mastered": sum(1 for level in levels if level >= 4),
+        "learning": sum(1 for level in levels if 2 <= level < 4),
+        "need_review": len(due),
+    }
+
+
+def test_counters_follow_updates(new_store):
+    """增删改后计数与全量遍历结果一致"""
+    store = new_store()
+    assert store.get_knowledge_statistics("c1") == {"total": 0, "mastered": 0, "learning": 0, "need_review": 0}
+
+    rng = random.Random(7)
+    ids = [store.add_knowledge_point("c1", "word", f"word_{i}") for i in range(30)]
+    # 重复添加不计数
+    store.add_knowledge_point("c1", "word", "WORD_0")
+    for _ in range(200):
+        store.update_knowledge_mastery("c1", rng.choice(ids), rng.random() < 0.7)
+
+    stats = store.get_knowledge_statistics("c1")
+    assert stats["total"] == 30
+    assert stats == _scan_statistics(store, "c1")
+
+
+def test_due_index_after_direct_update(new_store):
+    """通过 update_child_data 修改复习时间后，到期统计和待复习列表同步更新"""
+    store = new_store()
+    ids = [store.add_knowledge_point("c1", "word", f"word_{i}") for i in range(5)]
+    assert store.get_knowledge_statistics("c1")["need_review"] == 0
+
+    def make_due(child_data):
+        for offset, kp in enumerate(child_data["knowledge_points"][:3]):
+            kp.next_review_time = now_epoch() - 60 * (offset + 1)
+
+    store.update_child_data("c1", make_due)
+    assert store.get_knowledge_statistics("c1")["need_review"] == 3
+    # 按到期时间排序，最早到期的在前
+    due = store.get_due_for_review("c1", limit=2)
+    assert [kp["id"] for kp in due] == [ids[2], ids[1]]
+    assert all(kp["is_due"] for kp in due)
+    assert store.update_knowledge_mastery("c1", "kp_missing", True) is None
+
+    store.clear_child_data("c1")
+    assert store.get_knowledge_statistics("c1")["total"] == 0
+
+
+def test_due_index_after_mutating_reference(new_store):
+    """直接修改 _get_child_data 返回的数据后，到期统计按当前数据重建"""
+    store = new_store()
+    ids = [store.add_knowledge_point("c1", "word", f"word_{i}") for i in range(3)]
+    assert store.get_knowledge_statistics("c1")["need_review"] == 0
+
+    for kp in store._get_child_data("c1")["knowledge_points"][:2]:
+        kp["next_review_time"] = now_epoch() - 60
+    assert store.get_knowledge_statistics("c1")["need_review"] == 2
+    assert {kp["id"] for kp in store.get_due_for_review("c1")} == set(ids[:2])
+    assert store.get_knowledge_statistics("c1") == _scan_statistics(store, "c1")
@@ -0,0 +1,64 @@
+"""测试 load_memory 按路由分支加载记忆"""
+import sys
+import os
+from types import SimpleNamespace
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.graph import wrap_load_memory, wrap_route_decision, wrap_save_memory
+from graphs.memory_store import MemoryStore
+from graphs.state import LoadMemoryWrapInput, SaveMemoryWrapInput
+
+RUNTIME = SimpleNamespace(context=None)
+
+
+def _count_reads(monkeypatch) -> dict:
+    """统计 MemoryStore 的读取次数"""
+    calls = {}
+    for name in ("get_recent_conversation", "get_learning_progress", "get_speaking_practice_count"):
+        original = getattr(MemoryStore, name)
+
+        def counted(self, *args, _name=name, _original=original, **kwargs):
+            calls[_name] = calls.get(_name, 0) + 1
+            return _original(self, *args, **kwargs)
+
+        monkeypatch.setattr(MemoryStore, name, counted)
+    return calls
+
+
+def _load(user_input_text: str, trigger_type: str = "conversation"):
+    return wrap_load_memory(LoadMemoryWrapInput(
+        child_id="lazy_child", child_name="小明", child_age=8,
+        trigger_type=trigger_type, user_input_text=user_input_text
+    ), {}, RUNTIME)
+
+
+def test_quick_reply_skips_memory_reads(monkeypatch):
+    """快速回复分支不读取任何记忆，实时对话只读取对话历史"""
+    calls = _count_reads(monkeypatch)
+    output = _load("这是什么")
+    assert output.route == "快速回复"
+    assert wrap_route_decision(output) == "快速回复"
+    assert output.memory_loaded == []
+    assert calls == {}
+
+    output = _load("我们今天去了动物园")
+    assert output.route == "实时对话"
+    assert calls == {"get_recent_conversation": 1}
+
+
+def test_save_memory_resolves_unloaded_practice_count():
+    """保存记忆时未加载的练习次数从存储中读取，不会被默认值覆盖"""
+    memory_store = MemoryStore.get_instance()
+    memory_store.clear_child_data("lazy_child")
+    memory_store.update_speaking_practice_count("lazy_child", 5)
+
+    output = wrap_save_memory(SaveMemoryWrapInput(
+        child_id="lazy_child", trigger_type="practice", user_input_text="这是什么",
+        ai_response="这是苹果", route="快速回复"
+    ), {}, RUNTIME)
+    assert output.speaking_practice_count == 5
+    assert memory_store.get_learning_progress("lazy_child")["speaking_practice_count"] == 5
@@ -0,0 +1,92 @@
+"""测试应用日志的队列管道：调用方线程只入队，监听线程格式化写入；请求体日志限流和截断"""
+import sys
+import os
+import json
+import logging
+import queue
+import threading
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from coze_coding_utils.runtime_ctx.context import new_context
+from utils.log import write_log
+from utils.log.write_log import (
+    RecordQueueHandler, _BodyRateLimiter, flush_logging, loggable_body, request_context, setup_logging,
+)
+
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    monkeypatch.setattr(write_log, "LOG_ASYNC", True)
+    path = str(tmp_path / "app.log")
+    setup_logging(log_file=path, console_output=False)
+    yield path
+    write_log._stop_listener()
+    write_log._queue_handler = None
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def _records(path: str) -> list:
+    flush_logging()
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_formatted_on_listener_thread(log_file, monkeypatch):
+    """请求上下文在调用方线程取得，格式化在监听线程执行"""
+    threads = []
+    original = write_log._format_json
+
+    def recording_format(formatter, record):
+        threads.append(threading.current_thread())
+        return original(formatter, record)
+
+    monkeypatch.setattr(write_log, "_format_json", recording_format)
+    ctx = new_context(method="run")
+    token = request_context.set(ctx)
+    try:
+        args = {"turn": 1}
+        logging.getLogger("test.pipeline").info("请求 %s", args, extra={"obj": object()})
+        args["turn"] = 2
+    finally:
+        request_context.reset(token)
+
+    record = [r for r in _records(log_file) if r["logger"] == "test.pipeline"][0]
+    assert record["message"] == "请求 {'turn': 1}"
+    assert record["run_id"] == ctx.run_id and record["method"] == "run"
+    assert record["obj"].startswith("<object object")
+    assert threads and threading.main_thread() not in threads
+
+
+def test_full_queue_drops_records():
+    """队列满时丢弃记录并计数，不阻塞也不报错"""
+    handler = RecordQueueHandler(queue.Queue(maxsize=1))
+    logger = logging.getLogger("test.pipeline.full")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        for i in range(3):
+            logger.warning("message %d", i)
+    finally:
+        logger.removeHandler(handler)
+    assert handler.queue.qsize() == 1 and handler.dropped == 2
+    assert handler.queue.get_nowait().getMessage() == "message 0"
+
+
+def test_request_body_rate_limited_and_truncated(monkeypatch):
+    """请求体按路由限流，超长时截断"""
+    monkeypatch.setattr(write_log, "_body_limiter", _BodyRateLimiter(2))
+    monkeypatch.setattr(write_log, "LOG_REQUEST_BODY_MAX_CHARS", 10)
+    assert loggable_body("run", "{}") == "{}"
+    assert loggable_body("run", "a" * 25) == "a" * 10 + "…(+15 chars)"
+    assert loggable_body("run", "{}") == "<2 chars, rate limited>"
+    assert loggable_body("node_run", "{}") == "{}"
+    assert write_log._body_limiter.suppressed == 1
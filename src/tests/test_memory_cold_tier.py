@@ -0,0 +1,67 @@
+"""测试 MemoryStore 冷数据层（按内存预算溢出到 SQLite）"""
+import sys
+import os
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from storage.memory.memory_cold_store import SQLiteColdStore
+
+
+def test_inactive_children_spill_and_reload(tmp_path, new_store):
+    """超出预算的孩子溢出到冷存储，再次访问时数据完整"""
+    store = new_store()
+    store.enable_cold_tier(store._num_shards, path=str(tmp_path / "cold.sqlite3"))
+
+    for i in range(300):
+        child_id = f"child_{i}"
+        store.add_homework(child_id, "数学", f"作业{i}")
+        store.add_conversation(child_id, {"role": "user", "content": f"你好{i}"})
+
+    stats = store.get_memory_stats()
+    assert stats["resident_children"] <= store._num_shards
+    assert stats["resident_children"] + stats["cold_children"] == 300
+
+    homework = store.get_homework_list("child_0")
+    assert homework[0]["description"] == "作业0"
+    assert store.get_conversation_history("child_0")[0]["content"] == "你好0"
+    assert store.get_memory_stats()["loaded"] >= 1
+
+    # 清除时冷存储中的数据一并删除
+    store.clear_child_data("child_1")
+    assert store.get_homework_list("child_1") == []
+
+
+def test_snapshot_includes_cold_children(tmp_path, new_store):
+    """快照包含已溢出到冷存储的孩子"""
+    store = new_store()
+    store.enable_cold_tier(store._num_shards, path=str(tmp_path / "cold.sqlite3"))
+    store.enable_persistence(str(tmp_path / "persist"), sync_mode="off")
+    for i in range(200):
+        store.add_homework(f"child_{i}", "语文", f"背诵{i}")
+    assert store.get_memory_stats()["cold_children"] > 0
+    store.create_snapshot()
+    store.close_persistence()
+
+    restored = new_store()
+    stats = restored.enable_persistence(str(tmp_path / "persist"))
+    assert stats["children"] == 200
+    assert restored.get_homework_list("child_7")[0]["description"] == "背诵7"
+    restored.close_persistence()
+
+
+def test_shared_path_fails_fast(tmp_path):
+    """同一路径已被占用时打开失败，不会清空已有的冷数据"""
+    path = str(tmp_path / "cold.sqlite3")
+    first = SQLiteColdStore(path)
+    first.put_many(0, [("c1", {"speaking_practice_count": 3})])
+    with pytest.raises(RuntimeError):
+        SQLiteColdStore(path)
+    assert first.get("c1") == {"speaking_practice_count": 3}
+
+    first.close()
+    SQLiteColdStore(path).close()
@@ -0,0 +1,145 @@
+"""测试 MemoryStore 持久化（WAL + 快照）"""
+import sys
+import os
+import threading
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.memory_store import MemoryStore
+from storage.memory.memory_persistence import WriteAheadLog, _read_frames
+
+
+@pytest.fixture
+def persistent_store(new_store, tmp_path):
+    """创建在 tmp_path 下启用持久化的独立 MemoryStore 的工厂"""
+    def factory(**wal_options) -> MemoryStore:
+        store = new_store()
+        store.enable_persistence(str(tmp_path), **wal_options)
+        return store
+    return factory
+
+
+def test_wal_torn_tail_is_ignored(tmp_path):
+    """崩溃留下的残缺尾帧在恢复时被忽略"""
+    wal = WriteAheadLog(str(tmp_path), sync_mode="batch")
+    for i in range(3):
+        wal.append("spc", "c1", i)
+    wal.close()
+
+    segment = next(p for p in tmp_path.iterdir() if p.name.startswith("wal-"))
+    with open(segment, "ab") as f:
+        f.write(b"\x10\x00\x00\x00partial")
+
+    lsns = [lsn for lsn, _ in _read_frames(str(segment))]
+    assert lsns == [1, 2, 3]
+
+
+def test_restore_from_wal(persistent_store):
+    """未生成快照时，重放 WAL 恢复全部变更"""
+    store = persistent_store(sync_mode="always")
+    store.add_conversation("c1", {"user_input": "你好", "ai_response": "你好呀"})
+    hw_id = store.add_homework("c1", "数学", "口算20题")
+    store.complete_homework("c1", hw_id)
+    kp_id = store.add_knowledge_point("c1", "word", "apple", "苹果")
+    store.update_knowledge_mastery("c1", kp_id, True)
+    store.increment_learning_counter("c1", "total_practice", extra={"last_practice": "apple"})
+    store.increment_speaking_practice_count("c1", 2)
+    store.add_homework("c2", "语文", "背诵古诗")
+    store.clear_child_data("c2")
+    store.close_persistence()
+
+    restored = persistent_store()
+    assert restored.get_conversation_history("c1")[0]["user_input"] == "你好"
+    homework = restored.get_homework_list("c1")
+    assert homework[0]["completed"] is True
+    kp = restored.get_all_knowledge_points("c1")[0]
+    assert kp["review_count"] == 1
+    assert restored.get_learning_progress("c1")["total_practice"] == 1
+    assert restored.get_learning_progress("c1")["last_practice"] == "apple"
+    assert restored.get_speaking_practice_count("c1") == 2
+    assert restored.get_homework_list("c2") == []
+    restored.close_persistence()
+
+
+def test_snapshot_truncates_wal_and_restores(tmp_path, persistent_store):
+    """快照之后旧 WAL 段被删除，恢复 = 快照 + WAL 尾部"""
+    store = persistent_store(sync_mode="batch")
+    for i in range(50):
+        store.add_homework(f"child_{i}", "数学", f"作业{i}")
+    stats = store.create_snapshot()
+    assert stats["snapshot_lsn"] == 50
+
+    store.add_homework("child_0", "语文", "快照之后")
+    store.close_persistence()
+
+    wal_segments = [p for p in tmp_path.iterdir() if p.name.startswith("wal-")]
+    assert all(int(p.name[4:-4]) > 50 for p in wal_segments)
+
+    restored = persistent_store()
+    assert len(restored.get_homework_list("child_0")) == 2
+    assert len(restored.get_homework_list("child_49")) == 1
+    restored.close_persistence()
+
+
+def test_always_mode_waits_outside_shard_lock(persistent_store):
+    """sync_mode=always 时写入方在释放分片锁之后才等待落盘"""
+    store = persistent_store(sync_mode="always")
+    persistence = store._persistence
+    waited = []
+
+    def wait_durable(lsn):
+        # 其他线程此时能拿到同一分片的锁
+        result = []
+
+        def try_lock():
+            lock = store._lock_for("c1")
+            result.append(lock.acquire(timeout=1))
+            if result[0]:
+                lock.release()
+
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+        waited.append((lsn, result[0]))
+        persistence.wal.wait_durable(lsn)
+
+    persistence.wait_durable = wait_durable
+    store.add_homework("c1", "数学", "口算20题")
+    store.increment_speaking_practice_count("c1")
+    assert waited == [(1, True), (2, True)]
+    assert persistence.wal._durable_lsn >= 2
+    store.close_persistence()
+
+
+def test_failed_fsync_keeps_batch_and_surfaces_error(tmp_path, monkeypatch):
+    """fsync 失败时批次保留重试，已落盘 LSN 不前进，always 模式的等待方收到异常"""
+    wal = WriteAheadLog(str(tmp_path), sync_mode="always", flush_interval_ms=20)
+    real_fsync = os.fsync
+    failing = threading.Event()
+    failing.set()
+
+    def fsync(fd):
+        if failing.is_set():
+            raise OSError(28, "No space left on device")
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    lsn = wal.append("spc", "c1", 1)
+    with pytest.raises(OSError):
+        wal.wait_durable(lsn, timeout=5)
+    assert wal._durable_lsn == 0
+    assert wal.write_errors >= 1
+
+    failing.clear()
+    wal.append("spc", "c1", 2)
+    assert wal.wait_durable(lsn + 1, timeout=5)
+    wal.close()
+
+    segment = next(p for p in tmp_path.iterdir() if p.name.startswith("wal-"))
+    lsns = [frame_lsn for frame_lsn, _ in _read_frames(str(segment))]
+    assert lsns == [1, 2]
@@ -0,0 +1,234 @@
+"""测试 MemoryStore 的 Postgres 后端（读穿透 + 批量回写）
+
+需要真实数据库的用例通过 MEMORY_PG_TEST_URL 指定本地 Postgres，例如：
+    MEMORY_PG_TEST_URL=postgresql+psycopg://postgres@127.0.0.1:5432/postgres pytest src/tests/test_memory_postgres.py
+"""
+import sys
+import os
+import threading
+import time
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from storage.memory.memory_postgres import PostgresMemoryBackend
+
+PG_TEST_URL = os.getenv("MEMORY_PG_TEST_URL", "")
+
+
+def test_pending_changes_are_coalesced():
+    """同一实体的多次变更合并为一行，清除会丢弃该孩子之前的待写变更"""
+    engine = create_engine("postgresql+psycopg://localhost/unused")
+    backend = PostgresMemoryBackend(engine, flush_interval_ms=60_000)
+    try:
+        child_data = {
+            "conversation_history": [],
+            "learning_progress": {"total_practice": 1},
+            "speaking_practice_count": 3,
+            "homework_list": [{"id": "hw_1", "completed": True, "completed_at": "2024-01-01T10:00:00"}],
+            "knowledge_points": [],
+        }
+        backend.record("lp", "c1", {"total_practice": 1}, child_data)
+        backend.record("spc", "c1", 3, child_data)
+        backend.record("hw_add", "c1", {"id": "hw_1", "completed": False}, child_data)
+        backend.record("hw_done", "c1", {"id": "hw_1", "completed_at": "2024-01-01T10:00:00"}, child_data)
+        backend.record("conv", "c1", {"content": "你好"}, child_data)
+        backend.record("conv", "c2", {"content": "早上好"}, child_data)
+        backend.record("clear", "c2", None, None)
+
+        _, batch = backend._take_batch()
+        assert batch.profiles["c1"]["speaking_practice_count"] == 3
+        assert batch.homework[("c1", "hw_1")]["completed"] is True
+        assert batch.history == [("c1", {"content": "你好"})]
+        assert batch.deletes == {"c2"}
+        assert len(batch) == 4
+
+        # 写入失败放回队列时，之后入队的新值优先
+        backend.record("spc", "c1", 4, {**child_data, "speaking_practice_count": 4})
+        backend._requeue(batch)
+        assert backend._pending.profiles["c1"]["speaking_practice_count"] == 4
+        assert backend._pending.history == [("c1", {"content": "你好"})]
+    finally:
+        backend._take_batch()  # 丢弃待写变更，避免关闭时连接数据库
+        backend.close()
+
+
+def test_failed_batches_are_capped():
+    """写入一直失败时，批次重试超过上限或待写条目超过上限后被丢弃并计数"""
+    engine = create_engine("postgresql+psycopg://localhost/unused")
+    backend = PostgresMemoryBackend(engine, flush_interval_ms=60_000, max_pending=10, max_retries=2)
+
+    def fail(batch):
+        raise ConnectionError("database is down")
+
+    backend._write_batch = fail
+    child_data = {"learning_progress": {}, "speaking_practice_count": 0}
+    try:
+        backend.record("spc", "c1", 0, child_data)
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                backend.flush()
+        assert backend.stats()["pending"] == 0
+        assert backend.dropped_batches == 1 and backend.dropped_rows == 1
+        assert backend.consecutive_errors == 3
+
+        # 放回后超过待写上限：丢弃失败的旧批次，保留新变更
+        for i in range(8):
+            backend.record("conv", "c1", {"content": f"第{i}句"}, child_data)
+        seq, batch = backend._take_batch()
+        for i in range(5):
+            backend.record("conv", "c2", {"content": f"第{i}句"}, child_data)
+        backend._requeue(batch)
+        backend._finish_batch(seq)
+        assert [child_id for child_id, _ in backend._pending.history] == ["c2"] * 5
+        assert backend.dropped_rows == 9
+    finally:
+        backend._take_batch()
+        backend.close()
+
+
+class _SlowBackend:
+    """模拟查询较慢的后端：load_child 等待放行，记录每个孩子的查询次数"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.loads = {}
+
+    def load_child(self, child_id):
+        self.loads[child_id] = self.loads.get(child_id, 0) + 1
+        self.release.wait(5)
+        return {"speaking_practice_count": 7} if child_id == "c1" else None
+
+    def record(self, op, child_id, data, child_data):
+        pass
+
+
+def test_read_through_outside_shard_lock(new_store):
+    """同一孩子的并发加载只查询一次；加载期间同分片的其他孩子不被阻塞"""
+    store = new_store()
+    neighbour = next(f"n{i}" for i in range(1000) if store.get_shard_index(f"n{i}") == store.get_shard_index("c1"))
+    store.update_speaking_practice_count(neighbour, 0)
+    backend = store._backend = _SlowBackend()
+    results = []
+    readers = [
+        threading.Thread(target=lambda: results.append(store.get_speaking_practice_count("c1")))
+        for _ in range(4)
+    ]
+    for reader in readers:
+        reader.start()
+    deadline = time.time() + 5
+    while not backend.loads and time.time() < deadline:
+        time.sleep(0.01)
+
+    # 同一分片中已在内存的孩子可以正常读写
+    start = time.perf_counter()
+    store.update_speaking_practice_count(neighbour, 1)
+    assert time.perf_counter() - start < 1
+
+    backend.release.set()
+    for reader in readers:
+        reader.join()
+    assert results == [7] * 4
+    assert backend.loads == {"c1": 1}
+    store._backend = None
+
+
+class _LockCheckingBackend:
+    """记录每次加载时孩子所在分片的锁是否空闲（其他线程能否获取）"""
+
+    def __init__(self, store):
+        self.store = store
+        self.loads = {}
+
+    def load_child(self, child_id):
+        lock = self.store._locks[self.store.get_shard_index(child_id)]
+        free = []
+
+        def probe():
+            if lock.acquire(blocking=False):
+                lock.release()
+                free.append(True)
+
+        checker = threading.Thread(target=probe)
+        checker.start()
+        checker.join()
+        self.loads[child_id] = bool(free)
+        return None
+
+    def record(self, op, child_id, data, child_data):
+        pass
+
+
+def test_bulk_homework_loads_outside_shard_lock(new_store):
+    """批量布置作业时，不在内存中的孩子在分片锁外加载"""
+    store = new_store()
+    backend = store._backend = _LockCheckingBackend(store)
+    child_ids = [f"c{i}" for i in range(20)]
+    try:
+        store.add_homework_bulk(child_ids, [{"subject": "数学", "description": "口算20题"}])
+        assert backend.loads == {child_id: True for child_id in child_ids}
+    finally:
+        store._backend = None
+
+
+def test_import_loads_outside_shard_lock(new_store):
+    """导入一批记录时，不在内存中的孩子在分片锁外加载"""
+    store = new_store()
+    backend = store._backend = _LockCheckingBackend(store)
+    shard_index = store.get_shard_index("c0")
+    child_ids = [f"c{i}" for i in range(200) if store.get_shard_index(f"c{i}") == shard_index][:5]
+    records = [
+        {"type": "homework", "child_id": child_id, "data": {"id": f"hw_{n}", "subject": "数学", "description": "口算"}}
+        for child_id in child_ids for n in range(2)
+    ]
+    try:
+        assert store.import_records(shard_index, records) == len(records)
+        assert backend.loads == {child_id: True for child_id in child_ids}
+    finally:
+        store._backend = None
+
+
+@pytest.mark.skipif(not PG_TEST_URL, reason="MEMORY_PG_TEST_URL is not set")
+def test_write_behind_and_read_through(new_store):
+    """写入批量落库，新实例按需从数据库加载"""
+    engine = create_engine(PG_TEST_URL)
+    child_id = f"test_child_{uuid.uuid4().hex[:8]}"
+
+    store = new_store()
+    assert store.enable_postgres_backend(engine, flush_interval_ms=50)
+    for i in range(105):
+        store.add_conversation(child_id, {"role": "user", "content": f"第{i}句"})
+    hw_id = store.add_homework(child_id, "数学", "口算20题")
+    store.complete_homework(child_id, hw_id)
+    kp_id = store.add_knowledge_point(child_id, "word", "apple", "苹果")
+    store.update_knowledge_mastery(child_id, kp_id, True)
+    store.increment_learning_counter(child_id, "total_practice")
+    store.record_homework_check(child_id)
+    store.close_backend()
+
+    restored = new_store()
+    assert restored.enable_postgres_backend(engine)
+    history = restored.get_conversation_history(child_id)
+    assert len(history) == 100
+    assert history[-1]["content"] == "第104句"
+    assert restored.get_homework_list(child_id)[0]["completed"] is True
+    assert restored.get_all_knowledge_points(child_id)[0]["review_count"] == 1
+    assert restored.get_learning_progress(child_id)["total_practice"] == 1
+    assert restored.get_last_homework_check(child_id) is not None
+
+    restored.clear_child_data(child_id)
+    restored.flush_backend()
+    assert restored.get_homework_list(child_id) == []
+    restored.close_backend()
+
+    again = new_store()
+    assert again.enable_postgres_backend(engine)
+    assert again.get_conversation_history(child_id) == []
+    again.close_backend()
+    engine.dispose()
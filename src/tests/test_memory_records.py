@@ -0,0 +1,54 @@
+"""测试 MemoryStore 紧凑记录类型"""
+import sys
+import os
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.memory_records import ConversationTurn, Homework, KnowledgePoint, ROLES, child_from_dict
+
+
+def test_round_trip_keeps_dict_shape():
+    """to_dict 与原字典结构一致，未知字段保存在 extra 中"""
+    turn = {"role": "user", "content": "你好", "type": "conversation",
+            "timestamp": "2024-05-01T08:30:00", "emotion": "happy"}
+    record = ConversationTurn.from_dict(turn)
+    assert record.to_dict() == turn
+    assert record.role == ROLES.encode("user")
+    assert record.timestamp == int(datetime(2024, 5, 1, 8, 30).timestamp())
+    assert record.extra == {"emotion": "happy"}
+
+    # 未出现过的取值自动分配编码
+    record = ConversationTurn.from_dict({"role": "narrator", "content": "从前"})
+    assert record.to_dict() == {"role": "narrator", "content": "从前"}
+
+
+def test_invalid_timestamp_is_preserved():
+    """无法解析的时间戳原样保留，且不参与时间比较"""
+    hw = Homework.from_dict({"id": "hw_1", "deadline": "明天", "completed": False})
+    assert hw.deadline is None
+    assert hw["deadline"] == "明天"
+    assert hw.to_dict() == {"id": "hw_1", "completed": False, "deadline": "明天"}
+
+    # 重新写入合法时间后恢复为整数时间戳
+    hw["deadline"] = "2024-05-02T00:00:00"
+    assert hw.deadline == int(datetime(2024, 5, 2).timestamp())
+    assert "deadline" not in (hw.extra or {})
+
+
+def test_dict_style_access():
+    """记录支持字典式读写，兼容直接操作内部数据的代码"""
+    kp = KnowledgePoint.from_dict({"id": "kp_1", "type": "word", "content": "apple", "review_count": 0})
+    kp["review_count"] += 1
+    assert kp.review_count == 1
+    assert kp["type"] == "word"
+    assert kp.get("context", "") == ""
+    assert "context" not in kp
+    assert "content" in kp
+
+    child = child_from_dict({"knowledge_points": [kp.to_dict()], "homework_list": []})
+    assert isinstance(child["knowledge_points"][0], KnowledgePoint)
+    assert child["conversation_history"] == []
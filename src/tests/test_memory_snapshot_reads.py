@@ -0,0 +1,40 @@
+"""测试 MemoryStore 对话窗口快照读取"""
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.state import ActiveCareInput, LongTermMemoryOutput
+
+
+def test_recent_conversation_is_window_tuple(new_store):
+    """只返回最近 N 条对话，类型为元组"""
+    store = new_store()
+    for i in range(10):
+        store.add_conversation("c1", {"role": "user", "content": f"第{i}句"})
+
+    recent = store.get_recent_conversation("c1")
+    assert isinstance(recent, tuple)
+    assert [turn["content"] for turn in recent] == ["第7句", "第8句", "第9句"]
+    assert len(store.get_recent_conversation("c1", limit=5)) == 5
+    assert store.get_recent_conversation("c1", limit=0) == ()
+    assert store.get_recent_conversation("unknown") == ()
+
+
+def test_state_holds_history_by_reference(new_store):
+    """状态对象之间传递对话历史时不复制"""
+    store = new_store()
+    store.add_conversation("c1", {"role": "user", "content": "你好"})
+    recent = store.get_recent_conversation("c1")
+
+    loaded = LongTermMemoryOutput(conversation_history=recent)
+    care_input = ActiveCareInput(
+        child_name="小明", child_age=8, conversation_history=loaded.conversation_history,
+        current_time="2024-05-01 08:00:00"
+    )
+    assert loaded.conversation_history is recent
+    assert care_input.conversation_history is recent
+    assert care_input.model_copy(update={"current_time": "2024-05-01 09:00:00"}).conversation_history is recent
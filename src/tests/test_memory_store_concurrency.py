@@ -0,0 +1,71 @@
+"""测试 MemoryStore 分片锁下的并发安全"""
+import sys
+import os
+import threading
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.memory_store import MemoryStore
+
+THREADS = 16
+ROUNDS = 500
+
+
+def _run_threads(target) -> None:
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_concurrent_counter_increments_are_not_lost():
+    """同一孩子的并发累加不丢失更新"""
+    memory_store = MemoryStore.get_instance()
+    child_id = "test_concurrency_counter"
+    memory_store.clear_child_data(child_id)
+
+    def worker(_):
+        for _ in range(ROUNDS):
+            memory_store.increment_learning_counter(child_id, "speaking_practice_count")
+            memory_store.increment_speaking_practice_count(child_id)
+
+    _run_threads(worker)
+
+    assert memory_store.get_learning_progress(child_id)["speaking_practice_count"] == THREADS * ROUNDS
+    assert memory_store.get_speaking_practice_count(child_id) == THREADS * ROUNDS
+
+
+def test_concurrent_conversation_appends_keep_window():
+    """并发写入对话历史时窗口保持在100条以内"""
+    memory_store = MemoryStore.get_instance()
+    child_id = "test_concurrency_history"
+    memory_store.clear_child_data(child_id)
+
+    def worker(i):
+        for n in range(ROUNDS // 10):
+            memory_store.add_conversation(child_id, {"role": "user", "content": f"{i}-{n}"})
+
+    _run_threads(worker)
+
+    history = memory_store.get_conversation_history(child_id)
+    assert len(history) == 100
+
+
+def test_concurrent_homework_for_many_children():
+    """不同孩子分布在不同分片，互不干扰"""
+    memory_store = MemoryStore.get_instance()
+
+    def worker(i):
+        child_id = f"test_concurrency_child_{i}"
+        memory_store.clear_child_data(child_id)
+        for n in range(20):
+            memory_store.add_homework(child_id, "数学", f"练习{n}")
+
+    _run_threads(worker)
+
+    for i in range(THREADS):
+        assert len(memory_store.get_homework_list(f"test_concurrency_child_{i}")) == 20
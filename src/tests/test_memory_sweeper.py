@@ -0,0 +1,200 @@
+"""测试 MemoryStore 后台过期清理和归档"""
+import sys
+import os
+import tempfile
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, select
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.memory_records import now_epoch
+from graphs.memory_store import MemoryStore
+from storage.database.shared.model import ChildHomework, ChildKnowledgePoint
+from storage.memory.memory_postgres import PostgresMemoryBackend
+
+DAY = 86400
+PG_TEST_URL = os.getenv("MEMORY_PG_TEST_URL", "")
+
+
+@pytest.fixture
+def sweeping_store(new_store, tmp_path, monkeypatch):
+    """创建启用过期清理的独立 MemoryStore 的工厂（清理器不启动后台线程）"""
+    # tmp_path 位于系统临时目录下，把临时目录换到别处，归档文件才算持久
+    temp_dir = tmp_path / "tmp"
+    temp_dir.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(temp_dir))
+
+    def factory(**sweeper_options) -> MemoryStore:
+        store = new_store()
+        store.enable_sweeper(0, archive_path=str(tmp_path / "archive.sqlite3"), **sweeper_options)
+        return store
+    return factory
+
+
+def _populate(store: MemoryStore, child_id: str) -> None:
+    """每个孩子：1项过期作业、1项有效作业、1个长期掌握的知识点、1个学习中的知识点"""
+    store.add_homework(child_id, "数学", "上周的作业", deadline_days=-3)
+    store.add_homework(child_id, "语文", "今天的作业")
+    store.add_knowledge_point(child_id, "word", "apple")
+    store.add_knowledge_point(child_id, "word", "banana")
+
+    def master(child_data):
+        kp = child_data["knowledge_points"][0]
+        kp.mastery_level = 5
+        kp.interval = 14 * DAY
+        kp.next_review_time = now_epoch() - 40 * DAY + kp.interval
+
+    store.update_child_data(child_id, master)
+
+
+def test_pass_archives_expired_records(sweeping_store):
+    """过期作业和长期掌握的知识点被归档并移出内存，其余记录保留"""
+    store = sweeping_store()
+    for i in range(10):
+        _populate(store, f"child_{i}")
+
+    stats = store._sweeper.run_pass()
+    assert stats["passes"] == 1
+    assert stats["children_scanned"] == 10
+    assert stats["homework_archived"] == 10
+    assert stats["knowledge_archived"] == 10
+
+    assert [hw["description"] for hw in store.get_homework_list("child_3")] == ["今天的作业"]
+    assert [kp["content"] for kp in store.get_all_knowledge_points("child_3")] == ["banana"]
+    assert store.get_knowledge_statistics("child_3")["total"] == 1
+    assert [hw["description"] for hw in store.get_archived("child_3", "homework")] == ["上周的作业"]
+    assert [kp["content"] for kp in store.get_archived("child_3", "knowledge")] == ["apple"]
+    assert store.get_sweeper_stats()["compressed_bytes"] > 0
+
+    # 第二轮没有可归档的记录，规模采样随轮次累积
+    store._sweeper.run_pass(now=now_epoch() + 60)
+    history = store.get_child_size_history("child_3")
+    assert len(history) == 2
+    assert history[-1]["homework"] == 1 and history[-1]["knowledge"] == 1 and history[-1]["bytes"] > 0
+    assert len(store.get_child_size_report(limit=5)) == 5
+
+    store.clear_child_data("child_3")
+    assert store.get_archived("child_3", "homework") == []
+
+
+def test_knowledge_ids_stay_unique_after_archive(sweeping_store):
+    """知识点被归档移除后，新知识点的ID不与留下的知识点重复"""
+    store = sweeping_store()
+    _populate(store, "c1")
+    store._sweeper.run_pass()
+    store.add_knowledge_point("c1", "word", "cherry")
+    ids = [kp["id"] for kp in store.get_all_knowledge_points("c1")]
+    assert len(ids) == 2 and len(set(ids)) == 2
+
+
+def test_old_size_samples_are_pruned(sweeping_store):
+    """超过保留期的规模采样在一轮清理结束时删除"""
+    store = sweeping_store(size_history_days=1)
+    _populate(store, "c1")
+    started = now_epoch()
+    store._sweeper.run_pass(now=started)
+    store._sweeper.run_pass(now=started + 3600)
+    assert len(store.get_child_size_history("c1")) == 2
+
+    stats = store._sweeper.run_pass(now=started + 2 * DAY)
+    assert stats["size_samples_pruned"] == 2
+    assert [sample["sampled_at"] for sample in store.get_child_size_history("c1")] == [started + 2 * DAY]
+
+
+def test_slices_are_incremental(sweeping_store):
+    """时间片用完即返回，游标在下一个时间片继续；清理不改变 LRU 顺序"""
+    store = sweeping_store(slice_ms=0)
+    for i in range(5):
+        _populate(store, f"child_{i}")
+    order = [list(shard) for shard in store._shards]
+
+    slices = 1
+    while not store._sweeper.run_slice():
+        slices += 1
+        assert store._sweeper.stats()["in_progress"]
+    assert slices == 5
+    assert store._sweeper.stats()["children_scanned"] == 5
+    assert [list(shard) for shard in store._shards] == order
+
+
+def test_archive_is_journaled(tmp_path, sweeping_store, new_store):
+    """归档操作写入 WAL，重启后被归档的记录不会恢复到内存"""
+    store = sweeping_store()
+    store.enable_persistence(str(tmp_path / "wal"))
+    _populate(store, "c1")
+    store._sweeper.run_pass()
+    store.close_persistence()
+
+    restored = new_store()
+    restored.enable_persistence(str(tmp_path / "wal"))
+    try:
+        assert restored.get_homework_list("c1") == store.get_homework_list("c1")
+        assert restored.get_all_knowledge_points("c1") == store.get_all_knowledge_points("c1")
+    finally:
+        restored.close_persistence()
+
+
+def test_sweeper_requires_durable_archive(new_store):
+    """归档路径为空或在临时目录下时拒绝启动过期清理"""
+    store = new_store()
+    with pytest.raises(ValueError):
+        store.enable_sweeper(0, archive_path="")
+    with pytest.raises(ValueError):
+        store.enable_sweeper(0, archive_path=os.path.join(tempfile.gettempdir(), "archive.sqlite3"))
+    assert store._sweeper is None
+    assert store.get_sweeper_stats() is None
+
+
+def test_archive_becomes_backend_flag():
+    """归档操作在 Postgres 后端变为按主键标记 archived_at，同一批次中尚未写入的 upsert 保留"""
+    engine = create_engine("postgresql+psycopg://localhost/unused")
+    backend = PostgresMemoryBackend(engine, flush_interval_ms=60_000)
+    try:
+        backend.record("hw_add", "c1", {"id": "hw_1", "subject": "数学"}, None)
+        backend.record("kp_add", "c1", {"id": "kp_1", "content": "apple"}, None)
+        backend.record("archive", "c1", {"homework": ["hw_1"], "knowledge": ["kp_1", "kp_0"]}, None)
+        pending = backend._pending
+        assert set(pending.homework) == {("c1", "hw_1")} and set(pending.knowledge) == {("c1", "kp_1")}
+        assert pending.homework_archives == {("c1", "hw_1")}
+        assert pending.knowledge_archives == {("c1", "kp_1"), ("c1", "kp_0")}
+
+        # 再次添加同一ID时取消归档标记
+        backend.record("hw_add", "c1", {"id": "hw_1", "subject": "数学"}, None)
+        assert pending.homework_archives == set()
+    finally:
+        backend._pending = type(backend._pending)()
+        backend.close()
+
+
+@pytest.mark.skipif(not PG_TEST_URL, reason="MEMORY_PG_TEST_URL is not set")
+def test_archived_rows_are_kept_in_postgres(sweeping_store, new_store):
+    """归档的行保留在 Postgres 中并标记 archived_at，其他实例读穿透时跳过"""
+    engine = create_engine(PG_TEST_URL)
+    child_id = f"test_child_{uuid.uuid4().hex[:8]}"
+    store = sweeping_store()
+    assert store.enable_postgres_backend(engine, flush_interval_ms=50)
+    _populate(store, child_id)
+    store._sweeper.run_pass()
+    store.flush_backend()
+
+    with engine.connect() as conn:
+        for model, total in ((ChildHomework, 2), (ChildKnowledgePoint, 2)):
+            archived = conn.execute(
+                select(model.archived_at).where(model.child_id == child_id)
+            ).scalars().all()
+            assert len(archived) == total
+            assert sum(value is not None for value in archived) == 1
+
+    restored = new_store()
+    assert restored.enable_postgres_backend(engine)
+    assert [hw["description"] for hw in restored.get_homework_list(child_id)] == ["今天的作业"]
+    assert [kp["content"] for kp in restored.get_all_knowledge_points(child_id)] == ["banana"]
+    restored.clear_child_data(child_id)
+    restored.close_backend()
+    store.close_backend()
+    engine.dispose()
@@ -0,0 +1,159 @@
+"""测试 MemoryStore 流式批量导出 / 导入"""
+import sys
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.memory_store import MemoryStore
+from storage.memory.memory_transfer import (
+    MemoryImporter, RecordDecoder, decode_stream, encode_records, export_records, transfer_authorized
+)
+
+PG_TEST_URL = os.getenv("MEMORY_PG_TEST_URL", "")
+
+
+def _populate(store: MemoryStore, children: int) -> None:
+    for i in range(children):
+        child_id = f"child_{i}"
+        store.add_homework(child_id, "数学", f"作业{i}")
+        store.add_knowledge_point(child_id, "word", f"word_{i}")
+        store.update_speaking_practice_count(child_id, i)
+        for n in range(3):
+            store.add_conversation(child_id, {"role": "user", "content": f"第{n}句"})
+
+
+def _split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _snapshot(store: MemoryStore, child_id: str) -> tuple:
+    return (
+        store.get_homework_list(child_id),
+        store.get_all_knowledge_points(child_id),
+        store.get_conversation_history(child_id),
+        store.get_speaking_practice_count(child_id),
+    )
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "msgpack"])
+def test_round_trip(fmt, new_store):
+    """导出后按任意切分的字节块导入，数据一致；重复导入不产生重复的作业和知识点"""
+    source = new_store()
+    _populate(source, 50)
+    encoded = b"".join(encode_records(export_records(source), fmt))
+
+    target = new_store()
+    importer = MemoryImporter(target, batch_size=7, workers=4)
+    importer.add_many(decode_stream(_split(encoded, 13), fmt))
+    stats = importer.finish()
+    assert stats["records"] == 50 * 6
+    assert stats["by_type"] == {"child": 50, "homework": 50, "knowledge": 50, "conversation": 150}
+
+    for i in range(50):
+        assert _snapshot(target, f"child_{i}") == _snapshot(source, f"child_{i}")
+
+    # 作业和知识点按ID覆盖
+    importer = MemoryImporter(target)
+    importer.add_many(record for record in decode_stream([encoded], fmt) if record["type"] != "conversation")
+    importer.finish()
+    assert len(target.get_homework_list("child_0")) == 1
+    assert target.get_knowledge_statistics("child_0")["total"] == 1
+
+
+def test_export_includes_cold_children(tmp_path, new_store):
+    """冷存储中的孩子同样被导出，且导出不会把它们加载回内存"""
+    store = new_store()
+    store.enable_cold_tier(store._num_shards, path=str(tmp_path / "cold.sqlite3"))
+    _populate(store, 200)
+    resident = store.get_memory_stats()["resident_children"]
+
+    children = {record["child_id"] for record in export_records(store) if record["type"] == "child"}
+    assert len(children) == 200
+    assert store.get_memory_stats()["resident_children"] == resident
+
+
+@pytest.mark.skipif(not PG_TEST_URL, reason="MEMORY_PG_TEST_URL is not set")
+def test_export_reads_postgres_children(new_store):
+    """启用 Postgres 后端时，新实例能导出数据库中尚未加载的孩子，且不把它们放入内存"""
+    engine = create_engine(PG_TEST_URL)
+    prefix = f"export_{uuid.uuid4().hex[:8]}_"
+    source = new_store()
+    assert source.enable_postgres_backend(engine, flush_interval_ms=50)
+    for i in range(3):
+        child_id = f"{prefix}{i}"
+        source.add_homework(child_id, "数学", f"作业{i}")
+        source.add_conversation(child_id, {"role": "user", "content": f"第{i}句"})
+    # 只有知识点、没有档案行的孩子
+    source.add_knowledge_point(f"{prefix}3", "word", "apple")
+    source.close_backend()
+
+    fresh = new_store()
+    assert fresh.enable_postgres_backend(engine)
+    try:
+        children = {
+            record["child_id"] for record in export_records(fresh)
+            if record["type"] == "child" and record["child_id"].startswith(prefix)
+        }
+        assert children == {f"{prefix}{i}" for i in range(4)}
+        records = list(export_records(fresh, [f"{prefix}1"]))
+        assert [r["data"]["description"] for r in records if r["type"] == "homework"] == ["作业1"]
+        assert [r["data"]["content"] for r in records if r["type"] == "conversation"] == ["第1句"]
+        assert fresh.get_memory_stats()["resident_children"] == 0
+    finally:
+        for i in range(4):
+            fresh.clear_child_data(f"{prefix}{i}")
+        fresh.close_backend()
+        engine.dispose()
+
+
+def test_invalid_input(new_store):
+    """格式错误的记录和截断的流被拒绝"""
+    importer = MemoryImporter(new_store())
+    with pytest.raises(ValueError):
+        importer.add({"type": "unknown", "child_id": "c1", "data": {}})
+    importer.close()
+
+    with pytest.raises(ValueError):
+        RecordDecoder("ndjson").feed(b"{broken\n")
+    decoder = RecordDecoder("msgpack")
+    decoder.feed(b"\x10\x00\x00\x00abc")
+    with pytest.raises(ValueError):
+        decoder.close()
+
+
+def test_reimport_dedupes_and_merges_turns(new_store):
+    """重复导入同一份导出不产生重复对话，导入的对话与已有历史按时间戳合并"""
+    exported = [
+        {"type": "conversation", "child_id": "c1",
+         "data": {"role": "user", "content": f"第{i}句", "timestamp": f"2024-01-0{i}T10:00:00"}}
+        for i in (1, 3)
+    ]
+    store = new_store()
+    store.import_records(store.get_shard_index("c1"), [
+        {"type": "conversation", "child_id": "c1",
+         "data": {"role": "assistant", "content": "已有", "timestamp": "2024-01-02T10:00:00"}}
+    ])
+    for _ in range(2):
+        importer = MemoryImporter(store)
+        importer.add_many(exported)
+        importer.finish()
+
+    history = store.get_conversation_history("c1")
+    assert [turn["content"] for turn in history] == ["第1句", "已有", "第3句"]
+
+
+def test_transfer_token():
+    """设置令牌后，导出 / 导入接口只接受匹配的 Bearer 令牌"""
+    assert transfer_authorized(None, token="")
+    assert transfer_authorized("Bearer s3cret", token="s3cret")
+    assert transfer_authorized("bearer s3cret", token="s3cret")
+    assert not transfer_authorized(None, token="s3cret")
+    assert not transfer_authorized("Bearer wrong", token="s3cret")
+    assert not transfer_authorized("s3cret", token="s3cret")
@@ -0,0 +1,107 @@
+"""测试 /metrics 指标：分片直方图、节点耗时回调、外部调用计时、Prometheus 文本格式"""
+import sys
+import os
+import re
+import threading
+from typing import Optional
+
+import pytest
+from langgraph.graph import StateGraph, END
+from pydantic import BaseModel
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from coze_coding_utils.runtime_ctx.context import new_context
+from utils.log.metrics import (
+    EXTERNAL_CALL_DURATION, NODE_DURATION, Histogram, _timed_call, render_metrics,
+)
+from utils.log.node_log import Logger
+
+# 一行样本：名称{标签} 数值
+SAMPLE_LINE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_]+="([^"\\]|\\.)*",?)*\})? [-+0-9.eInf]+$')
+
+
+def test_histogram_threads_without_locks():
+    """多线程并发观测后汇总的计数和总和准确"""
+    histogram = Histogram("test_seconds", "test", ("op",), buckets=(0.1, 1.0))
+
+    def work(i: int):
+        for _ in range(5000):
+            histogram.observe(0.05 if i % 2 else 0.5, "write")
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    series = histogram.collect()[("write",)]
+    assert series[:3] == [20000, 20000, 0]
+    assert series[-1] == pytest.approx(20000 * 0.05 + 20000 * 0.5)
+
+    lines = list(histogram.render())
+    assert 'test_seconds_bucket{op="write",le="0.1"} 20000' in lines
+    assert 'test_seconds_bucket{op="write",le="1"} 40000' in lines
+    assert 'test_seconds_bucket{op="write",le="+Inf"} 40000' in lines
+    assert 'test_seconds_count{op="write"} 40000' in lines
+
+
+def test_timed_call_labels_model_and_status():
+    """外部调用按服务、模型、成功/失败分别统计，未传 model 时使用方法的默认值"""
+    def invoke(messages, model: str = "default-model"):
+        if messages == "boom":
+            raise RuntimeError("boom")
+        return "ok"
+
+    timed = _timed_call(invoke, "llm_test")
+    assert timed("hi") == "ok"
+    assert timed("hi", model="fast-model") == "ok"
+    with pytest.raises(RuntimeError):
+        timed("boom")
+
+    collected = EXTERNAL_CALL_DURATION.collect()
+    assert sum(collected[("llm_test", "default-model", "ok")][:-1]) == 1
+    assert sum(collected[("llm_test", "fast-model", "ok")][:-1]) == 1
+    assert sum(collected[("llm_test", "default-model", "error")][:-1]) == 1
+
+
+class FlowState(BaseModel):
+    text: str = ""
+    reply: Optional[str] = None
+
+
+def test_logger_records_node_latency():
+    """Logger 回调记录图中每个节点的耗时"""
+    def metrics_understand(state: FlowState) -> dict:
+        return {"text": state.text.strip()}
+
+    def metrics_reply(state: FlowState) -> dict:
+        return {"reply": f"你说：{state.text}"}
+
+    builder = StateGraph(FlowState)
+    builder.add_node("metrics_understand", metrics_understand)
+    builder.add_node("metrics_reply", metrics_reply)
+    builder.set_entry_point("metrics_understand")
+    builder.add_edge("metrics_understand", "metrics_reply")
+    builder.add_edge("metrics_reply", END)
+    graph = builder.compile()
+
+    tracer = Logger(graph, new_context(method="run"))
+    tracer.on_chain_start = tracer.on_chain_start_graph
+    tracer.on_chain_end = tracer.on_chain_end_graph
+    for _ in range(3):
+        graph.invoke({"text": " 你好 "}, config={"callbacks": [tracer]})
+
+    collected = NODE_DURATION.collect()
+    for node in ("metrics_understand", "metrics_reply"):
+        series = collected[(node, "ok")]
+        assert sum(series[:-1]) == 3
+    assert not tracer._node_started
+
+    text = render_metrics()
+    assert 'graph_node_duration_seconds_count{node="metrics_reply",status="ok"} 3' in text
+    for line in text.splitlines():
+        assert line.startswith("#") or SAMPLE_LINE.match(line), line
@@ -0,0 +1,79 @@
+"""测试节点日志后台写入：组提交、fsync 策略、队列满时丢弃并计数"""
+import sys
+import os
+import json
+import threading
+import time
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from utils.log.node_log_writer import NodeLogWriter
+
+
+def _entry(i: int) -> dict:
+    return {"level": "info", "message": "Node 'reply' ended", "type": "node_end", "seq": i, "output": "好" * 50}
+
+
+def _read(path) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize("fsync", ["batch", "interval", "off"])
+def test_group_commit_keeps_order(tmp_path, fsync):
+    """事件按顺序批量写入，fsync 次数取决于策略"""
+    path = tmp_path / "app.log"
+    writer = NodeLogWriter(str(path), flush_ms=1000, flush_bytes=8 * 1024, fsync=fsync, fsync_interval_ms=60000)
+    for i in range(500):
+        assert writer.submit(_entry(i))
+    assert writer.flush(timeout=5)
+
+    assert [entry["seq"] for entry in _read(path)] == list(range(500))
+    stats = writer.stats()
+    assert stats["written"] == 500 and stats["dropped"] == 0 and stats["errors"] == 0
+    assert 1 < stats["batches"] < 100
+    expected_fsyncs = {"batch": stats["batches"], "interval": 1, "off": 0}[fsync]
+    assert stats["fsyncs"] == expected_fsyncs
+    writer.close()
+
+
+def test_flush_after_deadline(tmp_path):
+    """批次未满时在 flush_ms 后写入"""
+    path = tmp_path / "app.log"
+    writer = NodeLogWriter(str(path), flush_ms=20, flush_bytes=1024 * 1024, fsync="off")
+    writer.submit(_entry(0))
+    time.sleep(0.3)
+    assert [entry["seq"] for entry in _read(path)] == [0]
+    writer.close()
+    assert not writer._thread.is_alive()
+
+
+def test_drops_when_queue_full(tmp_path):
+    """写入卡住时不阻塞调用方，超出队列容量的事件丢弃并计数"""
+    path = tmp_path / "app.log"
+    writer = NodeLogWriter(str(path), queue_size=10, flush_ms=1000, flush_bytes=1, fsync="off")
+    release = threading.Event()
+    writing = threading.Event()
+    write = writer._write
+
+    def slow_write(batch):
+        writing.set()
+        release.wait(5)
+        write(batch)
+
+    writer._write = slow_write
+    writer.submit(_entry(0))
+    assert writing.wait(5)
+    accepted = [writer.submit(_entry(i)) for i in range(1, 21)]
+    assert accepted.count(True) == 10
+    assert writer.stats()["dropped"] == 10
+
+    release.set()
+    assert writer.flush(timeout=5)
+    assert [entry["seq"] for entry in _read(path)] == list(range(11))
+    writer.close()
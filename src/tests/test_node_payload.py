@@ -0,0 +1,71 @@
+"""测试节点日志输入/输出的序列化：截断、省略字段、超大时只记录摘要、按节点采样"""
+import sys
+import os
+import json
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.state import GlobalState, PracticeStage
+from utils.file.file import File
+from utils.log import payload
+from utils.log.payload import parse_sample_rates, payload_sampled, serialize_payload
+
+
+def _state(turns: int) -> GlobalState:
+    return GlobalState(
+        child_id="child_1",
+        child_name="小明",
+        child_age=8,
+        conversation_history=tuple(
+            {"role": "user", "content": f"第{i}句：今天在学校学了新的英语单词"} for i in range(turns)
+        ),
+        user_input_audio=File(url="https://example.com/a.mp3", file_type="audio"),
+        ai_response="好" * 5000,
+        practice_stage=PracticeStage(stage="followup", turn_count=3),
+    )
+
+
+def test_large_fields_are_truncated(monkeypatch):
+    """长列表只保留最近的项，长字符串截断，bytes 只记录长度，指定字段不记录"""
+    monkeypatch.setattr(payload, "NODE_LOG_OMIT_FIELDS", frozenset({"learning_progress"}))
+    data = json.loads(serialize_payload({"state": _state(500), "audio": b"\x00" * 4096}))
+    state = data["state"]
+
+    history = state["conversation_history"]
+    assert len(history) == payload.NODE_LOG_MAX_LIST_ITEMS + 1
+    assert history[0] == "…(+480 items)"
+    assert history[-1]["content"].startswith("第499句")
+    assert state["ai_response"].startswith("好" * payload.NODE_LOG_MAX_STRING)
+    assert state["ai_response"].endswith("(+3000 chars)")
+    assert state["user_input_audio"] == {"url": "https://example.com/a.mp3", "file_type": "audio"}
+    assert state["practice_stage"]["turn_count"] == 3
+    assert state["learning_progress"] == "<omitted>"
+    assert data["audio"] == "<4096 bytes>"
+
+
+def test_size_bounded_regardless_of_state(monkeypatch):
+    """状态再大输出大小也有上限，超过上限时只记录摘要和大小"""
+    # 只差在序号位数上
+    assert abs(len(serialize_payload(_state(100))) - len(serialize_payload(_state(100000)))) < 200
+
+    monkeypatch.setattr(payload, "NODE_LOG_MAX_PAYLOAD_BYTES", 1024)
+    digest = json.loads(serialize_payload(_state(100)))
+    assert set(digest) == {"_digest", "_bytes"} and digest["_bytes"] > 1024
+    assert serialize_payload(_state(100)) == serialize_payload(_state(100))
+    assert serialize_payload(_state(100)) != serialize_payload(_state(200))
+    assert serialize_payload({"reply": "短"}) == '{"reply":"短"}'
+
+
+def test_sampling_per_node(monkeypatch):
+    """按节点比例采样，同一次运行的结果固定"""
+    assert parse_sample_rates("voice_synthesis=0.1, save_memory=0,bad,x=y") == {"voice_synthesis": 0.1, "save_memory": 0.0}
+    monkeypatch.setattr(payload, "_sample_rates", {"voice_synthesis": 0.25, "save_memory": 0.0})
+
+    assert payload_sampled("load_memory", "run_1")
+    assert not payload_sampled("save_memory", "run_1")
+    sampled = [payload_sampled("voice_synthesis", f"run_{i}") for i in range(4000)]
+    assert 0.2 < sum(sampled) / len(sampled) < 0.3
+    assert sampled == [payload_sampled("voice_synthesis", f"run_{i}") for i in range(4000)]
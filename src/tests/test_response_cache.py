@@ -0,0 +1,103 @@
+"""测试短期响应缓存（TTL + LRU）"""
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.response_cache import ResponseCache
+
+
+class FakeClock:
+    """可手动推进的单调时钟"""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_expiry():
+    """过期条目不会被返回"""
+    clock = FakeClock()
+    cache = ResponseCache(max_entries=10, ttl_seconds=90, clock=clock)
+    cache.put("k", "你好呀")
+
+    clock.now = 60
+    assert cache.get("k") == "你好呀"
+
+    clock.now = 91
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["expirations"] == 1
+
+
+def test_lru_eviction_by_count():
+    """超过条目数时淘汰最久未访问的条目"""
+    cache = ResponseCache(max_entries=3, clock=FakeClock())
+    for key in ("a", "b", "c"):
+        cache.put(key, key)
+
+    # 访问 a，使 b 成为最久未访问
+    assert cache.get("a") == "a"
+    cache.put("d", "d")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "a"
+    assert cache.get("d") == "d"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_by_bytes():
+    """超过字节上限时淘汰条目，超大条目不缓存"""
+    probe = ResponseCache(clock=FakeClock())
+    probe.put("k0", "x" * 100)
+    entry_size = probe.stats()["bytes"]
+
+    cache = ResponseCache(max_entries=100, max_bytes=entry_size * 2, clock=FakeClock())
+    cache.put("k0", "x" * 100)
+    cache.put("k1", "x" * 100)
+    cache.put("k2", "x" * 100)
+    assert len(cache) == 2
+    assert cache.get("k0") is None
+    assert cache.stats()["bytes"] <= entry_size * 2
+
+    cache.put("huge", "x" * entry_size * 4)
+    assert cache.get("huge") is None
+    assert len(cache) == 2
+
+
+def test_sweep_stops_at_first_fresh_entry():
+    """清理只移除过期条目，覆盖写入会刷新时间"""
+    clock = FakeClock()
+    cache = ResponseCache(max_entries=10, ttl_seconds=100, clock=clock)
+    cache.put("old", "1")
+    clock.now = 50
+    cache.put("mid", "2")
+    clock.now = 80
+    cache.put("old", "3")  # 重新写入，刷新时间
+
+    clock.now = 160
+    assert cache.sweep() == 1  # 只有 mid 过期
+    assert cache.get("old") == "3"
+    assert cache.get("mid") is None
+
+
+def test_memory_store_cache_api():
+    """MemoryStore 的缓存接口保持兼容"""
+    from graphs.memory_store import MemoryStore
+
+    memory_store = MemoryStore.get_instance()
+    memory_store.cache_response("quick_reply", "  你好 ", "你好呀！")
+    assert memory_store.get_cached_response("quick_reply", "你好") == "你好呀！"
+    assert memory_store.get_cached_response("quick_chat", "你好") is None
+
+    stats = memory_store.get_cache_stats()
+    assert stats["hits"] >= 1
+    assert stats["misses"] >= 1
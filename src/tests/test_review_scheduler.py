@@ -0,0 +1,75 @@
+"""测试向量化复习调度和离线模拟"""
+import sys
+import os
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from graphs.review_scheduler import DEFAULT_LEVEL_INTERVALS, KnowledgeArrays, ReviewScheduler, SchedulerParams
+from graphs.review_simulator import replay, simulate
+
+DAY = 86400
+
+
+def test_table_schedule_matches_level_intervals():
+    """table 算法：掌握程度升降规则不变，间隔为间隔表 ±20%"""
+    params = SchedulerParams(algorithm="table")
+    state = KnowledgeArrays(4, params)
+    state.mastery[:] = [0, 1, 2, 5]
+    ReviewScheduler(params, seed=0).review(state, np.array([True, False, False, True]), 1000)
+
+    assert state.mastery.tolist() == [1, 1, 1, 5]
+    assert state.review_count.tolist() == [1, 1, 1, 1]
+    assert state.correct_count.tolist() == [1, 0, 0, 1]
+    base = np.array([DEFAULT_LEVEL_INTERVALS[level] for level in state.mastery])
+    assert np.all(state.interval >= base * 0.8) and np.all(state.interval <= base * 1.2)
+    assert np.array_equal(state.next_review, 1000 + state.interval)
+
+
+def test_sm2_intervals_and_ease():
+    """sm2 算法：1天、6天，之后按难度系数增长；答错重置并降低难度系数"""
+    params = SchedulerParams(algorithm="sm2", jitter=0)
+    scheduler = ReviewScheduler(params)
+    state = KnowledgeArrays(1, params)
+    for expected in (DAY, 6 * DAY):
+        scheduler.review(state, np.array([True]), 0)
+        assert state.interval[0] == expected
+    scheduler.review(state, np.array([True]), 0)
+    # 回答质量 4 时难度系数不变
+    assert state.ease[0] == 2.5
+    assert state.interval[0] == round(6 * DAY * 2.5)
+
+    scheduler.review(state, np.array([False]), 0)
+    assert state.repetitions[0] == 0
+    assert state.interval[0] == DEFAULT_LEVEL_INTERVALS[0]
+    assert abs(state.ease[0] - 2.18) < 1e-9
+
+
+def test_store_reschedule_keeps_last_review(new_store):
+    """更换调度参数后，以上次复习时间为基准重排，且调度状态随知识点保存"""
+    store = new_store()
+    kp_id = store.add_knowledge_point("c1", "word", "apple")
+    store.add_knowledge_point("c2", "word", "banana")
+    updated = store.update_knowledge_mastery("c1", kp_id, True)
+    assert updated["repetitions"] == 1 and updated["ease_factor"] == 2.5
+
+    rescheduled = store.set_review_scheduler(SchedulerParams(algorithm="sm2", jitter=0))
+    assert rescheduled == 2
+    kp = store.get_all_knowledge_points("c1")[0]
+    # 上次复习时间 = 原下次复习时间 - 原间隔，sm2 第1次答对后间隔为1天
+    assert kp["interval"] == DAY
+    assert store.get_knowledge_statistics("c1")["total"] == 1
+
+
+def test_simulate_and_replay():
+    """模拟生成的历史可以回放给另一种调度方案"""
+    history = simulate(ReviewScheduler(SchedulerParams(algorithm="table"), seed=0), 500, 30, seed=0)
+    assert len(history) > 500
+    stats = replay(ReviewScheduler(SchedulerParams(algorithm="sm2"), seed=0), history)
+    assert stats["reviews"] == len(history)
+    assert 0 <= stats["overdue_ratio"] <= 1
+    assert stats["mean_interval_days"] > 0
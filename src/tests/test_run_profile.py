@@ -0,0 +1,110 @@
+"""测试单次运行的耗时分解：实际执行路径、节点耗时、外部调用、排队等待和 token 消耗"""
+import sys
+import os
+import asyncio
+import contextvars
+import time
+from typing import Optional
+
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import StateGraph, END
+from pydantic import BaseModel
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from coze_coding_utils.runtime_ctx.context import new_context
+from utils.log.metrics import _timed_call
+from utils.log.node_log import Logger
+from utils.log.run_profile import current_run_profile, record_queue_wait, start_run_profile
+from utils.messages.server import create_message_end_dict
+
+
+class ProfileState(BaseModel):
+    text: str = ""
+    reply: Optional[str] = None
+    execution_path: list = []
+    performance_metrics: dict = {}
+
+
+def _build_graph():
+    model = FakeMessagesListChatModel(responses=[
+        AIMessage(content="你好呀", usage_metadata={"input_tokens": 12, "output_tokens": 5, "total_tokens": 17})
+    ])
+
+    def synthesize(text: str, model: str = "tts-default") -> str:
+        time.sleep(0.01)
+        return f"audio:{text}"
+
+    tts = _timed_call(synthesize, "tts_profile")
+
+    def profile_understand(state: ProfileState) -> dict:
+        record_queue_wait("db_pool_engine", 0.002)
+        return {"text": state.text.strip()}
+
+    def profile_reply(state: ProfileState) -> dict:
+        message = model.invoke([HumanMessage(content=state.text)])
+        tts(message.content)
+        return {"reply": message.content, "performance_metrics": {"cache_hit": False}}
+
+    builder = StateGraph(ProfileState)
+    builder.add_node("profile_understand", profile_understand)
+    builder.add_node("profile_reply", profile_reply)
+    builder.set_entry_point("profile_understand")
+    builder.add_edge("profile_understand", "profile_reply")
+    builder.add_edge("profile_reply", END)
+    return builder.compile()
+
+
+def _run_config(graph):
+    tracer = Logger(graph, new_context(method="run"))
+    tracer.on_chain_start = tracer.on_chain_start_graph
+    tracer.on_chain_end = tracer.on_chain_end_graph
+    return {"callbacks": [tracer]}
+
+
+def test_profile_records_actual_run():
+    """异步运行时各阶段耗时都记入同一个记录，并填入图的输出"""
+    graph = _build_graph()
+
+    async def run():
+        profile = start_run_profile()
+        result = await graph.ainvoke({"text": " 你好 "}, config=_run_config(graph))
+        return profile, profile.apply(result)
+
+    profile, result = asyncio.run(run())
+
+    assert result["execution_path"] == ["profile_understand", "profile_reply"]
+    metrics = result["performance_metrics"]
+    assert metrics["cache_hit"] is False
+    assert metrics["total_nodes"] == 2
+    assert set(metrics["node_ms"]) == {"profile_understand", "profile_reply"}
+    assert metrics["node_ms"]["profile_reply"] >= 10
+    assert metrics["external"]["tts_profile"]["calls"] == 1
+    assert metrics["external_ms"] >= 10
+    assert metrics["queue"] == {"db_pool_engine": 2.0}
+    assert metrics["token_cost"] == {"input_tokens": 12, "output_tokens": 5, "total_tokens": 17}
+    assert metrics["total_ms"] >= metrics["node_ms"]["profile_reply"]
+    assert "failed_nodes" not in metrics
+
+
+def test_message_end_uses_run_tokens():
+    """message_end 带上本次运行累计的 token；没有记录时为0，图的输出保持原样"""
+    def run():
+        profile = start_run_profile()
+        profile.add_tokens(30, 10)
+        return create_message_end_dict("0", "", "s", "q", "log", time_cost_ms=5)
+
+    end = contextvars.copy_context().run(run)
+    assert end["content"]["message_end"]["token_cost"] == {"input_tokens": 30, "output_tokens": 10, "total_tokens": 40}
+
+    assert current_run_profile() is None
+    end = create_message_end_dict("0", "", "s", "q", "log", time_cost_ms=5)
+    assert end["content"]["message_end"]["token_cost"]["total_tokens"] == 0
+
+    graph = _build_graph()
+    result = graph.invoke({"text": "hi"})
+    assert "execution_path" not in result
@@ -0,0 +1,130 @@
+"""测试 cozeloop trace 的采样：按路由的比例、未采样运行只在失败时上报、不采样时不挂回调"""
+import sys
+import os
+from typing import Optional
+
+import pytest
+from cozeloop.integration.langchain.trace_callback import LoopTraceCallbackHandler
+from langgraph.graph import StateGraph, END
+from pydantic import BaseModel
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from coze_coding_utils.runtime_ctx.context import new_context
+from utils.log import loop_trace
+from utils.log.loop_trace import SampledTraceHandler, init_run_config, sample_decision
+
+
+class TraceState(BaseModel):
+    text: str = ""
+    reply: Optional[str] = None
+
+
+def _build_graph():
+    def sampled_reply(state: TraceState) -> dict:
+        """
+        title: 回复
+        desc: 生成回复
+        """
+        if state.text == "boom":
+            raise RuntimeError("boom")
+        return {"reply": state.text}
+
+    builder = StateGraph(TraceState)
+    builder.add_node("sampled_reply", sampled_reply, metadata={"type": "agent"})
+    builder.set_entry_point("sampled_reply")
+    builder.add_edge("sampled_reply", END)
+    return builder.compile()
+
+
+GRAPH = _build_graph()
+
+
+class RecordingProcessor:
+    """代替 SDK 的 span processor，记录交给上报队列的 span"""
+
+    def __init__(self):
+        self.spans = []
+
+    def on_span_end(self, span):
+        self.spans.append(span)
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    processor = RecordingProcessor()
+    monkeypatch.setattr(loop_trace.cozeloopTracer._trace_provider, "span_processor", processor)
+    return processor.spans
+
+
+def _run(text: str, method: str = "run"):
+    config = init_run_config(GRAPH, new_context(method=method))
+    handlers = [h for h in config["callbacks"] if isinstance(h, SampledTraceHandler)]
+    try:
+        GRAPH.invoke({"text": text}, config)
+    except RuntimeError:
+        pass
+    return handlers[0] if handlers else None
+
+
+def test_sampled_run_exported(exported):
+    """默认全部采样：span 结束时直接交给上报队列，并记录回调耗时"""
+    handler = _run("hi")
+    assert handler is not None and handler.decision == "sampled"
+    assert {span.name for span in exported} >= {"Workflow", "回复"}
+    assert handler.overhead > 0
+
+
+def test_held_run_exported_only_on_error(exported, monkeypatch):
+    """未被采样的运行：成功时丢弃 span，失败时全部上报"""
+    monkeypatch.setattr(loop_trace, "COZE_LOOP_SAMPLE_RATE", 0.0)
+    handler = _run("hi")
+    assert handler.hold and handler.decision == "dropped"
+    assert exported == []
+
+    handler = _run("boom")
+    assert handler.decision == "error"
+    assert {span.name for span in exported} >= {"Workflow", "回复"}
+    assert any(span.status_code for span in exported)
+
+
+def test_unsampled_run_has_no_trace_callback(exported, monkeypatch):
+    """成功和失败都不采样时不挂 trace 回调"""
+    monkeypatch.setattr(loop_trace, "COZE_LOOP_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(loop_trace, "COZE_LOOP_ERROR_SAMPLE_RATE", 0.0)
+    assert _run("boom") is None
+    assert exported == []
+
+
+def test_sample_rate_per_route(monkeypatch):
+    """按路由或图模式覆盖默认比例，同一次运行的结果固定"""
+    monkeypatch.setattr(loop_trace, "_sample_rates", {"run": 0.05, "agent": 0.0})
+    monkeypatch.setattr(loop_trace, "COZE_LOOP_ERROR_SAMPLE_RATE", 0.0)
+    decisions = [sample_decision("run", "workflow", f"run_{i}") for i in range(4000)]
+    assert 0.03 < decisions.count("sampled") / len(decisions) < 0.07
+    assert set(decisions) == {"sampled", "off"}
+    assert decisions == [sample_decision("run", "workflow", f"run_{i}") for i in range(4000)]
+    assert sample_decision("node_run", "workflow", "run_1") == "sampled"
+    assert sample_decision("stream_sse", "agent", "run_1") == "off"
+
+
+def test_fallback_when_sdk_cannot_hold(exported, monkeypatch, caplog):
+    """SDK 缺少 hold 需要的内部接口时，未采样的运行改用公开接口的回调完整上报，告警只记录一次"""
+    monkeypatch.setattr(loop_trace, "COZE_LOOP_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(loop_trace, "_hold_supported", True)
+    monkeypatch.setattr(loop_trace, "_missing_features", set())
+    with caplog.at_level("WARNING", logger=loop_trace.__name__):
+        loop_trace._disable_hold("Span.span_processor")
+        loop_trace._disable_hold("Span.span_processor")
+    assert len(caplog.records) == 1
+
+    fallback = loop_trace._decisions["fallback"]
+    config = init_run_config(GRAPH, new_context(method="run"))
+    handlers = [h for h in config["callbacks"] if isinstance(h, LoopTraceCallbackHandler)]
+    assert len(handlers) == 1 and not isinstance(handlers[0], SampledTraceHandler)
+    GRAPH.invoke({"text": "hi"}, config)
+    assert {span.name for span in exported} >= {"Workflow", "回复"}
+    assert loop_trace._decisions["fallback"] == fallback + 1
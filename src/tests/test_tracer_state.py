@@ -0,0 +1,124 @@
+"""测试 Logger 回调中未结束 run 的状态：按运行隔离、根 run 结束时释放、有数量上限"""
+import sys
+import os
+import gc
+import tracemalloc
+import uuid
+from typing import Optional
+
+from langgraph.graph import StateGraph, END
+from pydantic import BaseModel
+
+# 添加项目根目录到Python路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from coze_coding_utils.runtime_ctx.context import new_context
+from utils.log import node_log
+from utils.log.node_log import Logger
+
+
+class TraceState(BaseModel):
+    text: str = ""
+    reply: Optional[str] = None
+
+
+def _build_graph():
+    def trace_reply(state: TraceState) -> dict:
+        """
+        title: 回复
+        desc: 生成回复
+        """
+        return {"reply": state.text}
+
+    builder = StateGraph(TraceState)
+    builder.add_node("trace_reply", trace_reply, metadata={"type": "agent"})
+    builder.set_entry_point("trace_reply")
+    builder.add_edge("trace_reply", END)
+    return builder.compile()
+
+
+GRAPH = _build_graph()
+
+
+def _request(tracer: Logger, abandon: bool = False) -> None:
+    """模拟一次运行的回调：根 run 和一个节点，abandon 时节点收不到结束回调（取消、超时）"""
+    root, node = uuid.uuid4(), uuid.uuid4()
+    tracer.on_chain_start_graph({}, {"text": "hi"}, run_id=root, name="LangGraph")
+    tracer.on_chain_start_graph({}, {"text": "hi"}, run_id=node, parent_run_id=root, name="trace_reply")
+    if not abandon:
+        tracer.on_chain_end_graph({"reply": "hi"}, run_id=node, parent_run_id=root)
+    tracer.on_chain_end_graph({"reply": "hi"}, run_id=root)
+
+
+def test_state_per_logger(monkeypatch):
+    """每次运行的 Logger 各自记录未结束的 run"""
+    monkeypatch.setattr(node_log, "write_log", lambda entry: None)
+    first = Logger(GRAPH, new_context(method="run"))
+    second = Logger(GRAPH, new_context(method="run"))
+    run_id = uuid.uuid4()
+    first.on_chain_start_graph({}, {}, run_id=run_id, parent_run_id=uuid.uuid4(), name="trace_reply")
+    assert first.run_id_map == {run_id: "trace_reply"}
+    assert second.run_id_map == {}
+
+
+def test_abandoned_runs_released_with_root(monkeypatch):
+    """没有收到结束回调的节点在根 run 结束或失败时释放"""
+    monkeypatch.setattr(node_log, "write_log", lambda entry: None)
+    tracer = Logger(GRAPH, new_context(method="run"))
+    _request(tracer, abandon=True)
+    assert not tracer.run_id_map and not tracer._node_started and tracer.root_run_id is None
+
+    root, node = uuid.uuid4(), uuid.uuid4()
+    tracer.on_chain_start_graph({}, {}, run_id=root, name="LangGraph")
+    tracer.on_chain_start_graph({}, {}, run_id=node, parent_run_id=root, name="trace_reply")
+    assert tracer.root_run_id == root and node in tracer._node_started
+    tracer.on_chain_error(RuntimeError("boom"), run_id=root)
+    assert not tracer.run_id_map and not tracer._node_started
+
+
+def test_open_runs_capped(monkeypatch):
+    """根 run 一直不结束时，未结束的 run 数不超过上限，丢弃最早的"""
+    monkeypatch.setattr(node_log, "write_log", lambda entry: None)
+    monkeypatch.setattr(node_log, "TRACER_MAX_OPEN_RUNS", 50)
+    tracer = Logger(GRAPH, new_context(method="run"))
+    root = uuid.uuid4()
+    tracer.on_chain_start_graph({}, {}, run_id=root, name="LangGraph")
+    runs = [uuid.uuid4() for _ in range(200)]
+    for run_id in runs:
+        tracer.on_chain_start_graph({}, {}, run_id=run_id, parent_run_id=root, name="trace_reply")
+    assert len(tracer.run_id_map) == 50 and len(tracer._node_started) == 50
+    assert list(tracer.run_id_map) == runs[-50:]
+    assert tracer.evicted == 151
+
+    # 被丢弃的 run 结束时按未知 run 处理
+    tracer.on_chain_end_graph({}, run_id=runs[0], parent_run_id=root)
+    tracer.on_chain_end_graph({}, run_id=runs[-1], parent_run_id=root)
+    assert len(tracer.run_id_map) == 49
+
+
+def test_memory_flat_under_soak(monkeypatch):
+    """大量请求（含被放弃的运行）后内存不随请求数增长"""
+    monkeypatch.setattr(node_log, "write_log", lambda entry: None)
+    shared = Logger(GRAPH, new_context(method="run"))
+
+    def batch(n: int) -> None:
+        for i in range(n):
+            _request(shared, abandon=i % 3 == 0)
+            _request(Logger(GRAPH, new_context(method="run")), abandon=i % 3 == 0)
+
+    batch(500)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        batch(2000)
+        gc.collect()
+        baseline, _ = tracemalloc.get_traced_memory()
+        batch(6000)
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert not shared.run_id_map and not shared._node_started
+    assert current - baseline < 64 * 1024
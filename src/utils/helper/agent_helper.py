@@ -21,7 +21,7 @@ from utils.messages.server import (
     ToolResponseDetail,
     MessageStartDetail,
     MessageEndDetail,
-    TokenCost,
+    current_token_cost,
     MESSAGE_TYPE_MESSAGE_START,
     MESSAGE_TYPE_MESSAGE_END,
     MESSAGE_END_CODE_SUCCESS,
@@ -547,7 +547,7 @@ def iter_server_messages(
                 message_end=MessageEndDetail(
                     code=MESSAGE_END_CODE_SUCCESS,
                     message="",
-                    token_cost=TokenCost(input_tokens=0, output_tokens=0, total_tokens=0),
+                    token_cost=current_token_cost(),
                     time_cost_ms=t_ms,
                 )
             ),
@@ -572,7 +572,7 @@ def iter_server_messages(
                     code=str(err.code),
                     message=err.message,
                     time_cost_ms=t_ms,
-                    token_cost=TokenCost(input_tokens=0, output_tokens=0, total_tokens=0),
+                    token_cost=current_token_cost(),
                 )
             ),
             log_id=log_id,
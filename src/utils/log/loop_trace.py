@@ -1,29 +1,276 @@
+"""
+cozeloop trace 的回调配置与采样
+
+- 上报：span 结束后进入 SDK 的有界队列（COZE_LOOP_QUEUE_SIZE，满时丢弃并计数），
+  由 SDK 的后台线程按批（COZE_LOOP_EXPORT_BATCH）或每秒上报一次；请求结束时不再同步 flush，
+  进程退出时 close() 上报剩余的 span
+- 采样：运行开始时按路由（ctx.method：run / stream_run / stream_sse / node_run）或图模式
+  （workflow / agent）决定，COZE_LOOP_SAMPLE_RATE 为默认比例，COZE_LOOP_SAMPLE_RATES 按路由或模式覆盖
+  （如 "run=0.05,stream_sse=0.05,agent=0.2"）。未被采样的运行按 COZE_LOOP_ERROR_SAMPLE_RATE 保留失败的 trace：
+  span 先留在回调中（最多 COZE_LOOP_MAX_HELD_SPANS 个），运行失败时上报，成功时丢弃；两者都不命中时不挂 trace 回调
+- 开销：每次运行在 trace 回调中花费的时间记入 /metrics 的 trace_overhead_seconds；SDK 的 RuntimeInfo
+  每个 span 都通过 importlib.metadata 查询一次 langchain 版本（扫描 sys.path），这里改为进程内只查一次
+- SDK 内部接口：hold、RuntimeInfo 缓存、上报队列指标依赖 cozeloop 的非公开接口（requirements.txt 固定版本）。
+  导入时逐项检查，缺失时记录一次告警并退回公开接口：RuntimeInfo 不替换，hold 的运行改用
+  LoopTracer.get_callback_handler 的回调完整上报（计为 fallback），不输出上报队列指标
+"""
+import atexit
+import functools
+import importlib.metadata as metadata
+import logging
 import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Set
+
 import cozeloop
-from cozeloop.integration.langchain.trace_callback import LoopTracer
+from cozeloop.integration.langchain import trace_callback
+from cozeloop.integration.langchain.trace_callback import LoopTracer, LoopTraceCallbackHandler
 from langchain_core.runnables import RunnableConfig
 from utils.log.common import get_execute_mode
+from utils.log.metrics import TRACE_OVERHEAD, Sample, register_collector
 from utils.log.node_log import Logger
+from utils.log.payload import parse_sample_rates
+
+try:
+    from cozeloop.integration.langchain.trace_model.runtime import RuntimeInfo
+except ImportError:
+    RuntimeInfo = None
+try:
+    from cozeloop.internal.trace.model.model import QueueConf
+except ImportError:
+    QueueConf = None
+
+logger = logging.getLogger(__name__)
 
 space_id = os.getenv("COZE_PROJECT_SPACE_ID", "YOUR_SPACE_ID")
 api_token = os.getenv("COZE_LOOP_API_TOKEN", "YOUR_LOOP_API_TOKEN")
 base_url = os.getenv("COZE_LOOP_BASE_URL", "https://api.coze.cn")
 commit_hash = os.getenv("COZE_PROJECT_COMMIT_HASH","") # 发布版本的hash值
 
+# 采样比例：默认、按路由或图模式覆盖、未采样运行中失败 trace 的保留比例
+COZE_LOOP_SAMPLE_RATE = float(os.getenv("COZE_LOOP_SAMPLE_RATE", "1"))
+COZE_LOOP_SAMPLE_RATES = os.getenv("COZE_LOOP_SAMPLE_RATES", "")
+COZE_LOOP_ERROR_SAMPLE_RATE = float(os.getenv("COZE_LOOP_ERROR_SAMPLE_RATE", "1"))
+# 未采样运行中等待运行结果的 span 上限，超出的 span 丢弃
+COZE_LOOP_MAX_HELD_SPANS = int(os.getenv("COZE_LOOP_MAX_HELD_SPANS", "1000"))
+# SDK 上报队列容量和每批上报的 span 数
+COZE_LOOP_QUEUE_SIZE = int(os.getenv("COZE_LOOP_QUEUE_SIZE", "1024"))
+COZE_LOOP_EXPORT_BATCH = int(os.getenv("COZE_LOOP_EXPORT_BATCH", "100"))
+
+# 已告警过的缺失接口（每项只记录一次）
+_missing_features: Set[str] = set()
+
+
+def _warn_missing(feature: str, fallback: str) -> None:
+    if feature not in _missing_features:
+        _missing_features.add(feature)
+        logger.warning(f"cozeloop {feature} is not available in this SDK version, {fallback}")
+
+
+if QueueConf is None:
+    _warn_missing("QueueConf", "using the default span queue size")
 cozeloopTracer = cozeloop.new_client(
     workspace_id=space_id,
     api_token=api_token,
     api_base_url=base_url,
+    trace_queue_conf=QueueConf(
+        span_queue_length=COZE_LOOP_QUEUE_SIZE,
+        span_max_export_batch_length=COZE_LOOP_EXPORT_BATCH,
+    ) if QueueConf is not None else None,
 )
 cozeloop.set_default_client(cozeloopTracer)
+atexit.register(cozeloopTracer.close)
+
+
+def init_tracer() -> None:
+    """
+    绑定 trace 回调使用的 cozeloop client
+
+    SDK 的回调从模块全局变量读取 client，该变量只由 LoopTracer.get_callback_handler 设置；
+    本模块导入时（服务启动时）调用一次，之后创建回调不再重复绑定。
+    """
+    LoopTracer.get_callback_handler(cozeloopTracer)
+
+
+init_tracer()
+
+_sample_rates = parse_sample_rates(COZE_LOOP_SAMPLE_RATES)
+
+
+@functools.lru_cache(maxsize=None)
+def _langchain_version() -> str:
+    try:
+        return metadata.version("langchain")
+    except metadata.PackageNotFoundError:
+        return ""
+
+
+if RuntimeInfo is not None and hasattr(trace_callback, "RuntimeInfo"):
+    class CachedRuntimeInfo(RuntimeInfo):
+        """span 的运行时信息，langchain 版本只查询一次"""
+
+        def model_post_init(self, context: Any) -> None:
+            self.library_version = _langchain_version()
+
+    trace_callback.RuntimeInfo = CachedRuntimeInfo
+else:
+    _warn_missing("trace_callback.RuntimeInfo", "langchain version is looked up for every span")
+
+# hold 需要替换 span 的 processor：SDK 需提供 _new_flow_span、span.span_processor 和 SDK 的 span processor
+_hold_supported = callable(getattr(LoopTraceCallbackHandler, "_new_flow_span", None)) and hasattr(
+    getattr(getattr(cozeloopTracer, "_trace_provider", None), "span_processor", None), "on_span_end"
+)
+if not _hold_supported:
+    _warn_missing("span processor hooks", "unsampled runs are traced in full")
+
+# 各采样结果的运行数：sampled 上报 / error 失败后上报 / dropped 成功后丢弃 / off 不挂回调 /
+# fallback SDK 不支持 hold，改为完整上报
+_decisions: Dict[str, int] = {"sampled": 0, "error": 0, "dropped": 0, "off": 0, "fallback": 0}
+_held_dropped = 0
+_stats_lock = threading.Lock()
+
+
+def _count(decision: str, held_dropped: int = 0) -> None:
+    global _held_dropped
+    with _stats_lock:
+        _decisions[decision] += 1
+        _held_dropped += held_dropped
+
+
+def _sampled(rate: float, key: str) -> bool:
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    return zlib.crc32(key.encode("utf-8")) / 0xFFFFFFFF < rate
+
+
+def sample_decision(method: str, mode: str, run_id: str) -> str:
+    """
+    运行开始时的采样结果
+    :return: sampled 全部上报 / hold 失败时上报 / off 不记录
+    """
+    rate = _sample_rates.get(method, _sample_rates.get(mode, COZE_LOOP_SAMPLE_RATE))
+    if _sampled(rate, run_id):
+        return "sampled"
+    if _sampled(COZE_LOOP_ERROR_SAMPLE_RATE, f"error:{run_id}"):
+        return "hold"
+    return "off"
+
+
+class SampledTraceHandler(LoopTraceCallbackHandler):
+    """
+    记录回调耗时的 LoopTracer 回调
+
+    hold 时 span 结束后不直接交给 SDK，先留在本实例（本实例代替 SDK 的 span processor），
+    根 run 失败或有 span 出错时再交给 SDK 上报，否则丢弃。
+    """
+
+    def __init__(self, method: str, hold: bool, **kwargs: Any):
+        super().__init__(kwargs.get("modify_name_fn"), kwargs.get("add_tags_fn"), kwargs.get("tags"))
+        self.method = method
+        self.hold = hold
+        # 根 run 结束时的采样结果：sampled / error / dropped
+        self.decision = ""
+        # 本次运行在 trace 回调中花费的时间（秒）
+        self.overhead = 0.0
+        self._held: list = []
+        self._held_dropped = 0
+        self._failed = False
+        self._processor = None
+
+    def _new_flow_span(self, node_name: str, span_type: str, **kwargs: Any):
+        span = super()._new_flow_span(node_name, span_type, **kwargs)
+        if self.hold:
+            if not hasattr(span, "span_processor"):
+                # SDK 的 span 没有 processor 属性：本次及之后的运行不再 hold
+                _disable_hold("Span.span_processor")
+                self.hold = False
+                return span
+            self._processor = span.span_processor
+            span.span_processor = self
+        return span
+
+    def on_span_end(self, span) -> None:
+        """span 结束（hold 时代替 SDK 的 span processor）"""
+        if span.status_code:
+            self._failed = True
+        if len(self._held) < COZE_LOOP_MAX_HELD_SPANS:
+            self._held.append(span)
+        else:
+            self._held_dropped += 1
+
+    def on_chain_end(self, outputs: Any, **kwargs: Any) -> Any:
+        super().on_chain_end(outputs, **kwargs)
+        if kwargs.get("parent_run_id") is None:
+            self._on_root_end()
+
+    def on_chain_error(self, error: BaseException, **kwargs: Any) -> Any:
+        super().on_chain_error(error, **kwargs)
+        if kwargs.get("parent_run_id") is None:
+            self._failed = True
+            self._on_root_end()
+
+    def _on_root_end(self) -> None:
+        if not self.hold:
+            self.decision = "sampled"
+            _count(self.decision)
+            return
+        held, self._held = self._held, []
+        self.decision = "error" if self._failed and self._processor is not None else "dropped"
+        if self.decision == "error":
+            for span in held:
+                self._processor.on_span_end(span)
+        _count(self.decision, self._held_dropped)
+
+
+def _timed(callback):
+    @functools.wraps(callback)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return callback(self, *args, **kwargs)
+        finally:
+            self.overhead += time.perf_counter() - start
+            if kwargs.get("parent_run_id") is None and callback.__name__ in ("on_chain_end", "on_chain_error"):
+                TRACE_OVERHEAD.observe(self.overhead, self.method, self.decision)
+    return wrapper
+
+
+for _name in ("on_llm_start", "on_chat_model_start", "on_llm_end", "on_chain_start", "on_chain_end",
+              "on_chain_error", "on_tool_start", "on_tool_end", "on_tool_error"):
+    setattr(SampledTraceHandler, _name, _timed(getattr(SampledTraceHandler, _name)))
+
+
+def _disable_hold(feature: str) -> None:
+    global _hold_supported
+    _hold_supported = False
+    _warn_missing(feature, "unsampled runs are traced in full")
+
+
+def _trace_handler(ctx, mode: str, **kwargs: Any) -> Optional[LoopTraceCallbackHandler]:
+    """按采样结果创建 trace 回调，不记录时返回 None"""
+    decision = sample_decision(ctx.method or "", mode, ctx.run_id or "")
+    if decision == "off":
+        _count("off")
+        return None
+    if decision == "hold" and not _hold_supported:
+        _count("fallback")
+        return LoopTracer.get_callback_handler(
+            cozeloopTracer, kwargs.get("modify_name_fn"), kwargs.get("add_tags_fn"), kwargs.get("tags")
+        )
+    return SampledTraceHandler(ctx.method or "", decision == "hold", **kwargs)
 
 
 def init_run_config(graph, ctx):
     tracer = Logger(graph, ctx)
     tracer.on_chain_start = tracer.on_chain_start_graph  # 非必须
     tracer.on_chain_end = tracer.on_chain_end_graph
-    trace_callback_handler = LoopTracer.get_callback_handler(
-        cozeloopTracer,
+    trace_callback_handler = _trace_handler(
+        ctx,
+        "workflow",
         add_tags_fn=tracer.get_node_tags,
         modify_name_fn=tracer.get_node_name,
         tags={
@@ -33,33 +280,55 @@ def init_run_config(graph, ctx):
             "commit_hash": commit_hash,
         }
     )
+    callbacks: List[Any] = [tracer]
+    if trace_callback_handler is not None:
+        callbacks.append(trace_callback_handler)
     config = RunnableConfig(
-        callbacks=[
-            tracer,
-            trace_callback_handler
-        ],
+        callbacks=callbacks,
     )
     return config
 
 
 def init_agent_config(graph, ctx):
+    trace_callback_handler = _trace_handler(
+        ctx,
+        "agent",
+        tags={
+            "project_id": ctx.project_id,
+            "execute_mode": get_execute_mode(),
+            "log_id": ctx.logid,
+            "commit_hash": commit_hash,
+        }
+    )
     config = RunnableConfig(
-        callbacks=[
-            LoopTracer.get_callback_handler(
-                cozeloopTracer,
-                tags={
-                    "project_id": ctx.project_id,
-                    "execute_mode": get_execute_mode(),
-                    "log_id": ctx.logid,
-                    "commit_hash": commit_hash,
-                }
-                )
-        ]
+        callbacks=[trace_callback_handler] if trace_callback_handler is not None else []
     )
     print("config", config)
     return config
 
 
+def _collect_trace() -> Iterator[Sample]:
+    decisions = Sample("trace_runs_total", "Graph runs by trace sampling result", "counter", ("decision",))
+    with _stats_lock:
+        for decision, count in _decisions.items():
+            decisions.add(count, decision)
+        held_dropped = _held_dropped
+    yield decisions
+    yield Sample("trace_held_spans_dropped_total", "Spans dropped because a held trace exceeded COZE_LOOP_MAX_HELD_SPANS", "counter") \
+        .add(held_dropped)
+    span_queue = getattr(getattr(getattr(cozeloopTracer, "_trace_provider", None), "span_processor", None), "span_qm", None)
+    if span_queue is None or not hasattr(getattr(span_queue, "queue", None), "qsize") or not hasattr(span_queue, "dropped"):
+        _warn_missing("span export queue", "trace export queue metrics are not reported")
+    else:
+        yield Sample("trace_export_pending", "Spans waiting in the cozeloop export queue", "gauge") \
+            .add(span_queue.queue.qsize())
+        yield Sample("trace_export_dropped_total", "Spans dropped because the cozeloop export queue was full", "counter") \
+            .add(span_queue.dropped)
+
+
+register_collector(_collect_trace)
+
+
 # 保留add_trace_tags函数，作为对trace.set_tags的简单包装
 def add_trace_tags(trace, tags):
     """
@@ -69,4 +338,3 @@ def add_trace_tags(trace, tags):
     """
     # 使用set_tags方法
     trace.set_tags(tags)
-
@@ -0,0 +1,288 @@
+"""
+进程内指标，由 /metrics 以 Prometheus 文本格式导出
+
+- 直方图按线程分片：每个线程只写自己的分片（threading.local），观测时不加锁，
+  导出时汇总所有分片；分片只在线程第一次观测时登记一次
+- 节点和工作流耗时来自 utils/log/node_log.py 的 Logger 回调；LLM / TTS / ASR / Search 调用耗时
+  由 instrument_sdk_clients() 在 SDK 客户端方法上统一计时（这些调用不经过 LangChain 回调），
+  同时计入当前运行的耗时分解（utils/log/run_profile.py）
+- 缓存命中、连接池、队列深度等已有统计在导出时通过 register_collector() 注册的回调读取
+"""
+import bisect
+import functools
+import inspect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from utils.log.run_profile import record_external_call
+
+# 耗时直方图的桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 队列 / 连接池等待的桶（秒）
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """按线程分片的直方图"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._local = threading.local()
+        # 所有线程的分片：labels -> [各桶计数..., +Inf 桶计数, 总和]
+        self._shards: List[Dict[Tuple[str, ...], List[float]]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict[Tuple[str, ...], List[float]]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            series = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def collect(self) -> Dict[Tuple[str, ...], List[float]]:
+        """汇总所有分片"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged: Dict[Tuple[str, ...], List[float]] = {}
+        for shard in shards:
+            for labels, series in list(shard.items()):
+                total = merged.get(labels)
+                if total is None:
+                    merged[labels] = list(series)
+                else:
+                    for i, value in enumerate(series):
+                        total[i] += value
+        return merged
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Sample:
+    """导出时由回调生成的一组同名样本（计数器或仪表）"""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind  # counter / gauge
+        self.labelnames = tuple(labelnames)
+        self.values: List[Tuple[Tuple[str, ...], float]] = []
+
+    def add(self, value: float, *labels: str) -> "Sample":
+        self.values.append((labels, value))
+        return self
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in self.values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+NODE_DURATION = Histogram(
+    "graph_node_duration_seconds", "Graph node latency", ("node", "status")
+)
+WORKFLOW_DURATION = Histogram(
+    "graph_workflow_duration_seconds", "Whole graph run latency", ("method", "status")
+)
+EXTERNAL_CALL_DURATION = Histogram(
+    "external_call_duration_seconds", "LLM / TTS / ASR / Search call latency", ("service", "model", "status")
+)
+QUEUE_WAIT = Histogram(
+    "queue_wait_seconds", "Time spent waiting in internal queues and connection pools", ("queue",), WAIT_BUCKETS
+)
+TRACE_OVERHEAD = Histogram(
+    "trace_overhead_seconds", "Time spent in cozeloop trace callbacks per graph run", ("method", "decision"), WAIT_BUCKETS
+)
+
+_histograms: List[Histogram] = [NODE_DURATION, WORKFLOW_DURATION, EXTERNAL_CALL_DURATION, QUEUE_WAIT, TRACE_OVERHEAD]
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+
+
+def register_collector(collector: Callable[[], Iterable[Sample]]) -> None:
+    """注册导出时调用的回调（读取已有统计，生成计数器或仪表）"""
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    """所有指标的 Prometheus 文本格式"""
+    lines: List[str] = []
+    for histogram in _histograms:
+        lines.extend(histogram.render())
+    for collector in _collectors:
+        try:
+            for sample in collector():
+                lines.extend(sample.render())
+        except Exception as e:
+            lines.append(f"# collector {getattr(collector, '__name__', collector)} failed: {_escape(e)}")
+    return "\n".join(lines) + "\n"
+
+
+# ============== SDK 客户端调用 ==============
+
+# (类名, 方法名, 服务名)；LLMClient.invoke 内部通过流式调用实现，不单独统计 stream
+SDK_CALLS = (
+    ("LLMClient", "invoke", "llm"),
+    ("TTSClient", "synthesize", "tts"),
+    ("ASRClient", "recognize", "asr"),
+    ("SearchClient", "search", "search"),
+)
+
+
+def _timed_call(func: Callable, service: str) -> Callable:
+    default_model = ""
+    try:
+        parameter = inspect.signature(func).parameters.get("model")
+        if parameter is not None and parameter.default is not inspect.Parameter.empty:
+            default_model = parameter.default
+    except (TypeError, ValueError):
+        pass
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        model = kwargs.get("model") or default_model
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = func(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            EXTERNAL_CALL_DURATION.observe(elapsed, service, model, status)
+            record_external_call(service, elapsed)
+
+    wrapper._metrics_wrapped = True
+    return wrapper
+
+
+def instrument_sdk_clients() -> int:
+    """给 coze_coding_dev_sdk 客户端方法加上计时（只执行一次），返回新包装的方法数"""
+    try:
+        import coze_coding_dev_sdk as sdk
+    except ImportError:
+        return 0
+    wrapped = 0
+    for class_name, method, service in SDK_CALLS:
+        cls = getattr(sdk, class_name, None)
+        func = getattr(cls, method, None) if cls is not None else None
+        if func is None or getattr(func, "_metrics_wrapped", False):
+            continue
+        setattr(cls, method, _timed_call(func, service))
+        wrapped += 1
+    return wrapped
+
+
+# ============== 已有统计 ==============
+
+def _collect_caches() -> Iterator[Sample]:
+    from graphs.memory_store import MemoryStore
+
+    store = MemoryStore._instance
+    if store is None or not getattr(store, "initialized", False):
+        return
+    cache = store.get_cache_stats()
+    yield Sample("cache_requests_total", "Cache lookups by result", "counter", ("cache", "result")) \
+        .add(cache["hits"], "response", "hit").add(cache["misses"], "response", "miss")
+    yield Sample("cache_hit_ratio", "Cache hit ratio since start", "gauge", ("cache",)) \
+        .add(cache["hit_ratio"], "response")
+    backend = store.get_backend_stats()
+    if backend is not None:
+        yield Sample("memory_backend_pending", "Memory changes waiting to be written to Postgres", "gauge") \
+            .add(backend["pending"])
+        yield Sample("memory_backend_children_loaded_total", "Children loaded from Postgres (store misses)", "counter") \
+            .add(backend["children_loaded"])
+        yield Sample("memory_backend_errors_total", "Failed Postgres batch writes", "counter") \
+            .add(backend["errors"])
+        yield Sample("memory_backend_consecutive_errors", "Postgres batch writes failed in a row", "gauge") \
+            .add(backend["consecutive_errors"])
+        yield Sample("memory_backend_dropped_total", "Memory changes dropped after exceeding retry or pending limits", "counter") \
+            .add(backend["dropped_rows"])
+
+
+def _collect_pools() -> Iterator[Sample]:
+    from storage.database.db import get_pool_stats
+    from storage.memory.memory_saver import get_checkpoint_pool_stats
+
+    pools = get_pool_stats()
+    checkpoint = get_checkpoint_pool_stats()
+    if checkpoint is not None:
+        pools["checkpoint"] = checkpoint
+    if not pools:
+        return
+    checked_out = Sample("db_pool_checked_out", "Connections checked out", "gauge", ("pool",))
+    idle = Sample("db_pool_idle", "Idle connections", "gauge", ("pool",))
+    waiting = Sample("db_pool_waiting", "Requests waiting for a connection", "gauge", ("pool",))
+    for name, stats in pools.items():
+        checked_out.add(stats["checked_out"], name)
+        idle.add(stats["idle"], name)
+        waiting.add(stats["waiting"], name)
+    yield from (checked_out, idle, waiting)
+
+
+def _collect_checkpoint_writer() -> Iterator[Sample]:
+    from storage.memory.memory_saver import _graph_checkpointers
+
+    pending = Sample("checkpoint_writer_pending", "Checkpoint writes queued for the background writer", "gauge", ("mode",))
+    for mode, checkpointer in _graph_checkpointers.items():
+        if hasattr(checkpointer, "stats"):
+            pending.add(checkpointer.stats()["pending"], mode)
+    if pending.values:
+        yield pending
+
+
+register_collector(_collect_caches)
+register_collector(_collect_pools)
+register_collector(_collect_checkpoint_writer)
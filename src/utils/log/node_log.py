@@ -6,14 +6,20 @@ from utils.log.config import LOG_DIR
 from utils.log.common import get_execute_mode, is_prod
 import uuid
 from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
 from coze_coding_utils.runtime_ctx.context import Context
 import os
 import sys
 import json
 from typing import Dict, Optional, Any
 from pydantic import BaseModel
-from utils.log.parser import LangGraphParser
+from utils.log.parser import get_graph_parser
+from utils.log.metrics import NODE_DURATION, WORKFLOW_DURATION
+from utils.log.node_log_writer import get_node_log_writer
+from utils.log.payload import payload_sampled, serialize_payload
+from utils.log.run_profile import RunProfile, current_run_profile
 import asyncio
+import threading
 
 
 class ParamInfo:
@@ -49,6 +55,9 @@ logging.basicConfig(
     ]
 )
 
+# 一次运行中同时未结束的 LangChain run 数上限
+TRACER_MAX_OPEN_RUNS = int(os.getenv("TRACER_MAX_OPEN_RUNS", "10000"))
+
 # 获取logger实例（仅用于控制台输出）
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -56,21 +65,26 @@ logger.setLevel(logging.INFO)
 
 def write_log(log_entry):
     """
-    直接使用文件操作写入JSON格式日志，确保立即刷新到磁盘
+    写入JSON格式日志：默认放入后台写入器批量写入（见 node_log_writer.py），
+    NODE_LOG_ASYNC=0 时直接使用文件操作写入，确保立即刷新到磁盘
     :param log_entry: 符合要求格式的日志字典
     """
     try:
         if is_prod():
             #  线上不打日志，待具备清理能后再打
             return None
-        log_json = json.dumps(log_entry, ensure_ascii=False)
+        writer = get_node_log_writer(LOG_FILE)
+        if writer is not None:
+            writer.submit(log_entry)
+        else:
+            log_json = json.dumps(log_entry, ensure_ascii=False)
 
-        # 修改为行缓冲模式（buffering=1）而不是无缓冲模式
-        with open(LOG_FILE, 'a', encoding='utf-8', buffering=1) as f:  # 行缓冲模式
-            f.write(log_json + '\n')
-            # 显式调用flush和fsync确保数据写入磁盘
-            f.flush()
-            os.fsync(f.fileno())
+            # 修改为行缓冲模式（buffering=1）而不是无缓冲模式
+            with open(LOG_FILE, 'a', encoding='utf-8', buffering=1) as f:  # 行缓冲模式
+                f.write(log_json + '\n')
+                # 显式调用flush和fsync确保数据写入磁盘
+                f.flush()
+                os.fsync(f.fileno())
 
         # 同时输出到控制台以便调试
         level = log_entry.get('level', 'info').lower()
@@ -229,14 +243,27 @@ def log_workflow_end(execution_id, output=None, total_time=None, status="success
 
 
 class Logger(BaseCallbackHandler):
+    """
+    工作流运行的日志回调（每次运行由 init_run_config 创建）
+
+    未结束的 LangChain run 只记录在本实例中，根 run 结束或失败时清空；
+    取消、超时等情况下收不到结束回调的 run 最多保留 TRACER_MAX_OPEN_RUNS 个，超出时丢弃最早的。
+    """
+
     def __init__(self, graph, ctx: Context):
         self.root_run_id = None
         self.graph = graph
         self.runtime_ctx = ctx
         self.start_time = time.time()
-        self.parser = LangGraphParser(graph)
-
-    run_id_map: Dict[uuid.UUID, str] = {}
+        self.parser = get_graph_parser(graph)
+        # 未结束的 run：run_id -> 名称
+        self.run_id_map: Dict[uuid.UUID, str] = {}
+        # 节点开始时间（perf_counter），用于节点耗时指标
+        self._node_started: Dict[uuid.UUID, float] = {}
+        self._evict_lock = threading.Lock()
+        self.evicted = 0
+        # 本次运行的耗时分解（GraphService 启动运行时创建，根节点开始时取得）
+        self.profile: Optional[RunProfile] = None
 
     def on_chain_start_graph(
             self,
@@ -253,8 +280,17 @@ class Logger(BaseCallbackHandler):
             metadata = {}
         node_name_value = kwargs.get("name")
         node_name: str | None = node_name_value if isinstance(node_name_value, str) else None
+        if parent_run_id is None:
+            self.root_run_id = run_id
+            self.profile = current_run_profile()
         if node_name:
+            if len(self.run_id_map) >= TRACER_MAX_OPEN_RUNS:
+                self._evict_oldest()
             self.run_id_map[run_id] = node_name
+            if node_name in self.parser.nodes or node_name in self.parser.condition_funcs:
+                self._node_started[run_id] = time.perf_counter()
+            if self.profile is not None and node_name in self.parser.nodes:
+                self.profile.enter_node(node_name)
         if parent_run_id is None:
             self._on_graph_start(inputs)  # workflow 开始
         node_info = self.parser.nodes.get(node_name) if node_name is not None else None
@@ -265,7 +301,7 @@ class Logger(BaseCallbackHandler):
                 log_entry = create_log_entry(
                     level="info",
                     message=f"Condition node '{node_name}' started",
-                    input_data=_serialize_data(inputs),
+                    input_data=self._payload(node_name, inputs),
                     node_name=self.parser.condition_funcs[node_name]["cond_node_name"],  # 前端的条件节点名
                     execution_id=self.runtime_ctx.run_id,
                     execute_mode=get_execute_mode(),
@@ -281,7 +317,7 @@ class Logger(BaseCallbackHandler):
         log_entry = create_log_entry(
             level="info",
             message=f"Node '{node_info.name}' started",
-            input_data=_serialize_data(inputs),
+            input_data=self._payload(node_name, inputs),
             node_id=node_info.node_id,
             node_type=node_info.node_type,
             node_title=node_info.title,
@@ -303,7 +339,9 @@ class Logger(BaseCallbackHandler):
             **kwargs: Any,
     ) -> Any:
         node_name = self.run_id_map.pop(run_id, None)
+        self._observe_node(run_id, node_name, "ok")
         if parent_run_id is None:  # 根节点
+            self._release_runs()
             self._on_graph_end(outputs)
         elif node_name:
             # Node end
@@ -315,7 +353,7 @@ class Logger(BaseCallbackHandler):
                     log_entry = create_log_entry(
                         level="info",
                         message=f"Condition node '{node_name}' ended",
-                        output_data=_serialize_data(outputs),
+                        output_data=self._payload(node_name, outputs),
                         node_name=self.parser.condition_funcs[node_name]["cond_node_name"],  # 前端的条件节点名
                         execution_id=self.runtime_ctx.run_id,
                         execute_mode=get_execute_mode(),
@@ -331,7 +369,7 @@ class Logger(BaseCallbackHandler):
             log_entry = create_log_entry(
                 level="info",
                 message=f"Node '{node_info.name}' ended",
-                output_data=_serialize_data(outputs),
+                output_data=self._payload(node_name, outputs),
                 node_id=node_info.node_id,  # 注册的时候使用的function name，前端用来流转
                 node_type=node_info.node_type,
                 node_title=node_info.title,
@@ -353,13 +391,14 @@ class Logger(BaseCallbackHandler):
             commit_id=commit_id,
             log_id=str(self.runtime_ctx.logid),
             execute_id=self.runtime_ctx.run_id,
-            input_data=_serialize_data(inputs),
+            input_data=self._payload("workflow", inputs),
             method=self.runtime_ctx.method,
         )
 
     def _on_graph_end(self, outputs: Dict[str, Any]):
         # Workflow end
         total_time = time.time() - self.start_time
+        WORKFLOW_DURATION.observe(total_time, self.runtime_ctx.method or "", "ok")
         log_workflow_end(
             execution_id=self.runtime_ctx.run_id,
             output=outputs,
@@ -386,6 +425,10 @@ class Logger(BaseCallbackHandler):
             event_type = "cancel"
         # 记录节点失败日志
         node_name = self.run_id_map.pop(run_id, "")
+        self._observe_node(run_id, node_name, event_type)
+        if parent_run_id is None:
+            self._release_runs()
+            WORKFLOW_DURATION.observe(time.time() - self.start_time, self.runtime_ctx.method or "", event_type)
         # Node end
         node_id = ""
         node_title = ""
@@ -413,20 +456,63 @@ class Logger(BaseCallbackHandler):
         )
         write_log(error_log_entry)
 
+    def _release_runs(self) -> None:
+        """根 run 结束：丢弃本次运行中没有收到结束回调的 run"""
+        self.run_id_map.clear()
+        self._node_started.clear()
+        self.root_run_id = None
+
+    def _evict_oldest(self) -> None:
+        """未结束的 run 达到上限时丢弃最早的（兜底，正常运行不会触发）"""
+        with self._evict_lock:
+            first = self.evicted == 0
+            while len(self.run_id_map) >= TRACER_MAX_OPEN_RUNS:
+                try:
+                    oldest = next(iter(self.run_id_map))
+                except (StopIteration, RuntimeError):
+                    break
+                self.run_id_map.pop(oldest, None)
+                self._node_started.pop(oldest, None)
+                self.evicted += 1
+            if first and self.evicted:
+                logger.warning(f"Tracer for run {self.runtime_ctx.run_id} reached {TRACER_MAX_OPEN_RUNS} open runs, dropping the oldest")
+
+    def _payload(self, node_name: str, data: Any) -> str:
+        """节点输入/输出的日志内容，未被采样时为空（线上不写节点日志，不做序列化）"""
+        if is_prod() or not payload_sampled(node_name, self.runtime_ctx.run_id):
+            return ""
+        return _serialize_data(data)
+
+    def _observe_node(self, run_id: uuid.UUID, node_name: Optional[str], status: str) -> None:
+        """记录节点耗时（只统计图中的节点和条件函数）"""
+        started = self._node_started.pop(run_id, None)
+        if started is not None and node_name:
+            elapsed = time.perf_counter() - started
+            NODE_DURATION.observe(elapsed, node_name, status)
+            if self.profile is not None and node_name in self.parser.nodes:
+                self.profile.exit_node(node_name, elapsed, status)
+
+    def on_llm_end(
+            self,
+            response: LLMResult,
+            *,
+            run_id: UUID,
+            parent_run_id: UUID | None = None,
+            **kwargs: Any,
+    ) -> Any:
+        # 节点内的模型调用继承运行的回调，在这里累计 token 消耗
+        if self.profile is not None:
+            self.profile.add_tokens(*_token_usage(response))
+
     def get_node_tags(self, node_name: str) -> dict[str, str]:
-        node_tags = {}
         if node_name is None or node_name == "":
-            return node_tags
+            return {}
 
-        node_info = self.parser.nodes.get(node_name, None)
-        if node_info is None:
+        node_tags = self.parser.node_tags.get(node_name)
+        if node_tags is None:
             logger.debug(f"Node {node_name} not found in graph")
             return {}
-        node_tags["node_id"] = node_info.node_id
-        node_tags["node_type"] = self.parser.get_node_type(node_info.node_id)
-        node_tags["node_title"] = node_info.title
-        node_tags["node_name"] = node_info.name
-        return node_tags
+        return dict(node_tags)
 
     def get_node_name(self, node_name: str) -> str:
         # 获取node title
@@ -440,43 +526,33 @@ class Logger(BaseCallbackHandler):
         return node_title
 
 
+def _token_usage(response: LLMResult) -> tuple[int, int]:
+    """模型调用的 (输入 token, 输出 token)：优先取消息的 usage_metadata，其次取 llm_output 中的 token_usage"""
+    input_tokens = output_tokens = 0
+    found = False
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+                found = True
+    if not found:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0) or 0
+        output_tokens = usage.get("completion_tokens", 0) or 0
+    return input_tokens, output_tokens
+
+
 def _serialize_data(data: Any) -> str:
     """
-    增强版数据序列化函数，支持：
+    序列化日志中的输入/输出数据（截断和大小上限见 payload.py），支持：
     - Pydantic BaseModel
     - 字典/列表等基础类型
     - 自定义对象（通过 __dict__ 序列化）
-    - 特殊字符（保证 ASCII 编码）
     """
-
-    def _recursive_serialize(item: Any):
-        """递归序列化单个元素"""
-        # 处理 Pydantic 模型
-        if isinstance(item, BaseModel):
-            return item.model_dump()  # 先转字典再序列化
-
-        # 处理列表/元组
-        elif isinstance(item, (list, tuple)):
-            return [_recursive_serialize(sub_item) for sub_item in item]
-
-        # 处理字典
-        elif isinstance(item, dict):
-            return {key: _recursive_serialize(value) for key, value in item.items()}
-
-        # 处理自定义对象（有 __dict__ 属性的）
-        elif hasattr(item, '__dict__') and not isinstance(item, (str, int, float, bool, type(None))):
-            return _recursive_serialize(item.__dict__)
-
-        # 基础类型直接返回
-        else:
-            return item
-
     try:
-        # 先递归处理数据为可序列化的基础类型
-        serialized_data = _recursive_serialize(data)
-        # 最终序列化为 JSON 字符串
-        return json.dumps(serialized_data, ensure_ascii=False, indent=None)
-
+        return serialize_payload(data)
     except Exception as e:
         logger.error(f"Error serializing data: {e}", exc_info=True)
         # 降级处理：返回字符串表示
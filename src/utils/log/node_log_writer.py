@@ -0,0 +1,202 @@
+"""
+节点日志（app.log）的后台批量写入
+
+write_log() 原来每个事件都 open + write + flush + fsync 一次，在 LangGraph 回调中同步执行，
+每个节点每次请求两次磁盘往返。现在事件放入有界队列，由后台线程序列化并批量写入：
+
+- 组提交：攒够 NODE_LOG_FLUSH_BYTES 字节，或批次第一条入队后超过 NODE_LOG_FLUSH_MS 毫秒时写一次
+- fsync 策略（NODE_LOG_FSYNC）：batch 每批写入后 fsync；interval 最多每 NODE_LOG_FSYNC_INTERVAL_MS
+  毫秒 fsync 一次；off 交给操作系统刷盘
+- 队列满时丢弃事件并计数，不阻塞请求；丢弃数见 stats() 和 /metrics
+- 每批重新打开文件：setup_logging() 的 RotatingFileHandler 轮转同一个 app.log 后不会继续写旧文件
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from utils.log.metrics import Sample, register_collector
+
+logger = logging.getLogger(__name__)
+
+# 是否后台批量写入（0 时恢复每个事件同步写入并 fsync）
+NODE_LOG_ASYNC = os.getenv("NODE_LOG_ASYNC", "1") == "1"
+# 队列容量（事件数），队列满时丢弃新事件
+NODE_LOG_QUEUE_SIZE = int(os.getenv("NODE_LOG_QUEUE_SIZE", "10000"))
+# 组提交：批次最长等待时间（毫秒）和最大字节数
+NODE_LOG_FLUSH_MS = int(os.getenv("NODE_LOG_FLUSH_MS", "200"))
+NODE_LOG_FLUSH_BYTES = int(os.getenv("NODE_LOG_FLUSH_BYTES", str(256 * 1024)))
+# fsync 策略：batch / interval / off
+NODE_LOG_FSYNC = os.getenv("NODE_LOG_FSYNC", "batch").lower()
+NODE_LOG_FSYNC_INTERVAL_MS = int(os.getenv("NODE_LOG_FSYNC_INTERVAL_MS", "1000"))
+
+FSYNC_POLICIES = ("batch", "interval", "off")
+# 批次等待超时的标记
+_DEADLINE = object()
+
+
+class NodeLogWriter:
+    """有界队列 + 后台线程的 JSON 行日志写入"""
+
+    def __init__(
+        self,
+        path: str,
+        queue_size: int = NODE_LOG_QUEUE_SIZE,
+        flush_ms: int = NODE_LOG_FLUSH_MS,
+        flush_bytes: int = NODE_LOG_FLUSH_BYTES,
+        fsync: str = NODE_LOG_FSYNC,
+        fsync_interval_ms: int = NODE_LOG_FSYNC_INTERVAL_MS
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}, expected one of {FSYNC_POLICIES}")
+        self.path = path
+        self.flush_seconds = flush_ms / 1000
+        self.flush_bytes = flush_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval_ms / 1000
+        self._last_fsync = 0.0
+
+        # 队列中是日志字典、flush() 的 Event 或结束标记 None
+        self._queue: "queue.Queue[Union[Dict[str, Any], threading.Event, None]]" = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="node-log-writer", daemon=True)
+        self._thread.start()
+
+        # 统计信息
+        self.written = 0
+        self.dropped = 0
+        self._drop_lock = threading.Lock()
+        self.batches = 0
+        self.fsyncs = 0
+        self.errors = 0
+        self.write_seconds = 0.0
+
+    def submit(self, entry: Dict[str, Any]) -> bool:
+        """放入队列（不阻塞），队列已满时丢弃并返回False"""
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+            return False
+
+    def _run(self) -> None:
+        batch: List[bytes] = []
+        size = 0
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _DEADLINE
+            if isinstance(item, dict):
+                try:
+                    line = (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Failed to serialize log entry: {e}", flush=True)
+                    continue
+                if not batch:
+                    deadline = time.monotonic() + self.flush_seconds
+                batch.append(line)
+                size += len(line)
+                if size < self.flush_bytes:
+                    continue
+            if batch:
+                self._write(batch)
+                batch, size = [], 0
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _write(self, batch: List[bytes]) -> None:
+        start = time.perf_counter()
+        try:
+            with open(self.path, "ab") as f:
+                f.write(b"".join(batch))
+                f.flush()
+                if self.fsync == "batch" or (
+                    self.fsync == "interval" and time.monotonic() - self._last_fsync >= self.fsync_interval
+                ):
+                    os.fsync(f.fileno())
+                    self._last_fsync = time.monotonic()
+                    self.fsyncs += 1
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"Failed to write {len(batch)} log entries: {e}", flush=True)
+        finally:
+            self.write_seconds += time.perf_counter() - start
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已入队的事件写入文件，返回是否在超时前完成"""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 5) -> None:
+        """写完已入队的事件后停止后台线程"""
+        if not self._thread.is_alive():
+            return
+        self.flush(timeout)
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+            "batches": self.batches,
+            "avg_batch": round(self.written / self.batches, 1) if self.batches else None,
+            "fsyncs": self.fsyncs,
+            "errors": self.errors,
+            "avg_write_ms": round(self.write_seconds / self.batches * 1000, 3) if self.batches else None,
+        }
+
+
+_writer: Optional[NodeLogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_node_log_writer(path: str) -> Optional[NodeLogWriter]:
+    """节点日志写入器（单例，第一次调用时创建并在进程退出时写完剩余事件），NODE_LOG_ASYNC=0 时返回None"""
+    global _writer
+    if not NODE_LOG_ASYNC:
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = NodeLogWriter(path)
+                atexit.register(_writer.close)
+                logger.info(
+                    f"Node log writer started: flush_ms={NODE_LOG_FLUSH_MS}, flush_bytes={NODE_LOG_FLUSH_BYTES}, "
+                    f"fsync={NODE_LOG_FSYNC}, queue_size={NODE_LOG_QUEUE_SIZE}"
+                )
+    return _writer
+
+
+def _collect_node_log() -> Iterator[Sample]:
+    if _writer is None:
+        return
+    stats = _writer.stats()
+    yield Sample("node_log_dropped_total", "Node log events dropped because the writer queue was full", "counter") \
+        .add(stats["dropped"])
+    yield Sample("node_log_pending", "Node log events waiting for the background writer", "gauge") \
+        .add(stats["pending"])
+
+
+register_collector(_collect_node_log)
@@ -1,4 +1,6 @@
 import inspect
+import threading
+import weakref
 from dataclasses import dataclass
 from typing import Dict, Optional, Any, Callable, cast
 from langgraph.graph.state import CompiledStateGraph
@@ -75,14 +77,28 @@ class NodeInfo:
 
 class LangGraphParser:
     def __init__(self, app: CompiledStateGraph):
-        # 从LangGraph中获取图结构
-        self.graph_app = app
+        # 从LangGraph中获取图结构（弱引用：解析结果按图缓存，不能反过来让图无法释放）
+        self._graph_app = weakref.ref(app)
         self.graph = app.get_graph()
         # 从图中构建节点信息
         self.nodes: Dict[str, NodeInfo] = {}  # NodeId -> NodeInfo
         # 构建基础信息 - 优先使用CompiledStateGraph中的信息
         self._build_node_info()
         self.condition_funcs = self._pre_process_conditional_fork_node_info()  # 跟踪condition节点的判断函数，因为中间会插入哑结点和condition节点
+        # 每个节点的 trace 标签（LoopTracer 每次回调都会取）
+        self.node_tags: Dict[str, Dict[str, str]] = {
+            node_id: {
+                "node_id": info.node_id,
+                "node_type": self.get_node_type(info.node_id),
+                "node_title": info.title,
+                "node_name": info.name,
+            }
+            for node_id, info in self.nodes.items()
+        }
+
+    @property
+    def graph_app(self) -> CompiledStateGraph:
+        return self._graph_app()
 
     def _is_agent_node(self, node_id: str) -> bool:
         """
@@ -253,3 +269,23 @@ class LangGraphParser:
                 conditional_funcs[check_func_name] = {
                     "cond_node_name": "cond_" + parent_id} # 拼成前端的条件节点名
         return conditional_funcs
+
+
+# 已编译图 -> 解析结果；图不再被引用时自动清除（智能体项目每次请求可能创建新的图）
+_parsers: "weakref.WeakKeyDictionary[CompiledStateGraph, LangGraphParser]" = weakref.WeakKeyDictionary()
+_parsers_lock = threading.Lock()
+
+
+def get_graph_parser(app: CompiledStateGraph) -> LangGraphParser:
+    """
+    获取已编译图的解析结果（每个图只解析一次，各请求共享，只读）
+
+    Logger 每次请求都会创建，解析图（遍历节点、读取 metadata 和条件分支、解析 docstring）只在第一次进行。
+    """
+    parser = _parsers.get(app)
+    if parser is None:
+        with _parsers_lock:
+            parser = _parsers.get(app)
+            if parser is None:
+                parser = _parsers[app] = LangGraphParser(app)
+    return parser
@@ -0,0 +1,101 @@
+"""
+节点日志中输入/输出的序列化（Logger 回调中每个节点开始和结束各一次）
+
+原来对整个状态递归 model_dump 后 json.dumps，耗时随状态大小（对话历史、作业列表等）增长。现在：
+
+- 按节点采样：NODE_LOG_PAYLOAD_SAMPLE_RATE 为默认比例，NODE_LOG_PAYLOAD_SAMPLE_RATES 按节点覆盖
+  （如 "voice_synthesis=0.1,save_memory=0"）；按 run_id 决定，同一次运行中节点的开始和结束要么都记录要么都不记录
+- 遍历时先截断再递归：列表只保留最后 NODE_LOG_MAX_LIST_ITEMS 项（对话历史等按时间追加，最近的更有用），
+  字符串截断到 NODE_LOG_MAX_STRING 个字符，字典最多 NODE_LOG_MAX_DICT_KEYS 个键，
+  超过 NODE_LOG_MAX_DEPTH 层只记录类型名，bytes 只记录长度，NODE_LOG_OMIT_FIELDS 中的字段不记录
+- 用 orjson 编码；编码结果仍超过 NODE_LOG_MAX_PAYLOAD_BYTES 时只记录摘要和大小
+"""
+import hashlib
+import os
+import zlib
+from collections.abc import Mapping, Sequence, Set
+from enum import Enum
+from itertools import islice
+from typing import Any, Dict
+
+import orjson
+from pydantic import BaseModel
+
+NODE_LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("NODE_LOG_PAYLOAD_SAMPLE_RATE", "1"))
+NODE_LOG_PAYLOAD_SAMPLE_RATES = os.getenv("NODE_LOG_PAYLOAD_SAMPLE_RATES", "")
+NODE_LOG_MAX_LIST_ITEMS = int(os.getenv("NODE_LOG_MAX_LIST_ITEMS", "20"))
+NODE_LOG_MAX_DICT_KEYS = int(os.getenv("NODE_LOG_MAX_DICT_KEYS", "100"))
+NODE_LOG_MAX_STRING = int(os.getenv("NODE_LOG_MAX_STRING", "2000"))
+NODE_LOG_MAX_DEPTH = int(os.getenv("NODE_LOG_MAX_DEPTH", "6"))
+NODE_LOG_MAX_PAYLOAD_BYTES = int(os.getenv("NODE_LOG_MAX_PAYLOAD_BYTES", str(64 * 1024)))
+NODE_LOG_OMIT_FIELDS = frozenset(f.strip() for f in os.getenv("NODE_LOG_OMIT_FIELDS", "").split(",") if f.strip())
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """解析 "节点=比例,节点=比例"，格式错误的项忽略"""
+    rates = {}
+    for item in spec.split(","):
+        name, sep, rate = item.partition("=")
+        if not sep:
+            continue
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+_sample_rates = parse_sample_rates(NODE_LOG_PAYLOAD_SAMPLE_RATES)
+
+
+def payload_sampled(node_name: str, run_id: str) -> bool:
+    """本次运行是否记录该节点的输入输出"""
+    rate = _sample_rates.get(node_name, NODE_LOG_PAYLOAD_SAMPLE_RATE)
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    return zlib.crc32(f"{run_id}:{node_name}".encode("utf-8")) / 0xFFFFFFFF < rate
+
+
+def _bounded(item: Any, depth: int) -> Any:
+    """转换为可编码的结构，遍历前先截断"""
+    if item is None or isinstance(item, (bool, int, float)):
+        return item
+    if isinstance(item, str):
+        if len(item) > NODE_LOG_MAX_STRING:
+            return f"{item[:NODE_LOG_MAX_STRING]}…(+{len(item) - NODE_LOG_MAX_STRING} chars)"
+        return item
+    if isinstance(item, (bytes, bytearray, memoryview)):
+        return f"<{len(item)} bytes>"
+    if depth >= NODE_LOG_MAX_DEPTH:
+        return f"<{type(item).__name__}>"
+
+    if isinstance(item, BaseModel):
+        item = item.__dict__
+    if isinstance(item, Mapping):
+        result = {}
+        for i, (key, value) in enumerate(item.items()):
+            if i >= NODE_LOG_MAX_DICT_KEYS:
+                result["…"] = f"+{len(item) - NODE_LOG_MAX_DICT_KEYS} keys"
+                break
+            key = key if isinstance(key, str) else str(key)
+            result[key] = "<omitted>" if key in NODE_LOG_OMIT_FIELDS else _bounded(value, depth + 1)
+        return result
+    if isinstance(item, (Sequence, Set)):
+        omitted = max(0, len(item) - NODE_LOG_MAX_LIST_ITEMS)
+        kept = item[omitted:] if isinstance(item, Sequence) else islice(item, NODE_LOG_MAX_LIST_ITEMS)
+        result = [_bounded(v, depth + 1) for v in kept]
+        return [f"…(+{omitted} items)"] + result if omitted else result
+    if hasattr(item, "__dict__") and not isinstance(item, Enum):
+        return _bounded(vars(item), depth)
+    return item
+
+
+def serialize_payload(data: Any) -> str:
+    """节点输入/输出的日志字符串（JSON），大小有上限"""
+    encoded = orjson.dumps(_bounded(data, 0), default=str, option=orjson.OPT_NON_STR_KEYS)
+    if len(encoded) > NODE_LOG_MAX_PAYLOAD_BYTES:
+        digest = hashlib.blake2b(encoded, digest_size=16).hexdigest()
+        encoded = orjson.dumps({"_digest": digest, "_bytes": len(encoded)})
+    return encoded.decode("utf-8")
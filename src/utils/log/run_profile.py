@@ -0,0 +1,129 @@
+"""
+单次运行的耗时分解：实际经过的节点、各节点耗时、外部调用耗时、排队等待耗时和 token 消耗
+
+- GraphService 在每次运行前调用 start_run_profile()，记录对象放在 ContextVar 中；
+  LangGraph 执行节点和回调时复制上下文，拿到的是同一个记录对象
+- 节点和 token 由 utils/log/node_log.py 的 Logger 回调记录，外部调用由 utils/log/metrics.py 的
+  SDK 计时包装记录，连接池等待由 storage/database/db.py 记录
+- 运行结束后填入 GraphOutput.execution_path / performance_metrics，流式运行的 message_end
+  带上累计的 token_cost
+- 没有调用 start_run_profile() 时（直接调用图、测试）各记录函数什么也不做
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+
+class RunProfile:
+    """一次运行的耗时记录（同一次运行中可能有多个线程同时写入，用锁保护）"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.execution_path: List[str] = []  # 节点按开始顺序
+        self.node_seconds: Dict[str, float] = {}
+        self.failed_nodes: List[str] = []
+        self.external: Dict[str, List[float]] = {}  # 服务 -> [调用次数, 耗时]
+        self.queue_seconds: Dict[str, float] = {}
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def enter_node(self, name: str) -> None:
+        with self._lock:
+            self.execution_path.append(name)
+
+    def exit_node(self, name: str, seconds: float, status: str = "ok") -> None:
+        with self._lock:
+            self.node_seconds[name] = self.node_seconds.get(name, 0.0) + seconds
+            if status != "ok":
+                self.failed_nodes.append(name)
+
+    def add_external(self, service: str, seconds: float) -> None:
+        with self._lock:
+            stat = self.external.get(service)
+            if stat is None:
+                stat = self.external[service] = [0, 0.0]
+            stat[0] += 1
+            stat[1] += seconds
+
+    def add_queue_wait(self, queue: str, seconds: float) -> None:
+        with self._lock:
+            self.queue_seconds[queue] = self.queue_seconds.get(queue, 0.0) + seconds
+
+    def add_tokens(self, input_tokens: int, output_tokens: int) -> None:
+        with self._lock:
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+    def elapsed_ms(self) -> int:
+        return int((time.perf_counter() - self.started) * 1000)
+
+    def token_cost(self) -> Dict[str, int]:
+        return {
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.input_tokens + self.output_tokens,
+        }
+
+    def performance_metrics(self) -> Dict[str, Any]:
+        """按阶段拆分的耗时（毫秒）"""
+        with self._lock:
+            nodes = {name: _ms(seconds) for name, seconds in self.node_seconds.items()}
+            external = {
+                service: {"calls": int(calls), "ms": _ms(seconds)}
+                for service, (calls, seconds) in self.external.items()
+            }
+            queues = {name: _ms(seconds) for name, seconds in self.queue_seconds.items()}
+            failed = list(self.failed_nodes)
+        metrics = {
+            "total_ms": self.elapsed_ms(),
+            "total_nodes": len(self.execution_path),
+            "node_ms": nodes,
+            "external_ms": round(sum(stat["ms"] for stat in external.values()), 1),
+            "external": external,
+            "queue_ms": round(sum(queues.values()), 1),
+            "queue": queues,
+            "token_cost": self.token_cost(),
+        }
+        if failed:
+            metrics["failed_nodes"] = failed
+        return metrics
+
+    def apply(self, output: Any) -> Any:
+        """把实际执行路径和耗时填入图的输出（保留节点自己写入的指标，例如 cache_hit）"""
+        if not isinstance(output, dict) or not self.execution_path:
+            return output
+        output["execution_path"] = list(self.execution_path)
+        output["performance_metrics"] = {**(output.get("performance_metrics") or {}), **self.performance_metrics()}
+        return output
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+_current_profile: ContextVar[Optional[RunProfile]] = ContextVar("run_profile", default=None)
+
+
+def start_run_profile() -> RunProfile:
+    """为当前上下文（一次运行）创建新的耗时记录"""
+    profile = RunProfile()
+    _current_profile.set(profile)
+    return profile
+
+
+def current_run_profile() -> Optional[RunProfile]:
+    return _current_profile.get()
+
+
+def record_external_call(service: str, seconds: float) -> None:
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add_external(service, seconds)
+
+
+def record_queue_wait(queue: str, seconds: float) -> None:
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add_queue_wait(queue, seconds)
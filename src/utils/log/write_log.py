@@ -1,13 +1,36 @@
+"""
+应用日志（app.log 和控制台）的配置
+
+- setup_logging() 在根 logger 上挂 RecordQueueHandler：请求线程只做过滤（读取请求上下文）并把记录放入
+  有界队列（LOG_QUEUE_SIZE，满时丢弃并计数），由 QueueListener 线程用 orjson 格式化并写入文件和控制台；
+  LOG_ASYNC=0 时恢复各 handler 在调用方线程同步写入
+- loggable_body() 用于请求日志中的请求体：每个路由每秒最多 LOG_REQUEST_BODY_PER_SEC 个，
+  超过 LOG_REQUEST_BODY_MAX_CHARS 个字符时截断
+"""
+import atexit
 import logging
 import logging.handlers
-import json
 import os
+import queue
+import threading
+import time
 from contextvars import ContextVar
-from typing import Optional
+from typing import Dict, Iterator, Optional
 from pathlib import Path
 
+import orjson
+
 from coze_coding_utils.runtime_ctx.context import Context
 from utils.log.config import LOG_DIR
+from utils.log.metrics import Sample, register_collector
+
+# 是否经队列由后台线程格式化和写入（0 时恢复各 handler 在调用方线程同步写入）
+LOG_ASYNC = os.getenv("LOG_ASYNC", "1") == "1"
+# 队列容量（记录数），队列满时丢弃新记录
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# 请求体日志：每个路由每秒最多记录几个请求体，每个最多记录多少字符
+LOG_REQUEST_BODY_PER_SEC = float(os.getenv("LOG_REQUEST_BODY_PER_SEC", "5"))
+LOG_REQUEST_BODY_MAX_CHARS = int(os.getenv("LOG_REQUEST_BODY_MAX_CHARS", "2000"))
 
 request_context: ContextVar[Optional[Context]] = ContextVar('request_context', default=None)
 
@@ -45,74 +68,129 @@ class APSchedulerFilter(logging.Filter):
         return True
 
 
+# 不作为额外字段输出的 LogRecord 属性
+_RESERVED_ATTRS = frozenset([
+    'name', 'msg', 'args', 'created', 'filename', 'funcName',
+    'levelname', 'levelno', 'lineno', 'module', 'msecs',
+    'message', 'pathname', 'process', 'processName', 'relativeCreated',
+    'thread', 'threadName', 'exc_info', 'exc_text', 'stack_info',
+    'log_id', 'run_id', 'space_id', 'project_id', 'method',
+    'x_tt_env', 'rpc_persist_rec_rec_biz_scene',
+    'rpc_persist_coze_record_root_id', 'rpc_persist_rec_root_entity_type',
+    'rpc_persist_rec_root_entity_id',
+])
+
+
+def _format_json(formatter: logging.Formatter, record: logging.LogRecord) -> str:
+    log_data = {
+        'message': record.getMessage(),
+        'timestamp': formatter.formatTime(record, formatter.datefmt),
+        'level': record.levelname,
+        'logger': record.name,
+        'log_id': getattr(record, 'log_id', ''),
+        'run_id': getattr(record, 'run_id', ''),
+        'space_id': getattr(record, 'space_id', ''),
+        'project_id': getattr(record, 'project_id', ''),
+        'method': getattr(record, 'method', ''),
+        'x_tt_env': getattr(record, 'x_tt_env', ''),
+        'lineno': record.lineno,
+        'funcName': record.funcName,
+    }
+
+    if record.exc_info:
+        log_data['exc_info'] = formatter.formatException(record.exc_info)
+
+    for key, value in record.__dict__.items():
+        if key not in _RESERVED_ATTRS:
+            log_data[key] = value
+
+    return orjson.dumps(log_data, default=str, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+
 class JsonFormatter(logging.Formatter):
-    
+
     def format(self, record: logging.LogRecord) -> str:
-        log_data = {
-            'message': record.getMessage(),
-            'timestamp': self.formatTime(record, self.datefmt),
-            'level': record.levelname,
-            'logger': record.name,
-            'log_id': getattr(record, 'log_id', ''),
-            'run_id': getattr(record, 'run_id', ''),
-            'space_id': getattr(record, 'space_id', ''),
-            'project_id': getattr(record, 'project_id', ''),
-            'method': getattr(record, 'method', ''),
-            'x_tt_env': getattr(record, 'x_tt_env', ''),
-            'lineno': record.lineno,
-            'funcName': record.funcName,
-        }
-
-        if record.exc_info:
-            log_data['exc_info'] = self.formatException(record.exc_info)
-        
-        for key, value in record.__dict__.items():
-            if key not in ['name', 'msg', 'args', 'created', 'filename', 'funcName', 
-                          'levelname', 'levelno', 'lineno', 'module', 'msecs', 
-                          'message', 'pathname', 'process', 'processName', 'relativeCreated',
-                          'thread', 'threadName', 'exc_info', 'exc_text', 'stack_info',
-                          'log_id', 'run_id', 'space_id', 'project_id', 'method',
-                          'x_tt_env', 'rpc_persist_rec_rec_biz_scene', 
-                          'rpc_persist_coze_record_root_id', 'rpc_persist_rec_root_entity_type',
-                          'rpc_persist_rec_root_entity_id']:
-                log_data[key] = value
-        
-        return json.dumps(log_data, ensure_ascii=False)
+        return _format_json(self, record)
 
 
 class PlainTextFormatter(logging.Formatter):
-    
+
     def format(self, record: logging.LogRecord) -> str:
-        log_data = {
-            'message': record.getMessage(),
-            'timestamp': self.formatTime(record, self.datefmt),
-            'level': record.levelname,
-            'logger': record.name,
-            'log_id': getattr(record, 'log_id', ''),
-            'run_id': getattr(record, 'run_id', ''),
-            'space_id': getattr(record, 'space_id', ''),
-            'project_id': getattr(record, 'project_id', ''),
-            'method': getattr(record, 'method', ''),
-            'x_tt_env': getattr(record, 'x_tt_env', ''),
-            'lineno': record.lineno,
-            'funcName': record.funcName,
-        }
-        
-        if record.exc_info:
-            log_data['exc_info'] = self.formatException(record.exc_info)
-        
-        for key, value in record.__dict__.items():
-            if key not in ['name', 'msg', 'args', 'created', 'filename', 'funcName', 
-                          'levelname', 'levelno', 'lineno', 'module', 'msecs', 
-                          'message', 'pathname', 'process', 'processName', 'relativeCreated',
-                          'thread', 'threadName', 'exc_info', 'exc_text', 'stack_info',
-                          'log_id', 'run_id', 'space_id', 'project_id', 'method',
-                          'x_tt_env', 'rpc_persist_rec_rec_biz_scene', 
-                          'rpc_persist_coze_record_root_id', 'rpc_persist_rec_root_entity_type',
-                          'rpc_persist_rec_root_entity_id']:
-                log_data[key] = value
-        
-        return json.dumps(log_data, ensure_ascii=False)
+        return _format_json(self, record)
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    调用方线程只做过滤和合并消息参数，记录放入有界队列；格式化和写入在 QueueListener 线程执行。
+    队列满时丢弃记录并计数，不阻塞请求。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 参数可能在入队后被修改，先合并为消息；异常信息留给监听线程格式化
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class RecordQueueListener(logging.handlers.QueueListener):
+    """停止时等待队列有空位再放入结束标记（队列满时默认的 put_nowait 会失败）"""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+class _BodyRateLimiter:
+    """按路由的令牌桶：每秒最多记录 rate 个请求体"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.suppressed = 0
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, route: str) -> bool:
+        if self.rate <= 0:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(route)
+            if bucket is None:
+                bucket = self._buckets[route] = [self.rate, now]
+            tokens = min(self.rate, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return True
+            bucket[0] = tokens
+            self.suppressed += 1
+            return False
+
+
+_body_limiter = _BodyRateLimiter(LOG_REQUEST_BODY_PER_SEC)
+# 当前的队列 handler 和监听线程（LOG_ASYNC=1 时由 setup_logging 创建）
+_queue_handler: Optional[RecordQueueHandler] = None
+_listener: Optional[RecordQueueListener] = None
+
+
+def loggable_body(route: str, body_text: str) -> str:
+    """请求日志中的请求体：按路由限流，超过 LOG_REQUEST_BODY_MAX_CHARS 截断"""
+    if not _body_limiter.allow(route):
+        return f"<{len(body_text)} chars, rate limited>"
+    if len(body_text) > LOG_REQUEST_BODY_MAX_CHARS:
+        return f"{body_text[:LOG_REQUEST_BODY_MAX_CHARS]}…(+{len(body_text) - LOG_REQUEST_BODY_MAX_CHARS} chars)"
+    return body_text
 
 
 def setup_logging(
@@ -135,13 +213,19 @@ def setup_logging(
             log_file = str(fallback_log_dir / 'app.log')
             print(f"Warning: Using fallback log directory: {fallback_log_dir}, due to error: {e}", flush=True)
     
+    global _listener, _queue_handler
+    level = getattr(logging, log_level.upper(), logging.INFO)
     root_logger = logging.getLogger()
-    root_logger.setLevel(getattr(logging, log_level.upper(), logging.INFO))
+    root_logger.setLevel(level)
     
     root_logger.handlers.clear()
+    if _listener is not None:
+        _listener.stop()
+        _listener = _queue_handler = None
     
     context_filter = ContextFilter()
     apscheduler_filter = APSchedulerFilter()
+    handlers = []
     
     file_handler = logging.handlers.RotatingFileHandler(
         filename=log_file,
@@ -149,7 +233,7 @@ def setup_logging(
         backupCount=backup_count,
         encoding='utf-8'
     )
-    file_handler.setLevel(getattr(logging, log_level.upper(), logging.INFO))
+    file_handler.setLevel(level)
     
     if use_json_format:
         file_formatter = JsonFormatter()
@@ -160,26 +244,67 @@ def setup_logging(
         )
     
     file_handler.setFormatter(file_formatter)
-    file_handler.addFilter(context_filter)
-    file_handler.addFilter(apscheduler_filter)
-    root_logger.addHandler(file_handler)
+    handlers.append(file_handler)
     
     if console_output:
         console_handler = logging.StreamHandler()
-        console_handler.setLevel(getattr(logging, log_level.upper(), logging.INFO))
+        console_handler.setLevel(level)
         
         console_formatter = PlainTextFormatter(
             fmt='%(asctime)s %(levelname)s [log_id=%(log_id)s] [run_id=%(run_id)s] %(name)s:%(lineno)d %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         console_handler.setFormatter(console_formatter)
-        console_handler.addFilter(context_filter)
-        console_handler.addFilter(apscheduler_filter)
-        root_logger.addHandler(console_handler)
+        handlers.append(console_handler)
     
-    logging.info(f"Logging configured: file={log_file}, max_bytes={max_bytes}, backup_count={backup_count}")
+    if LOG_ASYNC:
+        # 请求上下文在调用方线程读取，过滤器放在队列 handler 上
+        _queue_handler = RecordQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        _queue_handler.setLevel(level)
+        _queue_handler.addFilter(context_filter)
+        _queue_handler.addFilter(apscheduler_filter)
+        root_logger.addHandler(_queue_handler)
+        _listener = RecordQueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in handlers:
+            handler.addFilter(context_filter)
+            handler.addFilter(apscheduler_filter)
+            root_logger.addHandler(handler)
+    
+    logging.info(f"Logging configured: file={log_file}, max_bytes={max_bytes}, backup_count={backup_count}, async={LOG_ASYNC}")
     
     return log_file
 
 
-__all__ = ['setup_logging', 'request_context', 'ContextFilter', 'APSchedulerFilter', 'JsonFormatter', 'PlainTextFormatter']
+def flush_logging() -> None:
+    """等待队列中的日志记录写完（停止并重新启动监听线程）"""
+    if _listener is not None:
+        _listener.stop()
+        _listener.start()
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+def _collect_logging() -> Iterator[Sample]:
+    if _queue_handler is not None:
+        yield Sample("log_records_dropped_total", "Log records dropped because the logging queue was full", "counter") \
+            .add(_queue_handler.dropped)
+        yield Sample("log_queue_pending", "Log records waiting for the logging listener thread", "gauge") \
+            .add(_queue_handler.queue.qsize())
+    yield Sample("request_body_logs_suppressed_total", "Request bodies left out of request logs by the per-route rate limit", "counter") \
+        .add(_body_limiter.suppressed)
+
+
+register_collector(_collect_logging)
+
+
+__all__ = ['setup_logging', 'flush_logging', 'loggable_body', 'request_context', 'ContextFilter', 'APSchedulerFilter', 'JsonFormatter', 'PlainTextFormatter']
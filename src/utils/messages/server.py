@@ -2,6 +2,8 @@ import uuid
 from dataclasses import dataclass, field, asdict
 from typing import List, Optional, Any, Dict, Literal
 
+from utils.log.run_profile import current_run_profile
+
 # Message Types
 MESSAGE_TYPE_ANSWER = "answer"
 MESSAGE_TYPE_THINKING = "thinking"
@@ -114,6 +116,14 @@ class ServerMessage:
 
 
 
+def current_token_cost() -> TokenCost:
+    """当前运行累计的 token 消耗（未记录运行耗时时为0）"""
+    profile = current_run_profile()
+    if profile is None:
+        return TokenCost(input_tokens=0, output_tokens=0, total_tokens=0)
+    return TokenCost(**profile.token_cost())
+
+
 def create_message_end_dict(
     code: str,
     message: str,
@@ -138,7 +148,7 @@ def create_message_end_dict(
                 code=code,
                 message=message,
                 time_cost_ms=time_cost_ms,
-                token_cost=TokenCost(input_tokens=0, output_tokens=0, total_tokens=0),
+                token_cost=current_token_cost(),
             )
         ),
         log_id=log_id,